@@ -114,21 +114,24 @@ def handle_notes():
         }
     ]
     
+    # Tüm notlar tek istekte, tek transaction'da oluşturulur
     created_count = 0
-    for note_data in sample_notes:
-        try:
-            response = requests.post(f"{BASE_URL}/", json=note_data)
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success'):
-                    print(f"✅ Not oluşturuldu: {note_data['title']}")
-                    created_count += 1
-                else:
-                    print(f"❌ Not oluşturulamadı: {note_data['title']} - {result}")
-            else:
-                print(f"❌ HTTP Error ({response.status_code}): {note_data['title']}")
-        except Exception as e:
-            print(f"❌ Error creating note {note_data['title']}: {e}")
+    try:
+        response = requests.post(f"{BASE_URL}/bulk", json={
+            "operation": "create",
+            "workspace_id": workspace_id,
+            "created_by": "default_user",
+            "notes": sample_notes
+        })
+        result = response.json()
+        if response.status_code == 200 and result.get('success'):
+            created_count = result['count']
+            for note_data in sample_notes:
+                print(f"✅ Not oluşturuldu: {note_data['title']}")
+        else:
+            print(f"❌ Notlar oluşturulamadı ({response.status_code}): {result}")
+    except Exception as e:
+        print(f"❌ Error creating notes: {e}")
     
     print(f"\n🎉 {created_count}/{len(sample_notes)} örnek not oluşturuldu!")
     print(f"🌐 Web arayüzünü kontrol edin: http://localhost:5000/notes")
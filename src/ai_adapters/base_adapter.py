@@ -3,7 +3,7 @@ Base AI Adapter - Tüm AI adaptörlerinin temel sınıfı
 Enhanced with real-time performance tracking
 """
 from abc import ABC
-from typing import Dict, Optional, Any, List
+from typing import Callable, Dict, Optional, Any, List
 from dataclasses import dataclass
 import time
 from datetime import datetime
@@ -131,6 +131,18 @@ class BaseAIAdapter:
             
             raise e
     
+    async def send_message_streaming(self, message: str, context: Optional[str] = None,
+                                     on_chunk: Optional[Callable[[str], None]] = None) -> AIResponse:
+        """Yanıtı parça parça ileterek gönder
+        
+        on_chunk her yeni metin parçası ile çağrılır. Streaming desteklemeyen
+        adapter'larda tüm yanıt tek parça olarak iletilir.
+        """
+        response = await self.send_message(message, context)
+        if on_chunk and response and response.content:
+            on_chunk(response.content)
+        return response
+    
     async def _send_message_impl(self, message: str, context: Optional[str] = None) -> AIResponse:
         """Alt sınıflar bu metodu implement etmeli"""
         raise NotImplementedError("Alt sınıflar _send_message_impl metodunu implement etmeli")
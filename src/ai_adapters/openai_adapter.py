@@ -3,71 +3,130 @@ OpenAI (GPT) Adapter
 """
 import openai
 import asyncio
-from typing import Optional, Dict, Any
+import threading
+import time
+from typing import Callable, Optional, Dict, Any, List
 from .base_adapter import BaseAIAdapter, AIResponse
 
 
 class OpenAIAdapter(BaseAIAdapter):
     """OpenAI API adapter"""
     
+    # check_rate_limit ile aynı aralık (saniyede 1 istek)
+    REQUEST_INTERVAL = 1.0
+    
     def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
         super().__init__(api_key, model)
         self.client = openai.AsyncOpenAI(api_key=api_key)
+        self._next_request_slot = 0.0
+        self._slot_lock = threading.Lock()
+        
+    def _build_messages(self, message: str, context: Optional[str] = None) -> List[Dict[str, str]]:
+        """Chat mesaj listesi oluştur"""
+        messages = []
+        
+        # Context varsa ekle
+        if context:
+            messages.append({
+                "role": "system",
+                "content": context
+            })
+        
+        # Kullanıcı mesajı
+        messages.append({"role": "user", "content": message})
+        return messages
+    
+    async def _wait_for_rate_limit(self):
+        """Sıradaki boş istek dilimini ayır ve o zamana kadar bekle
+        
+        Eşzamanlı (pipeline) çağrılar hata almak yerine sıraya girer: dilim
+        beklemeden önce ayrıldığından aynı boşluğu iki çağrı kullanamaz.
+        """
+        # Kilit içinde await yok; farklı event loop'lardan gelen çağrılar da sıralanır
+        with self._slot_lock:
+            now = time.time()
+            slot = max(now, self._next_request_slot, self.last_request_time + self.REQUEST_INTERVAL)
+            self._next_request_slot = slot + self.REQUEST_INTERVAL
+        if slot > now:
+            await asyncio.sleep(slot - now)
+    
+    def _build_response(self, content: str, model: str, usage) -> AIResponse:
+        """Yanıt ve kullanım bilgilerinden AIResponse oluştur"""
+        input_tokens = usage.prompt_tokens if usage else 0
+        output_tokens = usage.completion_tokens if usage else 0
+        
+        # Maliyet hesapla
+        cost = self._calculate_cost(input_tokens, output_tokens)
+        
+        # İstatistikleri güncelle
+        self._update_stats(input_tokens, output_tokens, cost)
         
+        return AIResponse(
+            content=content,
+            model=model,
+            usage={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "cost": cost
+            }
+        )
+    
     async def send_message(self, message: str, context: Optional[str] = None) -> AIResponse:
         """OpenAI'ye mesaj gönder"""
-        
-        # Rate limit kontrolü
-        rate_limit = self.check_rate_limit()
-        if not rate_limit['available']:
-            raise Exception(f"Rate limit aşıldı. {rate_limit['retry_after']} saniye bekleyin.")
+        await self._wait_for_rate_limit()
         
         try:
-            # Mesaj listesi oluştur
-            messages = []
-            
-            # Context varsa ekle
-            if context:
-                messages.append({
-                    "role": "system",
-                    "content": context
-                })
-            
-            # Kullanıcı mesajı
-            messages.append({"role": "user", "content": message})
-            
             # API çağrısı
             response = await self.client.chat.completions.create(
                 model=self.model,
-                messages=messages,
+                messages=self._build_messages(message, context),
                 max_tokens=2048,
                 temperature=0.7,
                 stream=False
             )
             
-            # Yanıt ve kullanım bilgileri
-            ai_response = response.choices[0].message.content
-            usage = response.usage
+            return self._build_response(response.choices[0].message.content, response.model, response.usage)
             
-            # Maliyet hesapla
-            cost = self._calculate_cost(usage.prompt_tokens, usage.completion_tokens)
+        except Exception as e:
+            self.stats['total_errors'] += 1
+            raise Exception(f"OpenAI API hatası: {str(e)}")
+    
+    async def send_message_streaming(self, message: str, context: Optional[str] = None,
+                                     on_chunk: Optional[Callable[[str], None]] = None) -> AIResponse:
+        """OpenAI'ye mesaj gönder, yanıtı geldikçe on_chunk ile ilet"""
+        await self._wait_for_rate_limit()
+        
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self._build_messages(message, context),
+                max_tokens=2048,
+                temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
             
-            # İstatistikleri güncelle
-            self._update_stats(usage.total_tokens, cost)
+            parts = []
+            model = self.model
+            usage = None
+            async for chunk in stream:
+                model = chunk.model or model
+                # Son chunk sadece kullanım bilgisini taşır
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    if on_chunk:
+                        on_chunk(delta)
             
-            return AIResponse(
-                content=ai_response,
-                model=response.model,
-                usage={
-                    "input_tokens": usage.prompt_tokens,
-                    "output_tokens": usage.completion_tokens,
-                    "total_tokens": usage.total_tokens,
-                    "cost": cost
-                }
-            )
+            return self._build_response("".join(parts), model, usage)
             
         except Exception as e:
-            self.stats['errors'] += 1
+            self.stats['total_errors'] += 1
             raise Exception(f"OpenAI API hatası: {str(e)}")
     
     def _calculate_cost(self, input_tokens: int, output_tokens: int) -> float:
@@ -1,7 +1,7 @@
 """
 Universal AI Adapter - Çoklu AI desteği sağlayan merkezi yönetim sistemi
 """
-from typing import Dict, Optional, List, Any, Union
+from typing import Callable, Dict, Optional, List, Any, Union
 from dataclasses import dataclass
 import asyncio
 import time
@@ -193,8 +193,12 @@ class UniversalAIAdapter:
         if role_id not in self.role_stats:
             self.role_stats[role_id] = TokenStats()
     
-    async def send_message(self, role_id: str, message: str, context: Optional[str] = None) -> Optional[AIResponse]:
-        """Belirli bir rol üzerinden mesaj gönder"""
+    async def send_message(self, role_id: str, message: str, context: Optional[str] = None,
+                           on_chunk: Optional[Callable[[str], None]] = None) -> Optional[AIResponse]:
+        """Belirli bir rol üzerinden mesaj gönder
+        
+        on_chunk verilirse yanıt parçaları geldikçe iletilir (streaming).
+        """
         start_time = time.time()
         
         # Role atanmış adapter'ı bul
@@ -214,7 +218,10 @@ class UniversalAIAdapter:
         
         try:
             # Mesajı gönder
-            response = await adapter.send_message(message, context)
+            if on_chunk:
+                response = await adapter.send_message_streaming(message, context, on_chunk)
+            else:
+                response = await adapter.send_message(message, context)
             response_time = time.time() - start_time
             
             if response:
@@ -282,7 +289,10 @@ class UniversalAIAdapter:
                         
                         # OpenAI ile dene
                         openai_adapter = self.adapters[openai_adapter_id]
-                        response = await openai_adapter.send_message(message, context)
+                        if on_chunk:
+                            response = await openai_adapter.send_message_streaming(message, context, on_chunk)
+                        else:
+                            response = await openai_adapter.send_message(message, context)
                         response_time = time.time() - start_time
                         
                         if response:
@@ -3,9 +3,21 @@ Note Organizer AI Agent
 ======================
 
 Notları kategorize eden, etiketleyen ve organize eden AI agent.
+
+Workspace organizasyonu map-reduce ile yapılır:
+- Kümeleme (yerel): notlar workspace vektör indeksinde benzerliğe göre
+  kümelenir; her not bir kümeye girer, LLM çağrısı yoktur
+- Map: her küme için temsilci notlar ve anahtar kelimelerle kısa bir özet
+  istenir; istekler sınırlı eşzamanlılıkla (semaphore) paralel gider
+- Reduce: küme özetleri tek istekte ana kategorilere birleştirilir; notlar
+  kümeleri üzerinden kategorilere atanır
+
+Süre not sayısıyla değil küme sayısıyla (eşzamanlılığa bölünmüş) orantılıdır.
+Tüm AI çağrıları UniversalAIAdapter.send_message (async) üzerinden yapılır.
 """
 
-from typing import List, Dict, Any, Optional
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
 import json
 from datetime import datetime
 
@@ -13,14 +25,26 @@ from ..ai_adapters.universal_adapter import UniversalAIAdapter
 from ..notes.database import NotesDatabase
 from ..logger import logger
 
+DEFAULT_ROLE = 'general'
+
+# Aynı anda en fazla bu kadar AI isteği
+DEFAULT_CONCURRENCY = 4
+
+# Küme özeti isteğine giren temsilci not sayısı ve önizleme uzunluğu
+REPRESENTATIVES_PER_CLUSTER = 8
+PREVIEW_CHARS = 160
+
 
 class NoteOrganizerAgent:
     """Not organizasyon AI agent'ı"""
     
-    def __init__(self, ai_adapter: UniversalAIAdapter, notes_db: NotesDatabase):
+    def __init__(self, ai_adapter: UniversalAIAdapter, notes_db: NotesDatabase,
+                 role_id: str = DEFAULT_ROLE, concurrency: int = DEFAULT_CONCURRENCY):
         self.ai_adapter = ai_adapter
         self.notes_db = notes_db
         self.agent_id = "note_organizer"
+        self.role_id = role_id
+        self.concurrency = concurrency
         
         # Agent prompt şablonu
         self.system_prompt = """Sen bir not organizasyon uzmanısın. Görevlerin:
@@ -32,8 +56,15 @@ class NoteOrganizerAgent:
 
 Her zaman kullanıcının not alma alışkanlıklarına uygun öneriler yap."""
     
-    def analyze_note(self, note_content: str, note_title: str, 
-                    existing_tags: List[str] = None) -> Dict[str, Any]:
+    async def _ask_json(self, prompt: str) -> Dict[str, Any]:
+        """Prompt'u rol üzerinden gönder ve yanıttaki JSON'u döndür"""
+        response = await self.ai_adapter.send_message(role_id=self.role_id, message=prompt)
+        if not response:
+            raise RuntimeError("AI yanıt vermedi")
+        return self._parse_json_response(response.content)
+    
+    async def analyze_note(self, note_content: str, note_title: str,
+                           existing_tags: List[str] = None) -> Dict[str, Any]:
         """Bir notu analiz et ve organizasyon önerileri sun"""
         
         prompt = f"""{self.system_prompt}
@@ -60,14 +91,7 @@ Yanıtını JSON formatında ver:
 }}"""
         
         try:
-            response = self.ai_adapter.generate_response(
-                prompt,
-                adapter_id=self.agent_id,
-                temperature=0.3  # Daha tutarlı organizasyon için düşük temperature
-            )
-            
-            # JSON'u parse et
-            result = self._parse_json_response(response)
+            result = await self._ask_json(prompt)
             
             # AI metadata olarak kaydet
             ai_metadata = {
@@ -90,54 +114,45 @@ Yanıtını JSON formatında ver:
                 "analysis": None
             }
     
-    def organize_workspace(self, workspace_id: str) -> Dict[str, Any]:
-        """Tüm workspace'i organize et"""
+    async def organize_workspace(self, workspace_id: str, max_clusters: Optional[int] = None) -> Dict[str, Any]:
+        """Tüm workspace'i organize et (kümele -> küme özetleri -> kategoriler)"""
         
         try:
-            # Workspace'deki tüm notları al
-            notes = self.notes_db.search_notes(workspace_id, limit=100)
-            
-            prompt = f"""{self.system_prompt}
-
-Aşağıda bir workspace'deki notların listesi var. Bu notları organize etmek için:
-1. Ana kategoriler belirle
-2. Alt kategoriler oluştur
-3. Her kategori için uygun etiketler öner
-4. Notları kategorilere göre grupla
-
-Notlar:
-"""
-            for note in notes[:20]:  # İlk 20 not ile sınırla
-                prompt += f"\n- {note.title}: {note.content[:100]}..."
-            
-            prompt += """
-
-Yanıtını JSON formatında ver:
-{
-    "main_categories": [
-        {
-            "name": "kategori_adı",
-            "description": "açıklama",
-            "suggested_tags": ["etiket1", "etiket2"],
-            "note_count": 0
-        }
-    ],
-    "organization_suggestions": ["öneri1", "öneri2"],
-    "duplicate_notes": [["not1_id", "not2_id"]]
-}"""
-            
-            response = self.ai_adapter.generate_response(
-                prompt,
-                adapter_id=self.agent_id,
-                temperature=0.3
+            clusters = await asyncio.to_thread(
+                self.notes_db.cluster_notes, workspace_id, max_clusters, REPRESENTATIVES_PER_CLUSTER
             )
+            total_notes = sum(len(cluster['note_ids']) for cluster in clusters)
+            if not clusters:
+                return {
+                    "success": True,
+                    "organization": {"main_categories": [], "organization_suggestions": [], "duplicate_notes": []},
+                    "total_notes": 0,
+                    "cluster_count": 0,
+                    "analyzed_at": datetime.now().isoformat()
+                }
+            
+            # Map: küme özetleri, sınırlı eşzamanlılıkla
+            semaphore = asyncio.Semaphore(self.concurrency)
+            summaries = await asyncio.gather(*[
+                self._summarize_cluster(index, cluster, semaphore) for index, cluster in enumerate(clusters)
+            ])
             
-            result = self._parse_json_response(response)
+            # Reduce: kategoriler
+            categories, suggestions = await self._merge_clusters(summaries, clusters)
             
             return {
                 "success": True,
-                "organization": result,
-                "total_notes": len(notes),
+                "organization": {
+                    "main_categories": categories,
+                    "organization_suggestions": suggestions,
+                    "duplicate_notes": [pair for cluster in clusters for pair in cluster['duplicates']],
+                    "clusters": [
+                        {**summary, "note_ids": cluster['note_ids'], "keywords": cluster['keywords']}
+                        for summary, cluster in zip(summaries, clusters)
+                    ]
+                },
+                "total_notes": total_notes,
+                "cluster_count": len(clusters),
                 "analyzed_at": datetime.now().isoformat()
             }
             
@@ -148,61 +163,129 @@ Yanıtını JSON formatında ver:
                 "error": str(e)
             }
     
-    def suggest_note_connections(self, note_id: str, workspace_id: str) -> Dict[str, Any]:
-        """Bir not için ilgili notları öner"""
+    async def _summarize_cluster(self, index: int, cluster: Dict[str, Any],
+                                 semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Map adımı: tek küme için ad, açıklama ve etiketler"""
+        notes = "\n".join(
+            f"- {note['title']}: {(note.get('preview') or '')[:PREVIEW_CHARS]}"
+            for note in cluster['representatives']
+        )
+        prompt = f"""{self.system_prompt}
+
+Aşağıda benzer notlardan oluşan bir grubun temsilcileri var.
+Grup boyutu: {len(cluster['note_ids'])} not
+Sık geçen kelimeler: {', '.join(cluster['keywords']) or 'Yok'}
+
+Temsilci notlar:
+{notes}
+
+Bu grup için kısa bir ad, bir cümlelik açıklama ve 3-5 etiket öner.
+
+Yanıtını JSON formatında ver:
+{{
+    "name": "grup_adı",
+    "description": "açıklama",
+    "suggested_tags": ["etiket1", "etiket2"]
+}}"""
+        summary = {"cluster": index, "name": "", "description": "", "suggested_tags": [],
+                   "note_count": len(cluster['note_ids'])}
+        async with semaphore:
+            try:
+                result = await self._ask_json(prompt)
+            except Exception as e:
+                logger.error(f"Cluster summary failed for cluster {index}: {e}")
+                result = {}
+        summary.update({
+            "name": result.get("name") or ", ".join(cluster['keywords'][:3]) or f"Grup {index + 1}",
+            "description": result.get("description", ""),
+            "suggested_tags": result.get("suggested_tags") or cluster['keywords'][:3]
+        })
+        return summary
+    
+    async def _merge_clusters(self, summaries: List[Dict[str, Any]],
+                              clusters: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Reduce adımı: küme özetlerini ana kategorilere birleştir
         
-        try:
-            # Ana notu al
-            main_note = self.notes_db.get_note(note_id, increment_view=False)
-            if not main_note:
-                return {"success": False, "error": "Not bulunamadı"}
-            
-            # Workspace'deki diğer notları al
-            other_notes = self.notes_db.search_notes(
-                workspace_id, 
-                limit=50
-            )
-            # Ana notu listeden çıkar
-            other_notes = [n for n in other_notes if n.id != note_id]
-            
-            prompt = f"""{self.system_prompt}
+        Her küme tam bir kategoriye atanır; AI'ın atlamadığı ya da yanıt
+        vermediği kümeler kendi adlarıyla kategori olur.
+        """
+        lines = "\n".join(
+            f"{summary['cluster']}. {summary['name']} ({summary['note_count']} not): "
+            f"{summary['description']} [etiketler: {', '.join(summary['suggested_tags'])}]"
+            for summary in summaries
+        )
+        prompt = f"""{self.system_prompt}
 
-Ana Not:
-Başlık: {main_note.title}
-İçerik: {main_note.content[:500]}...
-Etiketler: {[tag.name for tag in main_note.tags]}
+Bir workspace'deki notlar benzerliğe göre gruplandı. Gruplar (numara. ad (boyut): açıklama):
+{lines}
 
-Bu notla ilgili olabilecek notları bul:
-"""
-            
-            for i, note in enumerate(other_notes[:20]):
-                prompt += f"\n{i+1}. {note.title} (ID: {note.id})"
-            
-            prompt += """
+Bu grupları ana kategorilerde birleştir. Her grup numarası tam olarak bir kategoride yer almalı.
 
-En ilgili 5 notu seç ve neden ilgili olduklarını açıkla.
-JSON formatında yanıtla:
-{
-    "related_notes": [
-        {
-            "note_id": "id",
-            "relevance_score": 0.95,
-            "reason": "ilgi nedeni"
+Yanıtını JSON formatında ver:
+{{
+    "main_categories": [
+        {{
+            "name": "kategori_adı",
+            "description": "açıklama",
+            "suggested_tags": ["etiket1", "etiket2"],
+            "clusters": [0, 1]
+        }}
+    ],
+    "organization_suggestions": ["öneri1", "öneri2"]
+}}"""
+        try:
+            result = await self._ask_json(prompt)
+        except Exception as e:
+            logger.error(f"Category merge failed: {e}")
+            result = {}
+        
+        categories, assigned = [], set()
+        for category in result.get("main_categories") or []:
+            members = [index for index in category.get("clusters") or []
+                       if isinstance(index, int) and 0 <= index < len(clusters) and index not in assigned]
+            if not members:
+                continue
+            assigned.update(members)
+            categories.append(self._category(category, members, clusters))
+        for summary in summaries:
+            if summary['cluster'] not in assigned:
+                categories.append(self._category(summary, [summary['cluster']], clusters))
+        
+        categories.sort(key=lambda category: category['note_count'], reverse=True)
+        return categories, result.get("organization_suggestions") or []
+    
+    @staticmethod
+    def _category(source: Dict[str, Any], members: List[int], clusters: List[Dict[str, Any]]) -> Dict[str, Any]:
+        note_ids = [note_id for index in members for note_id in clusters[index]['note_ids']]
+        return {
+            "name": source.get("name", ""),
+            "description": source.get("description", ""),
+            "suggested_tags": source.get("suggested_tags") or [],
+            "clusters": members,
+            "note_count": len(note_ids),
+            "note_ids": note_ids
         }
-    ]
-}"""
-            
-            response = self.ai_adapter.generate_response(
-                prompt,
-                adapter_id=self.agent_id,
-                temperature=0.2
-            )
-            
-            result = self._parse_json_response(response)
+    
+    def suggest_note_connections(self, note_id: str, workspace_id: str) -> Dict[str, Any]:
+        """Bir not için ilgili notları öner (workspace vektör indeksi, LLM çağrısı yok)"""
+        
+        try:
+            related = self.notes_db.find_related_notes(note_id, limit=5)
             
             return {
                 "success": True,
-                "connections": result,
+                "connections": {
+                    "related_notes": [
+                        {
+                            "note_id": item['note']['id'],
+                            "title": item['note']['title'],
+                            "relevance_score": item['similarity_score'],
+                            "reason": "Ortak konular: " + ", ".join(item['common_keywords'][:5])
+                            if item['common_keywords'] else "Benzer içerik"
+                        }
+                        for item in related
+                    ]
+                },
                 "analyzed_at": datetime.now().isoformat()
             }
             
@@ -213,36 +296,51 @@ JSON formatında yanıtla:
                 "error": str(e)
             }
     
-    def auto_tag_notes(self, workspace_id: str, apply_tags: bool = False) -> Dict[str, Any]:
-        """Workspace'deki etiketlenmemiş notları otomatik etiketle"""
+    async def auto_tag_notes(self, workspace_id: str, apply_tags: bool = False, limit: int = 50) -> Dict[str, Any]:
+        """Workspace'deki etiketlenmemiş notları otomatik etiketle (sınırlı eşzamanlı analiz)"""
         
         try:
-            # Etiketlenmemiş notları bul
-            notes = self.notes_db.search_notes(workspace_id, tags=[], limit=50)
+            # Etiketlenmemiş notları bul (tüm workspace, id sırasıyla sayfa sayfa)
+            notes = []
+            for page in self.notes_db.iter_note_pages(workspace_id, ('title', 'content', 'tags', 'is_archived')):
+                notes.extend(note for note in page if not note['tags'] and not note['is_archived'])
+                if len(notes) >= limit:
+                    break
+            notes = notes[:limit]
+            
+            semaphore = asyncio.Semaphore(self.concurrency)
+            
+            async def analyze(note):
+                async with semaphore:
+                    return await self.analyze_note(note['content'] or '', note['title'])
+            
+            analyses = await asyncio.gather(*[analyze(note) for note in notes])
             
             results = []
-            for note in notes:
-                if not note.tags:
-                    analysis = self.analyze_note(note.content, note.title)
+            assignments, metadata = {}, {}
+            for note, analysis in zip(notes, analyses):
+                if analysis["success"] and analysis["analysis"]:
+                    suggested_tags = analysis["analysis"].get("suggested_tags", [])
                     
-                    if analysis["success"] and analysis["analysis"]:
-                        suggested_tags = analysis["analysis"].get("suggested_tags", [])
-                        
-                        if apply_tags and suggested_tags:
-                            # Etiketleri uygula
-                            self.notes_db.update_note(
-                                note.id,
-                                edited_by=self.agent_id,
-                                tags=suggested_tags[:3],  # En fazla 3 etiket
-                                ai_metadata=analysis["ai_metadata"]
-                            )
-                        
-                        results.append({
-                            "note_id": note.id,
-                            "note_title": note.title,
-                            "suggested_tags": suggested_tags,
-                            "applied": apply_tags
-                        })
+                    if apply_tags and suggested_tags:
+                        assignments[note['id']] = suggested_tags[:3]  # En fazla 3 etiket
+                        metadata[note['id']] = analysis["ai_metadata"]
+                    
+                    results.append({
+                        "note_id": note['id'],
+                        "note_title": note['title'],
+                        "suggested_tags": suggested_tags,
+                        "applied": apply_tags
+                    })
+            
+            # Etiketleri tek transaction'da uygula
+            if assignments:
+                self.notes_db.bulk_tag_notes(
+                    assignments,
+                    edited_by=self.agent_id,
+                    replace=True,
+                    ai_metadata=metadata
+                )
             
             return {
                 "success": True,
@@ -0,0 +1,21 @@
+"""
+🧭 Context Manager - Sabit Boyutlu Prompt Context'i
+=================================================
+
+Konuşma ve belge context'ini token bütçesi içinde tutar:
+- Session başına artımlı rolling summary
+- Belge başına önbellekli, bölüm bazlı özet
+- AI çağrısı gerektirmeyen deterministik özetleme
+"""
+
+from .manager import ContextManager, ContextBudget, FOLD_LAG
+from .summarizer import estimate_tokens, truncate_to_tokens, extract_key_sentences
+
+__all__ = [
+    'ContextManager',
+    'ContextBudget',
+    'FOLD_LAG',
+    'estimate_tokens',
+    'truncate_to_tokens',
+    'extract_key_sentences'
+]
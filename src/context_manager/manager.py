@@ -0,0 +1,184 @@
+"""
+Context Manager
+===============
+
+Prompt boyutunu sabit tutan, artımlı güncellenen özetler:
+
+Konuşmalar (session):
+- Son turlar prompt'a kısa özetlerle (history snippet) girer
+- Daha eski turlar tek bir "rolling summary"de birleştirilir
+- Özet bütçeyi aşarsa en eski satırlar kendi aralarında sıkıştırılır
+- Özet konuşma context'inde saklanır (checkpoint ile kalıcı), her turda
+  sadece yeni tur eklenir; baştan hesaplanmaz
+
+Belgeler (document):
+- Bütçeye sığan belge olduğu gibi kullanılır
+- Sığmayan belge bölüm bölüm özetlenir; bölüm özetleri içerik hash'i ile,
+  belge özeti (document_id, version) ile önbelleklenir. Düzenlenen belgede
+  sadece değişen bölümler yeniden özetlenir.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .summarizer import estimate_tokens, extract_key_sentences, split_sections, truncate_to_tokens
+
+# Rolling summary'ye katlanmadan önce ham tutulan tur sayısı.
+# Tur T başlarken sadece T-2 ve öncesi katlanır; böylece tur T+1'in prompt'u
+# tur T'nin yanıtı tamamlanmadan hesaplanabilir (pipeline prefetch ile uyumlu).
+FOLD_LAG = 2
+
+
+@dataclass
+class ContextBudget:
+    """Prompt bölümleri için token bütçeleri"""
+    session_summary_tokens: int = 300
+    turn_digest_tokens: int = 80
+    goal_tokens: int = 400
+    document_tokens: int = 1500
+
+
+class ContextManager:
+    """Session ve belge bazında rolling summary yöneticisi"""
+
+    def __init__(self, budget: Optional[ContextBudget] = None, cache_size: int = 256):
+        self.budget = budget or ContextBudget()
+        self.cache_size = cache_size
+
+        self._document_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._section_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'document_hits': 0, 'document_misses': 0, 'section_hits': 0, 'section_misses': 0}
+
+    # Session Summaries
+
+    def record_turn(self, context: Dict[str, Any], turn: int,
+                    pm_content: Optional[str], ld_content: Optional[str]) -> Dict[str, Any]:
+        """Tamamlanan turun tam yanıtlarını katlanmayı beklemek üzere kaydet"""
+        pending = list(context.get('pending_turns', []))
+        pending.append({'turn': turn, 'pm': pm_content or "", 'ld': ld_content or ""})
+        return {**context, 'pending_turns': pending}
+
+    def advance_session(self, context: Dict[str, Any], turn: int) -> Dict[str, Any]:
+        """Tur başında yeterince eski turları rolling summary'ye katla
+
+        Saf fonksiyondur; context'in yeni bir kopyasını döndürür.
+        """
+        pending = context.get('pending_turns', [])
+        ready = [entry for entry in pending if entry['turn'] <= turn - FOLD_LAG]
+        if not ready:
+            return context
+
+        lines = list(context.get('summary_lines', []))
+        for entry in ready:
+            lines.append(self._digest_turn(entry))
+        lines = self._compact(lines)
+
+        return {
+            **context,
+            'pending_turns': [entry for entry in pending if entry['turn'] > turn - FOLD_LAG],
+            'summary_lines': lines,
+            'summary': "\n".join(lines)
+        }
+
+    def bounded_goal(self, goal: str) -> str:
+        return truncate_to_tokens(goal, self.budget.goal_tokens)
+
+    def _digest_turn(self, entry: Dict[str, Any]) -> str:
+        half = self.budget.turn_digest_tokens // 2
+        pm = extract_key_sentences(entry['pm'], half) if entry['pm'] else "-"
+        ld = extract_key_sentences(entry['ld'], half) if entry['ld'] else "-"
+        return f"• Tur {entry['turn'] + 1} — PM: {pm} | LD: {ld}"
+
+    def _compact(self, lines: List[str]) -> List[str]:
+        """Özet bütçeyi aşıyorsa en eski iki satırı tek satıra sıkıştır"""
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.budget.session_summary_tokens:
+            first, second = lines[0], lines[1]
+            merged_text = " ".join(line.split(' — ', 1)[-1] for line in (first, second))
+            label = f"{self._turn_label(first)}-{self._turn_label(second).split('-')[-1]}"
+            merged = extract_key_sentences(merged_text, self.budget.turn_digest_tokens)
+            lines = [f"• Tur {label} — {merged}"] + lines[2:]
+
+        if lines and estimate_tokens(lines[0]) > self.budget.session_summary_tokens:
+            lines[0] = truncate_to_tokens(lines[0], self.budget.session_summary_tokens)
+        return lines
+
+    @staticmethod
+    def _turn_label(line: str) -> str:
+        return line.split(' — ', 1)[0].replace('• Tur ', '').strip()
+
+    # Document Summaries
+
+    def document_context(self, document) -> str:
+        """Belge içeriğini bütçe içinde döndür (gerekirse önbellekli özet)"""
+        content = document.content or ""
+        if estimate_tokens(content) <= self.budget.document_tokens:
+            return content
+
+        key = (document.document_id, document.version)
+        with self._lock:
+            cached = self._document_cache.get(key)
+            if cached is not None:
+                self._document_cache.move_to_end(key)
+                self.stats['document_hits'] += 1
+                return cached
+            self.stats['document_misses'] += 1
+
+        summary = self._summarize_document(content)
+
+        with self._lock:
+            # Aynı belgenin eski sürümlerini bırak
+            for old_key in [k for k in self._document_cache if k[0] == document.document_id]:
+                del self._document_cache[old_key]
+            self._remember(self._document_cache, key, summary)
+        return summary
+
+    def _summarize_document(self, content: str) -> str:
+        sections = split_sections(content)
+        total_tokens = max(estimate_tokens(content), 1)
+        parts = []
+
+        for heading, body in sections:
+            # Bütçe bölümlere uzunlukları oranında dağıtılır; küçük düzenlemelerde
+            # pay değişmesin (önbellek isabet etsin) diye 20 token'a yuvarlanır
+            share = max(20, self.budget.document_tokens * estimate_tokens(body) // total_tokens // 20 * 20)
+            summary = self._section_summary(body, share)
+            parts.append(f"{heading}\n{summary}" if heading else summary)
+
+        summary = "\n\n".join(part.strip() for part in parts if part.strip())
+        return truncate_to_tokens(summary, self.budget.document_tokens)
+
+    def _section_summary(self, body: str, max_tokens: int) -> str:
+        key = (hashlib.sha1(body.encode('utf-8')).hexdigest(), max_tokens)
+        with self._lock:
+            cached = self._section_cache.get(key)
+            if cached is not None:
+                self._section_cache.move_to_end(key)
+                self.stats['section_hits'] += 1
+                return cached
+            self.stats['section_misses'] += 1
+
+        summary = extract_key_sentences(body.strip(), max_tokens)
+        with self._lock:
+            self._remember(self._section_cache, key, summary)
+        return summary
+
+    def _remember(self, cache: OrderedDict, key, value):
+        cache[key] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                'cached_documents': len(self._document_cache),
+                'cached_sections': len(self._section_cache),
+                'budget': {
+                    'session_summary_tokens': self.budget.session_summary_tokens,
+                    'document_tokens': self.budget.document_tokens
+                }
+            }
@@ -0,0 +1,105 @@
+"""
+Extractive Summarizer
+=====================
+
+AI çağrısı gerektirmeyen, deterministik özetleme yardımcıları:
+- Yaklaşık token tahmini
+- Token bütçesine göre kırpma
+- Anahtar cümle çıkarımı (kelime frekansı skoru)
+- Markdown bölümlere ayırma
+
+Deterministik olması önemlidir: aynı girdi her zaman aynı özeti üretir,
+böylece özetler önbelleklenebilir ve prompt'lar turlar arasında sabit kalır.
+"""
+
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+# Ortalama token başına karakter (GPT/Gemini için kaba tahmin)
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?…])\s+|\n+')
+_WORD = re.compile(r'\w+', re.UNICODE)
+_HEADING = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
+
+_STOPWORDS = frozenset("""
+ve ile bir bu şu o da de ki için gibi daha çok en ama fakat veya ya
+mi mı mu mü ne neden nasıl olarak olan olur olup her hem ise kadar sonra önce
+the a an and or of to in on for with is are be this that it as by from at
+""".split())
+
+
+def estimate_tokens(text: str) -> int:
+    """Metnin yaklaşık token sayısı"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Metni kelime sınırında token bütçesine kırp"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(' ', 1)[0]
+    return cut.rstrip() + "…"
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT.split(text or "") if s.strip()]
+
+
+@lru_cache(maxsize=1024)
+def extract_key_sentences(text: str, max_tokens: int) -> str:
+    """Metnin en bilgi yoğun cümlelerini, orijinal sırasıyla, bütçe içinde döndür"""
+    if estimate_tokens(text) <= max_tokens:
+        return text.strip()
+
+    sentences = split_sentences(text)
+    if not sentences:
+        return ""
+
+    frequencies = {}
+    for word in _WORD.findall(text.lower()):
+        if len(word) > 2 and word not in _STOPWORDS:
+            frequencies[word] = frequencies.get(word, 0) + 1
+
+    def score(index_sentence):
+        index, sentence = index_sentence
+        words = [w for w in _WORD.findall(sentence.lower()) if w in frequencies]
+        if not words:
+            return 0.0
+        # Uzun cümleleri cezalandır, ilk cümleye küçük bonus ver
+        value = sum(frequencies[w] for w in words) / (len(words) ** 0.5)
+        return value * (1.2 if index == 0 else 1.0)
+
+    ranked = sorted(enumerate(sentences), key=score, reverse=True)
+
+    selected, used = [], 0
+    for index, sentence in ranked:
+        cost = estimate_tokens(sentence) + 1
+        if used + cost > max_tokens:
+            continue
+        selected.append(index)
+        used += cost
+
+    if not selected:
+        return truncate_to_tokens(sentences[ranked[0][0]], max_tokens)
+
+    return " ".join(sentences[i] for i in sorted(selected))
+
+
+def split_sections(markdown: str) -> List[Tuple[str, str]]:
+    """Markdown metnini (başlık, gövde) bölümlerine ayır"""
+    matches = list(_HEADING.finditer(markdown))
+    if not matches:
+        return [("", markdown)]
+
+    sections = []
+    if matches[0].start() > 0:
+        sections.append(("", markdown[:matches[0].start()]))
+
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(markdown)
+        sections.append((match.group(0).strip(), markdown[match.end():end]))
+
+    return sections
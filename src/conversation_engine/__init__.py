@@ -0,0 +1,24 @@
+"""
+🧵 Conversation Engine - Yeniden Başlatılabilir AI Konuşmaları
+============================================================
+
+PM ↔ LD konuşmalarını durum makinesi olarak yürütür:
+- Her fazdan sonra kalıcı checkpoint
+- Çökme sonrası kaldığı yerden devam
+- Tek event loop üzerinde çok sayıda eşzamanlı konuşma
+"""
+
+from .session import ConversationSession, STATUS_ACTIVE, STATUS_PAUSED, PHASE_PM, PHASE_LD
+from .engine import ConversationEngine
+from .prompts import build_pm_prompt, build_ld_prompt
+
+__all__ = [
+    'ConversationEngine',
+    'ConversationSession',
+    'STATUS_ACTIVE',
+    'STATUS_PAUSED',
+    'PHASE_PM',
+    'PHASE_LD',
+    'build_pm_prompt',
+    'build_ld_prompt'
+]
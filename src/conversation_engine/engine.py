@@ -0,0 +1,550 @@
+"""
+Conversation Engine
+===================
+
+PM ↔ LD konuşmalarını tek bir asyncio event loop üzerinde, birbirinden
+bağımsız görevler olarak çalıştırır:
+- Her konuşma açık bir durum makinesidir (bkz. session.py)
+- Her fazdan sonra durum paylaşılan/kalıcı store'a checkpoint'lenir
+- Süreç çökerse yarım kalan konuşmalar kaldıkları fazdan devam eder
+- Turlar arasında yapay bekleme yoktur; eşzamanlılığı event loop sağlar
+- Store çağrıları (senkron SQLite/Redis, BEGIN IMMEDIATE beklemesi dahil)
+  asyncio.to_thread ile loop dışında yapılır; yavaş bir checkpoint diğer
+  konuşmaları durdurmaz
+- Pipeline modunda LD çağrısı PM yanıtı akarken başlar, sonraki PM turu
+  spekülatif olarak önceden istenir (bkz. pipeline.py)
+- Eski turlar context_manager ile rolling summary'ye katlanır; prompt
+  boyutu konuşma uzadıkça büyümez
+
+Store olarak server_runtime'daki SharedStateBackend kullanılır; sqlite
+veya redis backend'i ile checkpoint'ler restart'tan sonra da yaşar.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..context_manager import ContextManager
+from ..server_runtime.shared_state import CONVERSATIONS, SharedStateBackend
+from .pipeline import (
+    StreamingCall, LD_PREFIX_CHARS, PM_PREFETCH_CHARS, speculative_context, history_entry
+)
+from .prompts import build_pm_prompt, build_ld_prompt
+from .session import ConversationSession, STATUS_ACTIVE, STATUS_PAUSED, PHASE_PM, PHASE_LD
+
+# Sahibi bu süre boyunca checkpoint almayan konuşma başka worker'a devredilebilir
+DEFAULT_LEASE_SECONDS = 300
+# Sahipsiz konuşmaların aranma aralığı
+DEFAULT_SWEEP_INTERVAL = 30
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ConversationEngine:
+    """Checkpoint'li, yeniden başlatılabilir konuşma motoru"""
+
+    def __init__(self, ai_adapter, store: SharedStateBackend,
+                 emit: Callable[[str, Dict[str, Any]], None],
+                 check_interventions: Optional[Callable[[str], str]] = None,
+                 on_message: Optional[Callable[[], None]] = None,
+                 on_paused: Optional[Callable[[str, str, int], Awaitable[None]]] = None,
+                 has_pending_intervention: Optional[Callable[[str], bool]] = None,
+                 pipelined: bool = False,
+                 context_manager: Optional[ContextManager] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 sweep_interval: float = DEFAULT_SWEEP_INTERVAL):
+        self.ai_adapter = ai_adapter
+        self.store = store
+        self.emit = emit
+        self.check_interventions = check_interventions
+        self.on_message = on_message
+        self.on_paused = on_paused
+        self.has_pending_intervention = has_pending_intervention
+        self.pipelined = pipelined
+        self.context_manager = context_manager or ContextManager()
+        self.lease_seconds = lease_seconds
+        self.sweep_interval = sweep_interval
+
+        self.worker_id: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, concurrent.futures.Future] = {}
+        self._sweeper: Optional[concurrent.futures.Future] = None
+
+        # Pipeline: session → {'pm' | 'ld': uçuştaki spekülatif çağrı} (sadece event loop thread'i)
+        self._speculative: Dict[str, Dict[str, StreamingCall]] = {}
+        self.speculation_stats = {'started': 0, 'used': 0, 'discarded': 0}
+
+    # Lifecycle
+
+    def ensure_started(self) -> asyncio.AbstractEventLoop:
+        """Event loop thread'ini başlat (fork sonrası her worker'da yeniden)"""
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return self._loop
+
+            self._pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:6]}"
+            self._tasks = {}
+            self._loop = asyncio.new_event_loop()
+
+            thread = threading.Thread(target=self._run_loop, name='conversation-engine', daemon=True)
+            thread.start()
+            loop = self._loop
+
+        self._sweeper = asyncio.run_coroutine_threadsafe(self._sweep(), loop)
+        print(f"🧵 Conversation engine başlatıldı ({self.worker_id})")
+        return loop
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def stop(self):
+        """Event loop'u durdur; checkpoint'ler store'da kalır"""
+        with self._lock:
+            if self._loop is None:
+                return
+            futures = list(self._tasks.values()) + ([self._sweeper] if self._sweeper else [])
+            loop, self._loop = self._loop, None
+
+        for future in futures:
+            future.cancel()
+        concurrent.futures.wait(futures, timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+
+    def running_sessions(self) -> List[str]:
+        with self._lock:
+            return [sid for sid, future in self._tasks.items() if not future.done()]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'worker_id': self.worker_id,
+            'running_sessions': len(self.running_sessions()),
+            'pipelined': self.pipelined,
+            'speculation': dict(self.speculation_stats),
+            'context': self.context_manager.get_stats()
+        }
+
+    # Public API (thread-safe)
+
+    def start_conversation(self, project_goal: str, max_turns: int) -> str:
+        """Yeni konuşma oluştur, checkpoint'le ve event loop'ta başlat"""
+        self.ensure_started()
+
+        session_id = f"{int(time.time())}-{uuid.uuid4().hex[:6]}"
+        session = ConversationSession.new(session_id, project_goal, max_turns)
+        session.owner = self.worker_id
+        session.heartbeat = time.time()
+        self.store.create_conversation(session_id, session.to_dict())
+
+        self.emit('conversation_started', {
+            'prompt': project_goal,
+            'max_turns': max_turns,
+            'session_id': session_id,
+            'timestamp': datetime.now().isoformat()
+        })
+
+        self._submit(session_id)
+        return session_id
+
+    def continue_conversation(self, session_id: str, additional_turns: int) -> Dict[str, Any]:
+        """Duraklamış konuşmayı atomik olarak aktif yapıp devam ettir"""
+        self.ensure_started()
+
+        def mutate(data):
+            if data is None:
+                return None, None
+            session = ConversationSession.from_dict(data)
+            if session.status != STATUS_PAUSED:
+                return data, None
+            session.status = STATUS_ACTIVE
+            session.max_turns += additional_turns
+            session.owner = self.worker_id
+            session.heartbeat = time.time()
+            session.last_error = None
+            return session.to_dict(), session
+
+        session = self.store.update(CONVERSATIONS, session_id, mutate)
+        if session is None:
+            if not self.store.has_conversation(session_id):
+                raise KeyError(session_id)
+            raise ValueError("Konuşma pause durumunda değil")
+
+        self.emit('conversation_continued', {
+            'session_id': session_id,
+            'additional_turns': additional_turns,
+            'total_max_turns': session.max_turns,
+            'current_completed': session.completed_turns,
+            'timestamp': datetime.now().isoformat()
+        })
+
+        self._submit(session_id)
+        return session.to_dict()
+
+    def end_conversation(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Konuşmayı sil; çalışan görev bu worker'daysa iptal et
+
+        Başka worker'da çalışıyorsa bir sonraki checkpoint'te durur.
+        """
+        conversation = self.store.pop_conversation(session_id)
+
+        with self._lock:
+            future = self._tasks.pop(session_id, None)
+        if future is not None:
+            future.cancel()
+
+        return conversation
+
+    def discard_speculation(self, session_id: str):
+        """Önceden istenmiş sonraki PM turunu iptal et (ör. müdahale geldiğinde)"""
+        loop = self._loop
+        if loop is not None and self._pid == os.getpid():
+            loop.call_soon_threadsafe(self._discard_speculative, session_id, 'pm')
+
+    def resume_interrupted(self) -> List[str]:
+        """Sahibi çökmüş aktif konuşmaları üstlen ve devam ettir"""
+        resumed = []
+        running = set(self.running_sessions())
+
+        for session_id, data in self.store.values(CONVERSATIONS).items():
+            session = ConversationSession.from_dict(data)
+            if session.status != STATUS_ACTIVE or session_id in running:
+                continue
+            if session.owner == self.worker_id or not self._is_orphaned(session):
+                continue
+
+            if self._claim(session_id) is None:
+                continue
+
+            print(f"♻️ Konuşma checkpoint'ten devam ediyor: {session_id} "
+                  f"(tur {session.completed_turns + 1}, faz {session.phase})")
+            self.emit('conversation_resumed', {
+                'session_id': session_id,
+                'completed_turns': session.completed_turns,
+                'max_turns': session.max_turns,
+                'phase': session.phase,
+                'timestamp': datetime.now().isoformat()
+            })
+            self._submit(session_id)
+            resumed.append(session_id)
+
+        return resumed
+
+    # Ownership & Checkpoints
+
+    def _is_orphaned(self, session: ConversationSession) -> bool:
+        if not session.owner or session.is_stale(self.lease_seconds):
+            return True
+
+        # Aynı makinede sahibi process artık yoksa lease'i beklemeye gerek yok
+        host, _, rest = session.owner.partition(':')
+        pid = rest.split(':')[0]
+        return host == socket.gethostname() and pid.isdigit() and not _pid_alive(int(pid))
+
+    def _claim(self, session_id: str) -> Optional[ConversationSession]:
+        def mutate(data):
+            if data is None:
+                return None, None
+            session = ConversationSession.from_dict(data)
+            if session.status != STATUS_ACTIVE:
+                return data, None
+            if session.owner != self.worker_id and not self._is_orphaned(session):
+                return data, None
+            session.owner = self.worker_id
+            session.heartbeat = time.time()
+            return session.to_dict(), session
+
+        return self.store.update(CONVERSATIONS, session_id, mutate)
+
+    def _checkpoint(self, session_id: str,
+                    apply: Callable[[ConversationSession], None]) -> Optional[ConversationSession]:
+        """Durumu atomik olarak güncelle
+
+        Konuşma silinmiş, duraklatılmış veya başka worker'a geçmişse None döner
+        ve çalışan görev durur (fencing).
+        """
+        def mutate(data):
+            if data is None:
+                return None, None
+            session = ConversationSession.from_dict(data)
+            if session.status != STATUS_ACTIVE or session.owner != self.worker_id:
+                return data, None
+            apply(session)
+            session.heartbeat = time.time()
+            return session.to_dict(), session
+
+        return self.store.update(CONVERSATIONS, session_id, mutate)
+
+    def _submit(self, session_id: str):
+        loop = self.ensure_started()
+        with self._lock:
+            # Biten görevleri temizle
+            self._tasks = {sid: future for sid, future in self._tasks.items() if not future.done()}
+            if session_id in self._tasks:
+                return
+            self._tasks[session_id] = asyncio.run_coroutine_threadsafe(self._run(session_id), loop)
+
+    async def _sweep(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.resume_interrupted)
+            except Exception as e:
+                print(f"⚠️ Konuşma sweep hatası: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    # State Machine
+
+    async def _run(self, session_id: str):
+        """Konuşmayı checkpoint'ten başlayarak duraklayana kadar yürüt"""
+        try:
+            while True:
+                data = await asyncio.to_thread(self.store.get_conversation, session_id)
+                if data is None:
+                    return
+                session = ConversationSession.from_dict(data)
+                if session.status != STATUS_ACTIVE or session.owner != self.worker_id:
+                    return
+
+                if not session.has_remaining_turns:
+                    await self._pause(session)
+                    return
+
+                if session.phase == PHASE_PM:
+                    advanced = await self._run_pm_phase(session)
+                else:
+                    advanced = await self._run_ld_phase(session)
+
+                if not advanced:
+                    return
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Checkpoint korunur; konuşma pause'a alınır ve kaldığı fazdan devam ettirilebilir
+            def fail(session):
+                session.status = STATUS_PAUSED
+                session.last_error = str(e)
+            await asyncio.to_thread(self._checkpoint, session_id, fail)
+
+            self.emit('conversation_error', {
+                'error': str(e),
+                'session_id': session_id,
+                'can_continue': True,
+                'timestamp': datetime.now().isoformat()
+            })
+        finally:
+            self._discard_speculative(session_id)
+
+    # Speculation
+
+    def _start_call(self, role_id: str, prompt: str, label: str) -> StreamingCall:
+        return StreamingCall(self.ai_adapter, role_id, prompt, label)
+
+    def _speculate(self, session_id: str, key: str, call: StreamingCall):
+        self._discard_speculative(session_id, key)
+        self._speculative.setdefault(session_id, {})[key] = call
+        self.speculation_stats['started'] += 1
+
+    def _take_speculative(self, session_id: str, key: str, prompt: str) -> Optional[StreamingCall]:
+        """Spekülatif çağrıyı prompt birebir aynıysa devral, değilse iptal et
+
+        Hata ile bitmiş spekülasyon devralınmaz; gerçek tur taze çağrı yapar.
+        """
+        call = self._speculative.get(session_id, {}).pop(key, None)
+        if call is None:
+            return None
+        failed = call.task.done() and not call.task.cancelled() and call.task.exception() is not None
+        if call.prompt == prompt and not call.task.cancelled() and not failed:
+            self.speculation_stats['used'] += 1
+            return call
+        call.cancel()
+        self.speculation_stats['discarded'] += 1
+        return None
+
+    def _discard_speculative(self, session_id: str, key: Optional[str] = None):
+        calls = self._speculative.get(session_id, {})
+        for call_key in ([key] if key else list(calls)):
+            call = calls.pop(call_key, None)
+            if call is not None:
+                call.cancel()
+                self.speculation_stats['discarded'] += 1
+        if not calls:
+            self._speculative.pop(session_id, None)
+
+    # Phases
+
+    async def _call(self, session_id: str, key: str, role_id: str, prompt: str, label: str):
+        """AI çağrısı; pipeline modunda varsa spekülatif çağrıyı kullanır"""
+        if not self.pipelined:
+            return None, await self.ai_adapter.send_message(role_id, prompt, label)
+
+        call = self._take_speculative(session_id, key, prompt) or self._start_call(role_id, prompt, label)
+        return call, None
+
+    async def _run_pm_phase(self, session: ConversationSession) -> bool:
+        session_id = session.session_id
+        turn = session.completed_turns
+
+        # Müdahale tur başında alınır ve hemen checkpoint'lenir; çökme olursa kaybolmaz
+        if 'intervention' not in session.turn_state:
+            intervention = ""
+            if self.check_interventions:
+                intervention = await asyncio.to_thread(self.check_interventions, session_id)
+
+            def begin_turn(s):
+                s.current_turn = turn + 1
+                s.turn_state = {'intervention': intervention}
+                s.context = self.context_manager.advance_session(s.context, turn)
+            session = await asyncio.to_thread(self._checkpoint, session_id, begin_turn)
+            if session is None:
+                return False
+        else:
+            intervention = session.turn_state['intervention']
+
+        self.emit('conversation_turn', {
+            'turn': turn + 1,
+            'phase': 'pm_thinking',
+            'session_id': session_id,
+            'timestamp': datetime.now().isoformat()
+        })
+
+        label = f"Proje Değerlendirmesi - Tur {turn + 1}"
+        pm_prompt = build_pm_prompt(session.context, turn, intervention, self.context_manager)
+        call, response = await self._call(session_id, 'pm', "project_manager", pm_prompt, label)
+
+        if call is not None:
+            # LD prompt'u için gereken kısım geldiyse LD'yi PM bitmeden başlat
+            pm_prefix = await call.wait_for_prefix(LD_PREFIX_CHARS)
+            if pm_prefix is not None:
+                self._speculate(session_id, 'ld', self._start_call(
+                    "lead_developer",
+                    self._ld_prompt(session.context, turn, pm_prefix, intervention),
+                    f"Teknik Analiz - Tur {turn + 1}"
+                ))
+            response = await call.result()
+
+        def finish_pm(s):
+            s.phase = PHASE_LD
+            s.turn_state['pm_content'] = response.content if response else None
+            if response:
+                s.context['conversation_history'].append(history_entry("PM", response.content))
+        if await asyncio.to_thread(self._checkpoint, session_id, finish_pm) is None:
+            return False
+
+        if response:
+            self._emit_message('project_manager', '👔 Proje Yöneticisi', response, turn, session_id)
+        return True
+
+    async def _run_ld_phase(self, session: ConversationSession) -> bool:
+        session_id = session.session_id
+        turn = session.completed_turns
+        turn_state = session.turn_state
+
+        self.emit('conversation_turn', {
+            'turn': turn + 1,
+            'phase': 'ld_thinking',
+            'session_id': session_id,
+            'timestamp': datetime.now().isoformat()
+        })
+
+        # PM yanıtı geçmişe zaten eklendi; prompt doğrudan checkpoint'ten üretilir
+        ld_prompt = build_ld_prompt(session.context, turn, turn_state.get('pm_content'),
+                                    turn_state.get('intervention', ""), self.context_manager)
+        call, response = await self._call(
+            session_id, 'ld', "lead_developer", ld_prompt, f"Teknik Analiz - Tur {turn + 1}"
+        )
+
+        if call is not None:
+            # Müdahale beklemiyorsa sonraki PM turunu önceden iste
+            next_turn = turn + 1
+            if next_turn < session.max_turns and not await self._intervention_pending(session_id):
+                ld_prefix = await call.wait_for_prefix(PM_PREFETCH_CHARS)
+                if ld_prefix is not None and not await self._intervention_pending(session_id):
+                    # Tur başındaki özet katlaması LD yanıtına bağlı değil (FOLD_LAG)
+                    context = self.context_manager.advance_session(
+                        speculative_context(session.context, history_entry("LD", ld_prefix)), next_turn
+                    )
+                    self._speculate(session_id, 'pm', self._start_call(
+                        "project_manager",
+                        build_pm_prompt(context, next_turn, "", self.context_manager),
+                        f"Proje Değerlendirmesi - Tur {next_turn + 1}"
+                    ))
+            response = await call.result()
+
+        def finish_turn(s):
+            s.phase = PHASE_PM
+            s.completed_turns = turn + 1
+            s.context = self.context_manager.record_turn(
+                s.context, turn, s.turn_state.get('pm_content'), response.content if response else None
+            )
+            s.turn_state = {}
+            if response:
+                s.context['conversation_history'].append(history_entry("LD", response.content))
+        if await asyncio.to_thread(self._checkpoint, session_id, finish_turn) is None:
+            return False
+
+        if response:
+            self._emit_message('lead_developer', '👨‍💻 Lead Developer', response, turn, session_id)
+        return True
+
+    def _ld_prompt(self, context: Dict[str, Any], turn: int, pm_content: Optional[str],
+                   intervention: str) -> str:
+        """PM yanıtı (veya başı) geçmişe eklenmiş haliyle LD prompt'u"""
+        context = speculative_context(context, history_entry("PM", pm_content))
+        return build_ld_prompt(context, turn, pm_content, intervention, self.context_manager)
+
+    async def _intervention_pending(self, session_id: str) -> bool:
+        if not self.has_pending_intervention:
+            return False
+        return bool(await asyncio.to_thread(self.has_pending_intervention, session_id))
+
+    async def _pause(self, session: ConversationSession):
+        def pause(s):
+            s.status = STATUS_PAUSED
+        paused = await asyncio.to_thread(self._checkpoint, session.session_id, pause)
+        if paused is None:
+            return
+
+        # Konuşma durakladı (tamamen bitmedi)
+        self.emit('conversation_paused', {
+            'total_turns': paused.completed_turns,
+            'max_turns': paused.max_turns,
+            'session_id': paused.session_id,
+            'can_continue': True,
+            'timestamp': datetime.now().isoformat()
+        })
+
+        if self.on_paused:
+            await self.on_paused(paused.session_id, paused.context['project_goal'], paused.completed_turns)
+
+    def _emit_message(self, speaker: str, speaker_name: str, response, turn: int, session_id: str):
+        self.emit('conversation_message', {
+            'speaker': speaker,
+            'speaker_name': speaker_name,
+            'message': response.content,
+            'turn': turn + 1,
+            'model': response.model,
+            'usage': response.usage,
+            'session_id': session_id,
+            'timestamp': datetime.now().isoformat()
+        })
+
+        # Analytics güncellemesi
+        if self.on_message:
+            self.on_message()
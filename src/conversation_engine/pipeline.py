@@ -0,0 +1,85 @@
+"""
+Turn Pipelining
+===============
+
+PM ve LD turlarını üst üste bindirmek için yardımcılar.
+
+Prompt'lar önceki yanıtların yalnızca başını kullanır:
+- LD prompt'u PM yanıtının ilk 400 karakterine bakar
+- Sonraki PM prompt'u geçmişteki 100 karakterlik özetlere bakar
+
+Bu yüzden LD çağrısı PM yanıtının ilk 400 karakteri gelince, sonraki
+PM çağrısı da LD yanıtının ilk 100 karakteri gelince spekülatif olarak
+başlatılabilir. Spekülatif çağrı ancak gerçek yanıttan üretilen prompt
+birebir aynıysa kullanılır; diyalog değişmez.
+"""
+
+import asyncio
+from typing import Any, Dict, Optional
+
+# LD prompt'unun kullandığı PM yanıtı uzunluğu
+LD_PREFIX_CHARS = 400
+# Sonraki PM prompt'unun kullandığı LD yanıtı uzunluğu (geçmiş özeti)
+PM_PREFETCH_CHARS = 100
+
+
+class StreamingCall:
+    """Yanıtı parça parça biriken tek bir AI çağrısı"""
+
+    def __init__(self, ai_adapter, role_id: str, prompt: str, label: str):
+        self.role_id = role_id
+        self.prompt = prompt
+        self.text = ""
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(
+            ai_adapter.send_message(role_id, prompt, label, on_chunk=self._on_chunk)
+        )
+        self.task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Future):
+        # İptal edilen/kullanılmayan çağrıların hatası loglanmasın diye okunur
+        if not task.cancelled():
+            task.exception()
+        self._changed.set()
+
+    def _on_chunk(self, delta: str):
+        self.text += delta
+        self._changed.set()
+
+    async def wait_for_prefix(self, length: int) -> Optional[str]:
+        """En az length karakter gelene ya da çağrı bitene kadar bekle
+
+        Çağrı bittiyse kesin yanıtı, bitmediyse o ana kadar gelen metni döndürür.
+        Çağrı hata ile bittiyse None döner (spekülasyon yapılmaz).
+        """
+        while len(self.text) < length and not self.task.done():
+            self._changed.clear()
+            await self._changed.wait()
+
+        if not self.task.done():
+            return self.text
+        if self.task.cancelled() or self.task.exception() is not None:
+            return None
+
+        response = self.task.result()
+        return response.content if response else ""
+
+    async def result(self):
+        return await self.task
+
+    def cancel(self):
+        if not self.task.done():
+            self.task.cancel()
+
+
+def speculative_context(context: Dict[str, Any], entry: Optional[str]) -> Dict[str, Any]:
+    """Geçmişine henüz checkpoint'lenmemiş bir özet eklenmiş context kopyası"""
+    history = list(context['conversation_history'])
+    if entry:
+        history.append(entry)
+    return {**context, 'conversation_history': history}
+
+
+def history_entry(prefix: str, content: Optional[str]) -> Optional[str]:
+    """Yanıtın geçmişe yazılan özeti (yanıt alınamadıysa None)"""
+    return f"{prefix}: {content[:100]}..." if content is not None else None
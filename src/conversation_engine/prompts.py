@@ -0,0 +1,98 @@
+"""
+Conversation Prompts
+====================
+
+PM ve LD turları için prompt şablonları.
+
+Prompt boyutu sabittir: proje hedefi verilen ContextManager'ın bütçesine kırpılır, eski turlar
+context_manager'ın rolling summary'si ile, son turlar kısa özetlerle girer.
+"""
+
+from typing import Any, Dict, Optional
+
+from ..context_manager import ContextManager
+
+# ContextManager verilmezse varsayılan bütçe kullanılır
+_DEFAULT_CONTEXT_MANAGER = ContextManager()
+
+
+def _goal(context: Dict[str, Any], context_manager: Optional[ContextManager]) -> str:
+    return (context_manager or _DEFAULT_CONTEXT_MANAGER).bounded_goal(context['project_goal'])
+
+
+def _summary_block(context: Dict[str, Any]) -> str:
+    summary = context.get('summary')
+    return f"\n🧭 ÖNCEKİ TURLARIN ÖZETİ:\n{summary}\n" if summary else ""
+
+
+def build_pm_prompt(context: Dict[str, Any], turn: int, intervention: str = "",
+                    context_manager: Optional[ContextManager] = None) -> str:
+    """Proje Yöneticisi prompt'u (turn 0 tabanlı)"""
+    if turn == 0:
+        prompt = f"""Sen deneyimli bir proje yöneticisisin. Aşağıdaki proje hakkında analiz yap:
+
+🎯 PROJE: {_goal(context, context_manager)}
+
+Tur {turn + 1}'de şunları yap:
+• Proje hedeflerini netleştir
+• Ana gereksinimleri belirle
+• İlk adımları öneri
+• Lead Developer'a hangi sorular sorulmalı?
+
+Kısa ve odaklı bir analiz sun."""
+    else:
+        recent_history = ' -> '.join(context['conversation_history'][-3:])
+        prompt = f"""Proje Yöneticisi Perspektifi - Tur {turn + 1}:
+
+🎯 PROJE: {context['project_goal'][:200]}...{_summary_block(context)}
+📋 SON GELİŞMELER: {recent_history}
+
+Lead Developer'ın son yorumuna dayanarak:
+• Teknik yaklaşımı değerlendir
+• Proje planı açısından feedback ver
+• Sonraki adımları belirle
+• Karar alınması gereken konuları öne çıkar
+
+Yapıcı ve yönlendirici bir yanıt ver."""
+
+    if intervention:
+        prompt += f"\n\n🔔 YÖNETİCİ NOTU: {intervention}"
+    return prompt
+
+
+def build_ld_prompt(context: Dict[str, Any], turn: int, pm_content: Optional[str],
+                    intervention: str = "", context_manager: Optional[ContextManager] = None) -> str:
+    """Lead Developer prompt'u (turn 0 tabanlı)"""
+    if turn == 0:
+        prompt = f"""Sen deneyimli bir Lead Developer'sın. Proje Yöneticisi'nin analizini değerlendir:
+
+🎯 PROJE: {_goal(context, context_manager)}
+
+👔 PROJE YÖNETİCİSİ DİYOR: {pm_content[:400] if pm_content else "Henüz yanıt yok"}
+
+Teknik perspektiften:
+• Hangi teknolojiler uygun olur?
+• Mimari nasıl olmalı?
+• Gelişirme sürecindeki zorluklar neler?
+• PM'e hangi teknik sorular sormalı?
+
+Teknik ve uygulanabilir öneriler sun."""
+    else:
+        prompt = f"""Lead Developer Perspektifi - Tur {turn + 1}:
+
+🎯 PROJE: {context['project_goal'][:200]}...{_summary_block(context)}
+📋 GÖRÜŞMELER: {' -> '.join(context['conversation_history'][-4:])}
+
+👔 PM'İN SON YORUMU: {pm_content[:400] if pm_content else "Yanıt yok"}
+
+Teknik açıdan:
+• PM'in önerilerine teknik feedback ver
+• Implementation zorlukları belirt
+• Alternatif çözümler öner
+• Bir sonraki teknik adımları tanımla
+
+Gerçekçi ve detaylı bir teknik analiz yap."""
+
+    if intervention:
+        prompt += f"\n\n🔔 YÖNETİCİ NOTU: {intervention}"
+    return prompt
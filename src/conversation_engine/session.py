@@ -0,0 +1,71 @@
+"""
+Conversation Session State
+==========================
+
+Her konuşma açık bir durum makinesi olarak modellenir:
+
+    ACTIVE/pm  →  ACTIVE/ld  →  ACTIVE/pm (sonraki tur) ... →  PAUSED
+                                                              ↘ (end) silinir
+
+Her fazdan sonra checkpoint alınır; süreç çökse bile konuşma kaldığı
+fazdan (PM yanıtı alınmışsa doğrudan LD'den) devam eder.
+"""
+
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, Optional
+
+# Konuşma durumları
+STATUS_ACTIVE = 'active'
+STATUS_PAUSED = 'paused'
+
+# Tur içi fazlar
+PHASE_PM = 'pm'
+PHASE_LD = 'ld'
+
+
+@dataclass
+class ConversationSession:
+    """Checkpoint'lenen konuşma durumu"""
+    session_id: str
+    context: Dict[str, Any]
+    max_turns: int
+    status: str = STATUS_ACTIVE
+    phase: str = PHASE_PM
+    current_turn: int = 0
+    completed_turns: int = 0
+    # Yarım kalan turun verisi (müdahale notu, PM yanıtı)
+    turn_state: Dict[str, Any] = field(default_factory=dict)
+    owner: Optional[str] = None
+    heartbeat: float = 0.0
+    created_at: float = field(default_factory=time.time)
+    last_error: Optional[str] = None
+
+    @classmethod
+    def new(cls, session_id: str, project_goal: str, max_turns: int) -> "ConversationSession":
+        return cls(
+            session_id=session_id,
+            context={
+                'project_goal': project_goal,
+                'conversation_history': [],
+                'decisions_made': [],
+                'next_actions': []
+            },
+            max_turns=max_turns
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConversationSession":
+        known = {name: data[name] for name in cls.__dataclass_fields__ if name in data}
+        return cls(**known)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @property
+    def has_remaining_turns(self) -> bool:
+        return self.completed_turns < self.max_turns
+
+    def is_stale(self, lease_seconds: float, now: Optional[float] = None) -> bool:
+        """Sahibi lease süresi boyunca checkpoint almadıysa sahipsiz sayılır"""
+        return (now or time.time()) - self.heartbeat > lease_seconds
@@ -14,6 +14,7 @@ import re
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Tuple
 
+from ..context_manager import ContextManager, estimate_tokens
 from .document_state_manager import DocumentStateManager, DocumentChange
 from .real_time_sync_engine import RealTimeSyncEngine
 
@@ -32,10 +33,14 @@ class AIDocumentCommand:
 class AIDocumentIntegration:
     """AI-Document Collaboration Intelligence Layer"""
     
-    def __init__(self, document_manager: DocumentStateManager, sync_engine: RealTimeSyncEngine):
+    def __init__(self, document_manager: DocumentStateManager, sync_engine: RealTimeSyncEngine,
+                 context_manager: Optional[ContextManager] = None):
         self.document_manager = document_manager
         self.sync_engine = sync_engine
         
+        # Büyük belgeler prompt'a bütçe içinde, önbellekli özet olarak girer
+        self.context_manager = context_manager or ContextManager()
+        
         # AI command patterns
         self.command_patterns = {
             'append_to_document': r'(?i)belgeye\s+ekle[:\s]+(.+)',
@@ -55,6 +60,11 @@ class AIDocumentIntegration:
         if not document:
             return base_prompt
         
+        # Belge içeriği token bütçesini aşıyorsa bölüm bazlı özet kullanılır
+        content = self.context_manager.document_context(document)
+        if content != document.content:
+            content += f"\n\n(Belge özetlendi: tam içerik ~{estimate_tokens(document.content)} token)"
+        
         # Belge bilgilerini hazırla
         document_context = f"""
 📄 CANLI BELGE CONTEXT:
@@ -68,7 +78,7 @@ Son Güncelleme: {document.last_modified}
 
 📝 GÜNCEL BELGE İÇERİĞİ:
 ========================
-{document.content}
+{content}
 
 🎯 BELGE DÜZENLEME YETKİLERİNİZ:
 ===============================
@@ -7,13 +7,15 @@ Canlı belgelerin gerçek zamanlı durumunu yönetir:
 - Version control ve change tracking
 - Multi-user edit conflict resolution
 - Document snapshot management
+- Opsiyonel paylaşılan state backend'i (çoklu worker); backend'de sadece
+  son DOCUMENT_CHANGE_HISTORY değişiklik tutulur
 """
 
 import uuid
 import time
 import json
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 from threading import Lock
 import difflib
@@ -62,15 +64,77 @@ class LiveDocument:
     metadata: Dict[str, Any] = None
 
 
+def document_to_state(document: LiveDocument) -> Dict[str, Any]:
+    """LiveDocument'i JSON uyumlu dict'e çevir"""
+    return asdict(document)
+
+
+def document_from_state(data: Dict[str, Any]) -> LiveDocument:
+    """JSON dict'ten LiveDocument oluştur"""
+    data = dict(data)
+    data['changes_history'] = [DocumentChange(**change) for change in data.get('changes_history', [])]
+    data['cursors'] = {
+        user_id: DocumentCursor(**cursor) for user_id, cursor in data.get('cursors', {}).items()
+    }
+    return LiveDocument(**data)
+
+
 class DocumentStateManager:
     """Real-time Document State Management Engine"""
     
-    def __init__(self):
+    def __init__(self, state_backend=None):
         self.documents: Dict[str, LiveDocument] = {}
         self.locks: Dict[str, Lock] = {}
         self.change_queue: List[DocumentChange] = []
         self.max_history_size = 1000
         
+        # Paylaşılan backend verilirse belgeler worker'lar arasında tutulur,
+        # self.documents sadece yerel önbellek olarak kalır
+        self.state_backend = state_backend
+    
+    def _load(self, document_id: str) -> Optional[LiveDocument]:
+        """Belgeyi getir (backend varsa ondan oku ve önbelleği tazele)"""
+        if self.state_backend is None:
+            return self.documents.get(document_id)
+        
+        from ..server_runtime.shared_state import DOCUMENTS
+        data = self.state_backend.get(DOCUMENTS, document_id)
+        if data is None:
+            self.documents.pop(document_id, None)
+            return None
+        
+        document = document_from_state(data)
+        self.documents[document_id] = document
+        return document
+    
+    def _mutate(self, document_id: str, operation: Callable[[LiveDocument], Any], default: Any = False) -> Any:
+        """Belge üzerinde atomik değişiklik yap
+        
+        Backend yoksa belge kilidi altında, varsa backend'in atomik
+        update'i içinde çalışır. Belge yoksa default döner.
+        """
+        if self.state_backend is None:
+            if document_id not in self.documents:
+                return default
+            with self.locks.setdefault(document_id, Lock()):
+                return operation(self.documents[document_id])
+        
+        from ..server_runtime.shared_state import DOCUMENTS, DOCUMENT_CHANGE_HISTORY
+        
+        def mutate(data):
+            if data is None:
+                return None, (None, default)
+            document = document_from_state(data)
+            result = operation(document)
+            # Her düzenlemede yeniden yazılan JSON'u küçük tut
+            document.changes_history = document.changes_history[-DOCUMENT_CHANGE_HISTORY:]
+            return document_to_state(document), (document, result)
+        
+        document, result = self.state_backend.update(DOCUMENTS, document_id, mutate)
+        if document is not None:
+            self.documents[document_id] = document
+        return result
+        
     def create_document(self, title: str, content: str = "", 
                        document_type: str = "markdown", 
                        created_by: str = "system") -> str:
@@ -96,34 +160,31 @@ class DocumentStateManager:
         self.documents[document_id] = document
         self.locks[document_id] = Lock()
         
+        if self.state_backend is not None:
+            from ..server_runtime.shared_state import DOCUMENTS
+            self.state_backend.set(DOCUMENTS, document_id, document_to_state(document))
+        
         print(f"📄 Canlı belge oluşturuldu: {title} ({document_id[:8]})")
         return document_id
     
     def get_document(self, document_id: str) -> Optional[LiveDocument]:
         """Belge bilgilerini getir"""
-        return self.documents.get(document_id)
+        return self._load(document_id)
     
     def add_user_to_document(self, document_id: str, user_id: str) -> bool:
         """Kullanıcıyı belgeye ekle"""
-        if document_id not in self.documents:
-            return False
-            
-        with self.locks[document_id]:
-            document = self.documents[document_id]
+        def operation(document: LiveDocument) -> bool:
             if user_id not in document.active_users:
                 document.active_users.append(user_id)
                 document.last_modified = datetime.now().isoformat()
                 print(f"👤 {user_id} belgeye katıldı: {document.title}")
-            
-        return True
+            return True
+        
+        return self._mutate(document_id, operation)
     
     def remove_user_from_document(self, document_id: str, user_id: str) -> bool:
         """Kullanıcıyı belgeden çıkar"""
-        if document_id not in self.documents:
-            return False
-            
-        with self.locks[document_id]:
-            document = self.documents[document_id]
+        def operation(document: LiveDocument) -> bool:
             if user_id in document.active_users:
                 document.active_users.remove(user_id)
                 # Cursor'ını da temizle
@@ -131,83 +192,80 @@ class DocumentStateManager:
                     del document.cursors[user_id]
                 document.last_modified = datetime.now().isoformat()
                 print(f"👋 {user_id} belgeden ayrıldı: {document.title}")
+            return True
         
-        return True
+        return self._mutate(document_id, operation)
     
     def apply_change(self, document_id: str, change: DocumentChange) -> bool:
         """Belge değişikliğini uygula"""
-        if document_id not in self.documents:
+        return self._mutate(document_id, lambda document: self._apply_change_locked(document, change))
+    
+    def _apply_change_locked(self, document: LiveDocument, change: DocumentChange) -> bool:
+        """Değişikliği kilit/atomik işlem altında belgeye uygula"""
+        if document.is_locked:
+            print(f"⚠️ Belge kilitli, değişiklik uygulanamadı: {document.document_id}")
             return False
         
-        with self.locks[document_id]:
-            document = self.documents[document_id]
-            
-            if document.is_locked:
-                print(f"⚠️ Belge kilitli, değişiklik uygulanamadı: {document_id}")
+        try:
+            # Change type'a göre işlem yap
+            if change.change_type == "insert":
+                new_content = (
+                    document.content[:change.position] + 
+                    change.new_content + 
+                    document.content[change.position:]
+                )
+            elif change.change_type == "delete":
+                # Metin silme
+                end_pos = change.position + len(change.old_content)
+                new_content = (
+                    document.content[:change.position] + 
+                    document.content[end_pos:]
+                )
+            elif change.change_type == "replace":
+                end_pos = change.position + len(change.old_content)
+                new_content = (
+                    document.content[:change.position] + 
+                    change.new_content + 
+                    document.content[end_pos:]
+                )
+            else:
+                print(f"❌ Bilinmeyen change type: {change.change_type}")
                 return False
             
-            try:
-                # Change type'a göre işlem yap
-                if change.change_type == "insert":
-                    new_content = (
-                        document.content[:change.position] + 
-                        change.new_content + 
-                        document.content[change.position:]
-                    )
-                elif change.change_type == "delete":
-                    # Metin silme
-                    end_pos = change.position + len(change.old_content)
-                    new_content = (
-                        document.content[:change.position] + 
-                        document.content[end_pos:]
-                    )
-                elif change.change_type == "replace":
-                    end_pos = change.position + len(change.old_content)
-                    new_content = (
-                        document.content[:change.position] + 
-                        change.new_content + 
-                        document.content[end_pos:]
-                    )
-                else:
-                    print(f"❌ Bilinmeyen change type: {change.change_type}")
-                    return False
-                
-                # İçeriği güncelle
-                document.content = new_content
-                document.version += 1
-                document.last_modified = datetime.now().isoformat()
-                
-                # Change'i history'ye ekle
-                change.applied = True
-                document.changes_history.append(change)
-                
-                # History size limitini kontrol et
-                if len(document.changes_history) > self.max_history_size:
-                    document.changes_history = document.changes_history[-self.max_history_size:]
-                
-                print(f"✅ Değişiklik uygulandı: {change.user_id} → {change.change_type}")
-                return True
-                
-            except Exception as e:
-                print(f"❌ Change uygulama hatası: {e}")
-                return False
+            # İçeriği güncelle
+            document.content = new_content
+            document.version += 1
+            document.last_modified = datetime.now().isoformat()
+            
+            # Change'i history'ye ekle
+            change.applied = True
+            document.changes_history.append(change)
+            
+            # History size limitini kontrol et
+            if len(document.changes_history) > self.max_history_size:
+                document.changes_history = document.changes_history[-self.max_history_size:]
+            
+            print(f"✅ Değişiklik uygulandı: {change.user_id} → {change.change_type}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Change uygulama hatası: {e}")
+            return False
     
     def update_cursor(self, document_id: str, cursor: DocumentCursor) -> bool:
         """Kullanıcı cursor pozisyonunu güncelle"""
-        if document_id not in self.documents:
-            return False
-        
-        with self.locks[document_id]:
-            document = self.documents[document_id]
+        def operation(document: LiveDocument) -> bool:
             document.cursors[cursor.user_id] = cursor
-            
-        return True
+            return True
+        
+        return self._mutate(document_id, operation)
     
     def get_document_content(self, document_id: str) -> Optional[str]:
         """Belge içeriğini getir"""
-        if document_id not in self.documents:
+        document = self._load(document_id)
+        if not document:
             return None
-        return self.documents[document_id].content
+        return document.content
     
     def get_document_info(self, document_id: str) -> Optional[Dict[str, Any]]:
         """Belge bilgilerini dict olarak getir"""
@@ -230,40 +288,40 @@ class DocumentStateManager:
     
     def lock_document(self, document_id: str, locked_by: str) -> bool:
         """Belgeyi kilitle (AI işlemi sırasında)"""
-        if document_id not in self.documents:
-            return False
-        
-        with self.locks[document_id]:
-            document = self.documents[document_id]
+        def operation(document: LiveDocument) -> bool:
             document.is_locked = True
             document.metadata = document.metadata or {}
             document.metadata['locked_by'] = locked_by
             document.metadata['locked_at'] = datetime.now().isoformat()
-            
+            return True
+        
+        if not self._mutate(document_id, operation):
+            return False
+        
         print(f"🔒 Belge kilitlendi: {locked_by}")
         return True
     
     def unlock_document(self, document_id: str) -> bool:
         """Belge kilidini aç"""
-        if document_id not in self.documents:
-            return False
-        
-        with self.locks[document_id]:
-            document = self.documents[document_id]
+        def operation(document: LiveDocument) -> bool:
             document.is_locked = False
             if document.metadata:
                 document.metadata.pop('locked_by', None)
                 document.metadata.pop('locked_at', None)
+            return True
+        
+        if not self._mutate(document_id, operation):
+            return False
         
         print(f"🔓 Belge kilidi açıldı")
         return True
     
     def get_changes_since_version(self, document_id: str, since_version: int) -> List[DocumentChange]:
         """Belirli versiyondan sonraki değişiklikleri getir"""
-        if document_id not in self.documents:
+        document = self._load(document_id)
+        if not document:
             return []
         
-        document = self.documents[document_id]
         return [
             change for change in document.changes_history 
             if change.applied and change.timestamp > since_version
@@ -288,11 +346,22 @@ class DocumentStateManager:
         
         return snapshot
     
+    def _all_documents(self) -> Dict[str, LiveDocument]:
+        """Tüm belgeler (backend varsa tüm worker'larınkiler)"""
+        if self.state_backend is None:
+            return self.documents
+        
+        from ..server_runtime.shared_state import DOCUMENTS
+        return {
+            doc_id: document_from_state(data)
+            for doc_id, data in self.state_backend.values(DOCUMENTS).items()
+        }
+    
     def list_active_documents(self) -> List[Dict[str, Any]]:
         """Aktif belgeleri listele"""
         documents = []
         
-        for doc_id, document in self.documents.items():
+        for doc_id, document in self._all_documents().items():
             if document.active_users:  # Aktif kullanıcı varsa
                 doc_info = {
                     'document_id': doc_id,
@@ -315,10 +384,11 @@ class DocumentStateManager:
     
     def get_statistics(self) -> Dict[str, Any]:
         """Document state manager istatistikleri"""
-        total_documents = len(self.documents)
-        active_documents = len([d for d in self.documents.values() if d.active_users])
-        total_active_users = sum(len(d.active_users) for d in self.documents.values())
-        total_changes = sum(len(d.changes_history) for d in self.documents.values())
+        all_documents = list(self._all_documents().values())
+        total_documents = len(all_documents)
+        active_documents = len([d for d in all_documents if d.active_users])
+        total_active_users = sum(len(d.active_users) for d in all_documents)
+        total_changes = sum(len(d.changes_history) for d in all_documents)
         
         return {
             'total_documents': total_documents,
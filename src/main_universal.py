@@ -2,15 +2,24 @@
 AI Chrome Chat Manager - Universal Edition
 Ana yürütme dosyası
 """
-import asyncio
 import sys
 import os
-import argparse
-from colorama import init, Fore, Style
 
 # Projeyi path'e ekle
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Production sunucu modu (gevent/eventlet) için standart kütüphane en başta yamalanmalı;
+# src.monkey_patch başka hiçbir modül import etmez
+from src.monkey_patch import patch_from_env
+patch_from_env()
+
+import asyncio
+import argparse
+from colorama import init, Fore, Style
+
+from src.server_runtime import ServerRuntimeConfig
+server_config = ServerRuntimeConfig.from_env()
+
 from src.universal_ai_adapter import UniversalAIAdapter, SecureConfigManager
 from src.message_broker import MessageBroker
 from src.memory_bank_integration import MemoryBankIntegration
@@ -108,9 +117,12 @@ class UniversalChatManager:
                 port=5000,
                 message_broker=self.message_broker,
                 memory_bank=self.memory_bank,
-                ai_adapter=self.ai_adapter
+                ai_adapter=self.ai_adapter,
+                server_config=server_config
             )
-            self.web_ui.start_background()
+            # Headless modda sunucu initialize sonrası ön planda çalıştırılır
+            if not getattr(args, 'serve', False):
+                self.web_ui.start_background()
         except Exception as e:
             raise AIChromeChatError(
                 f"Web UI başlatılamadı: {str(e)}",
@@ -356,8 +368,12 @@ async def main():
     parser = argparse.ArgumentParser(description="AI Chrome Chat Manager - Universal Edition")
     parser.add_argument("--setup", action="store_true", help="API anahtarlarını yapılandır")
     parser.add_argument("--reset", action="store_true", help="Tüm yapılandırmaları sıfırla")
+    parser.add_argument("--serve", action="store_true",
+                        help="Komut satırı olmadan sadece web sunucusunu çalıştır (production)")
     
     args = parser.parse_args()
+    # Production modunda CLI döngüsü async sunucuyu bloklayacağı için headless çalış
+    args.serve = args.serve or server_config.is_production
     
     # Reset işlemi
     if args.reset:
@@ -374,7 +390,10 @@ async def main():
     
     try:
         await manager.initialize_components(args)
-        await manager.run()
+        if args.serve:
+            manager.web_ui.serve_forever()
+        else:
+            await manager.run()
     except KeyboardInterrupt:
         logger.info("⌨️ Klavye kesintisi algılandı")
     except Exception as e:
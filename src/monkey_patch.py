@@ -0,0 +1,38 @@
+"""
+Monkey Patch
+============
+
+Production sunucu modu (gevent/eventlet) için standart kütüphaneyi süreç başında yamalar:
+- Sadece os ve importlib kullanır; hiçbir proje modülünü import etmez, böylece
+  socket/ssl/threading kullanan modüller yamadan önce yüklenmez
+- Ayarları ServerRuntimeConfig.from_env ile aynı ortam değişkenlerinden okur
+- Seçilen backend yüklü değilse threading moduna düşer
+"""
+
+import importlib.util
+import os
+
+
+def patch_async_mode(async_mode: str) -> str:
+    """gevent/eventlet ise standart kütüphaneyi yamala, uygulanan modu döndür"""
+    if async_mode not in ('gevent', 'eventlet') or importlib.util.find_spec(async_mode) is None:
+        return 'threading'
+
+    if async_mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+    else:
+        import eventlet
+        eventlet.monkey_patch()
+
+    return async_mode
+
+
+def patch_from_env() -> str:
+    """SERVER_MODE=production ise SERVER_ASYNC_MODE'a göre yamala
+
+    Giriş noktasında, diğer tüm import'lardan önce çağrılmalıdır.
+    """
+    if os.getenv('SERVER_MODE', 'development').lower() != 'production':
+        return 'threading'
+    return patch_async_mode(os.getenv('SERVER_ASYNC_MODE', 'gevent').lower())
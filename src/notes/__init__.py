@@ -5,7 +5,7 @@ AI-Powered Note Taking System
 Bu modül, AI destekli not alma sisteminin temel bileşenlerini içerir.
 """
 
-from .models import Note, NoteWorkspace, NoteTag
+from .models import Note, NoteWorkspace, NoteTag, NoteVersion
 from .database import NotesDatabase
 from .api import notes_blueprint
 
@@ -16,6 +16,7 @@ __all__ = [
     'Note',
     'NoteWorkspace', 
     'NoteTag',
+    'NoteVersion',
     'NotesDatabase',
     'notes_blueprint'
 ] 
\ No newline at end of file
@@ -7,6 +7,7 @@ Not sistemi için AI entegrasyon özellikleri.
 
 import re
 from typing import List, Dict, Any, Optional
+from .keywords import extract_keywords, tokenize
 from ..universal_ai_adapter import UniversalAIAdapter
 from ..logger import logger
 
@@ -216,33 +217,8 @@ Sadece geçerli JSON formatında yanıt ver.
             return []
     
     def _extract_keywords(self, text: str) -> List[str]:
-        """Basit keyword extraction"""
-        if not text:
-            return []
-        
-        # HTML etiketlerini temizle
-        clean_text = re.sub(r'<[^>]+>', ' ', text)
-        
-        # Küçük harfe çevir ve kelimeleri ayır
-        words = re.findall(r'\b\w{3,}\b', clean_text.lower())
-        
-        # Türkçe stop words (basit liste)
-        stop_words = {
-            'bir', 'bu', 'şu', 'olan', 'olan', 'için', 'ile', 've', 'ya', 'da',
-            'ama', 'fakat', 'çünkü', 'eğer', 'when', 'where', 'what', 'how',
-            'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of',
-            'with', 'by', 'from', 'up', 'about', 'into', 'through', 'during'
-        }
-        
-        # Stop words'leri filtrele ve frekans hesapla
-        word_freq = {}
-        for word in words:
-            if word not in stop_words and len(word) > 2:
-                word_freq[word] = word_freq.get(word, 0) + 1
-        
-        # En sık kullanılan kelimeleri döndür
-        keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        return [word for word, freq in keywords[:10]]
+        """Basit keyword extraction (modül seviyesinde derlenmiş tokenizer)"""
+        return extract_keywords(text)
     
     def _fallback_analysis(self, title: str, content: str) -> Dict[str, Any]:
         """AI çalışmadığında fallback analiz"""
@@ -276,7 +252,7 @@ Sadece geçerli JSON formatında yanıt ver.
         suggested_tags = []
         
         # Başlıktan etiket çıkar
-        title_words = re.findall(r'\b\w{3,}\b', title.lower())
+        title_words = tokenize(title)
         suggested_tags.extend(title_words[:2])
         
         # En sık kullanılan keyword'lerden etiket
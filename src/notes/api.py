@@ -5,41 +5,98 @@ Notes API Endpoints
 Not sistemi için Flask API endpoint'leri.
 """
 
-from flask import Blueprint, request, jsonify, session, send_file
+from flask import Blueprint, Response, request, jsonify, session, send_file
 from typing import Dict, Any
 import json
 from functools import wraps
 
 from .database import NotesDatabase
 from .models import Note, NoteWorkspace
+from .projections import parse_fields
 from .ai_integration import NotesAIIntegration
+from .archive_stream import ARCHIVE_MIMETYPES, available_archive_formats
+from .change_feed import bridge_socketio
+from .enrichment import EnrichmentQueue, TASK_ANALYSIS, TASK_SUMMARY, TASK_TAGS, cached_result
 from .export_manager import NotesExportManager
 from .file_manager import NotesFileManager
+from .media_worker import DEFAULT_THUMBNAIL_SIZE, nearest_size
 from ..logger import logger
 import asyncio
-import os
+import re
 import tempfile
+import threading
+import uuid
+from datetime import datetime
 from werkzeug.utils import secure_filename
 
 # Blueprint oluştur
 notes_blueprint = Blueprint('notes', __name__, url_prefix='/api/notes')
 
-# Database instance
-notes_db = NotesDatabase()
+# Database instance: ilk kullanımda açılır (import veritabanı açmaz, göç çalıştırmaz)
+notes_db = None
+_notes_db_lock = threading.Lock()
 
 # AI Integration (will be initialized from main app)
 ai_integration = None
 
-# Export Manager
+# Arka plan AI zenginleştirme kuyruğu (init_ai_integration ile başlar)
+enrichment_queue = None
+
+# Socket.IO sunucusu (init_realtime ile ayarlanır); değişiklik ve export ilerleme olayları
+socketio = None
+
+# Export Manager (tek not export önbelleği not olaylarıyla geçersiz kılınır)
 export_manager = NotesExportManager()
 
 # File Manager
 file_manager = NotesFileManager()
 
-def init_ai_integration(ai_adapter):
-    """AI entegrasyonunu başlat"""
-    global ai_integration
+# Dosya kayıtlarının içeriği değişmez (içerik adresli); istemci önbelleği süresi
+FILE_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+
+# Üretilmemiş thumbnail için istek içinde beklenecek en uzun süre (saniye)
+THUMBNAIL_WAIT = 3.0
+
+
+def get_notes_db() -> NotesDatabase:
+    """Paylaşılan NotesDatabase; ilk çağrıda açılır ve export önbelleği akışa bağlanır"""
+    global notes_db
+    if notes_db is None:
+        with _notes_db_lock:
+            if notes_db is None:
+                database = NotesDatabase()
+                export_manager.cache.attach(database.change_feed)
+                notes_db = database
+    return notes_db
+
+
+def init_realtime(socketio_server):
+    """Not değişikliklerini ve export ilerlemesini workspace odalarına yayınla (notes:<workspace_id>)"""
+    global socketio
+    socketio = socketio_server
+    bridge_socketio(get_notes_db().change_feed, socketio_server)
+
+
+def init_ai_integration(ai_adapter, socketio=None):
+    """AI entegrasyonunu ve kayıtları izleyen zenginleştirme kuyruğunu başlat"""
+    global ai_integration, enrichment_queue
     ai_integration = NotesAIIntegration(ai_adapter)
+    enrichment_queue = EnrichmentQueue(get_notes_db(), ai_integration, socketio)
+    enrichment_queue.attach(get_notes_db().change_feed)
+
+
+def _enrichment_response(note, task: str, length: str = None):
+    """Güncel sonuç varsa onu, yoksa işi öne alıp 202 döndür (istek AI'ı beklemez)"""
+    entry = cached_result(note.ai_metadata, task, note.title, note.content, length)
+    if entry is not None:
+        return entry['value'], None
+    enrichment_queue.enqueue(note.id, [task], length=length, immediate=True)
+    return None, (jsonify({
+        'success': True,
+        'status': 'queued',
+        'note_id': note.id,
+        'task': task
+    }), 202)
 
 
 @notes_blueprint.route('/workspaces', methods=['GET'])
@@ -48,7 +105,7 @@ def get_workspaces():
     user_id = request.args.get('user_id', 'default_user')
     
     try:
-        workspaces = notes_db.get_user_workspaces(user_id)
+        workspaces = get_notes_db().get_user_workspaces(user_id)
         return jsonify({
             'success': True,
             'workspaces': [workspace.to_dict() for workspace in workspaces]
@@ -71,7 +128,7 @@ def create_workspace():
         return jsonify({'success': False, 'error': 'Workspace adı gerekli'}), 400
     
     try:
-        workspace = notes_db.create_workspace(name, created_by, description)
+        workspace = get_notes_db().create_workspace(name, created_by, description)
         return jsonify({
             'success': True,
             'workspace': workspace.to_dict()
@@ -83,21 +140,33 @@ def create_workspace():
 
 @notes_blueprint.route('/', methods=['GET'])
 def get_notes():
-    """Notları listele"""
+    """Notları listele (q verilirse tam metin arama, BM25 sıralı)
+
+    Liste hafif projeksiyon döner (varsayılan: id, title, preview, tags,
+    updated_at); fields= ile alanlar seçilir. Sonraki sayfa için yanıttaki
+    next_cursor, cursor= parametresiyle gönderilir.
+    """
     workspace_id = request.args.get('workspace_id')
-    limit = int(request.args.get('limit', 50))
+    limit = min(int(request.args.get('limit', 50)), 500)
     query = request.args.get('q', '')
     
     try:
-        if query:
-            notes = notes_db.search_notes(workspace_id, query)
-        else:
-            notes = notes_db.get_notes(workspace_id, limit=limit)
+        fields = parse_fields(request.args.get('fields'))
+        page = get_notes_db().list_note_summaries(
+            workspace_id,
+            fields=fields,
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            query=query or None
+        )
         
         return jsonify({
             'success': True,
-            'notes': [note.to_dict() for note in notes]
+            'notes': page['notes'],
+            'next_cursor': page['next_cursor']
         })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Notes listing failed: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -117,7 +186,7 @@ def create_note():
         return jsonify({'success': False, 'error': 'Workspace ID gerekli'}), 400
     
     try:
-        note = notes_db.create_note(
+        note = get_notes_db().create_note(
             title=title, 
             workspace_id=workspace_id, 
             created_by=created_by,
@@ -132,13 +201,72 @@ def create_note():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@notes_blueprint.route('/bulk', methods=['POST'])
+def bulk_notes():
+    """Toplu not işlemleri (tek transaction)
+
+    Gövde: {"operation": "create" | "tag" | "archive" | "unarchive" | "move", ...}
+    - create: workspace_id, created_by, notes: [{title, content, parent_id, tags}]
+    - tag: tags: {note_id: [etiket, ...]}, replace (bool), edited_by
+    - archive / unarchive: note_ids
+    - move: note_ids, parent_id (null: köke), edited_by
+    """
+    data = request.get_json() or {}
+    operation = data.get('operation')
+    edited_by = data.get('edited_by', 'default_user')
+
+    try:
+        if operation == 'create':
+            workspace_id = data.get('workspace_id')
+            if not workspace_id:
+                return jsonify({'success': False, 'error': 'Workspace ID gerekli'}), 400
+            note_ids = get_notes_db().bulk_create_notes(
+                workspace_id, data.get('created_by', 'default_user'), data.get('notes') or []
+            )
+            return jsonify({'success': True, 'note_ids': note_ids, 'count': len(note_ids)})
+
+        if operation == 'tag':
+            count = get_notes_db().bulk_tag_notes(data.get('tags') or {}, edited_by, replace=bool(data.get('replace')))
+        elif operation in ('archive', 'unarchive'):
+            count = get_notes_db().bulk_archive_notes(data.get('note_ids') or [], archived=operation == 'archive')
+        elif operation == 'move':
+            count = get_notes_db().bulk_move_notes(data.get('note_ids') or [], data.get('parent_id'), edited_by)
+        else:
+            return jsonify({'success': False, 'error': f'Bilinmeyen işlem: {operation}'}), 400
+
+        return jsonify({'success': True, 'count': count})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Bulk notes operation failed ({operation}): {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@notes_blueprint.route('/changes', methods=['GET'])
+def get_changes():
+    """Değişiklik günlüğü (after= son işlenen seq, workspace_id= isteğe bağlı)"""
+    after = request.args.get('after', 0, type=int)
+    workspace_id = request.args.get('workspace_id')
+    limit = min(request.args.get('limit', 500, type=int), 1000)
+
+    try:
+        result = get_notes_db().get_changes(after, workspace_id, limit)
+        return jsonify({
+            'success': True,
+            **result
+        })
+    except Exception as e:
+        logger.error(f"Change feed read failed: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @notes_blueprint.route('/<note_id>', methods=['GET'])
 def get_note(note_id):
     """Belirli bir notu getir"""
     increment_view = request.args.get('increment_view', 'false').lower() == 'true'
     
     try:
-        note = notes_db.get_note(note_id, increment_view=increment_view)
+        note = get_notes_db().get_note(note_id, increment_view=increment_view)
         if not note:
             return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
         
@@ -162,7 +290,7 @@ def update_note(note_id):
     data = request.get_json()
     
     try:
-        updated_note = notes_db.update_note(
+        updated_note = get_notes_db().update_note(
             note_id=note_id,
             title=data.get('title'),
             content=data.get('content'),
@@ -188,7 +316,7 @@ def update_note(note_id):
 def delete_note(note_id):
     """Notu sil"""
     try:
-        success = notes_db.delete_note(note_id)
+        success = get_notes_db().delete_note(note_id)
         
         if success:
             return jsonify({'success': True, 'message': 'Not silindi'})
@@ -203,7 +331,7 @@ def delete_note(note_id):
 @notes_blueprint.route('/<note_id>/archive', methods=['POST'])
 def archive_note(note_id):
     """Notu arşivle"""
-    success = notes_db.archive_note(note_id)
+    success = get_notes_db().archive_note(note_id)
     
     if not success:
         return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
@@ -214,10 +342,43 @@ def archive_note(note_id):
     })
 
 
+@notes_blueprint.route('/<note_id>/versions', methods=['GET'])
+def get_note_versions(note_id):
+    """Notun sürüm geçmişi"""
+    limit = min(request.args.get('limit', 50, type=int), 200)
+
+    try:
+        versions = get_notes_db().get_note_versions(note_id, limit=limit)
+        return jsonify({
+            'success': True,
+            'versions': versions
+        })
+    except Exception as e:
+        logger.error(f"Version list failed for note {note_id}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@notes_blueprint.route('/<note_id>/versions/<int:version>', methods=['GET'])
+def get_note_version(note_id, version):
+    """Notun belirli bir sürümü"""
+    try:
+        result = get_notes_db().get_note_version(note_id, version)
+        if not result:
+            return jsonify({'success': False, 'error': 'Sürüm bulunamadı'}), 404
+
+        return jsonify({
+            'success': True,
+            'version': result
+        })
+    except Exception as e:
+        logger.error(f"Version fetch failed for note {note_id} v{version}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @notes_blueprint.route('/tree/<workspace_id>', methods=['GET'])
 def get_note_tree(workspace_id):
     """Not hiyerarşisini getir"""
-    tree = notes_db.get_note_tree(workspace_id)
+    tree = get_notes_db().get_note_tree(workspace_id)
     
     return jsonify({
         'success': True,
@@ -228,14 +389,22 @@ def get_note_tree(workspace_id):
 @notes_blueprint.route('/recent/<workspace_id>', methods=['GET'])
 def get_recent_notes(workspace_id):
     """Son düzenlenen notları getir"""
-    limit = int(request.args.get('limit', 10))
+    limit = min(int(request.args.get('limit', 10)), 500)
     
     try:
-        notes = notes_db.get_recent_notes(workspace_id, limit)
+        page = get_notes_db().list_note_summaries(
+            workspace_id,
+            fields=parse_fields(request.args.get('fields')),
+            cursor=request.args.get('cursor'),
+            limit=limit
+        )
         return jsonify({
             'success': True,
-            'notes': [note.to_dict() for note in notes]
+            'notes': page['notes'],
+            'next_cursor': page['next_cursor']
         })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Recent notes fetch failed: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -244,12 +413,23 @@ def get_recent_notes(workspace_id):
 @notes_blueprint.route('/pinned/<workspace_id>', methods=['GET'])
 def get_pinned_notes(workspace_id):
     """Sabitlenmiş notları getir"""
+    limit = min(int(request.args.get('limit', 100)), 500)
+
     try:
-        notes = notes_db.get_pinned_notes(workspace_id)
+        page = get_notes_db().list_note_summaries(
+            workspace_id,
+            fields=parse_fields(request.args.get('fields')),
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            pinned=True
+        )
         return jsonify({
             'success': True,
-            'notes': [note.to_dict() for note in notes]
+            'notes': page['notes'],
+            'next_cursor': page['next_cursor']
         })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Pinned notes fetch failed: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -258,7 +438,7 @@ def get_pinned_notes(workspace_id):
 @notes_blueprint.route('/tags/<workspace_id>', methods=['GET'])
 def list_tags(workspace_id):
     """Workspace'deki etiketleri listele"""
-    tags = notes_db.list_tags(workspace_id)
+    tags = get_notes_db().list_tags(workspace_id)
     
     return jsonify({
         'success': True,
@@ -266,7 +446,8 @@ def list_tags(workspace_id):
             {
                 'id': tag.id,
                 'name': tag.name,
-                'color': tag.color
+                'color': tag.color,
+                'note_count': tag.note_count
             }
             for tag in tags
         ]
@@ -278,7 +459,7 @@ def get_popular_tags(workspace_id):
     """En çok kullanılan etiketleri getir"""
     limit = int(request.args.get('limit', 10))
     
-    tags = notes_db.get_popular_tags(workspace_id, limit=limit)
+    tags = get_notes_db().get_popular_tags(workspace_id, limit=limit)
     
     return jsonify({
         'success': True,
@@ -289,7 +470,7 @@ def get_popular_tags(workspace_id):
 @notes_blueprint.route('/stats/<workspace_id>', methods=['GET'])
 def get_workspace_stats(workspace_id):
     """Workspace istatistiklerini getir"""
-    stats = notes_db.get_workspace_stats(workspace_id)
+    stats = get_notes_db().get_workspace_stats(workspace_id)
     
     return jsonify({
         'success': True,
@@ -297,12 +478,28 @@ def get_workspace_stats(workspace_id):
     })
 
 
+@notes_blueprint.route('/stats/repair', methods=['POST'])
+def repair_stats():
+    """Hazır sayaçları yeniden hesapla (workspace_id verilmezse tümü)"""
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        fixed = get_notes_db().repair_stats(data.get('workspace_id'))
+        return jsonify({
+            'success': True,
+            'fixed': fixed
+        })
+    except Exception as e:
+        logger.error(f"Stats repair failed: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @notes_blueprint.route('/<note_id>/pin', methods=['POST'])
 def pin_note(note_id):
     """Notu sabitle/sabitlemeyi kaldır"""
     try:
         # Get note
-        note = notes_db.get_note(note_id)
+        note = get_notes_db().get_note(note_id)
         if not note:
             return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
         
@@ -315,7 +512,7 @@ def pin_note(note_id):
             new_pin_status = data['pinned']
         
         # Update note
-        updated_note = notes_db.update_note(
+        updated_note = get_notes_db().update_note(
             note_id=note_id,
             is_pinned=new_pin_status,
             edited_by='default_user'
@@ -345,20 +542,19 @@ def ai_analyze_note(note_id):
         return jsonify({'success': False, 'error': 'AI entegrasyonu mevcut değil'}), 500
     
     try:
-        note = notes_db.get_note(note_id)
+        note = get_notes_db().get_note(note_id)
         if not note:
             return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
         
-        # AI analizi yap
-        result = asyncio.run(ai_integration.analyze_note(note.content))
+        # Sonuç arka planda üretilir ve Socket.IO ile gönderilir
+        analysis, queued = _enrichment_response(note, TASK_ANALYSIS)
+        if queued:
+            return queued
         
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'analysis': result['analysis']
-            })
-        else:
-            return jsonify({'success': False, 'error': result['error']})
+        return jsonify({
+            'success': True,
+            'analysis': analysis
+        })
             
     except Exception as e:
         logger.error(f"AI analysis failed for note {note_id}: {e}")
@@ -372,15 +568,16 @@ def ai_suggest_tags(note_id):
         return jsonify({'success': False, 'error': 'AI entegrasyonu mevcut değil'}), 500
     
     try:
-        note = notes_db.get_note(note_id)
+        note = get_notes_db().get_note(note_id)
         if not note:
             return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
         
         # Get existing tags
         existing_tags = [tag.name for tag in note.tags] if note.tags else []
         
-        # Call with correct parameters
-        suggested_tags = asyncio.run(ai_integration.suggest_tags(note.title, note.content, existing_tags))
+        suggested_tags, queued = _enrichment_response(note, TASK_TAGS)
+        if queued:
+            return queued
         
         return jsonify({
             'success': True,
@@ -403,12 +600,13 @@ def ai_summarize_note(note_id):
     length = data.get('length', 'medium')
     
     try:
-        note = notes_db.get_note(note_id)
+        note = get_notes_db().get_note(note_id)
         if not note:
             return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
         
-        # Call with correct parameters
-        summary = asyncio.run(ai_integration.summarize_content(note.title, note.content, length))
+        summary, queued = _enrichment_response(note, TASK_SUMMARY, length)
+        if queued:
+            return queued
         
         return jsonify({
             'success': True,
@@ -428,7 +626,7 @@ def ai_improve_writing(note_id):
         return jsonify({'success': False, 'error': 'AI entegrasyonu mevcut değil'}), 500
     
     try:
-        note = notes_db.get_note(note_id)
+        note = get_notes_db().get_note(note_id)
         if not note:
             return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
         
@@ -447,21 +645,14 @@ def ai_improve_writing(note_id):
 
 @notes_blueprint.route('/<note_id>/ai/related', methods=['GET'])
 def ai_find_related_notes(note_id):
-    """AI ile ilgili notları bul"""
-    if not ai_integration:
-        return jsonify({'success': False, 'error': 'AI entegrasyonu mevcut değil'}), 500
+    """İlgili notları bul (workspace vektör indeksi)"""
+    limit = min(request.args.get('limit', 5, type=int), 50)
     
     try:
-        note = notes_db.get_note(note_id)
-        if not note:
+        if not get_notes_db().get_note(note_id, increment_view=False):
             return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
         
-        # Aynı workspace'teki diğer notları al - convert to dict format
-        all_notes_objects = notes_db.get_notes(note.workspace_id, limit=100)
-        all_notes = [n.to_dict() for n in all_notes_objects]
-        
-        # Call with correct parameters
-        related_notes = asyncio.run(ai_integration.find_related_notes(note.title, note.content, all_notes))
+        related_notes = get_notes_db().find_related_notes(note_id, limit=limit)
         
         return jsonify({
             'success': True,
@@ -479,7 +670,7 @@ def upload_file_to_note(note_id):
     """Note'a dosya yükle"""
     try:
         # Note'un varlığını kontrol et
-        note = notes_db.get_note(note_id)
+        note = get_notes_db().get_note(note_id)
         if not note:
             return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
         
@@ -493,10 +684,9 @@ def upload_file_to_note(note_id):
         
         # Dosya adını güvenli hale getir
         filename = secure_filename(file.filename)
-        file_data = file.read()
         
-        # Dosyayı yükle
-        result = file_manager.upload_file(file_data, filename, note_id)
+        # Dosyayı parça parça yükle (tamamı belleğe alınmaz)
+        result = file_manager.upload_stream(file.stream, filename, note_id)
         
         if result['success']:
             logger.info(f"File uploaded to note {note_id}: {filename}")
@@ -513,12 +703,78 @@ def upload_file_to_note(note_id):
         logger.error(f"File upload failed for note {note_id}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@notes_blueprint.route('/<note_id>/uploads', methods=['POST'])
+def start_chunked_upload(note_id):
+    """Parçalı (devam ettirilebilir) yükleme oturumu aç"""
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename') or '')
+    total_size = data.get('size')
+    if not filename or not isinstance(total_size, int) or total_size < 0:
+        return jsonify({'success': False, 'error': 'filename ve size gerekli'}), 400
+    
+    try:
+        if not get_notes_db().get_note(note_id, increment_view=False):
+            return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
+        
+        result = file_manager.start_upload(filename, total_size, note_id)
+        return jsonify(result), 201 if result['success'] else 400
+        
+    except Exception as e:
+        logger.error(f"Chunked upload start failed for note {note_id}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _content_range_start(default: int) -> int:
+    """Content-Range: bytes <start>-<end>/<total> başlığından başlangıç (yoksa ?offset=)"""
+    content_range = request.headers.get('Content-Range', '')
+    if content_range.startswith('bytes ') and '-' in content_range:
+        return int(content_range[6:].split('-', 1)[0])
+    return request.args.get('offset', default, type=int)
+
+
+@notes_blueprint.route('/uploads/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    """Yükleme durumu; kopan yükleme 'offset'ten devam eder"""
+    session_info = file_manager.get_upload(upload_id)
+    if not session_info:
+        return jsonify({'success': False, 'error': 'Yükleme bulunamadı'}), 404
+    return jsonify({'success': True, **session_info})
+
+
+@notes_blueprint.route('/uploads/<upload_id>', methods=['PUT'])
+def append_chunked_upload(upload_id):
+    """Sıradaki parçayı ekle (gövde ham bayt akışı olarak okunur)"""
+    try:
+        session_info = file_manager.get_upload(upload_id)
+        if not session_info:
+            return jsonify({'success': False, 'error': 'Yükleme bulunamadı'}), 404
+        
+        offset = _content_range_start(session_info['offset'])
+        result = file_manager.append_upload(upload_id, offset, request.stream)
+        status = result.pop('status', 200 if result['success'] else 400)
+        return jsonify(result), status
+        
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Geçersiz Content-Range'}), 400
+    except Exception as e:
+        logger.error(f"Chunked upload failed for upload {upload_id}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@notes_blueprint.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    """Yarım yüklemeyi iptal et"""
+    if not file_manager.abort_upload(upload_id):
+        return jsonify({'success': False, 'error': 'Yükleme bulunamadı'}), 404
+    return jsonify({'success': True})
+
+
 @notes_blueprint.route('/<note_id>/files', methods=['GET'])
 def get_note_files(note_id):
     """Note'un dosyalarını listele"""
     try:
         # Note'un varlığını kontrol et
-        note = notes_db.get_note(note_id)
+        note = get_notes_db().get_note(note_id)
         if not note:
             return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
         
@@ -546,11 +802,16 @@ def download_file(file_id):
         if not file_path or not file_path.exists():
             return jsonify({'success': False, 'error': 'Dosya fiziksel olarak bulunamadı'}), 404
         
+        # Range / If-None-Match desteklenir; içerik hash'i ETag olur. Dosya yolu
+        # verildiği için sunucu wsgi.file_wrapper ile sendfile kullanabilir
         return send_file(
             file_path,
             as_attachment=True,
             download_name=file_info['original_filename'],
-            mimetype=file_info.get('mime_type')
+            mimetype=file_info.get('mime_type'),
+            conditional=True,
+            etag=file_info.get('hash') or True,
+            max_age=FILE_CACHE_MAX_AGE
         )
         
     except Exception as e:
@@ -559,17 +820,32 @@ def download_file(file_id):
 
 @notes_blueprint.route('/files/<file_id>/thumbnail', methods=['GET'])
 def get_file_thumbnail(file_id):
-    """Dosya thumbnail'ını getir"""
+    """Dosya thumbnail'ını getir (?size=128|300|800, ?format=jpeg|webp ya da Accept: image/webp)"""
     try:
         file_info = file_manager.get_file_info(file_id)
         if not file_info:
             return jsonify({'success': False, 'error': 'Dosya bulunamadı'}), 404
         
-        thumbnail_path = file_manager.get_thumbnail_path(file_id)
-        if not thumbnail_path or not thumbnail_path.exists():
-            return jsonify({'success': False, 'error': 'Thumbnail bulunamadı'}), 404
-        
-        return send_file(thumbnail_path, mimetype='image/jpeg')
+        size = nearest_size(request.args.get('size', DEFAULT_THUMBNAIL_SIZE, type=int))
+        fmt = request.args.get('format')
+        if fmt not in ('jpeg', 'webp'):
+            # */* her şeyi kabul eder; WebP sadece açıkça istenirse verilir
+            fmt = 'webp' if 'image/webp' in request.accept_mimetypes.values() else 'jpeg'
+        
+        thumbnail_path = file_manager.get_thumbnail(file_id, size, fmt, wait=THUMBNAIL_WAIT)
+        if thumbnail_path is None:
+            if file_info.get('category') != 'images':
+                return jsonify({'success': False, 'error': 'Thumbnail bulunamadı'}), 404
+            # Üretim arka planda sürüyor
+            response = jsonify({'success': False, 'error': 'Thumbnail hazırlanıyor'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        
+        response = send_file(thumbnail_path, mimetype=f'image/{fmt}', conditional=True,
+                             etag=f"{file_info.get('hash') or file_id}-{size}.{fmt}", max_age=FILE_CACHE_MAX_AGE)
+        if 'format' not in request.args:
+            response.vary.add('Accept')
+        return response
         
     except Exception as e:
         logger.error(f"Thumbnail fetch failed for file {file_id}: {e}")
@@ -628,8 +904,8 @@ def get_storage_stats():
 # Export Endpoints
 @notes_blueprint.route('/<note_id>/export/<format_type>', methods=['GET'])
 def export_single_note(note_id, format_type):
-    """Tek bir notu export et"""
-    note = notes_db.get_note(note_id)
+    """Tek bir notu export et (not sürümü değişmediyse önbellekten)"""
+    note = get_notes_db().get_note(note_id, increment_view=False)
     if not note:
         return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
     
@@ -637,20 +913,79 @@ def export_single_note(note_id, format_type):
         # Export manager ile export et
         filepath = export_manager.export_single_note(note.to_dict(), format_type)
         
-        # Dosya adını al
-        filename = os.path.basename(filepath)
-        
         return jsonify({
             'success': True,
-            'download_url': f'/api/notes/download/{filename}',
+            'download_url': f'/api/notes/{note_id}/export/{format_type}/download',
             'file_path': filepath,
+            'version': note.version,
             'format': format_type
         })
         
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Note export failed for note {note_id}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@notes_blueprint.route('/<note_id>/export/<format_type>/download', methods=['GET'])
+def download_note_export(note_id, format_type):
+    """Not export dosyasını indir (ETag: not sürümü + format)"""
+    note = get_notes_db().get_note(note_id, increment_view=False)
+    if not note:
+        return jsonify({'success': False, 'error': 'Not bulunamadı'}), 404
+    
+    try:
+        note_data = note.to_dict()
+        filepath = export_manager.export_single_note(note_data, format_type)
+        return send_file(filepath, as_attachment=True,
+                         download_name=export_manager.export_filename(note_data, format_type),
+                         conditional=True, etag=f"{note_id}-v{note.version}.{format_type}")
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Note export download failed for note {note_id}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@notes_blueprint.route('/workspaces/<workspace_id>/export', methods=['GET'])
+def export_workspace(workspace_id):
+    """Workspace'i tek arşiv olarak akıt (?archive=zip|tar.zst, ?format=markdown|html|json|txt)
+
+    İlerleme, notes:<workspace_id> odasına 'notes_export_progress' olayıyla
+    bildirilir; istemci kendi export_id'sini verebilir (X-Export-Id başlığında döner).
+    """
+    workspace = get_notes_db().get_workspace(workspace_id)
+    if not workspace:
+        return jsonify({'success': False, 'error': 'Workspace bulunamadı'}), 404
+    
+    archive_format = request.args.get('archive', 'zip')
+    format_type = request.args.get('format', 'markdown')
+    export_id = request.args.get('export_id', '')
+    if not re.fullmatch(r'[A-Za-z0-9_-]{1,64}', export_id):
+        export_id = uuid.uuid4().hex
+    
+    realtime = socketio
+    
+    def emit_progress(state):
+        if realtime is not None:
+            realtime.emit('notes_export_progress', {'export_id': export_id, 'workspace_id': workspace_id, **state},
+                          room=f"notes:{workspace_id}")
+    
+    try:
+        stream = export_manager.stream_workspace(
+            workspace.to_dict(), get_notes_db(), file_manager,
+            archive_format=archive_format, format_type=format_type, progress=emit_progress
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e), 'archive_formats': available_archive_formats()}), 400
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = secure_filename(f"{workspace.name}_{timestamp}.{archive_format}") or f"workspace_{timestamp}.{archive_format}"
+    return Response(stream, mimetype=ARCHIVE_MIMETYPES[archive_format], headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Export-Id': export_id,
+        'Cache-Control': 'no-store'
+    })
+
 @notes_blueprint.route('/export/formats', methods=['GET'])
 def get_export_formats():
     """Kullanılabilir export formatlarını getir"""
@@ -659,7 +994,8 @@ def get_export_formats():
         return jsonify({
             'success': True,
             'formats': list(formats.keys()),
-            'format_details': formats
+            'format_details': formats,
+            'archive_formats': available_archive_formats()
         })
     except Exception as e:
         logger.error(f"Export formats fetch failed: {e}")
@@ -0,0 +1,148 @@
+"""
+Notes Archive Stream
+====================
+
+Arşivi diske yazmadan, üretildikçe parça parça veren yazıcılar (zip, tar.zst).
+
+- Çıktı sadece yazılabilir bir tampona (_StreamSink) gider; her girdi
+  parçasından sonra tampon boşaltılıp HTTP yanıtına verilir, bellek
+  kullanımı arşiv boyutundan bağımsızdır
+- zip: zipfile seek edilemeyen akışta data descriptor kullanır; büyük
+  girdiler için ZIP64 açıktır, zaten sıkıştırılmış içerik (resimler) stored yazılır
+- tar.zst: tar başlığı ve dolgu elle yazılır, böylece büyük dosyalar da
+  parça parça akar (tarfile.addfile dosyayı tek seferde kopyalar)
+
+zstandard kurulu değilse sadece zip kullanılabilir.
+"""
+
+import tarfile
+import time
+import zipfile
+from typing import List, Optional
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+ARCHIVE_MIMETYPES = {
+    'zip': 'application/zip',
+    'tar.zst': 'application/zstd'
+}
+
+ZSTD_LEVEL = 3
+
+
+def available_archive_formats() -> List[str]:
+    return [fmt for fmt in ARCHIVE_MIMETYPES if fmt != 'tar.zst' or ZSTD_AVAILABLE]
+
+
+class _StreamSink:
+    """Arşiv çıktısını biriktiren, sadece yazılabilir akış"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.bytes_written = 0
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _TarEntry:
+    """Boyutu önceden bilinen tar girdisi: başlık, parça parça veri, blok dolgusu"""
+
+    def __init__(self, tar: tarfile.TarFile, info: tarfile.TarInfo):
+        self.tar = tar
+        self.info = info
+        self.written = 0
+        header = info.tobuf(tar.format, tar.encoding, tar.errors)
+        tar.fileobj.write(header)
+        tar.offset += len(header)
+
+    def write(self, data: bytes):
+        self.tar.fileobj.write(data)
+        self.written += len(data)
+
+    def close(self):
+        if self.written != self.info.size:
+            raise OSError(f"{self.info.name}: {self.written} bayt yazıldı, {self.info.size} bekleniyordu")
+        blocks, remainder = divmod(self.info.size, tarfile.BLOCKSIZE)
+        if remainder:
+            self.tar.fileobj.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+            blocks += 1
+        self.tar.offset += blocks * tarfile.BLOCKSIZE
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+class ArchiveWriter:
+    """Akış halinde zip / tar.zst yazıcı
+
+    open(name, size) ile açılan girdiye parça parça yazılır; her parçadan
+    sonra drain() o ana kadar üretilen baytları döndürür.
+    """
+
+    def __init__(self, archive_format: str = 'zip'):
+        if archive_format not in available_archive_formats():
+            raise ValueError(f"Desteklenmeyen arşiv formatı: {archive_format}")
+        self.format = archive_format
+        self.sink = _StreamSink()
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._tar: Optional[tarfile.TarFile] = None
+        self._compressor = None
+        if archive_format == 'zip':
+            self._zip = zipfile.ZipFile(self.sink, 'w', compression=zipfile.ZIP_DEFLATED)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(self.sink, closefd=False)
+            self._tar = tarfile.open(fileobj=self._compressor, mode='w|', format=tarfile.PAX_FORMAT)
+
+    @property
+    def bytes_written(self) -> int:
+        return self.sink.bytes_written
+
+    def open(self, name: str, size: int, compress: bool = True):
+        """Yazılabilir girdi (context manager); size tar başlığı için gereklidir"""
+        mtime = time.time()
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, time.localtime(mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            info.external_attr = 0o644 << 16
+            return self._zip.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT)
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(mtime)
+        info.mode = 0o644
+        return _TarEntry(self._tar, info)
+
+    def add_bytes(self, name: str, data: bytes, compress: bool = True):
+        with self.open(name, len(data), compress) as entry:
+            entry.write(data)
+
+    def drain(self) -> bytes:
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        """Arşivi kapat (zip merkez dizini / tar sonu, zstd çerçevesi); kalan baytları döndür"""
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+            self._compressor.close()
+        return self.drain()
@@ -0,0 +1,313 @@
+"""
+Note Change Feed
+================
+
+Notlar için kalıcı, sıralı değişiklik günlüğü (CDC) ve abonelik API'si.
+
+- Her yazma işlemi (create/update/delete/archive/unarchive/tag/move)
+  note_changes tablosuna aynı transaction içinde bir kayıt ekler; kayıt
+  ancak değişiklik commit edilirse görünür
+- seq artan sıra numarasıdır: tüketiciler son işledikleri seq'ten
+  devam eder (read(after_seq=...)), kaçırılan olay olmaz
+- Süreç içi aboneler subscribe() ile kaydolur; commit sonrası arka plan
+  thread'i yeni kayıtları sırayla abonelere iletir. Thread günlüğü belirli
+  aralıklarla da okur, böylece diğer worker process'lerin yazdıkları da
+  her process'teki abonelere ulaşır
+- Her kayıt yazan process'in pid'ini taşır (data['pid']); tüm process'ler
+  her kaydı gördüğünden yan etkili aboneler (Socket.IO, AI kuyruğu) sadece
+  kendi process'inin kayıtlarını işler
+- bridge_socketio() olayları Socket.IO odalarına (notes:<workspace_id>) yayınlar;
+  message queue ile her olay bir kez, yazan worker'dan gider
+- Günlük başlangıçta ve dağıtım thread'inde saatte bir retention_days'ten
+  eski kayıtlardan budanır (prune_expired); prune() elle de çağrılabilir
+
+Türetilmiş veriler (önbellekler, indeksler, sayaçlar) her istekte yeniden
+hesaplamak yerine bu akıştan artımlı olarak güncellenebilir.
+"""
+
+import atexit
+import itertools
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, func, insert, select
+
+from .models import NoteChange
+from ..logger import logger
+
+OP_CREATE = 'create'
+OP_UPDATE = 'update'
+OP_DELETE = 'delete'
+OP_ARCHIVE = 'archive'
+OP_UNARCHIVE = 'unarchive'
+OP_TAG = 'tag'
+OP_MOVE = 'move'
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_BATCH_SIZE = 500
+# Günlükte tutulan kayıtların en fazla yaşı ve budama aralığı (saniye)
+DEFAULT_RETENTION_DAYS = 30
+PRUNE_INTERVAL = 3600.0
+
+# Session.info anahtarı: bu transaction'da günlüğe yazıldı mı
+_PENDING_KEY = 'note_changes_pending'
+
+ChangeCallback = Callable[[Dict[str, Any]], None]
+
+
+def change(op: str, note_id: str, workspace_id: str, version: Optional[int] = None,
+           actor: Optional[str] = None, **data) -> Dict[str, Any]:
+    """Günlük kaydı için satır sözlüğü (yazan process'in pid'i ile)"""
+    return {
+        'op': op,
+        'note_id': note_id,
+        'workspace_id': workspace_id,
+        'version': version,
+        'actor': actor,
+        'data': {**data, 'pid': os.getpid()},
+        'created_at': datetime.now()
+    }
+
+
+def record_changes(session, changes: Iterable[Dict[str, Any]]):
+    """Değişiklikleri çağıranın transaction'ında günlüğe yaz (tek executemany)"""
+    rows = list(changes)
+    if not rows:
+        return
+    session.execute(insert(NoteChange), rows)
+    session.info[_PENDING_KEY] = True
+
+
+class ChangeFeed:
+    """note_changes günlüğü için okuma ve süreç içi dağıtım"""
+
+    def __init__(self, engine, read_engine=None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 retention_days: Optional[int] = DEFAULT_RETENTION_DAYS):
+        self.engine = engine
+        self.read_engine = read_engine or engine
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self._pruned_at: Optional[float] = None
+
+        self._subscribers: Dict[int, Dict[str, Any]] = {}
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        self._dispatch_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stopped = False
+
+        # Aboneler sadece bu process başladıktan sonraki olayları canlı alır
+        self._last_seq = self.latest_seq()
+
+        self.stats = {'dispatched': 0, 'deliveries': 0, 'errors': 0}
+        atexit.register(self.stop)
+
+    def attach(self, session_factory):
+        """sessionmaker'a bağlan: günlüğe yazan her commit dağıtımı tetikler"""
+        event.listen(session_factory, 'after_commit', self._on_commit)
+
+    def _on_commit(self, session):
+        if session.info.pop(_PENDING_KEY, False) and self._subscribers:
+            self._ensure_thread()
+            self._wake.set()
+
+    # Okuma
+
+    def latest_seq(self) -> int:
+        with self.read_engine.connect() as connection:
+            return connection.execute(select(func.max(NoteChange.seq))).scalar() or 0
+
+    def read(self, after_seq: int = 0, workspace_id: Optional[str] = None,
+             limit: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, Any]]:
+        """after_seq'ten sonraki kayıtlar (seq sırasıyla)"""
+        statement = select(NoteChange).where(NoteChange.seq > after_seq)
+        if workspace_id is not None:
+            statement = statement.where(NoteChange.workspace_id == workspace_id)
+        statement = statement.order_by(NoteChange.seq).limit(limit)
+
+        with self.read_engine.connect() as connection:
+            rows = connection.execute(statement).mappings().all()
+        return [self._row_to_dict(row) for row in rows]
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        created_at = row['created_at']
+        return {
+            'seq': row['seq'],
+            'workspace_id': row['workspace_id'],
+            'note_id': row['note_id'],
+            'op': row['op'],
+            'version': row['version'],
+            'actor': row['actor'],
+            'data': row['data'] or {},
+            'created_at': created_at.isoformat() if created_at else None
+        }
+
+    # Abonelik
+
+    def subscribe(self, callback: ChangeCallback, workspace_id: Optional[str] = None,
+                  ops: Optional[Iterable[str]] = None, since: Optional[int] = None) -> int:
+        """Aboneliği kaydet; abonelik token'ını döndür
+
+        since verilirse o seq'ten sonraki geçmiş kayıtlar önce (sırayla) iletilir,
+        ardından canlı olaylar boşluksuz devam eder.
+        """
+        subscriber = {
+            'callback': callback,
+            'workspace_id': workspace_id,
+            'ops': frozenset(ops) if ops else None
+        }
+        with self._dispatch_lock:
+            if not self._subscribers:
+                # Abone yokken dağıtım yapılmaz; canlı akış şimdiden başlar
+                self._last_seq = self.latest_seq()
+            if since is not None:
+                cursor = since
+                while cursor < self._last_seq:
+                    backlog = [item for item in self.read(cursor, workspace_id, self.batch_size)
+                               if item['seq'] <= self._last_seq]
+                    if not backlog:
+                        break
+                    for item in backlog:
+                        self._deliver(subscriber, item)
+                    cursor = backlog[-1]['seq']
+            with self._lock:
+                token = next(self._tokens)
+                self._subscribers[token] = subscriber
+        self._ensure_thread()
+        return token
+
+    def unsubscribe(self, token: int) -> bool:
+        with self._lock:
+            return self._subscribers.pop(token, None) is not None
+
+    def dispatch(self) -> int:
+        """Commit edilmiş yeni kayıtları abonelere ilet; iletilen kayıt sayısını döndür"""
+        with self._dispatch_lock:
+            total = 0
+            while True:
+                batch = self.read(self._last_seq, limit=self.batch_size)
+                if not batch:
+                    return total
+                with self._lock:
+                    subscribers = list(self._subscribers.values())
+                for item in batch:
+                    for subscriber in subscribers:
+                        self._deliver(subscriber, item)
+                self._last_seq = batch[-1]['seq']
+                total += len(batch)
+                with self._lock:
+                    self.stats['dispatched'] += len(batch)
+
+    def _deliver(self, subscriber: Dict[str, Any], item: Dict[str, Any]):
+        if subscriber['workspace_id'] is not None and item['workspace_id'] != subscriber['workspace_id']:
+            return
+        if subscriber['ops'] is not None and item['op'] not in subscriber['ops']:
+            return
+        try:
+            subscriber['callback'](item)
+            with self._lock:
+                self.stats['deliveries'] += 1
+        except Exception as e:
+            # Hatalı abone diğerlerini ve sırayı bozmaz
+            with self._lock:
+                self.stats['errors'] += 1
+            logger.error(f"Change feed subscriber failed at seq {item['seq']}: {e}")
+
+    # Arka plan dağıtımı
+
+    def _ensure_thread(self):
+        if self._stopped:
+            return
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        if self._pid not in (None, pid):
+            # Fork sonrası: ebeveynin kilitleri ve thread'i bu process'e ait değil
+            self._lock = threading.Lock()
+            self._dispatch_lock = threading.Lock()
+            self._wake = threading.Event()
+            self._thread = None
+            self._pid = pid
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="notes-change-feed", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            # Abone kalmadıysa thread biter; sonraki subscribe yenisini başlatır
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stopped:
+                break
+            try:
+                self.dispatch()
+                self.prune_expired()
+            except Exception as e:
+                logger.error(f"Change feed dispatch failed: {e}")
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    # Bakım
+
+    def prune(self, max_age_days: Optional[int] = None, before_seq: Optional[int] = None) -> int:
+        """Eski günlük kayıtlarını sil; silinen kayıt sayısını döndür"""
+        statement = delete(NoteChange)
+        if max_age_days is not None:
+            statement = statement.where(NoteChange.created_at < datetime.now() - timedelta(days=max_age_days))
+        if before_seq is not None:
+            statement = statement.where(NoteChange.seq < before_seq)
+        if max_age_days is None and before_seq is None:
+            return 0
+
+        with self.engine.begin() as connection:
+            removed = connection.execute(statement).rowcount or 0
+        if removed:
+            logger.info(f"Pruned {removed} note change log entries")
+        return removed
+
+    def prune_expired(self, force: bool = False) -> int:
+        """retention_days'ten eski kayıtları en fazla PRUNE_INTERVAL'da bir sil"""
+        if self.retention_days is None:
+            return 0
+        now = time.monotonic()
+        if not force and self._pruned_at is not None and now - self._pruned_at < PRUNE_INTERVAL:
+            return 0
+        self._pruned_at = now
+        return self.prune(max_age_days=self.retention_days)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'subscribers': len(self._subscribers), 'last_seq': self._last_seq}
+
+
+def bridge_socketio(feed: ChangeFeed, socketio, event_name: str = 'note_change',
+                    room_prefix: str = 'notes:') -> int:
+    """Olayları Socket.IO'da workspace odasına yayınla (notes:<workspace_id>)
+
+    Sadece bu process'in yazdığı kayıtlar yayınlanır; diğer worker'ların
+    kayıtlarını onlar yayınlar (message queue tüm istemcilere dağıtır).
+    """
+    def emit_change(item: Dict[str, Any]):
+        if item['data'].get('pid') != os.getpid():
+            return
+        socketio.emit(event_name, item, room=f"{room_prefix}{item['workspace_id']}")
+
+    return feed.subscribe(emit_change)
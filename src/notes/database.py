@@ -6,14 +6,33 @@ Not veritabanı işlemleri için katman.
 """
 
 import os
-from typing import List, Optional, Dict, Any
+import uuid
+from typing import Iterator, List, Optional, Dict, Any, Tuple
 from datetime import datetime
-from sqlalchemy import create_engine, and_, or_, desc, func
+from sqlalchemy import and_, or_, delete, desc, insert, select, tuple_, update
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import IntegrityError
 
-from .models import Base, Note, NoteWorkspace, NoteTag
+from .models import (
+    Base, Note, NoteWorkspace, NoteTag, NoteTextFeatures, NoteVersion, WorkspaceStats, note_tags
+)
+from .keywords import cached_features, compute_features, content_hash
+from .change_feed import (
+    ChangeFeed, OP_ARCHIVE, OP_CREATE, OP_DELETE, OP_MOVE, OP_TAG, OP_UNARCHIVE, OP_UPDATE,
+    change, record_changes
+)
+from .enrichment import ENRICHMENT_KEY
+from .migrations import apply_migrations
+from .projections import (
+    DEFAULT_LIST_FIELDS, decode_cursor, encode_cursor, row_to_dict, select_columns
+)
+from .search import setup_search_index, search_note_ids
+from .similarity import SimilarityIndex
+from .stats import repair_stats
+from .versioning import record_version, reconstruct, prune_versions
+from .view_counter import ViewCounter
 from ..logger import logger
+from ..server_runtime.sqlite_pool import get_connection_factory
 
 
 class NotesDatabase:
@@ -24,18 +43,41 @@ class NotesDatabase:
         if db_path is None:
             db_path = os.path.join(os.path.dirname(__file__), '../../data/notes.db')
             
-        # Dizin yoksa oluştur
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        
-        self.engine = create_engine(f'sqlite:///{db_path}', echo=False)
+        # WAL + pragmalar; yazmalar tek yazar bağlantısında, okumalar havuzda
+        self.connection_factory = get_connection_factory(db_path)
+        self.engine, self.read_engine = self.connection_factory.create_engines()
         Base.metadata.create_all(self.engine)
+        apply_migrations(self.engine)
+        self.fts_enabled = setup_search_index(self.engine)
         
         self.SessionLocal = sessionmaker(bind=self.engine)
+        self.ReadSessionLocal = sessionmaker(bind=self.read_engine)
+
+        # Görüntülenmeler tamponlanır ve toplu yazılır (okumalar yazma kilidi almaz)
+        self.view_counter = ViewCounter(self.engine)
+
+        # Değişiklik günlüğü: yazmalarla aynı transaction'da, commit sonrası abonelere
+        self.change_feed = ChangeFeed(self.engine, self.read_engine)
+        self.change_feed.attach(self.SessionLocal)
+        # Günlük sınırsız büyümesin: açılışta ve akış thread'inde saatlik budanır
+        self.change_feed.prune_expired(force=True)
+
+        # İlgili notlar için vektör indeksi; akışa ilk sorguda bağlanır
+        self.similarity = SimilarityIndex(os.path.splitext(os.path.abspath(db_path))[0] + '.vectors',
+                                          self._load_similarity_rows)
         logger.info(f"Notes database initialized at: {db_path}")
     
     def get_session(self) -> Session:
-        """Get database session"""
+        """Get database session (yazma)"""
         return self.SessionLocal()
+
+    def get_read_session(self) -> Session:
+        """Salt okunur session (okuyucu havuzundan)"""
+        return self.ReadSessionLocal()
+
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """Bağlantı havuzu sayaçları"""
+        return self.connection_factory.get_stats()
     
     # Workspace Operations
     def create_workspace(self, name: str, owner_id: str, description: str = "") -> NoteWorkspace:
@@ -54,12 +96,12 @@ class NotesDatabase:
     
     def get_workspace(self, workspace_id: str) -> Optional[NoteWorkspace]:
         """Workspace getir"""
-        with self.get_session() as session:
+        with self.get_read_session() as session:
             return session.query(NoteWorkspace).filter_by(id=workspace_id).first()
     
     def list_workspaces(self, owner_id: str) -> List[NoteWorkspace]:
         """Kullanıcının workspace'lerini listele"""
-        with self.get_session() as session:
+        with self.get_read_session() as session:
             return session.query(NoteWorkspace).filter_by(owner_id=owner_id).all()
     
     def get_user_workspaces(self, user_id: str) -> List[NoteWorkspace]:
@@ -68,11 +110,11 @@ class NotesDatabase:
     
     def get_notes(self, workspace_id: str, limit: int = 50) -> List[Note]:
         """Workspace'deki notları getir"""
-        with self.get_session() as session:
-            from sqlalchemy.orm import joinedload
+        with self.get_read_session() as session:
+            from sqlalchemy.orm import selectinload
             
             return session.query(Note)\
-                .options(joinedload(Note.tags))\
+                .options(selectinload(Note.tags))\
                 .filter_by(workspace_id=workspace_id, is_archived=False)\
                 .order_by(desc(Note.updated_at))\
                 .limit(limit)\
@@ -99,20 +141,30 @@ class NotesDatabase:
             
             # Etiketleri ekle
             if tags:
-                for tag_name in tags:
-                    tag = self._get_or_create_tag(session, tag_name, workspace_id)
-                    note.tags.append(tag)
+                tag_map = self._get_or_create_tags(session, tags, workspace_id)
+                note.tags.extend(tag_map.values())
             
             session.add(note)
+            session.flush()
+            session.add(NoteTextFeatures(note_id=note.id, **compute_features(title, content)))
+            record_changes(session, [change(
+                OP_CREATE, note.id, workspace_id, note.version, created_by,
+                parent_id=parent_id, tags=list(dict.fromkeys(tags or []))
+            )])
             session.commit()
             session.refresh(note)
             logger.info(f"Note created: {note.id} by {created_by}")
             return note
     
     def get_note(self, note_id: str, increment_view: bool = True) -> Optional[Note]:
-        """Not getir"""
-        with self.get_session() as session:
+        """Not getir
+
+        Görüntülenme sayacı view_counter'da tamponlanır; dönen notun
+        view_count'u henüz yazılmamış görüntülenmeleri de içerir.
+        """
+        with self.get_read_session() as session:
             from sqlalchemy.orm import joinedload
+            from sqlalchemy.orm.attributes import set_committed_value
             
             # Eager load tags to prevent DetachedInstanceError
             note = session.query(Note)\
@@ -120,10 +172,12 @@ class NotesDatabase:
                 .filter_by(id=note_id)\
                 .first()
             
-            if note and increment_view:
-                note.view_count += 1
-                session.commit()
-                session.refresh(note)
+            if note:
+                if increment_view:
+                    self.view_counter.record(note_id)
+                pending = self.view_counter.pending(note_id)
+                if pending:
+                    set_committed_value(note, 'view_count', (note.view_count or 0) + pending)
                 
             return note
     
@@ -146,6 +200,8 @@ class NotesDatabase:
             
             if not note:
                 return None
+
+            previous = (note.version, note.title, note.content, note.last_edited_by, note.updated_at)
             
             # Güncellemeleri uygula
             if title is not None:
@@ -159,6 +215,14 @@ class NotesDatabase:
             note.last_edited_by = edited_by
             note.updated_at = datetime.now()
             note.version += 1
+
+            # Başlık/içerik değiştiyse önceki sürümü ters delta olarak sakla
+            old_version, old_title, old_content, old_editor, old_updated = previous
+            if old_title != note.title or old_content != note.content:
+                record_version(session, note.id, old_version, old_title, old_content,
+                               note.content, old_editor, old_updated)
+                # Anahtar kelimeler kayıtta bir kez hesaplanır
+                session.merge(NoteTextFeatures(note_id=note.id, **compute_features(note.title, note.content)))
             
             # AI metadata güncelle
             if ai_metadata:
@@ -169,9 +233,15 @@ class NotesDatabase:
             # Etiketleri güncelle
             if tags is not None:
                 note.tags.clear()
-                for tag_name in tags:
-                    tag = self._get_or_create_tag(session, tag_name, note.workspace_id)
-                    note.tags.append(tag)
+                tag_map = self._get_or_create_tags(session, tags, note.workspace_id)
+                note.tags.extend(tag_map.values())
+
+            fields = [name for name, value in (('title', title), ('content', content), ('tags', tags),
+                                               ('ai_metadata', ai_metadata), ('is_pinned', is_pinned))
+                      if value is not None]
+            record_changes(session, [change(
+                OP_UPDATE, note.id, note.workspace_id, note.version, edited_by, fields=fields
+            )])
             
             session.commit()
             session.refresh(note)
@@ -187,11 +257,60 @@ class NotesDatabase:
                 return False
             
             # Alt notları da sil
+            session.execute(delete(NoteVersion).where(NoteVersion.note_id == note_id))
+            session.execute(delete(NoteTextFeatures).where(NoteTextFeatures.note_id == note_id))
+            record_changes(session, [change(OP_DELETE, note.id, note.workspace_id, note.version)])
             session.delete(note)
             session.commit()
             logger.info(f"Note deleted: {note_id}")
             return True
     
+    # Version History
+    def get_note_versions(self, note_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Notun geçmiş kayıtları (yeniden eskiye, içeriksiz)"""
+        with self.get_read_session() as session:
+            rows = session.execute(
+                select(NoteVersion)
+                .where(NoteVersion.note_id == note_id)
+                .order_by(desc(NoteVersion.version))
+                .limit(limit)
+            ).scalars().all()
+            return [row.to_dict() for row in rows]
+
+    def get_note_version(self, note_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Notun belirli bir sürümünü yeniden oluştur"""
+        with self.get_read_session() as session:
+            note = session.get(Note, note_id)
+            if not note:
+                return None
+            result = reconstruct(session, note_id, version, note.version, note.title, note.content)
+            if result is not None:
+                result['note_id'] = note_id
+                result['current_version'] = note.version
+            return result
+
+    def prune_note_versions(self, note_id: Optional[str] = None,
+                            keep_versions: Optional[int] = None,
+                            max_age_days: Optional[int] = None) -> int:
+        """Saklama politikasını uygula; silinen kayıt sayısını döndür"""
+        with self.get_session() as session:
+            removed = prune_versions(session, note_id, keep_versions=keep_versions,
+                                     max_age_days=max_age_days)
+            session.commit()
+            if removed:
+                logger.info(f"Pruned {removed} note versions")
+            return removed
+
+    # Change Feed
+    def get_changes(self, after_seq: int = 0, workspace_id: Optional[str] = None,
+                    limit: int = 500) -> Dict[str, Any]:
+        """after_seq'ten sonraki değişiklikler ve devam için son seq"""
+        changes = self.change_feed.read(after_seq, workspace_id, limit)
+        return {
+            'changes': changes,
+            'last_seq': changes[-1]['seq'] if changes else after_seq
+        }
+
     def archive_note(self, note_id: str) -> bool:
         """Notu arşivle"""
         with self.get_session() as session:
@@ -201,9 +320,191 @@ class NotesDatabase:
                 return False
                 
             note.is_archived = True
+            record_changes(session, [change(OP_ARCHIVE, note.id, note.workspace_id, note.version)])
             session.commit()
             return True
     
+    # Bulk Operations
+    def bulk_create_notes(self, workspace_id: str, created_by: str, notes: List[Dict[str, Any]]) -> List[str]:
+        """Çok sayıda notu tek transaction'da oluştur; oluşturulan id'leri sırayla döndür
+
+        Her öğe: title (zorunlu), content, parent_id, tags, content_type.
+        """
+        if not notes:
+            return []
+        for index, data in enumerate(notes):
+            if not data.get('title'):
+                raise ValueError(f"{index}. not için başlık gerekli")
+
+        now = datetime.now()
+        rows, tag_links = [], []
+        for data in notes:
+            note_id = str(uuid.uuid4())
+            rows.append({
+                'id': note_id,
+                'title': data['title'],
+                'content': data.get('content', ''),
+                'content_type': data.get('content_type', 'markdown'),
+                'parent_id': data.get('parent_id'),
+                'workspace_id': workspace_id,
+                'created_by': created_by,
+                'last_edited_by': created_by,
+                'created_at': now,
+                'updated_at': now,
+                'ai_metadata': {}
+            })
+            tag_links.extend((note_id, name) for name in dict.fromkeys(data.get('tags') or []))
+
+        with self.get_session() as session:
+            session.execute(insert(Note), rows)
+            session.execute(insert(NoteTextFeatures), [
+                {'note_id': row['id'], 'updated_at': now, **compute_features(row['title'], row['content'])}
+                for row in rows
+            ])
+
+            if tag_links:
+                tag_map = self._get_or_create_tags(session, [name for _, name in tag_links], workspace_id)
+                session.flush()
+                session.execute(note_tags.insert(), [
+                    {'note_id': note_id, 'tag_id': tag_map[name].id} for note_id, name in tag_links
+                ])
+
+            record_changes(session, [
+                change(OP_CREATE, row['id'], workspace_id, 1, created_by,
+                       parent_id=row['parent_id'], tags=list(dict.fromkeys(data.get('tags') or [])),
+                       source='bulk')
+                for row, data in zip(rows, notes)
+            ])
+            session.commit()
+
+        logger.info(f"Bulk created {len(rows)} notes in {workspace_id} by {created_by}")
+        return [row['id'] for row in rows]
+
+    def bulk_tag_notes(self,
+                       assignments: Dict[str, List[str]],
+                       edited_by: str,
+                       replace: bool = False,
+                       ai_metadata: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+        """Notlara toplu etiket ekle (replace=True ise mevcut etiketleri değiştir)
+
+        ai_metadata verilirse not başına mevcut metadata ile birleştirilir.
+        Güncellenen not sayısını döndürür.
+        """
+        if not assignments:
+            return 0
+
+        with self.get_session() as session:
+            notes = session.query(Note.id, Note.workspace_id, Note.ai_metadata)\
+                .filter(Note.id.in_(list(assignments)))\
+                .all()
+            if not notes:
+                return 0
+            note_ids = [note.id for note in notes]
+
+            if replace:
+                session.execute(delete(note_tags).where(note_tags.c.note_id.in_(note_ids)))
+                existing = set()
+            else:
+                existing = set(session.query(note_tags.c.note_id, note_tags.c.tag_id)
+                               .filter(note_tags.c.note_id.in_(note_ids)).all())
+
+            by_workspace: Dict[str, List[str]] = {}
+            for note in notes:
+                by_workspace.setdefault(note.workspace_id, []).extend(assignments[note.id])
+            tag_maps = {
+                workspace_id: self._get_or_create_tags(session, names, workspace_id)
+                for workspace_id, names in by_workspace.items()
+            }
+            session.flush()
+
+            links = []
+            for note in notes:
+                tag_map = tag_maps[note.workspace_id]
+                for name in dict.fromkeys(assignments[note.id]):
+                    pair = (note.id, tag_map[name].id)
+                    if pair not in existing:
+                        existing.add(pair)
+                        links.append({'note_id': pair[0], 'tag_id': pair[1]})
+            if links:
+                session.execute(note_tags.insert(), links)
+
+            now = datetime.now()
+            metadata_rows = [
+                {'id': note.id, 'ai_metadata': {**(note.ai_metadata or {}), **ai_metadata[note.id]}}
+                for note in notes if ai_metadata and ai_metadata.get(note.id)
+            ]
+            if metadata_rows:
+                session.execute(update(Note), metadata_rows)
+            session.execute(
+                update(Note)
+                .where(Note.id.in_(note_ids))
+                .values(last_edited_by=edited_by, updated_at=now, version=Note.version + 1)
+            )
+
+            versions = dict(session.query(Note.id, Note.version).filter(Note.id.in_(note_ids)).all())
+            order = {note_id: index for index, note_id in enumerate(assignments)}
+            record_changes(session, [
+                change(OP_TAG, note.id, note.workspace_id, versions.get(note.id), edited_by,
+                       tags=list(dict.fromkeys(assignments[note.id])), replace=replace)
+                for note in sorted(notes, key=lambda note: order[note.id])
+            ])
+            session.commit()
+
+        logger.info(f"Bulk tagged {len(note_ids)} notes by {edited_by}")
+        return len(note_ids)
+
+    def bulk_archive_notes(self, note_ids: List[str], archived: bool = True) -> int:
+        """Notları tek UPDATE ile arşivle / arşivden çıkar"""
+        if not note_ids:
+            return 0
+        with self.get_session() as session:
+            targets = session.query(Note.id, Note.workspace_id, Note.version)\
+                .filter(Note.id.in_(list(note_ids))).all()
+            result = session.execute(
+                update(Note).where(Note.id.in_(list(note_ids))).values(is_archived=archived)
+            )
+            op = OP_ARCHIVE if archived else OP_UNARCHIVE
+            order = {note_id: index for index, note_id in enumerate(note_ids)}
+            record_changes(session, [
+                change(op, note.id, note.workspace_id, note.version)
+                for note in sorted(targets, key=lambda note: order[note.id])
+            ])
+            session.commit()
+            return result.rowcount
+
+    def bulk_move_notes(self, note_ids: List[str], parent_id: Optional[str], edited_by: str) -> int:
+        """Notları tek UPDATE ile yeni bir üst notun altına taşı (None: köke)
+
+        Bir not kendi altına veya kendi alt notlarından birinin altına taşınamaz.
+        """
+        if not note_ids:
+            return 0
+
+        with self.get_session() as session:
+            if parent_id is not None:
+                # parent_id taşınan notlardan birinin alt ağacındaysa döngü oluşur
+                subtree = select(Note.id).where(Note.id.in_(list(note_ids))).cte('moved', recursive=True)
+                subtree = subtree.union(select(Note.id).join(subtree, Note.parent_id == subtree.c.id))
+                cycle = session.query(subtree.c.id).filter(subtree.c.id == parent_id).first()
+                if cycle:
+                    raise ValueError("Not kendi alt ağacına taşınamaz")
+
+            result = session.execute(
+                update(Note)
+                .where(Note.id.in_(list(note_ids)))
+                .values(parent_id=parent_id, last_edited_by=edited_by,
+                        updated_at=datetime.now(), version=Note.version + 1)
+            )
+            moved = session.query(Note.id, Note.workspace_id, Note.version)\
+                .filter(Note.id.in_(list(note_ids))).all()
+            order = {note_id: index for index, note_id in enumerate(note_ids)}
+            record_changes(session, [
+                change(OP_MOVE, note.id, note.workspace_id, note.version, edited_by, parent_id=parent_id)
+                for note in sorted(moved, key=lambda note: order[note.id])
+            ])
+            session.commit()
+            return result.rowcount
+    
     # Search Operations
     def search_notes(self,
                     workspace_id: str,
@@ -214,19 +515,27 @@ class NotesDatabase:
                     include_archived: bool = False,
                     limit: int = 50,
                     offset: int = 0) -> List[Note]:
-        """Notları ara"""
-        with self.get_session() as session:
-            from sqlalchemy.orm import joinedload
+        """Notları ara
+
+        Metin sorgusu varsa FTS5 indeksi kullanılır: sonuçlar BM25 sırasıyla
+        döner ve her notun search_match alanında vurgulu başlık/snippet bulunur.
+        """
+        if query and self.fts_enabled:
+            return self._full_text_search(workspace_id, query, tags, parent_id, created_by,
+                                          include_archived, limit, offset)
+
+        with self.get_read_session() as session:
+            from sqlalchemy.orm import selectinload
             
             q = session.query(Note)\
-                .options(joinedload(Note.tags))\
+                .options(selectinload(Note.tags))\
                 .filter_by(workspace_id=workspace_id)
             
             # Arşivlenmiş notları dahil etme
             if not include_archived:
                 q = q.filter_by(is_archived=False)
             
-            # Metin araması
+            # Metin araması (FTS5 yoksa)
             if query:
                 search_filter = or_(
                     Note.title.ilike(f'%{query}%'),
@@ -251,14 +560,306 @@ class NotesDatabase:
             q = q.offset(offset).limit(limit)
             
             return q.all()
+
+    def _full_text_search(self, workspace_id: str, query: str, tags, parent_id, created_by,
+                          include_archived: bool, limit: int, offset: int) -> List[Note]:
+        """FTS5 araması; notları BM25 sırasıyla döndür"""
+        with self.get_read_session() as session:
+            from sqlalchemy.orm import selectinload
+
+            matches = search_note_ids(
+                session.connection(), workspace_id, query,
+                tags=tags, parent_id=parent_id, created_by=created_by,
+                include_archived=include_archived, limit=limit, offset=offset
+            )
+            if not matches:
+                return []
+
+            notes = session.query(Note)\
+                .options(selectinload(Note.tags))\
+                .filter(Note.id.in_([match['id'] for match in matches]))\
+                .all()
+            by_id = {note.id: note for note in notes}
+
+            result = []
+            for match in matches:
+                note = by_id.get(match['id'])
+                if note is not None:
+                    note.search_match = {
+                        'rank': match['rank'],
+                        'title': match['title'],
+                        'snippet': match['snippet']
+                    }
+                    result.append(note)
+            return result
     
+    def list_note_summaries(self,
+                            workspace_id: str,
+                            fields: Tuple[str, ...] = DEFAULT_LIST_FIELDS,
+                            cursor: Optional[str] = None,
+                            limit: int = 50,
+                            query: Optional[str] = None,
+                            pinned: Optional[bool] = None,
+                            include_archived: bool = False) -> Dict[str, Any]:
+        """Liste görünümü için hafif not projeksiyonları (keyset pagination)
+
+        Sadece istenen sütunlar çekilir; etiketler sayfa için tek sorguda
+        yüklenir. Metin sorgusu yoksa sıra (updated_at, id) azalan, varsa
+        BM25 sırasıdır. Dönen next_cursor bir sonraki sayfayı getirir.
+        Bozuk cursor için ValueError fırlatır.
+        """
+        if query and self.fts_enabled:
+            return self._search_summaries(workspace_id, query, fields, cursor, limit, include_archived)
+
+        with self.get_read_session() as session:
+            q = session.query(*select_columns(fields, required=('id', 'updated_at')))\
+                .filter(Note.workspace_id == workspace_id)
+
+            if not include_archived:
+                q = q.filter(Note.is_archived.is_(False))
+            if pinned is not None:
+                q = q.filter(Note.is_pinned.is_(pinned))
+            if query:
+                q = q.filter(or_(Note.title.ilike(f'%{query}%'), Note.content.ilike(f'%{query}%')))
+
+            if cursor:
+                updated_at, note_id = decode_cursor(cursor, 2)
+                q = q.filter(tuple_(Note.updated_at, Note.id) < (datetime.fromisoformat(updated_at), note_id))
+
+            rows = q.order_by(desc(Note.updated_at), desc(Note.id)).limit(limit + 1).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+            notes = [row_to_dict(row, fields) for row in rows]
+            if 'tags' in fields:
+                self._attach_tag_names(session, notes)
+
+            next_cursor = None
+            if has_more:
+                last = rows[-1]._mapping
+                next_cursor = encode_cursor(last['updated_at'], last['id'])
+
+            return {'notes': notes, 'next_cursor': next_cursor}
+
+    def _search_summaries(self, workspace_id: str, query: str, fields: Tuple[str, ...],
+                          cursor: Optional[str], limit: int, include_archived: bool) -> Dict[str, Any]:
+        """FTS araması sonucu projeksiyonları; imleç (rank, id)"""
+        after = tuple(decode_cursor(cursor, 2)) if cursor else None
+
+        with self.get_read_session() as session:
+            matches = search_note_ids(
+                session.connection(), workspace_id, query,
+                include_archived=include_archived, limit=limit + 1, after=after
+            )
+            has_more = len(matches) > limit
+            matches = matches[:limit]
+            if not matches:
+                return {'notes': [], 'next_cursor': None}
+
+            rows = session.query(*select_columns(fields, required=('id',)))\
+                .filter(Note.id.in_([match['id'] for match in matches]))\
+                .all()
+            by_id = {row._mapping['id']: row_to_dict(row, fields) for row in rows}
+
+            notes = []
+            for match in matches:
+                note = by_id.get(match['id'])
+                if note is not None:
+                    note['search'] = {'rank': match['rank'], 'title': match['title'], 'snippet': match['snippet']}
+                    notes.append(note)
+
+            if 'tags' in fields:
+                self._attach_tag_names(session, notes)
+
+            next_cursor = encode_cursor(matches[-1]['rank'], matches[-1]['id']) if has_more else None
+            return {'notes': notes, 'next_cursor': next_cursor}
+
+    @staticmethod
+    def _attach_tag_names(session: Session, notes: List[Dict[str, Any]]):
+        """Sayfadaki notların etiket adlarını tek sorguda ekle"""
+        tags_by_note: Dict[str, List[str]] = {note['id']: [] for note in notes}
+        if not tags_by_note:
+            return
+        rows = session.query(note_tags.c.note_id, NoteTag.name)\
+            .join(NoteTag, NoteTag.id == note_tags.c.tag_id)\
+            .filter(note_tags.c.note_id.in_(list(tags_by_note)))\
+            .all()
+        for note_id, tag_name in rows:
+            tags_by_note[note_id].append(tag_name)
+        for note in notes:
+            note['tags'] = tags_by_note[note['id']]
+
+    # Related Notes
+    def _load_similarity_rows(self, workspace_id: Optional[str] = None,
+                              note_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Vektör indeksi için arşivlenmemiş notların metinleri"""
+        with self.get_read_session() as session:
+            q = session.query(Note.id, Note.workspace_id, Note.title, Note.content,
+                              NoteTextFeatures.content_hash, NoteTextFeatures.term_freq)\
+                .outerjoin(NoteTextFeatures, NoteTextFeatures.note_id == Note.id)\
+                .filter(Note.is_archived.is_(False))
+            if workspace_id is not None:
+                q = q.filter(Note.workspace_id == workspace_id)
+            if note_ids is not None:
+                q = q.filter(Note.id.in_(list(note_ids)))
+
+            rows = []
+            for row in q.all():
+                features = cached_features(row.title, row.content, row.content_hash, None, row.term_freq)
+                rows.append({'id': row.id, 'workspace_id': row.workspace_id, 'title': row.title,
+                             'content': row.content, 'term_freq': features['term_freq']})
+            self._attach_tag_names(session, rows)
+            return rows
+
+    def find_related_notes(self, note_id: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Workspace'in tamamında en benzer notlar (vektör indeksi, LLM çağrısı yok)"""
+        with self.get_read_session() as session:
+            workspace_id = session.query(Note.workspace_id).filter(Note.id == note_id).scalar()
+        if workspace_id is None:
+            return []
+
+        self.similarity.attach(self.change_feed)
+        # Sadece indeks güncellenir (diğer aboneler istek thread'inde çalışmaz):
+        # yeni kaydedilen not hemen bulunur
+        self.similarity.catch_up()
+        matches = self.similarity.related(workspace_id, note_id, limit)
+        if not matches:
+            return []
+
+        with self.get_read_session() as session:
+            rows = session.query(*select_columns(DEFAULT_LIST_FIELDS, required=('content',)),
+                                 NoteTextFeatures.content_hash, NoteTextFeatures.keywords)\
+                .outerjoin(NoteTextFeatures, NoteTextFeatures.note_id == Note.id)\
+                .filter(Note.id.in_([note_id] + [match_id for match_id, _ in matches]))\
+                .all()
+            notes = {row.id: row_to_dict(row, DEFAULT_LIST_FIELDS) for row in rows}
+            # Kayıtta hesaplanmış anahtar kelimeler (hash uyuşmazsa yeniden hesaplanır)
+            note_keywords = {
+                row.id: cached_features(row.title, row.content, row.content_hash, row.keywords, None)['keywords']
+                for row in rows
+            }
+            self._attach_tag_names(session, list(notes.values()))
+
+        main_keywords = note_keywords.get(note_id, [])
+        related = []
+        for match_id, score in matches:
+            if match_id not in notes:
+                continue
+            candidate = set(note_keywords[match_id])
+            related.append({
+                'note': notes[match_id],
+                'similarity_score': round(score, 4),
+                'common_keywords': [word for word in main_keywords if word in candidate]
+            })
+        return related
+
+    def cluster_notes(self, workspace_id: str, max_clusters: Optional[int] = None,
+                      representatives: int = 8, keywords: int = 10) -> List[Dict[str, Any]]:
+        """Workspace notlarını vektör indeksinde kümele (LLM çağrısı yok)
+
+        Her küme tüm üye id'lerini, merkeze en yakın notların kısa
+        projeksiyonlarını (representatives) ve üyelerin kayıtta hesaplanmış
+        anahtar kelimelerinden en sık geçenleri içerir. Anahtar kelimeler
+        içerik hash'i doğrulanmadan kullanılır (küme etiketi içindir); sadece
+        özellik satırı olmayan notların metni okunur.
+        """
+        self.similarity.attach(self.change_feed)
+        self.similarity.catch_up()
+        options = {'max_clusters': max_clusters} if max_clusters else {}
+        clusters = self.similarity.clusters(workspace_id, **options)
+        if not clusters:
+            return []
+
+        with self.get_read_session() as session:
+            # Not metinleri yüklenmez: kümeler sadece saklanan anahtar kelimeleri kullanır
+            note_keywords = dict(
+                session.query(Note.id, NoteTextFeatures.keywords)
+                .join(NoteTextFeatures, NoteTextFeatures.note_id == Note.id)
+                .filter(Note.workspace_id == workspace_id, Note.is_archived.is_(False))
+                .all()
+            )
+            # Özellik satırı olmayan notlar (ör. ORM dışı eklenen) için hesaplanır
+            missing = session.query(Note.id, Note.title, Note.content)\
+                .outerjoin(NoteTextFeatures, NoteTextFeatures.note_id == Note.id)\
+                .filter(Note.workspace_id == workspace_id, Note.is_archived.is_(False),
+                        NoteTextFeatures.note_id.is_(None))\
+                .all()
+            for row in missing:
+                note_keywords[row.id] = compute_features(row.title, row.content)['keywords']
+            representative_ids = [note_id for cluster in clusters for note_id in cluster['note_ids'][:representatives]]
+            summaries = session.query(*select_columns(DEFAULT_LIST_FIELDS))\
+                .filter(Note.id.in_(representative_ids))\
+                .all()
+            by_id = {row.id: row_to_dict(row, DEFAULT_LIST_FIELDS) for row in summaries}
+            self._attach_tag_names(session, list(by_id.values()))
+
+        for cluster in clusters:
+            counts: Dict[str, int] = {}
+            for note_id in cluster['note_ids']:
+                for word in note_keywords.get(note_id, []):
+                    counts[word] = counts.get(word, 0) + 1
+            cluster['keywords'] = sorted(counts, key=lambda word: (-counts[word], word))[:keywords]
+            cluster['representatives'] = [by_id[note_id] for note_id in cluster['note_ids'][:representatives]
+                                          if note_id in by_id]
+        return clusters
+
+    # AI Enrichment
+
+    def get_enrichment_sources(self, note_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Zenginleştirme kuyruğu için notların metni, etiketleri ve ai_metadata'sı"""
+        if not note_ids:
+            return {}
+        with self.get_read_session() as session:
+            rows = session.query(Note.id, Note.workspace_id, Note.title, Note.content, Note.ai_metadata)\
+                .filter(Note.id.in_(list(note_ids)))\
+                .all()
+            sources = [{
+                'id': row.id,
+                'workspace_id': row.workspace_id,
+                'title': row.title,
+                'content': row.content,
+                'ai_metadata': row.ai_metadata or {},
+                'content_hash': content_hash(row.title, row.content)
+            } for row in rows]
+            self._attach_tag_names(session, sources)
+        return {source['id']: source for source in sources}
+
+    def save_ai_enrichment(self, results: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """AI sonuçlarını ai_metadata['enrichment'] altına tek transaction'da yaz
+
+        results: {note_id: {'content_hash': ..., 'entries': {görev: sonuç}}}. İçeriği
+        o arada değişmiş notların sonuçları atılır. Sürüm ve düzenleme zamanı
+        değişmez. Yazılan notların {note_id: workspace_id} sözlüğünü döndürür.
+        """
+        if not results:
+            return {}
+        with self.get_session() as session:
+            notes = session.query(Note).filter(Note.id.in_(list(results))).all()
+            written = {}
+            for note in notes:
+                result = results[note.id]
+                if content_hash(note.title, note.content) != result['content_hash']:
+                    continue
+                metadata = dict(note.ai_metadata or {})
+                metadata[ENRICHMENT_KEY] = {**(metadata.get(ENRICHMENT_KEY) or {}), **result['entries']}
+                note.ai_metadata = metadata
+                written[note.id] = note.workspace_id
+
+            record_changes(session, [
+                change(OP_UPDATE, note.id, note.workspace_id, note.version, 'ai',
+                       fields=['ai_metadata'], enrichment=sorted(results[note.id]['entries']))
+                for note in notes if note.id in written
+            ])
+            session.commit()
+        return written
+
     def get_recent_notes(self, workspace_id: str, limit: int = 10) -> List[Note]:
         """Son güncellenen notları getir"""
-        with self.get_session() as session:
-            from sqlalchemy.orm import joinedload
+        with self.get_read_session() as session:
+            from sqlalchemy.orm import selectinload
             
             return session.query(Note)\
-                .options(joinedload(Note.tags))\
+                .options(selectinload(Note.tags))\
                 .filter_by(workspace_id=workspace_id, is_archived=False)\
                 .order_by(desc(Note.updated_at))\
                 .limit(limit)\
@@ -266,65 +867,130 @@ class NotesDatabase:
     
     def get_pinned_notes(self, workspace_id: str) -> List[Note]:
         """Sabitlenmiş notları getir"""
-        with self.get_session() as session:
-            from sqlalchemy.orm import joinedload
+        with self.get_read_session() as session:
+            from sqlalchemy.orm import selectinload
             
             return session.query(Note)\
-                .options(joinedload(Note.tags))\
+                .options(selectinload(Note.tags))\
                 .filter_by(workspace_id=workspace_id, is_pinned=True, is_archived=False)\
                 .order_by(desc(Note.updated_at))\
                 .all()
     
     def get_note_tree(self, workspace_id: str, parent_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Not hiyerarşisini getir"""
-        with self.get_session() as session:
+        """Not hiyerarşisini getir
+
+        Alt ağaç tek bir WITH RECURSIVE sorgusuyla, etiketler tek bir toplu
+        sorguyla yüklenir; ağaç bellekte parent_id'ye göre kurulur. Arşivlenmiş
+        notlar ve altındaki notlar ağaca girmez.
+        """
+        with self.get_read_session() as session:
+            from sqlalchemy.orm.attributes import set_committed_value
+
+            root_filter = Note.parent_id.is_(None) if parent_id is None else Note.parent_id == parent_id
+            subtree = select(Note.id)\
+                .where(Note.workspace_id == workspace_id, root_filter, Note.is_archived.is_(False))\
+                .cte('subtree', recursive=True)
+            # UNION (UNION ALL değil): bozuk parent döngülerinde sonsuz özyinelemeyi önler
+            subtree = subtree.union(
+                select(Note.id)
+                .join(subtree, Note.parent_id == subtree.c.id)
+                .where(Note.is_archived.is_(False))
+            )
+
             notes = session.query(Note)\
-                .filter_by(workspace_id=workspace_id, parent_id=parent_id, is_archived=False)\
+                .filter(Note.id.in_(select(subtree.c.id)))\
                 .order_by(Note.title)\
                 .all()
-            
-            result = []
+
+            tags_by_note: Dict[str, List[NoteTag]] = {}
+            tag_rows = session.query(note_tags.c.note_id, NoteTag)\
+                .join(NoteTag, NoteTag.id == note_tags.c.tag_id)\
+                .filter(note_tags.c.note_id.in_(select(subtree.c.id)))\
+                .all()
+            for note_id, tag in tag_rows:
+                tags_by_note.setdefault(note_id, []).append(tag)
+
+            nodes: Dict[Optional[str], List[Dict[str, Any]]] = {}
             for note in notes:
+                # Toplu yüklenen etiketleri ilişkiye yerleştir (lazy load tetiklenmez)
+                set_committed_value(note, 'tags', tags_by_note.get(note.id, []))
                 note_dict = note.to_dict()
-                # Alt notları recursive olarak getir
-                note_dict['children'] = self.get_note_tree(workspace_id, note.id)
-                result.append(note_dict)
-                
-            return result
+                note_dict['children'] = nodes.setdefault(note.id, [])
+                nodes.setdefault(note.parent_id, []).append(note_dict)
+
+            return nodes.get(parent_id, [])
+    
+    def iter_note_pages(self, workspace_id: str, fields: Tuple[str, ...],
+                        batch_size: int = 200) -> Iterator[List[Dict[str, Any]]]:
+        """Workspace'in tüm notları (arşivliler dahil), id sırasıyla sayfa sayfa
+
+        Her sayfa kendi kısa okuma session'ında yüklenir (id üzerinde keyset);
+        uzun süren export'lar bağlantı tutmaz ve bellek sayfa boyutuyla sınırlı
+        kalır. Sıra güncellemelerden etkilenmez, not atlanmaz.
+        """
+        fields = tuple(dict.fromkeys(('id',) + tuple(fields)))
+        after = None
+        while True:
+            with self.get_read_session() as session:
+                q = session.query(*select_columns(fields)).filter(Note.workspace_id == workspace_id)
+                if after is not None:
+                    q = q.filter(Note.id > after)
+                rows = q.order_by(Note.id).limit(batch_size).all()
+                notes = [row_to_dict(row, fields) for row in rows]
+                if 'tags' in fields:
+                    self._attach_tag_names(session, notes)
+            if notes:
+                yield notes
+            if len(notes) < batch_size:
+                return
+            after = notes[-1]['id']
     
     # Tag Operations
     def _get_or_create_tag(self, session: Session, tag_name: str, workspace_id: str) -> NoteTag:
         """Etiketi getir veya oluştur"""
-        tag = session.query(NoteTag).filter_by(name=tag_name, workspace_id=workspace_id).first()
-        
-        if not tag:
-            tag = NoteTag(name=tag_name, workspace_id=workspace_id)
-            session.add(tag)
-            
-        return tag
+        return self._get_or_create_tags(session, [tag_name], workspace_id)[tag_name]
+
+    def _get_or_create_tags(self, session: Session, tag_names: List[str], workspace_id: str) -> Dict[str, NoteTag]:
+        """Etiketleri toplu getir veya oluştur (tek SELECT ... IN, eksikler için insert)"""
+        names = list(dict.fromkeys(name for name in tag_names if name))
+        if not names:
+            return {}
+
+        # Aynı session'da henüz flush edilmemiş etiketler
+        tags = {
+            tag.name: tag for tag in session.new
+            if isinstance(tag, NoteTag) and tag.workspace_id == workspace_id and tag.name in names
+        }
+        missing = [name for name in names if name not in tags]
+        if missing:
+            for tag in session.query(NoteTag).filter(NoteTag.workspace_id == workspace_id,
+                                                     NoteTag.name.in_(missing)):
+                tags[tag.name] = tag
+
+        for name in names:
+            if name not in tags:
+                tag = NoteTag(name=name, workspace_id=workspace_id)
+                session.add(tag)
+                tags[name] = tag
+
+        return tags
     
     def list_tags(self, workspace_id: str) -> List[NoteTag]:
         """Workspace'deki tüm etiketleri listele"""
-        with self.get_session() as session:
+        with self.get_read_session() as session:
             return session.query(NoteTag)\
                 .filter_by(workspace_id=workspace_id)\
                 .order_by(NoteTag.name)\
                 .all()
     
     def get_popular_tags(self, workspace_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """En çok kullanılan etiketleri getir"""
-        with self.get_session() as session:
-            result = session.query(
-                NoteTag.name,
-                NoteTag.color,
-                func.count(Note.id).label('note_count')
-            )\
-            .join(NoteTag.notes)\
-            .filter(NoteTag.workspace_id == workspace_id)\
-            .group_by(NoteTag.name, NoteTag.color)\
-            .order_by(desc('note_count'))\
-            .limit(limit)\
-            .all()
+        """En çok kullanılan etiketleri getir (hazır note_count, indeks üzerinden)"""
+        with self.get_read_session() as session:
+            result = session.query(NoteTag.name, NoteTag.color, NoteTag.note_count)\
+                .filter(NoteTag.workspace_id == workspace_id, NoteTag.note_count > 0)\
+                .order_by(desc(NoteTag.note_count))\
+                .limit(limit)\
+                .all()
             
             return [
                 {
@@ -337,23 +1003,13 @@ class NotesDatabase:
     
     # Statistics
     def get_workspace_stats(self, workspace_id: str) -> Dict[str, Any]:
-        """Workspace istatistiklerini getir"""
-        with self.get_session() as session:
-            total_notes = session.query(func.count(Note.id))\
-                .filter_by(workspace_id=workspace_id)\
-                .scalar()
-                
-            archived_notes = session.query(func.count(Note.id))\
-                .filter_by(workspace_id=workspace_id, is_archived=True)\
-                .scalar()
-                
-            total_tags = session.query(func.count(NoteTag.id))\
-                .filter_by(workspace_id=workspace_id)\
-                .scalar()
-                
-            return {
-                'total_notes': total_notes,
-                'active_notes': total_notes - archived_notes,
-                'archived_notes': archived_notes,
-                'total_tags': total_tags
-            } 
\ No newline at end of file
+        """Workspace istatistiklerini getir (workspace_stats satırı)"""
+        with self.get_read_session() as session:
+            stats = session.get(WorkspaceStats, workspace_id)
+            if stats is None:
+                return {'total_notes': 0, 'active_notes': 0, 'archived_notes': 0, 'total_tags': 0}
+            return stats.to_dict()
+
+    def repair_stats(self, workspace_id: Optional[str] = None) -> Dict[str, int]:
+        """Hazır sayaçları kaynak tablolarla karşılaştır ve düzelt"""
+        return repair_stats(self.engine, workspace_id)
@@ -0,0 +1,322 @@
+"""
+Note AI Enrichment Queue
+========================
+
+Notlar için arka plan AI zenginleştirme kuyruğu (analiz, etiket önerisi, özet).
+
+- Not kayıtları (create / başlık-içerik update) değişiklik akışından
+  sadece analiz işi ekler; etiket önerisi ve özet yalnızca açık API
+  isteğiyle kuyruğa girer. İstek thread'i AI sağlayıcısını hiç beklemez
+- Toplu oluşturma / içe aktarma (source='bulk') kuyruğa iş eklemez
+- Debounce: aynı not için art arda gelen işler birleştirilir ve son
+  kayıttan debounce saniye sonra çalışır
+- Tekilleştirme: sonuçlar ai_metadata['enrichment'] altında içerik hash'i
+  ile saklanır; hash değişmediyse görev atlanır. Sonuç yazılırken içerik
+  değişmişse sonuç atılır (yeni kayıt zaten kuyrukta)
+- Zamanı gelen işler model (rolün atandığı adapter) başına gruplanır; her
+  grup model başına dakikalık istek limitiyle eşzamanlı çalışır ve
+  sonuçları tek transaction'da yazılır
+- Sonuçlar Socket.IO'da notes:<workspace_id> odasına 'note_enrichment'
+  olayıyla yayınlanır
+
+Thread ilk işte başlatılır ve prefork worker'larda her process'te yeniden
+oluşturulur. Değişiklik akışı tüm process'lerin kayıtlarını herkese
+dağıttığından her process sadece kendi commit ettiği değişiklikleri
+(data['pid']) kuyruğa alır; aynı kayıt worker sayısı kadar işlenmez.
+"""
+
+import asyncio
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .change_feed import OP_CREATE, OP_UPDATE
+from .keywords import content_hash
+from ..logger import logger
+
+TASK_ANALYSIS = 'analysis'
+TASK_TAGS = 'tags'
+TASK_SUMMARY = 'summary'
+TASKS = (TASK_ANALYSIS, TASK_TAGS, TASK_SUMMARY)
+
+DEFAULT_ROLE = 'general'
+DEFAULT_SUMMARY_LENGTH = 'medium'
+DEFAULT_DEBOUNCE = 5.0
+DEFAULT_RATE_PER_MINUTE = 30
+DEFAULT_BATCH_SIZE = 8
+
+# ai_metadata altında sonuçların tutulduğu anahtar
+ENRICHMENT_KEY = 'enrichment'
+
+# Bu alanlar değişince not yeniden zenginleştirilir
+_CONTENT_FIELDS = frozenset({'title', 'content'})
+
+
+def cached_result(ai_metadata: Optional[Dict[str, Any]], task: str, title: str, content: str,
+                  length: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Notun güncel içeriği için saklanmış sonuç (yoksa ya da eskiyse None)"""
+    entry = ((ai_metadata or {}).get(ENRICHMENT_KEY) or {}).get(task)
+    if not entry or entry.get('content_hash') != content_hash(title, content):
+        return None
+    if task == TASK_SUMMARY and entry.get('length') != (length or DEFAULT_SUMMARY_LENGTH):
+        return None
+    return entry
+
+
+class _RateLimiter:
+    """Model başına istek aralığı: eşzamanlı istekler sıradaki boş dilimi alır"""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class EnrichmentQueue:
+    """Debounce'lu, tekilleştirilmiş ve hız sınırlı AI zenginleştirme kuyruğu"""
+
+    def __init__(self, db, ai_integration, socketio=None,
+                 tasks: Iterable[str] = TASKS,
+                 role_id: str = DEFAULT_ROLE,
+                 debounce: float = DEFAULT_DEBOUNCE,
+                 rate_per_minute: int = DEFAULT_RATE_PER_MINUTE,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.ai_integration = ai_integration
+        self.socketio = socketio
+        self.tasks = tuple(tasks)
+        self.role_id = role_id
+        self.debounce = debounce
+        self.rate_per_minute = rate_per_minute
+        self.batch_size = batch_size
+
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._running: Dict[str, str] = {}
+        self._limiters: Dict[str, _RateLimiter] = {}
+        self._lock = threading.Lock()
+        self._process_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stopped = False
+        self._subscription = None
+
+        self.stats = {'enqueued': 0, 'skipped': 0, 'requests': 0, 'saved': 0, 'stale': 0, 'errors': 0}
+        atexit.register(self.stop)
+
+    def attach(self, change_feed):
+        """Kayıt olaylarına abone ol: create ve başlık/içerik güncellemeleri analiz işi ekler"""
+        if self._subscription is None:
+            self._subscription = change_feed.subscribe(self._on_change, ops=(OP_CREATE, OP_UPDATE))
+
+    def _on_change(self, item: Dict[str, Any]):
+        data = item['data']
+        # Başka worker'ın kaydı o worker'da işlenir; toplu içe aktarma AI kotasını tüketmez
+        if data.get('pid') != os.getpid() or data.get('source') == 'bulk':
+            return
+        if item['op'] == OP_UPDATE and not _CONTENT_FIELDS & set(data.get('fields') or ()):
+            return
+        self.enqueue(item['note_id'], [TASK_ANALYSIS])
+
+    # Kuyruk
+
+    def enqueue(self, note_id: str, tasks: Optional[Iterable[str]] = None,
+                length: Optional[str] = None, immediate: bool = False):
+        """Notu kuyruğa ekle; bekleyen iş varsa görevler birleştirilir ve süre yenilenir"""
+        tasks = set(tasks or self.tasks)
+        due = time.monotonic() + (0.0 if immediate else self.debounce)
+        with self._lock:
+            job = self._pending.get(note_id)
+            if job is None:
+                job = self._pending[note_id] = {'note_id': note_id, 'tasks': set(), 'length': None, 'due': due}
+            job['tasks'] |= tasks
+            job['length'] = length or job['length']
+            # Açık istek bekleyen işi öne çeker; kayıtlar ise erteler (debounce)
+            job['due'] = min(job['due'], due) if immediate else max(job['due'], due)
+            self.stats['enqueued'] += 1
+        self._ensure_thread()
+        self._wake.set()
+
+    def is_pending(self, note_id: str) -> bool:
+        with self._lock:
+            return note_id in self._pending or note_id in self._running
+
+    def _take_due(self, force: bool = False) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            due = [job for job in self._pending.values() if force or job['due'] <= now]
+            for job in due:
+                del self._pending[job['note_id']]
+            return due
+
+    def _seconds_until_due(self) -> Optional[float]:
+        with self._lock:
+            if not self._pending:
+                return None
+            return max(0.0, min(job['due'] for job in self._pending.values()) - time.monotonic())
+
+    # İşleme
+
+    def _model_for(self, role_id: str) -> str:
+        """Rolün atandığı adapter; batch ve hız limiti bu anahtarla tutulur"""
+        adapter = getattr(self.ai_integration, 'ai_adapter', None)
+        return (getattr(adapter, 'role_assignments', None) or {}).get(role_id, role_id)
+
+    def process_pending(self, force: bool = False) -> int:
+        """Zamanı gelen (force ile tüm) işleri çalıştır; kaydedilen not sayısını döndür"""
+        with self._process_lock:
+            jobs = self._take_due(force)
+            if not jobs:
+                return 0
+            loop = asyncio.new_event_loop()
+            try:
+                return loop.run_until_complete(self._process(jobs))
+            finally:
+                loop.close()
+
+    async def _process(self, jobs: List[Dict[str, Any]]) -> int:
+        sources = self.db.get_enrichment_sources([job['note_id'] for job in jobs])
+        model = self._model_for(self.role_id)
+        limiter = self._limiters.setdefault(model, _RateLimiter(self.rate_per_minute))
+
+        work = []
+        for job in jobs:
+            source = sources.get(job['note_id'])
+            if source is None:
+                continue
+            tasks = [task for task in TASKS if task in job['tasks'] and cached_result(
+                source['ai_metadata'], task, source['title'], source['content'], job['length']) is None]
+            if not tasks:
+                with self._lock:
+                    self.stats['skipped'] += 1
+                continue
+            work.append((source, tasks, job['length'] or DEFAULT_SUMMARY_LENGTH))
+
+        saved = 0
+        for start in range(0, len(work), self.batch_size):
+            saved += await self._run_batch(work[start:start + self.batch_size], model, limiter)
+        return saved
+
+    async def _run_batch(self, batch, model: str, limiter: _RateLimiter) -> int:
+        with self._lock:
+            for source, _, _ in batch:
+                self._running[source['id']] = source['content_hash']
+        try:
+            outcomes = await asyncio.gather(*[
+                self._enrich(source, tasks, length, model, limiter) for source, tasks, length in batch
+            ])
+            results = {source['id']: {'content_hash': source['content_hash'], 'entries': entries}
+                       for (source, _, _), entries in zip(batch, outcomes) if entries}
+            written = self.db.save_ai_enrichment(results) if results else {}
+        finally:
+            with self._lock:
+                for source, _, _ in batch:
+                    self._running.pop(source['id'], None)
+
+        with self._lock:
+            self.stats['saved'] += len(written)
+            self.stats['stale'] += len(results) - len(written)
+        for note_id, workspace_id in written.items():
+            self._emit(note_id, workspace_id, results[note_id]['entries'])
+        return len(written)
+
+    async def _enrich(self, source: Dict[str, Any], tasks: List[str], length: str,
+                      model: str, limiter: _RateLimiter) -> Dict[str, Any]:
+        entries = {}
+        for task in tasks:
+            await limiter.acquire()
+            with self._lock:
+                self.stats['requests'] += 1
+            try:
+                value = await self._call(task, source, length)
+            except Exception as e:
+                with self._lock:
+                    self.stats['errors'] += 1
+                logger.error(f"AI enrichment '{task}' failed for note {source['id']}: {e}")
+                continue
+            entry = {
+                'value': value,
+                'content_hash': source['content_hash'],
+                'model': model,
+                'updated_at': datetime.now().isoformat()
+            }
+            if task == TASK_SUMMARY:
+                entry['length'] = length
+            entries[task] = entry
+        return entries
+
+    async def _call(self, task: str, source: Dict[str, Any], length: str):
+        ai = self.ai_integration
+        if task == TASK_ANALYSIS:
+            result = await ai.analyze_note(source['content'])
+            if not result.get('success'):
+                raise RuntimeError(result.get('error') or 'AI yanıt vermedi')
+            return result['analysis']
+        if task == TASK_TAGS:
+            return await ai.suggest_tags(source['title'], source['content'], source['tags'])
+        return await ai.summarize_content(source['title'], source['content'], length)
+
+    def _emit(self, note_id: str, workspace_id: str, entries: Dict[str, Any]):
+        if self.socketio is None:
+            return
+        try:
+            self.socketio.emit('note_enrichment', {
+                'note_id': note_id,
+                'workspace_id': workspace_id,
+                'enrichment': entries
+            }, room=f"notes:{workspace_id}")
+        except Exception as e:
+            logger.error(f"AI enrichment push failed for note {note_id}: {e}")
+
+    # Arka plan thread'i
+
+    def _ensure_thread(self):
+        if self._stopped:
+            return
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        if self._pid not in (None, pid):
+            # Fork sonrası: ebeveynin kuyruğu ve thread'i bu process'e ait değil
+            self._lock = threading.Lock()
+            self._process_lock = threading.Lock()
+            self._wake = threading.Event()
+            self._pending = {}
+            self._running = {}
+            self._limiters = {}
+            self._thread = None
+            self._pid = pid
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="notes-ai-enrichment", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self._seconds_until_due())
+            self._wake.clear()
+            if self._stopped:
+                break
+            try:
+                self.process_pending()
+            except Exception as e:
+                logger.error(f"AI enrichment batch failed: {e}")
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'pending': len(self._pending), 'running': len(self._running)}
@@ -0,0 +1,149 @@
+"""
+Notes Export Cache
+==================
+
+Tek not export'ları için diskte, boyutu sınırlı LRU önbelleği.
+
+- Anahtar (note_id, version, format): not değişmediyse aynı dosya yeniden
+  render edilmeden verilir
+- Dosyalar <ab>/<note_id>.v<version>.<ext> olarak saklanır; yeni sürüm
+  yazılınca notun eski sürüm dosyaları silinir
+- LRU: isabette dosyanın mtime'ı güncellenir; toplam boyut max_bytes'ı
+  aşınca en eski erişilenler düşük su seviyesine kadar silinir. Sıra
+  bilgisi dosya sisteminde olduğundan prefork worker'lar aynı önbelleği paylaşır
+- Sürüm artırmayan değişiklikler (arşiv, AI metadata, silme) değişiklik
+  akışından gelir ve notun tüm dosyalarını geçersiz kılar
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..logger import logger
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Tahliye toplam boyutu bu orana indirir (her yazmada tekrar taranmasın)
+LOW_WATER_RATIO = 0.8
+
+FORMAT_EXTENSIONS = {'markdown': 'md', 'html': 'html', 'json': 'json', 'txt': 'txt'}
+
+
+class ExportCache:
+    """(note_id, version, format) anahtarlı, boyutu sınırlı disk önbelleği"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+        self._subscription = None
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def path(self, note_id: str, version: int, format_type: str) -> Path:
+        return self.cache_dir / note_id[:2] / f"{note_id}.v{version}.{FORMAT_EXTENSIONS[format_type]}"
+
+    def attach(self, change_feed):
+        """Not olaylarında notun önbelleğini temizle (sürüm artırmayan değişiklikler dahil)"""
+        if self._subscription is None:
+            self._subscription = change_feed.subscribe(lambda item: self.invalidate(item['note_id']))
+
+    def get_or_render(self, note_id: str, version: int, format_type: str, render: Callable[[], str]) -> Path:
+        """Önbellekteki export dosyası; yoksa render() ile üretip yaz"""
+        target = self.path(note_id, version, format_type)
+        try:
+            # LRU sırası: son erişim zamanı
+            os.utime(target)
+            with self._lock:
+                self.stats['hits'] += 1
+            return target
+        except FileNotFoundError:
+            pass
+
+        data = render().encode('utf-8')
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp.write_bytes(data)
+        os.replace(temp, target)
+
+        # Eski sürümler bir daha istenmez
+        freed = sum(self._unlink(path) for path in self._note_files(note_id)
+                    if not path.name.startswith(f"{note_id}.v{version}."))
+        with self._lock:
+            self.stats['misses'] += 1
+            if self._size is not None:
+                self._size += len(data) - freed
+            over = self._current_size() > self.max_bytes
+        if over:
+            self.evict()
+        return target
+
+    def invalidate(self, note_id: str) -> int:
+        """Notun tüm sürüm/format dosyalarını sil; silinen dosya sayısını döndür"""
+        paths = self._note_files(note_id)
+        freed = sum(self._unlink(path) for path in paths)
+        with self._lock:
+            if paths:
+                self.stats['invalidations'] += 1
+            if self._size is not None:
+                self._size -= freed
+        return len(paths)
+
+    def evict(self) -> int:
+        """En eski erişilen dosyaları düşük su seviyesine kadar sil"""
+        entries = sorted(self._scan(), key=lambda entry: entry[0])
+
+        total = sum(size for _, size, _ in entries)
+        limit = int(self.max_bytes * LOW_WATER_RATIO)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            self._unlink(path)
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._size = total
+            self.stats['evictions'] += evicted
+        if evicted:
+            logger.info(f"Export cache evicted {evicted} files ({total} bytes kept)")
+        return evicted
+
+    def _scan(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, boyut, yol) listesi; yazılmakta olan geçici dosyalar hariç"""
+        entries = []
+        for path in self.cache_dir.glob('*/*'):
+            if path.name.endswith('.tmp'):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _current_size(self) -> int:
+        # Diğer process'lerin yazdıkları da sayılsın diye ilk seferde ve tahliyede taranır
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._scan())
+        return self._size
+
+    def _note_files(self, note_id: str) -> List[Path]:
+        return [path for path in (self.cache_dir / note_id[:2]).glob(f"{note_id}.v*")
+                if not path.name.endswith('.tmp')]
+
+    @staticmethod
+    def _unlink(path: Path) -> int:
+        """Dosyayı sil; boşalan bayt sayısını döndür"""
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'size': self._current_size(), 'max_bytes': self.max_bytes}
@@ -3,26 +3,59 @@ Notes Export Manager
 ===================
 
 Notları farklı formatlarda export etme sistemi.
+
+Workspace export'u (stream_workspace) tek bir zip / tar.zst arşivini
+üretildikçe verir: notlar id sırasıyla sayfa sayfa okunur, ekler blob'dan
+parça parça kopyalanır; bellek kullanımı workspace boyutundan bağımsızdır.
 """
 
 import os
 import re
-from typing import List, Dict, Any, Optional
+import time
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional
 from datetime import datetime
 import json
 import tempfile
 from pathlib import Path
 
+from .archive_stream import ArchiveWriter
+from .export_cache import FORMAT_EXTENSIONS, ExportCache
 from ..logger import logger
 
+# Workspace export'unda bir seferde okunan not sayısı
+EXPORT_BATCH_SIZE = 200
+
+# Ek kopyalama parça boyutu
+EXPORT_CHUNK_SIZE = 256 * 1024
+
+# İlerleme olayları arası en kısa süre (saniye); faz değişimleri hemen bildirilir
+PROGRESS_INTERVAL = 0.5
+
+# Arşive yazılan not alanları (önizleme hariç tüm sütunlar + etiket adları)
+EXPORT_NOTE_FIELDS = (
+    'id', 'title', 'content', 'content_type', 'parent_id', 'workspace_id', 'created_by',
+    'created_at', 'updated_at', 'last_edited_by', 'is_public', 'is_pinned', 'is_archived',
+    'version', 'ai_metadata', 'view_count', 'edit_count', 'tags'
+)
+
+# İndeks (tree.jsonl) için hafif projeksiyon
+EXPORT_INDEX_FIELDS = ('id', 'title', 'parent_id', 'is_archived', 'tags')
+
+# Zaten sıkıştırılmış içerik arşivde tekrar sıkıştırılmaz
+STORED_CATEGORIES = {'images'}
+
 
 class NotesExportManager:
     """Not export işlemlerini yöneten sınıf"""
     
-    def __init__(self, output_dir: Optional[str] = None):
+    def __init__(self, output_dir: Optional[str] = None, cache_max_bytes: Optional[int] = None):
         self.output_dir = output_dir or tempfile.gettempdir()
         Path(self.output_dir).mkdir(parents=True, exist_ok=True)
         
+        # Tek not export'ları (note_id, version, format) ile önbelleklenir
+        cache_options = {'max_bytes': cache_max_bytes} if cache_max_bytes else {}
+        self.cache = ExportCache(os.path.join(self.output_dir, 'notes-export-cache'), **cache_options)
+        
         # Export formatları (temel formatlar - kütüphane bağımlılığı yok)
         self.available_formats = {
             'markdown': True,
@@ -34,25 +67,26 @@ class NotesExportManager:
         logger.info(f"Export Manager initialized. Available formats: {list(self.available_formats.keys())}")
     
     def export_single_note(self, note: Dict[str, Any], format_type: str = 'markdown') -> str:
-        """Tek bir notu export et"""
+        """Tek bir notu export et
+        
+        Kayıtlı notlar (id ve version içeren) önbellekten verilir; not
+        değişmediyse yeniden render edilmez.
+        """
         if format_type not in self.available_formats:
             raise ValueError(f"Desteklenmeyen format: {format_type}")
         
+        if note.get('id') and note.get('version') is not None:
+            return str(self.cache.get_or_render(
+                note['id'], note['version'], format_type, lambda: self.render_note(note, format_type)
+            ))
+        
         # Dosya adı oluştur
         safe_title = self._safe_filename(note.get('title', 'Untitled'))
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{safe_title}_{timestamp}.{format_type}"
         filepath = os.path.join(self.output_dir, filename)
         
-        # Format'a göre export
-        if format_type == 'markdown':
-            content = self._export_to_markdown(note)
-        elif format_type == 'html':
-            content = self._export_to_html(note)
-        elif format_type == 'json':
-            content = self._export_to_json(note)
-        elif format_type == 'txt':
-            content = self._export_to_txt(note)
+        content = self.render_note(note, format_type)
         
         # Dosyaya yaz
         with open(filepath, 'w', encoding='utf-8') as f:
@@ -61,6 +95,18 @@ class NotesExportManager:
         logger.info(f"Note exported: {filepath}")
         return filepath
     
+    def render_note(self, note: Dict[str, Any], format_type: str = 'markdown') -> str:
+        """Notu verilen formatta metne çevir"""
+        if format_type == 'markdown':
+            return self._export_to_markdown(note)
+        elif format_type == 'html':
+            return self._export_to_html(note)
+        elif format_type == 'json':
+            return self._export_to_json(note)
+        elif format_type == 'txt':
+            return self._export_to_txt(note)
+        raise ValueError(f"Desteklenmeyen format: {format_type}")
+    
     def export_multiple_notes(self, notes: List[Dict[str, Any]], 
                             format_type: str = 'markdown') -> List[str]:
         """Birden fazla notu export et"""
@@ -117,6 +163,159 @@ class NotesExportManager:
         logger.info(f"Workspace summary exported: {filepath}")
         return filepath
     
+    def stream_workspace(self, workspace: Dict[str, Any], db, file_manager=None,
+                         archive_format: str = 'zip', format_type: str = 'markdown',
+                         progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[bytes]:
+        """Workspace'i (notlar, etiketler, ağaç, ekler) tek arşiv olarak akıt
+        
+        Arşiv düzeni (kök: <workspace adı>/):
+          workspace.json                 workspace kaydı ve export bilgisi
+          tags.json                      etiketler
+          notes/<başlık>_<id>.<ext>      not, istenen formatta
+          notes/<başlık>_<id>.json       not kaydı (tüm alanlar; içe aktarma için)
+          attachments/<file_id>/<ad>     ekler
+          tree/part-<n>.jsonl            satır başına not: id, parent_id, başlık, yollar, ekler
+        
+        Blob'u diskte bulunmayan ek atlanır, loglanır ve ağaçta
+        'missing_attachments' altında listelenir. Format hataları ilk bayttan önce ValueError olarak fırlatılır. Akış
+        sırasında oluşan hata loglanır, 'error' olayı bildirilir ve arşiv
+        kapatılmadan kesilir (istemci eksik arşivi ayırt edebilir).
+        """
+        if format_type not in self.available_formats:
+            raise ValueError(f"Desteklenmeyen format: {format_type}")
+        archive = ArchiveWriter(archive_format)
+        stream = self._stream_workspace(archive, workspace, db, file_manager, format_type, progress)
+        # Boş parça chunked yanıtı erken sonlandırmasın
+        return (chunk for chunk in stream if chunk)
+    
+    def _stream_workspace(self, archive: ArchiveWriter, workspace: Dict[str, Any], db, file_manager,
+                          format_type: str, progress) -> Iterator[bytes]:
+        root = self._safe_filename(workspace.get('name') or workspace['id'])
+        state = {
+            'phase': 'notes',
+            'notes_done': 0,
+            'notes_total': db.get_workspace_stats(workspace['id']).get('total_notes', 0),
+            'files_done': 0,
+            'bytes_written': 0
+        }
+        last_report = [0.0]
+        
+        def report(phase: Optional[str] = None):
+            now = time.monotonic()
+            if phase is None and now - last_report[0] < PROGRESS_INTERVAL:
+                return
+            state['phase'] = phase or state['phase']
+            state['bytes_written'] = archive.bytes_written
+            last_report[0] = now
+            if progress is not None:
+                try:
+                    progress(dict(state))
+                except Exception as e:
+                    logger.error(f"Export progress callback failed: {e}")
+        
+        try:
+            report('notes')
+            archive.add_bytes(f"{root}/workspace.json", self._json_bytes({
+                'export_date': datetime.now().isoformat(),
+                'export_version': '2.0',
+                'format': format_type,
+                'workspace': workspace
+            }))
+            archive.add_bytes(f"{root}/tags.json", self._json_bytes([
+                {'id': tag.id, 'name': tag.name, 'color': tag.color, 'note_count': tag.note_count}
+                for tag in db.list_tags(workspace['id'])
+            ]))
+            yield archive.drain()
+            
+            # Aynı ek birden fazla nota bağlı olabilir; arşive bir kez yazılır (sadece id'ler tutulur)
+            exported_files = set()
+            missing_files = set()
+            pages = db.iter_note_pages(workspace['id'], EXPORT_NOTE_FIELDS, EXPORT_BATCH_SIZE)
+            for page_number, page in enumerate(pages, 1):
+                files_by_note = file_manager.get_files_for_notes([note['id'] for note in page]) \
+                    if file_manager is not None else {}
+                index_lines = []
+                for note in page:
+                    base = f"notes/{self._note_basename(note)}"
+                    archive.add_bytes(f"{root}/{base}.{FORMAT_EXTENSIONS[format_type]}",
+                                      self.render_note(note, format_type).encode('utf-8'))
+                    archive.add_bytes(f"{root}/{base}.json", self._json_bytes(note))
+                    yield archive.drain()
+                    
+                    attachments = []
+                    missing = []
+                    for file_info in files_by_note.get(note['id'], []):
+                        path = f"attachments/{file_info['id']}/{self._safe_filename(file_info['original_filename'])}"
+                        if file_info['id'] not in exported_files and file_info['id'] not in missing_files:
+                            if (yield from self._stream_attachment(archive, f"{root}/{path}", file_info, file_manager)):
+                                exported_files.add(file_info['id'])
+                                state['files_done'] += 1
+                                report()
+                            else:
+                                missing_files.add(file_info['id'])
+                        (missing if file_info['id'] in missing_files else attachments).append(path)
+                    
+                    index_lines.append(json.dumps({
+                        'id': note['id'],
+                        'parent_id': note['parent_id'],
+                        'title': note['title'],
+                        'is_archived': note['is_archived'],
+                        'tags': note['tags'],
+                        'path': f"{base}.{FORMAT_EXTENSIONS[format_type]}",
+                        'record': f"{base}.json",
+                        'attachments': attachments,
+                        'missing_attachments': missing
+                    }, ensure_ascii=False))
+                    state['notes_done'] += 1
+                    report()
+                
+                archive.add_bytes(f"{root}/tree/part-{page_number:04d}.jsonl",
+                                  ('\n'.join(index_lines) + '\n').encode('utf-8'))
+                yield archive.drain()
+            
+            yield archive.close()
+            report('done')
+        except Exception as e:
+            logger.error(f"Workspace export failed for {workspace['id']}: {e}")
+            state['error'] = str(e)
+            report('error')
+            raise
+    
+    def _stream_attachment(self, archive: ArchiveWriter, name: str, file_info: Dict[str, Any],
+                           file_manager) -> Generator[bytes, None, bool]:
+        """Eki blob'dan parça parça arşive kopyala
+        
+        Blob okunamıyorsa arşive girdi açılmadan False döner.
+        """
+        try:
+            path = file_manager.resolve_path(file_info)
+            size = path.stat().st_size
+            source = open(path, 'rb')
+        except OSError as e:
+            logger.warning(f"Attachment blob missing, skipped in export: {file_info['id']}: {e}")
+            return False
+        with source, \
+                archive.open(name, size, compress=file_info.get('category') not in STORED_CATEGORIES) as entry:
+            while True:
+                chunk = source.read(EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                entry.write(chunk)
+                yield archive.drain()
+        return True
+    
+    def export_filename(self, note: Dict[str, Any], format_type: str) -> str:
+        """İndirme için dosya adı"""
+        return f"{self._safe_filename(note.get('title') or 'Untitled')}.{FORMAT_EXTENSIONS[format_type]}"
+    
+    def _note_basename(self, note: Dict[str, Any]) -> str:
+        """Arşivde benzersiz not dosya adı (başlık + id)"""
+        return f"{self._safe_filename(note.get('title') or 'Untitled')[:60]}_{note['id']}"
+    
+    @staticmethod
+    def _json_bytes(data: Any) -> bytes:
+        return json.dumps(data, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+    
     def _export_to_markdown(self, note: Dict[str, Any]) -> str:
         """Markdown formatına export"""
         lines = []
@@ -0,0 +1,281 @@
+"""
+Notes File Catalog
+==================
+
+Not eklerinin metadata'sı için SQLite kataloğu (eski file_metadata.json yerine).
+
+- Her dosya note_files tablosunda tek satırdır; yükleme ve silme tek satırlık
+  transaction'dır, tüm metadata yeniden yazılmaz
+- Dosya-not bağlantıları note_file_links tablosundadır; not başına dosya
+  listesi note_id indeksinden okunur
+- hash ve category indekslidir
+- İçerik blob'ları (SHA-256 ile adreslenen fiziksel dosyalar) blobs tablosunda
+  referans sayısıyla tutulur; aynı içerik bir kez saklanır, son referans
+  silinince blob da silinir
+- Bağlantılar paylaşılan SQLite factory'den gelir (WAL, okuyucu havuzu + tek yazar)
+
+import_json() eski file_metadata.json içeriğini bir kez aktarır; JSON dosyası
+yedek olarak yerinde bırakılır ve bir daha okunmaz.
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ..logger import logger
+from ..server_runtime.sqlite_pool import get_connection_factory
+
+SCHEMA_VERSION = 1
+
+_COLUMNS = ('id', 'original_filename', 'stored_filename', 'file_path', 'thumbnail_path',
+            'file_size', 'mime_type', 'category', 'hash', 'upload_date')
+
+_SELECT = f"""SELECT {', '.join('f.' + column for column in _COLUMNS)},
+        (SELECT json_group_array(l.note_id) FROM note_file_links l WHERE l.file_id = f.id) AS notes
+    FROM note_files f"""
+
+
+class FileCatalog:
+    """Ek metadata'sı için indeksli katalog"""
+
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = get_connection_factory(self.db_path)
+        self.init_database()
+
+    def init_database(self):
+        with self.db.writer() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS note_files (
+                    id TEXT PRIMARY KEY,
+                    original_filename TEXT NOT NULL,
+                    stored_filename TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    thumbnail_path TEXT,
+                    file_size INTEGER NOT NULL DEFAULT 0,
+                    mime_type TEXT,
+                    category TEXT NOT NULL,
+                    hash TEXT,
+                    upload_date TEXT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS note_file_links (
+                    file_id TEXT NOT NULL REFERENCES note_files (id),
+                    note_id TEXT NOT NULL,
+                    PRIMARY KEY (file_id, note_id)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    refcount INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_note_file_links_note ON note_file_links (note_id, file_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_note_files_hash ON note_files (hash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_note_files_category ON note_files (category)")
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        metadata = dict(zip(_COLUMNS, row))
+        metadata['notes'] = json.loads(row[len(_COLUMNS)] or '[]')
+        return metadata
+
+    # Yazma
+
+    def add(self, metadata: Dict[str, Any]):
+        """Dosyayı ve not bağlantılarını tek transaction'da ekle"""
+        with self.db.writer() as conn:
+            self._insert(conn, [metadata])
+
+    @staticmethod
+    def _insert(conn, items: List[Dict[str, Any]]):
+        conn.executemany(
+            f"INSERT OR REPLACE INTO note_files ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+            [tuple(item.get(column) for column in _COLUMNS) for item in items]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO note_file_links (file_id, note_id) VALUES (?, ?)",
+            [(item['id'], note_id) for item in items for note_id in item.get('notes') or []]
+        )
+
+    def add_blob_reference(self, metadata: Dict[str, Any], store_blob: Callable[[], None]) -> bool:
+        """Dosya kaydını ekle ve blob referansını artır; blob yeni oluştuysa True
+
+        Blob henüz yoksa store_blob() aynı yazma transaction'ı içinde çağrılır
+        (geçici dosyayı blob yoluna taşır); eşzamanlı aynı içerikli yüklemelerden
+        sadece biri blob'u yazar.
+        """
+        with self.db.writer() as conn:
+            exists = conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (metadata['hash'],)).fetchone()
+            if exists:
+                conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?", (metadata['hash'],))
+            else:
+                store_blob()
+                conn.execute(
+                    "INSERT INTO blobs (hash, path, size, refcount, created_at) VALUES (?, ?, ?, 1, ?)",
+                    (metadata['hash'], metadata['file_path'], metadata['file_size'], datetime.now().isoformat())
+                )
+            self._insert(conn, [metadata])
+        return not exists
+
+    def release(self, file_id: str, note_id: Optional[str] = None,
+                remove_files: Optional[Callable[[Dict[str, Any], List[str]], None]] = None
+                ) -> Optional[Dict[str, Any]]:
+        """Dosya referansını bırak
+
+        note_id verilir ve dosya başka notlara da bağlıysa sadece o bağlantı
+        silinir. Aksi halde kayıt silinir ve blob referansı azalır. Silinmesi
+        gereken fiziksel yollar 'delete_paths' içinde döner; remove_files
+        verilirse (metadata, yollar) ile aynı yazma transaction'ı içinde
+        çağrılır. Dosyalar commit'ten önce silindiğinden eşzamanlı aynı
+        içerikli yükleme (add_blob_reference) yeni yazdığı blob'u kaybetmez.
+        """
+        with self.db.writer() as conn:
+            row = conn.execute(f"{_SELECT} WHERE f.id = ?", (file_id,)).fetchone()
+            if row is None:
+                return None
+            metadata = self._row_to_dict(row)
+
+            if note_id is not None and set(metadata['notes']) - {note_id}:
+                conn.execute("DELETE FROM note_file_links WHERE file_id = ? AND note_id = ?", (file_id, note_id))
+                return {'file': metadata, 'unlinked_only': True, 'delete_paths': []}
+
+            conn.execute("DELETE FROM note_file_links WHERE file_id = ?", (file_id,))
+            conn.execute("DELETE FROM note_files WHERE id = ?", (file_id,))
+            blob = conn.execute("SELECT path, refcount FROM blobs WHERE hash = ?", (metadata['hash'],)).fetchone()
+            if blob is None:
+                # Blob kataloğundan önceki (UUID adlı) dosya
+                delete_paths = [metadata['file_path'], metadata['thumbnail_path']]
+            elif blob[1] <= 1:
+                conn.execute("DELETE FROM blobs WHERE hash = ?", (metadata['hash'],))
+                delete_paths = [blob[0], metadata['thumbnail_path']]
+            else:
+                conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE hash = ?", (metadata['hash'],))
+                delete_paths = []
+            delete_paths = [path for path in delete_paths if path]
+            if delete_paths and remove_files is not None:
+                remove_files(metadata, delete_paths)
+        return {'file': metadata, 'unlinked_only': False, 'delete_paths': delete_paths}
+
+    def link(self, file_id: str, note_id: str):
+        with self.db.writer() as conn:
+            conn.execute("INSERT OR IGNORE INTO note_file_links (file_id, note_id) VALUES (?, ?)", (file_id, note_id))
+
+    # Okuma
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        with self.db.reader() as conn:
+            row = conn.execute(f"{_SELECT} WHERE f.id = ?", (file_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list_for_note(self, note_id: str) -> List[Dict[str, Any]]:
+        """Notun dosyaları (yükleme sırasıyla; note_id indeksi)"""
+        with self.db.reader() as conn:
+            rows = conn.execute(
+                f"{_SELECT} JOIN note_file_links n ON n.file_id = f.id WHERE n.note_id = ? "
+                f"ORDER BY f.upload_date, f.id", (note_id,)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def list_for_notes(self, note_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Birden fazla notun dosyaları tek sorguda ({note_id: [dosya, ...]})"""
+        files: Dict[str, List[Dict[str, Any]]] = {note_id: [] for note_id in note_ids}
+        if not files:
+            return files
+        placeholders = ', '.join('?' * len(files))
+        with self.db.reader() as conn:
+            rows = conn.execute(
+                f"{_SELECT} WHERE f.id IN (SELECT file_id FROM note_file_links WHERE note_id IN ({placeholders})) "
+                f"ORDER BY f.upload_date, f.id", list(files)
+            ).fetchall()
+        for row in rows:
+            metadata = self._row_to_dict(row)
+            for note_id in metadata['notes']:
+                if note_id in files:
+                    files[note_id].append(metadata)
+        return files
+
+    def find_note_file(self, note_id: str, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Notta aynı içerikli dosya varsa onu döndür"""
+        with self.db.reader() as conn:
+            row = conn.execute(
+                f"{_SELECT} JOIN note_file_links n ON n.file_id = f.id WHERE n.note_id = ? AND f.hash = ? LIMIT 1",
+                (note_id, file_hash)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def find_by_hash(self, file_hash: str) -> List[Dict[str, Any]]:
+        with self.db.reader() as conn:
+            rows = conn.execute(f"{_SELECT} WHERE f.hash = ?", (file_hash,)).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.db.reader() as conn:
+            total_files, total_size = conn.execute(
+                "SELECT count(*), coalesce(sum(file_size), 0) FROM note_files"
+            ).fetchone()
+            categories = dict(conn.execute(
+                "SELECT category, count(*) FROM note_files GROUP BY category"
+            ).fetchall())
+            # Diskteki gerçek boyut: blob'lar bir kez, eski dosyalar kendi boyutuyla
+            blob_count, blob_size = conn.execute("SELECT count(*), coalesce(sum(size), 0) FROM blobs").fetchone()
+            legacy_size = conn.execute(
+                "SELECT coalesce(sum(file_size), 0) FROM note_files "
+                "WHERE NOT EXISTS (SELECT 1 FROM blobs b WHERE b.hash = note_files.hash)"
+            ).fetchone()[0]
+        return {
+            'total_files': total_files,
+            'total_size': total_size,
+            'stored_size': blob_size + legacy_size,
+            'blobs': blob_count,
+            'categories': categories
+        }
+
+    # Eski JSON metadata
+
+    def import_json(self, metadata_file: Path) -> int:
+        """file_metadata.json içeriğini bir kez aktar; aktarılan kayıt sayısını döndür"""
+        metadata_file = Path(metadata_file)
+        with self.db.writer() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return 0
+            items = []
+            if metadata_file.exists():
+                try:
+                    with open(metadata_file, 'r', encoding='utf-8') as f:
+                        items = list(_normalize(json.load(f).values()))
+                except Exception as e:
+                    # Okunamayan dosya sonraki açılışta tekrar denensin diye sürüm işaretlenmez
+                    logger.error(f"File metadata import failed: {e}")
+                    return 0
+            self._insert(conn, items)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        if items:
+            logger.info(f"Imported {len(items)} attachment records from {metadata_file}")
+        return len(items)
+
+
+def _normalize(items: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    """Eski kayıtlar: Windows yol ayırıcıları ve eksik alanlar"""
+    for item in items:
+        if not item.get('id'):
+            continue
+        item = dict(item)
+        if item.get('file_path'):
+            item['file_path'] = item['file_path'].replace('\\', '/')
+        if item.get('thumbnail_path'):
+            item['thumbnail_path'] = item['thumbnail_path'].replace('\\', '/')
+        item['stored_filename'] = item.get('stored_filename') or item['id']
+        item['file_path'] = item.get('file_path') or f"documents/{item['stored_filename']}"
+        item['category'] = item.get('category') or 'other'
+        item['upload_date'] = item.get('upload_date') or ''
+        item['original_filename'] = item.get('original_filename') or item['stored_filename']
+        item['file_size'] = item.get('file_size') or 0
+        yield item
@@ -6,23 +6,29 @@ Notlar için dosya yükleme, saklama ve yönetim sistemi.
 """
 
 import os
+import re
+import json
+import time
 import uuid
 import hashlib
 import mimetypes
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+from typing import BinaryIO, Iterable, List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
 import shutil
-import json
-
-try:
-    from PIL import Image, ImageOps
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
 
+from .file_catalog import FileCatalog
+from .media_worker import DEFAULT_THUMBNAIL_SIZE, PIL_AVAILABLE, MediaWorker, render_thumbnails, thumbnail_name
 from ..logger import logger
 
+# Yükleme ve hash okuma parça boyutu
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Tamamlanmamış parçalı yüklemelerin saklanma süresi (saniye)
+UPLOAD_SESSION_TTL = 24 * 60 * 60
+
+_UPLOAD_ID = re.compile(r'[0-9a-f]{32}')
+
 class NotesFileManager:
     """Not dosyalarını yöneten sınıf"""
     
@@ -39,9 +45,11 @@ class NotesFileManager:
         self.documents_dir = self.upload_dir / "documents"
         self.thumbnails_dir = self.upload_dir / "thumbnails"
         self.temp_dir = self.upload_dir / "temp"
+        # İçerik adresli dosyalar (SHA-256)
+        self.blobs_dir = self.upload_dir / "blobs"
         
         # Dizinleri oluştur
-        for directory in [self.images_dir, self.documents_dir, self.thumbnails_dir, self.temp_dir]:
+        for directory in [self.images_dir, self.documents_dir, self.thumbnails_dir, self.temp_dir, self.blobs_dir]:
             directory.mkdir(parents=True, exist_ok=True)
             
         # Desteklenen dosya türleri
@@ -60,30 +68,21 @@ class NotesFileManager:
             'other': 10
         }
         
-        # Metadata dosyası
+        # Thumbnail'lar arka planda process havuzunda üretilir
+        self.media = MediaWorker(self.thumbnails_dir)
+        
+        # Parçalı yüklemeler: upload_id -> (sha256 durumu, hash'lenen bayt sayısı)
+        self._upload_hashers: Dict[str, Tuple[Any, int]] = {}
+        self._upload_locks: Dict[str, threading.Lock] = {}
+        self._upload_locks_guard = threading.Lock()
+        
+        # Metadata kataloğu (SQLite); eski file_metadata.json bir kez aktarılır
         self.metadata_file = self.upload_dir / "file_metadata.json"
-        self.metadata = self._load_metadata()
+        self.catalog = FileCatalog(self.upload_dir / "file_catalog.db")
+        self.catalog.import_json(self.metadata_file)
         
         logger.info(f"File Manager initialized. Upload dir: {self.upload_dir}")
     
-    def _load_metadata(self) -> Dict[str, Any]:
-        """Dosya metadata'sını yükle"""
-        if self.metadata_file.exists():
-            try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"Metadata loading error: {e}")
-        return {}
-    
-    def _save_metadata(self):
-        """Dosya metadata'sını kaydet"""
-        try:
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logger.error(f"Metadata saving error: {e}")
-    
     def get_file_category(self, filename: str) -> str:
         """Dosya kategorisini belirle"""
         extension = filename.lower().split('.')[-1] if '.' in filename else ''
@@ -117,35 +116,50 @@ class NotesFileManager:
         return True, "OK"
     
     def generate_file_hash(self, file_path: Path) -> str:
-        """Dosya hash'i oluştur"""
-        hash_md5 = hashlib.md5()
+        """Dosya hash'i oluştur (SHA-256, blob adıyla aynı)"""
+        digest = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+            for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
     
     def create_thumbnail(self, image_path: Path, file_id: str) -> Optional[str]:
-        """Resim için thumbnail oluştur"""
+        """Resim için thumbnail'ları bu process'te üret (varsayılan boyutun yolunu döndür)"""
         if not PIL_AVAILABLE:
             return None
             
         try:
-            with Image.open(image_path) as img:
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                img.thumbnail((300, 300), Image.Resampling.LANCZOS)
-                
-                thumbnail_path = self.thumbnails_dir / f"{file_id}_thumb.jpg"
-                img.save(thumbnail_path, 'JPEG', quality=85)
-                
-                return str(thumbnail_path.relative_to(self.upload_dir))
+            render_thumbnails(str(image_path), str(self.thumbnails_dir), file_id)
+            relative = self.thumbnails_dir / thumbnail_name(file_id, DEFAULT_THUMBNAIL_SIZE, 'jpeg')
+            return relative.relative_to(self.upload_dir).as_posix()
         except Exception as e:
             logger.error(f"Thumbnail creation error: {e}")
             return None
     
+    def _write_temp(self, chunks: Iterable[bytes], max_bytes: int) -> Tuple[Path, str, int]:
+        """Parçaları geçici dosyaya yazarken SHA-256 ve boyutu hesapla"""
+        digest = hashlib.sha256()
+        size = 0
+        temp_path = self.temp_dir / f"{uuid.uuid4()}.part"
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ValueError(f"Dosya çok büyük. Maksimum: {max_bytes // (1024 * 1024)}MB")
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return temp_path, digest.hexdigest(), size
+    
+    def blob_path(self, file_hash: str) -> Path:
+        """İçerik adresli blob yolu: blobs/<ilk iki karakter>/<sha256>"""
+        return self.blobs_dir / file_hash[:2] / file_hash
+    
     def upload_file(self, file_data: bytes, filename: str, note_id: Optional[str] = None) -> Dict[str, Any]:
-        """Dosya yükle"""
+        """Dosya yükle (bellekteki veri; aynı içerik bir kez saklanır)"""
         try:
             file_size = len(file_data)
             is_valid, error_msg = self.validate_file(filename, file_size)
@@ -153,34 +167,60 @@ class NotesFileManager:
             if not is_valid:
                 return {'success': False, 'error': error_msg}
             
-            file_id = str(uuid.uuid4())
-            category = self.get_file_category(filename)
+            view = memoryview(file_data)
+            chunks = (view[offset:offset + UPLOAD_CHUNK_SIZE] for offset in range(0, file_size, UPLOAD_CHUNK_SIZE))
+            return self._store(chunks, filename, note_id, file_size)
             
-            if category == 'images':
-                target_dir = self.images_dir
-            else:
-                target_dir = self.documents_dir
+        except Exception as e:
+            logger.error(f"File upload error: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    def max_upload_bytes(self, filename: str) -> int:
+        return self.size_limits.get(self.get_file_category(filename), 10) * 1024 * 1024
+    
+    def upload_stream(self, stream: BinaryIO, filename: str, note_id: Optional[str] = None) -> Dict[str, Any]:
+        """Akıştan dosya yükle: parça parça okunur, boyut ve hash yazarken hesaplanır"""
+        try:
+            is_valid, error_msg = self.validate_file(filename, 0)
+            if not is_valid:
+                return {'success': False, 'error': error_msg}
             
-            file_extension = filename.split('.')[-1] if '.' in filename else ''
-            final_filename = f"{file_id}.{file_extension}"
-            final_path = target_dir / final_filename
+            chunks = iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b'')
+            return self._store(chunks, filename, note_id, self.max_upload_bytes(filename))
             
-            with open(final_path, 'wb') as f:
-                f.write(file_data)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        except Exception as e:
+            logger.error(f"File upload error: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    def _store(self, chunks: Iterable[bytes], filename: str, note_id: Optional[str], max_bytes: int) -> Dict[str, Any]:
+        """Akışı hash'leyerek geçici dosyaya yaz, blob'a bağla ve kataloğa ekle"""
+        temp_path, file_hash, file_size = self._write_temp(chunks, max_bytes)
+        return self._commit_temp(temp_path, file_hash, file_size, filename, note_id)
+    
+    def _commit_temp(self, temp_path: Path, file_hash: str, file_size: int,
+                     filename: str, note_id: Optional[str]) -> Dict[str, Any]:
+        """Tamamlanmış geçici dosyayı blob'a taşı (ya da mevcut blob'a bağla)"""
+        try:
+            # Aynı not için aynı içerik: mevcut kayıt döner
+            if note_id:
+                existing = self.catalog.find_note_file(note_id, file_hash)
+                if existing:
+                    logger.info(f"File already attached: {filename} -> {existing['id']}")
+                    return {'success': True, 'file_id': existing['id'], 'file_info': existing, 'deduplicated': True}
             
-            file_hash = self.generate_file_hash(final_path)
+            file_id = str(uuid.uuid4())
+            category = self.get_file_category(filename)
+            blob_path = self.blob_path(file_hash)
             mime_type, _ = mimetypes.guess_type(filename)
             
-            thumbnail_path = None
-            if category == 'images':
-                thumbnail_path = self.create_thumbnail(final_path, file_id)
-            
             metadata = {
                 'id': file_id,
                 'original_filename': filename,
-                'stored_filename': final_filename,
-                'file_path': str(final_path.relative_to(self.upload_dir)),
-                'thumbnail_path': thumbnail_path,
+                'stored_filename': file_hash,
+                'file_path': blob_path.relative_to(self.upload_dir).as_posix(),
+                'thumbnail_path': None,
                 'file_size': file_size,
                 'mime_type': mime_type,
                 'category': category,
@@ -189,38 +229,154 @@ class NotesFileManager:
                 'notes': [note_id] if note_id else []
             }
             
-            self.metadata[file_id] = metadata
-            self._save_metadata()
+            def store_blob():
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temp_path, blob_path)
             
-            logger.info(f"File uploaded: {filename} -> {file_id}")
+            created = self.catalog.add_blob_reference(metadata, store_blob)
+            if category == 'images':
+                # Thumbnail'lar istek dışında üretilir; içerik zaten işlendiyse önbellekten
+                self.media.get(blob_path, file_hash)
+            logger.info(f"File uploaded: {filename} -> {file_id} ({'new blob' if created else 'deduplicated'})")
             
             return {
                 'success': True,
                 'file_id': file_id,
-                'file_info': metadata
+                'file_info': metadata,
+                'deduplicated': not created
             }
+        finally:
+            temp_path.unlink(missing_ok=True)
+    
+    # Parçalı (devam ettirilebilir) yükleme
+    
+    def _upload_paths(self, upload_id: str) -> Optional[Tuple[Path, Path]]:
+        if not _UPLOAD_ID.fullmatch(upload_id or ''):
+            return None
+        return self.temp_dir / f"{upload_id}.part", self.temp_dir / f"{upload_id}.json"
+    
+    def _upload_lock(self, upload_id: str) -> threading.Lock:
+        with self._upload_locks_guard:
+            return self._upload_locks.setdefault(upload_id, threading.Lock())
+    
+    def start_upload(self, filename: str, total_size: int, note_id: Optional[str] = None) -> Dict[str, Any]:
+        """Parçalı yükleme oturumu aç; parçalar append_upload ile sırayla gönderilir"""
+        is_valid, error_msg = self.validate_file(filename, total_size)
+        if not is_valid:
+            return {'success': False, 'error': error_msg}
+        
+        self.cleanup_uploads()
+        upload_id = uuid.uuid4().hex
+        part_path, session_path = self._upload_paths(upload_id)
+        session = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'note_id': note_id,
+            'total_size': total_size,
+            'created_at': datetime.now().isoformat()
+        }
+        part_path.touch()
+        session_path.write_text(json.dumps(session), encoding='utf-8')
+        return {'success': True, **session, 'offset': 0, 'chunk_size': UPLOAD_CHUNK_SIZE}
+    
+    def get_upload(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Oturum bilgisi; offset diskteki parça dosyasının boyutudur"""
+        paths = self._upload_paths(upload_id)
+        if not paths or not paths[1].exists():
+            return None
+        part_path, session_path = paths
+        session = json.loads(session_path.read_text(encoding='utf-8'))
+        session['offset'] = part_path.stat().st_size if part_path.exists() else 0
+        return session
+    
+    def append_upload(self, upload_id: str, offset: int, stream: BinaryIO) -> Dict[str, Any]:
+        """offset'ten başlayan parçayı ekle; son parçada dosya kataloğa eklenir"""
+        with self._upload_lock(upload_id):
+            session = self.get_upload(upload_id)
+            if not session:
+                return {'success': False, 'error': 'Yükleme bulunamadı', 'status': 404}
+            if offset != session['offset']:
+                return {'success': False, 'error': 'Beklenmeyen offset', 'offset': session['offset'], 'status': 409}
             
-        except Exception as e:
-            logger.error(f"File upload error: {e}")
-            return {'success': False, 'error': str(e)}
+            part_path, session_path = self._upload_paths(upload_id)
+            digest, hashed = self._upload_hashers.get(upload_id, (None, -1))
+            if hashed != offset:
+                # Yeniden başlatma ya da başka worker: hash durumu diskteki parçadan kurulur
+                digest = hashlib.sha256()
+                with open(part_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+                        digest.update(chunk)
+            
+            size = offset
+            with open(part_path, 'r+b') as f:
+                f.seek(offset)
+                for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+                    size += len(chunk)
+                    if size > session['total_size']:
+                        f.truncate(offset)
+                        self._upload_hashers.pop(upload_id, None)
+                        return {'success': False, 'error': 'Parça bildirilen boyutu aşıyor', 'offset': offset, 'status': 400}
+                    digest.update(chunk)
+                    f.write(chunk)
+            
+            if size < session['total_size']:
+                self._upload_hashers[upload_id] = (digest, size)
+                return {'success': True, 'upload_id': upload_id, 'offset': size, 'complete': False}
+            
+            self._upload_hashers.pop(upload_id, None)
+            session_path.unlink(missing_ok=True)
+            result = self._commit_temp(part_path, digest.hexdigest(), size, session['filename'], session['note_id'])
+        with self._upload_locks_guard:
+            self._upload_locks.pop(upload_id, None)
+        return {**result, 'upload_id': upload_id, 'offset': size, 'complete': True}
+    
+    def abort_upload(self, upload_id: str) -> bool:
+        paths = self._upload_paths(upload_id)
+        if not paths or not paths[1].exists():
+            return False
+        with self._upload_lock(upload_id):
+            for path in paths:
+                path.unlink(missing_ok=True)
+            self._upload_hashers.pop(upload_id, None)
+        return True
+    
+    def cleanup_uploads(self, max_age: int = UPLOAD_SESSION_TTL) -> int:
+        """Süresi dolmuş yarım yüklemeleri sil"""
+        cutoff = time.time() - max_age
+        removed = 0
+        for path in self.temp_dir.glob('*.part'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+                    (self.temp_dir / f"{path.stem}.json").unlink(missing_ok=True)
+                    self._upload_hashers.pop(path.stem, None)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
     
     def get_file_info(self, file_id: str) -> Optional[Dict[str, Any]]:
         """Dosya bilgilerini getir"""
-        return self.metadata.get(file_id)
+        return self.catalog.get(file_id)
     
     def get_note_files(self, note_id: str) -> List[Dict[str, Any]]:
-        """Note'un dosyalarını getir"""
-        files = []
-        for file_id, metadata in self.metadata.items():
-            if note_id in metadata.get('notes', []):
-                files.append(metadata)
-        return files
+        """Note'un dosyalarını getir (note_id indeksi)"""
+        return self.catalog.list_for_note(note_id)
+    
+    def get_files_for_notes(self, note_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Birden fazla notun dosyaları (tek katalog sorgusu)"""
+        return self.catalog.list_for_notes(note_ids)
     
     def get_file_path(self, file_id: str) -> Optional[Path]:
         """Dosya yolunu getir"""
         file_info = self.get_file_info(file_id)
         if not file_info:
             return None
+        return self.resolve_path(file_info)
+    
+    def resolve_path(self, file_info: Dict[str, Any]) -> Path:
+        """Katalog kaydının diskteki yolu"""
+        file_id = file_info['id']
         
         # Use the stored file_path from metadata
         stored_path = file_info.get('file_path')
@@ -237,46 +393,68 @@ class NotesFileManager:
             return self.upload_dir / 'documents' / stored_filename
     
     def get_thumbnail_path(self, file_id: str) -> Optional[Path]:
-        """Thumbnail yolunu getir"""
+        """Varsayılan thumbnail yolunu getir (henüz üretilmemiş olabilir)"""
         file_info = self.get_file_info(file_id)
         if not file_info or file_info.get('category') != 'images':
             return None
         
-        return self.upload_dir / 'thumbnails' / f"{file_id}_thumb.jpg"
+        if file_info.get('thumbnail_path'):
+            return self.upload_dir / file_info['thumbnail_path']
+        return self.media.path(file_info.get('hash') or file_id)
+    
+    def get_thumbnail(self, file_id: str, size: int = DEFAULT_THUMBNAIL_SIZE, fmt: str = 'jpeg',
+                      wait: float = 0.0) -> Optional[Path]:
+        """İstenen boyut/formatta thumbnail; yoksa arka planda üretilir, en fazla wait saniye beklenir"""
+        file_info = self.get_file_info(file_id)
+        if not file_info or file_info.get('category') != 'images':
+            return None
+        
+        # Eski kayıtların tek boyutlu JPEG thumbnail'ı
+        legacy = file_info.get('thumbnail_path')
+        if legacy and size == DEFAULT_THUMBNAIL_SIZE and fmt == 'jpeg' and (self.upload_dir / legacy).exists():
+            return self.upload_dir / legacy
+        
+        return self.media.get(self.get_file_path(file_id), file_info.get('hash') or file_id, size, fmt, wait)
     
     def get_storage_stats(self) -> Dict[str, Any]:
         """Storage istatistikleri"""
-        total_files = len(self.metadata)
-        total_size = sum(metadata['file_size'] for metadata in self.metadata.values())
+        stats = self.catalog.get_stats()
         
         return {
-            'total_files': total_files,
-            'total_size': total_size,
-            'total_size_mb': round(total_size / (1024 * 1024), 2)
+            'total_files': stats['total_files'],
+            'total_size': stats['total_size'],
+            'total_size_mb': round(stats['total_size'] / (1024 * 1024), 2),
+            'stored_size': stats['stored_size'],
+            'stored_size_mb': round(stats['stored_size'] / (1024 * 1024), 2),
+            'blobs': stats['blobs'],
+            'categories': stats['categories']
         }
     
+    def _remove_released_files(self, metadata: Dict[str, Any], paths: List[str]):
+        """Son referansı bırakılan içeriğin dosyaları (katalog yazma transaction'ı içinde)"""
+        for relative_path in paths:
+            (self.upload_dir / relative_path).unlink(missing_ok=True)
+        # İçerik tamamen silindi: tüm thumbnail varyantları da
+        self.media.remove(metadata.get('hash') or metadata['id'])
+
     def delete_file(self, file_id: str, note_id: Optional[str] = None) -> Dict[str, Any]:
-        """Dosyayı sil"""
+        """Dosyayı sil
+
+        note_id verilirse sadece o notla bağlantı kaldırılır (başka notlarda
+        kullanılıyorsa kayıt kalır). Fiziksel blob, son referans silinince silinir.
+        """
         try:
-            # Get file info from metadata
-            file_info = self.get_file_info(file_id)
-            if not file_info:
+            released = self.catalog.release(file_id, note_id, remove_files=self._remove_released_files)
+            if not released:
                 return {'success': False, 'error': 'Dosya bulunamadı'}
             
-            # Delete physical file
-            file_path = self.get_file_path(file_id)
-            if file_path and file_path.exists():
-                file_path.unlink()
-            
-            # Delete thumbnail (if exists)
-            thumbnail_path = self.get_thumbnail_path(file_id)
-            if thumbnail_path and thumbnail_path.exists():
-                thumbnail_path.unlink()
+            if released['unlinked_only']:
+                logger.info(f"File unlinked from note {note_id}: {file_id}")
+                return {'success': True, 'message': 'Dosya nottan kaldırıldı'}
             
-            # Remove from metadata
-            if file_id in self.metadata:
-                del self.metadata[file_id]
-                self._save_metadata()
+            if not released['file'].get('thumbnail_path'):
+                # Eski kayıtlar: thumbnail yolu saklanmamış (dosya id'sine özel)
+                (self.upload_dir / f"thumbnails/{file_id}_thumb.jpg").unlink(missing_ok=True)
             
             logger.info(f"File deleted: {file_id}")
             return {'success': True, 'message': 'Dosya başarıyla silindi'}
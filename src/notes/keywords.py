@@ -0,0 +1,89 @@
+"""
+Note Keyword Extraction
+=======================
+
+Notlar için anahtar kelime ve terim frekansı çıkarımı.
+
+- Tokenizer modül seviyesinde derlenmiş regex'ler ve sabit stop word
+  kümesi kullanır; çağrı başına regex derlenmez
+- Anahtar kelimeler ve terim frekansları not kaydedilirken bir kez
+  hesaplanır ve note_text_features tablosunda içerik hash'i ile saklanır
+- Okuyucular hash'i notun güncel başlık/içeriğiyle karşılaştırır; uyuşmazsa
+  (ör. ORM dışı yazma) değerler yeniden hesaplanır
+- Türkçe I/İ/ı, FTS sorgusundaki (search.build_match_query) gibi i'ye
+  katlanır; yazımı farklı aynı kelime tek terimdir
+"""
+
+import hashlib
+import re
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Optional
+
+_HTML_TAG = re.compile(r'<[^>]+>')
+# Harf ve rakamlar (python3, 2024, v12); alt çizgi ayırıcıdır
+_WORD = re.compile(r'[^\W_]{3,}', re.UNICODE)
+
+# Token kuralları değişince artırılır: saklanan özellikler (göç) ve vektör
+# indeksi (state.json) yeniden hesaplanır
+TOKENIZER_VERSION = 2
+
+STOP_WORDS = frozenset({
+    'bir', 'bu', 'şu', 'olan', 'için', 'ile', 've', 'ya', 'da', 'de', 'ki', 'mi',
+    'ama', 'fakat', 'çünkü', 'eğer', 'gibi', 'daha', 'çok', 'her', 'olarak',
+    'when', 'where', 'what', 'how', 'the', 'and', 'or', 'but', 'in', 'on', 'at',
+    'to', 'for', 'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through',
+    'during', 'this', 'that', 'are', 'was', 'were', 'has', 'have'
+})
+
+# Başlık token'ları içerikten bu kadar ağır sayılır
+TITLE_WEIGHT = 3
+KEYWORD_LIMIT = 10
+# Saklanan en fazla terim sayısı (en sık olanlar)
+TERM_LIMIT = 200
+
+
+def tokenize(text: str) -> List[str]:
+    """HTML'i temizle, küçük harfe çevir (I/İ/ı -> i), stop word'leri at"""
+    if not text:
+        return []
+    text = _HTML_TAG.sub(' ', text).replace('İ', 'i').replace('I', 'i').replace('ı', 'i').lower()
+    return [word for word in _WORD.findall(text) if word not in STOP_WORDS]
+
+
+def term_frequencies(title: str, content: str) -> Counter:
+    """Başlık ağırlıklı terim frekansları"""
+    counts = Counter(tokenize(content))
+    for token in tokenize(title):
+        counts[token] += TITLE_WEIGHT
+    return counts
+
+
+def top_terms(counts: Mapping[str, int], limit: int = KEYWORD_LIMIT) -> List[str]:
+    return [term for term, _ in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]]
+
+
+def extract_keywords(text: str, limit: int = KEYWORD_LIMIT) -> List[str]:
+    """Metnin en sık geçen anahtar kelimeleri"""
+    return top_terms(Counter(tokenize(text)), limit)
+
+
+def content_hash(title: str, content: str) -> str:
+    return hashlib.sha1(f"{title or ''}\0{content or ''}".encode('utf-8')).hexdigest()
+
+
+def compute_features(title: str, content: str) -> Dict[str, Any]:
+    """note_text_features satırı için değerler"""
+    counts = term_frequencies(title, content)
+    return {
+        'content_hash': content_hash(title, content),
+        'keywords': top_terms(counts, KEYWORD_LIMIT),
+        'term_freq': dict(sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:TERM_LIMIT])
+    }
+
+
+def cached_features(title: str, content: str, stored_hash: Optional[str],
+                    keywords: Optional[List[str]], term_freq: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    """Saklanan değerler güncelse onları, değilse yeniden hesaplananları döndür"""
+    if stored_hash is not None and stored_hash == content_hash(title, content):
+        return {'content_hash': stored_hash, 'keywords': keywords or [], 'term_freq': term_freq or {}}
+    return compute_features(title, content)
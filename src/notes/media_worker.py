@@ -0,0 +1,179 @@
+"""
+Notes Media Worker
+==================
+
+Ek resimleri için arka plan thumbnail üretimi.
+
+- Küçültme CPU yoğun olduğundan ayrı process'lerde (ProcessPoolExecutor)
+  çalışır; yükleme isteği resim işlemeyi beklemez
+- Her resim için birden fazla boyut, JPEG ve WebP olarak tek geçişte üretilir;
+  büyükten küçüğe küçültülür, JPEG kaynaklarda Image.draft ile çözme sırasında
+  ölçeklenir
+- Sonuçlar diskte içerik hash'i ile önbelleklenir (thumbnails/<ab>/<hash>_<boyut>.<uzantı>);
+  aynı içerik için tekrar üretilmez
+- Üretim yüklemede tetiklenir; eksik bir boyut istendiğinde de (lazy) üretilir
+
+Pillow yoksa thumbnail üretilmez.
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+from ..logger import logger
+
+THUMBNAIL_SIZES = (128, 300, 800)
+DEFAULT_THUMBNAIL_SIZE = 300
+THUMBNAIL_FORMATS = {'jpeg': 'jpg', 'webp': 'webp'}
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+DEFAULT_MAX_WORKERS = 2
+
+
+def nearest_size(size: int) -> int:
+    """İstenen boyutu karşılayan en küçük üretilen boyut"""
+    return next((candidate for candidate in sorted(THUMBNAIL_SIZES) if candidate >= size), max(THUMBNAIL_SIZES))
+
+
+def thumbnail_name(key: str, size: int, fmt: str) -> str:
+    """thumbnails dizinine göre göreli önbellek yolu"""
+    return f"{key[:2]}/{key}_{size}.{THUMBNAIL_FORMATS[fmt]}"
+
+
+def render_thumbnails(source_path: str, output_dir: str, key: str,
+                      sizes: Iterable[int] = THUMBNAIL_SIZES,
+                      formats: Iterable[str] = tuple(THUMBNAIL_FORMATS)) -> Dict[str, str]:
+    """Tüm boyut/format varyantlarını üret; {'<boyut>.<format>': göreli yol} döndür
+
+    Worker process'te çalışır (modül seviyesinde, pickle edilebilir).
+    """
+    sizes = sorted(set(sizes), reverse=True)
+    output = Path(output_dir)
+    results = {}
+    with Image.open(source_path) as img:
+        # JPEG: DCT ölçekleme ile en büyük hedefin iki katına yakın çöz
+        img.draft('RGB', (sizes[0] * 2, sizes[0] * 2))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        # Büyükten küçüğe: her boyut bir öncekinden küçültülür
+        for size in sizes:
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                relative = thumbnail_name(key, size, fmt)
+                target = output / relative
+                target.parent.mkdir(parents=True, exist_ok=True)
+                temp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+                if fmt == 'webp':
+                    img.save(temp, 'WEBP', quality=WEBP_QUALITY, method=4)
+                else:
+                    img.save(temp, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+                os.replace(temp, target)
+                results[f"{size}.{fmt}"] = relative
+    return results
+
+
+class MediaWorker:
+    """Thumbnail üretimi için process havuzu ve disk önbelleği"""
+
+    def __init__(self, thumbnails_dir: Path, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.thumbnails_dir = Path(thumbnails_dir)
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid = None
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {'submitted': 0, 'rendered': 0, 'errors': 0, 'cache_hits': 0}
+
+    def path(self, key: str, size: int = DEFAULT_THUMBNAIL_SIZE, fmt: str = 'jpeg') -> Path:
+        return self.thumbnails_dir / thumbnail_name(key, size, fmt)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            # Fork sonrası ebeveynin havuzu kullanılamaz
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._inflight = {}
+            self._pid = pid
+        return self._executor
+
+    def submit(self, source_path: Path, key: str) -> Optional[Future]:
+        """Tüm varyantları arka planda üret; aynı içerik için çalışan iş paylaşılır"""
+        if not PIL_AVAILABLE:
+            return None
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            args = (render_thumbnails, str(source_path), str(self.thumbnails_dir), key)
+            try:
+                future = self._get_executor().submit(*args)
+            except BrokenProcessPool:
+                # Çöken worker havuzu bir kez yeniden kurulur
+                self._executor = None
+                future = self._get_executor().submit(*args)
+            self._inflight[key] = future
+            self.stats['submitted'] += 1
+        future.add_done_callback(lambda done, key=key: self._finished(key, done))
+        return future
+
+    def _finished(self, key: str, future: Future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if future.exception() is not None:
+                self.stats['errors'] += 1
+            else:
+                self.stats['rendered'] += 1
+        if future.exception() is not None:
+            logger.error(f"Thumbnail generation failed for {key}: {future.exception()}")
+
+    def get(self, source_path: Optional[Path], key: str, size: int = DEFAULT_THUMBNAIL_SIZE,
+            fmt: str = 'jpeg', wait: float = 0.0) -> Optional[Path]:
+        """Önbellekteki thumbnail; yoksa üretimi başlat ve en fazla wait saniye bekle
+
+        Henüz hazır değilse None döner (üretim arka planda sürer).
+        """
+        target = self.path(key, size, fmt)
+        if target.exists():
+            with self._lock:
+                self.stats['cache_hits'] += 1
+            return target
+        if not source_path or not Path(source_path).exists():
+            return None
+        future = self.submit(source_path, key)
+        if future is None or wait <= 0:
+            return None
+        try:
+            future.result(timeout=wait)
+        except Exception:
+            return None
+        return target if target.exists() else None
+
+    def remove(self, key: str) -> int:
+        """İçeriğin tüm thumbnail varyantlarını sil"""
+        removed = 0
+        for path in (self.thumbnails_dir / key[:2]).glob(f"{key}_*"):
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, 'inflight': len(self._inflight)}
@@ -0,0 +1,138 @@
+"""
+Notes Schema Migrations
+=======================
+
+Notes veritabanı için sürümlü şema göçleri.
+
+- Tablolar models.py'den create_all ile oluşturulur; mevcut veritabanlarında
+  sonradan gereken değişiklikler (indeksler vb.) buradaki göçlerle eklenir
+- Her göç bir kez, sırayla ve kendi transaction'ında uygulanır
+- Uygulanan sürümler schema_migrations tablosunda tutulur
+- Yeni göç eklemek için MIGRATIONS listesinin sonuna yeni sürüm eklenir;
+  uygulanmış göçler değiştirilmez
+"""
+
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Sequence, Union
+
+from . import stats
+from .keywords import compute_features
+from ..logger import logger
+
+MigrationStep = Union[str, Callable]
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Tek bir şema göçü: SQL ifadeleri veya connection alan fonksiyonlar"""
+    version: int
+    description: str
+    steps: Sequence[MigrationStep]
+
+
+def backfill_text_features(connection):
+    """Özellik satırı olmayan notlar için anahtar kelime ve frekansları hesapla"""
+    rows = connection.exec_driver_sql(
+        "SELECT n.id, n.title, n.content FROM notes n "
+        "LEFT JOIN note_text_features f ON f.note_id = n.id WHERE f.note_id IS NULL"
+    ).fetchall()
+    now = datetime.now().isoformat(sep=' ')
+    params = []
+    for note_id, title, content in rows:
+        features = compute_features(title, content)
+        params.append((note_id, features['content_hash'], json.dumps(features['keywords'], ensure_ascii=False),
+                       json.dumps(features['term_freq'], ensure_ascii=False), now))
+    if params:
+        connection.exec_driver_sql(
+            "INSERT INTO note_text_features (note_id, content_hash, keywords, term_freq, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)", params
+        )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Composite indexes for note listings, tree and tag lookups", [
+        # get_notes / get_recent_notes / istatistikler: workspace + arşiv filtresi, updated_at sırası
+        "CREATE INDEX IF NOT EXISTS ix_notes_workspace_archived_updated "
+        "ON notes (workspace_id, is_archived, updated_at)",
+        # get_pinned_notes
+        "CREATE INDEX IF NOT EXISTS ix_notes_workspace_pinned_updated "
+        "ON notes (workspace_id, is_pinned, is_archived, updated_at)",
+        # get_note_tree: kök seviyesi ve özyinelemeli alt not adımı
+        "CREATE INDEX IF NOT EXISTS ix_notes_workspace_parent "
+        "ON notes (workspace_id, parent_id, is_archived)",
+        "CREATE INDEX IF NOT EXISTS ix_notes_parent ON notes (parent_id)",
+        # created_by filtresi
+        "CREATE INDEX IF NOT EXISTS ix_notes_workspace_creator "
+        "ON notes (workspace_id, created_by)",
+        # Etiket ilişkisi her iki yönden
+        "CREATE INDEX IF NOT EXISTS ix_note_tags_note_tag ON note_tags (note_id, tag_id)",
+        "CREATE INDEX IF NOT EXISTS ix_note_tags_tag_note ON note_tags (tag_id, note_id)",
+        # list_tags / get_popular_tags: workspace filtresi, isim sırası
+        "CREATE INDEX IF NOT EXISTS ix_tags_workspace_name ON tags (workspace_id, name)",
+    ]),
+    Migration(2, "Keyset pagination index on (updated_at, id)", [
+        # Liste sayfalaması (updated_at, id) ile azalan sırada ilerler
+        "CREATE INDEX IF NOT EXISTS ix_notes_workspace_archived_updated_id "
+        "ON notes (workspace_id, is_archived, updated_at, id)",
+        "DROP INDEX IF EXISTS ix_notes_workspace_archived_updated",
+        "CREATE INDEX IF NOT EXISTS ix_notes_workspace_pinned_updated_id "
+        "ON notes (workspace_id, is_pinned, is_archived, updated_at, id)",
+        "DROP INDEX IF EXISTS ix_notes_workspace_pinned_updated",
+    ]),
+    Migration(3, "Materialized workspace stats and tag note counts", [
+        stats.add_note_count_column,
+        # get_popular_tags: workspace filtresi, note_count sırası
+        "CREATE INDEX IF NOT EXISTS ix_tags_workspace_note_count ON tags (workspace_id, note_count)",
+        stats.create_triggers,
+        # Mevcut veriden ilk değerler
+        stats.repair_connection,
+    ]),
+    Migration(4, "Backfill note keywords and term frequencies", [
+        backfill_text_features,
+    ]),
+    Migration(5, "Recompute note keywords for tokenizer version 2 (I/İ/ı folding, digits)", [
+        "DELETE FROM note_text_features",
+        backfill_text_features,
+    ]),
+]
+
+_CREATE_TABLE = """CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    applied_at TEXT NOT NULL
+)"""
+
+
+def current_version(connection) -> int:
+    connection.exec_driver_sql(_CREATE_TABLE)
+    row = connection.exec_driver_sql("SELECT MAX(version) FROM schema_migrations").first()
+    return row[0] or 0
+
+
+def apply_migrations(engine, migrations: Sequence[Migration] = MIGRATIONS) -> List[int]:
+    """Uygulanmamış göçleri sırayla uygula; uygulanan sürümleri döndür"""
+    with engine.begin() as connection:
+        version = current_version(connection)
+
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= version:
+            continue
+
+        with engine.begin() as connection:
+            for step in migration.steps:
+                if callable(step):
+                    step(connection)
+                else:
+                    connection.exec_driver_sql(step)
+            connection.exec_driver_sql(
+                "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.description, datetime.now().isoformat())
+            )
+
+        applied.append(migration.version)
+        logger.info(f"Notes migration {migration.version} applied: {migration.description}")
+
+    return applied
@@ -8,11 +8,11 @@ Not alma sistemi için veri modelleri.
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass, field
-from sqlalchemy import Column, String, Text, DateTime, Boolean, Integer, ForeignKey, Table
+from sqlalchemy import Column, String, Text, DateTime, Boolean, Integer, ForeignKey, Table, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.sqlite import JSON
-from sqlalchemy.schema import UniqueConstraint
+from sqlalchemy.schema import Index, UniqueConstraint
 import uuid
 
 Base = declarative_base()
@@ -111,7 +111,7 @@ class Note(Base):
         except Exception:
             tags_list = []
             
-        return {
+        data = {
             'id': self.id,
             'title': self.title,
             'content': self.content,
@@ -131,6 +131,13 @@ class Note(Base):
             'edit_count': self.edit_count
         }
 
+        # Tam metin aramasından geldiyse vurgulu başlık ve snippet
+        search_match = getattr(self, 'search_match', None)
+        if search_match:
+            data['search'] = search_match
+
+        return data
+
 
 class NoteTag(Base):
     """Not etiketi modeli"""
@@ -141,6 +148,8 @@ class NoteTag(Base):
     color = Column(String(7), default='#808080')  # Hex color
     workspace_id = Column(String, ForeignKey('workspaces.id'))
     created_at = Column(DateTime, default=datetime.now)
+    # Bağlı not sayısı; note_tags tetikleyicileriyle güncellenir (bkz. stats.py)
+    note_count = Column(Integer, nullable=False, default=0, server_default='0')
     
     # Relationships
     notes = relationship("Note", secondary=note_tags, back_populates="tags")
@@ -151,17 +160,94 @@ class NoteTag(Base):
     )
 
 
-@dataclass
-class NoteVersion:
-    """Not versiyonu için dataclass (gelecek özellik)"""
-    note_id: str
-    version: int
-    content: str
-    edited_by: str
-    edited_at: datetime
-    change_summary: Optional[str] = None
-    
-    
+class WorkspaceStats(Base):
+    """Workspace sayaçları; tetikleyicilerle güncellenir (bkz. stats.py)"""
+    __tablename__ = 'workspace_stats'
+
+    workspace_id = Column(String, primary_key=True)
+    total_notes = Column(Integer, nullable=False, default=0)
+    archived_notes = Column(Integer, nullable=False, default=0)
+    total_tags = Column(Integer, nullable=False, default=0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total_notes': self.total_notes,
+            'active_notes': self.total_notes - self.archived_notes,
+            'archived_notes': self.archived_notes,
+            'total_tags': self.total_tags
+        }
+
+
+class NoteTextFeatures(Base):
+    """Kayıtta hesaplanan anahtar kelimeler ve terim frekansları (bkz. keywords.py)"""
+    __tablename__ = 'note_text_features'
+
+    note_id = Column(String, ForeignKey('notes.id'), primary_key=True)
+    content_hash = Column(String(40), nullable=False)
+    keywords = Column(JSON, default=[])
+    term_freq = Column(JSON, default={})
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class NoteVersion(Base):
+    """Not sürüm geçmişi kaydı (ters delta veya sıkıştırılmış tam kopya, bkz. versioning.py)"""
+    __tablename__ = 'note_versions'
+
+    note_id = Column(String, ForeignKey('notes.id'), primary_key=True)
+    version = Column(Integer, primary_key=True)
+    kind = Column(String(10), nullable=False, default='delta')  # delta, snapshot
+    title = Column(String(500))
+    payload = Column(LargeBinary, nullable=False)
+    content_size = Column(Integer, default=0)
+    edited_by = Column(String)
+    edited_at = Column(DateTime, default=datetime.now)
+    change_summary = Column(Text)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'note_id': self.note_id,
+            'version': self.version,
+            'title': self.title,
+            'kind': self.kind,
+            'content_size': self.content_size,
+            'edited_by': self.edited_by,
+            'edited_at': self.edited_at.isoformat() if self.edited_at else None,
+            'change_summary': self.change_summary
+        }
+
+
+class NoteChange(Base):
+    """Not değişiklik günlüğü kaydı (change feed, bkz. change_feed.py)"""
+    __tablename__ = 'note_changes'
+
+    # AUTOINCREMENT: budanan sıra numaraları tekrar kullanılmaz
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    workspace_id = Column(String, nullable=False)
+    note_id = Column(String, nullable=False)
+    op = Column(String(20), nullable=False)  # create, update, delete, archive, unarchive, tag, move
+    version = Column(Integer)
+    actor = Column(String)
+    data = Column(JSON, default={})
+    created_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index('ix_note_changes_workspace_seq', 'workspace_id', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'seq': self.seq,
+            'workspace_id': self.workspace_id,
+            'note_id': self.note_id,
+            'op': self.op,
+            'version': self.version,
+            'actor': self.actor,
+            'data': self.data or {},
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
 @dataclass
 class NoteActivity:
     """Not aktivitesi için dataclass"""
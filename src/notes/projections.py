@@ -0,0 +1,110 @@
+"""
+Note List Projections
+=====================
+
+Liste görünümleri için hafif not projeksiyonları ve keyset pagination.
+
+- Listeler tam not gövdesi yerine sadece istenen sütunları çeker
+  (varsayılan: id, title, preview, tags, updated_at)
+- fields= parametresi ile sütunlar seçilir; content açıkça istenmelidir
+- Sayfalama OFFSET yerine imleçle (cursor) yapılır: son satırın sıralama
+  anahtarı opak bir token olarak döner, sonraki sayfa bu anahtardan devam eder;
+  derin sayfalar da ilk sayfa kadar hızlıdır
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from .models import Note
+
+# Önizleme için içerikten alınan karakter sayısı
+PREVIEW_CHARS = 200
+
+LIST_COLUMNS = {
+    'id': Note.id,
+    'title': Note.title,
+    'preview': func.substr(Note.content, 1, PREVIEW_CHARS).label('preview'),
+    'content': Note.content,
+    'content_type': Note.content_type,
+    'parent_id': Note.parent_id,
+    'workspace_id': Note.workspace_id,
+    'created_by': Note.created_by,
+    'created_at': Note.created_at,
+    'updated_at': Note.updated_at,
+    'last_edited_by': Note.last_edited_by,
+    'is_public': Note.is_public,
+    'is_pinned': Note.is_pinned,
+    'is_archived': Note.is_archived,
+    'version': Note.version,
+    'ai_metadata': Note.ai_metadata,
+    'view_count': Note.view_count,
+    'edit_count': Note.edit_count,
+}
+
+# Sütun olmayan, ayrıca toplu yüklenen alanlar
+EXTRA_FIELDS = ('tags',)
+
+DEFAULT_LIST_FIELDS = ('id', 'title', 'preview', 'tags', 'updated_at')
+
+
+def parse_fields(value: Optional[str]) -> Tuple[str, ...]:
+    """fields= parametresini doğrula ('id,title,tags' -> ('id', 'title', 'tags'))"""
+    if not value:
+        return DEFAULT_LIST_FIELDS
+
+    fields = []
+    for name in (part.strip() for part in value.split(',')):
+        if not name or name in fields:
+            continue
+        if name not in LIST_COLUMNS and name not in EXTRA_FIELDS:
+            raise ValueError(f"Bilinmeyen alan: {name}")
+        fields.append(name)
+
+    # Sayfalama ve istemci eşleştirmesi için id her zaman döner
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return tuple(fields)
+
+
+def select_columns(fields: Iterable[str], required: Iterable[str] = ()) -> List[Any]:
+    """Projeksiyon için SQL sütunları (sıralama anahtarları dahil)"""
+    names = [name for name in fields if name in LIST_COLUMNS]
+    for name in required:
+        if name not in names:
+            names.append(name)
+    return [LIST_COLUMNS[name] for name in names]
+
+
+def row_to_dict(row, fields: Iterable[str]) -> Dict[str, Any]:
+    data = {}
+    mapping = row._mapping
+    for name in fields:
+        if name not in LIST_COLUMNS:
+            continue
+        value = mapping[name]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        data[name] = value
+    return data
+
+
+def encode_cursor(*values) -> str:
+    """Sıralama anahtarını opak, URL güvenli bir imlece çevir"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """İmleci çöz; bozuk imleçte ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError("Geçersiz cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Geçersiz cursor")
+    return values
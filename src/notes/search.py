@@ -0,0 +1,208 @@
+"""
+Notes Full-Text Search
+======================
+
+SQLite FTS5 tabanlı not araması.
+
+- notes_fts sanal tablosu başlık, içerik ve etiket adlarını yansıtır
+- Senkronizasyon tetikleyicilerle (trigger) yapılır; ORM dışı yazmalar da indekslenir
+- Sıralama BM25 ile (başlık > etiket > içerik ağırlıklı)
+- Her terim prefix sorgusudur: yazarken arama ("proj" -> "proje")
+- Türkçe: unicode61 + remove_diacritics ile ş/ç/ğ/ö/ü/İ katlanır; ı/i farkı
+  sorgu tarafında varyantlarla giderilir ("isik" -> "ışık", "IŞIK")
+
+FTS satırı notes.rowid ile eşlenir. VACUUM rowid'leri değiştirebileceği için
+böyle bir bakımdan sonra rebuild_search_index() çağrılmalıdır.
+"""
+
+import itertools
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..logger import logger
+
+FTS_TABLE = 'notes_fts'
+
+# bm25 sütun ağırlıkları: title, content, tags
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+# ı/i varyantı üretilecek en fazla harf sayısı (2^n varyant)
+MAX_DOTLESS_VARIANTS = 3
+
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+SNIPPET_TOKENS = 16
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+_TAGS_OF_NOTE = """(SELECT group_concat(t.name, ' ') FROM note_tags nt
+                    JOIN tags t ON t.id = nt.tag_id WHERE nt.note_id = {note_id})"""
+
+_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, tags,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content, tags)
+        VALUES (new.rowid, new.title, coalesce(new.content, ''),
+                coalesce({_TAGS_OF_NOTE.format(note_id='new.id')}, ''));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+        UPDATE {FTS_TABLE} SET title = new.title, content = coalesce(new.content, '')
+        WHERE rowid = new.rowid;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notes_fts_tag_insert AFTER INSERT ON note_tags BEGIN
+        UPDATE {FTS_TABLE} SET tags = coalesce({_TAGS_OF_NOTE.format(note_id='new.note_id')}, '')
+        WHERE rowid = (SELECT rowid FROM notes WHERE id = new.note_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notes_fts_tag_delete AFTER DELETE ON note_tags BEGIN
+        UPDATE {FTS_TABLE} SET tags = coalesce({_TAGS_OF_NOTE.format(note_id='old.note_id')}, '')
+        WHERE rowid = (SELECT rowid FROM notes WHERE id = old.note_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS notes_fts_tag_rename AFTER UPDATE OF name ON tags BEGIN
+        UPDATE {FTS_TABLE}
+        SET tags = coalesce({_TAGS_OF_NOTE.format(note_id=f'(SELECT id FROM notes WHERE rowid = {FTS_TABLE}.rowid)')}, '')
+        WHERE rowid IN (SELECT notes.rowid FROM notes
+                        JOIN note_tags ON note_tags.note_id = notes.id
+                        WHERE note_tags.tag_id = new.id);
+    END""",
+]
+
+_REBUILD = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"""INSERT INTO {FTS_TABLE}(rowid, title, content, tags)
+        SELECT n.rowid, n.title, coalesce(n.content, ''),
+               coalesce({_TAGS_OF_NOTE.format(note_id='n.id')}, '')
+        FROM notes n""",
+]
+
+
+def fts5_available(connection) -> bool:
+    """SQLite derlemesinde FTS5 var mı?"""
+    try:
+        connection.exec_driver_sql("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)")
+        connection.exec_driver_sql("DROP TABLE IF EXISTS temp.fts5_probe")
+        return True
+    except Exception:
+        return False
+
+
+def setup_search_index(engine) -> bool:
+    """FTS tablosunu ve tetikleyicileri oluştur; ilk kurulumda mevcut notları indeksle"""
+    with engine.begin() as connection:
+        if not fts5_available(connection):
+            logger.warning("SQLite FTS5 not available, falling back to LIKE search")
+            return False
+
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+        ).first() is not None
+
+        for statement in _SCHEMA:
+            connection.exec_driver_sql(statement)
+
+        if not exists:
+            for statement in _REBUILD:
+                connection.exec_driver_sql(statement)
+            logger.info("Notes search index built")
+
+    return True
+
+
+def rebuild_search_index(engine):
+    """FTS indeksini notes tablosundan baştan oluştur"""
+    with engine.begin() as connection:
+        for statement in _REBUILD:
+            connection.exec_driver_sql(statement)
+
+
+def _dotless_variants(term: str) -> List[str]:
+    """Terimdeki i/ı harflerinin olası tüm yazımları"""
+    positions = [i for i, char in enumerate(term) if char == 'i'][:MAX_DOTLESS_VARIANTS]
+    variants = []
+    for choice in itertools.product('iı', repeat=len(positions)):
+        chars = list(term)
+        for position, char in zip(positions, choice):
+            chars[position] = char
+        variants.append(''.join(chars))
+    return variants
+
+
+def build_match_query(text: str) -> Optional[str]:
+    """Kullanıcı metnini güvenli bir FTS5 MATCH ifadesine çevir
+
+    Her kelime prefix terimidir ve terimler AND ile bağlanır. FTS5 sözdizimi
+    kullanıcıya açılmaz; kelimeler tırnak içinde geçer.
+    """
+    normalized = (text or '').replace('İ', 'i').replace('I', 'i').replace('ı', 'i').lower()
+    terms = _TERM.findall(normalized)
+    if not terms:
+        return None
+
+    clauses = []
+    for term in terms:
+        variants = [f'"{variant}"*' for variant in _dotless_variants(term)]
+        clauses.append(variants[0] if len(variants) == 1 else f"({' OR '.join(variants)})")
+    return ' AND '.join(clauses)
+
+
+def search_note_ids(connection,
+                    workspace_id: str,
+                    query: str,
+                    tags: Optional[List[str]] = None,
+                    parent_id: Optional[str] = None,
+                    created_by: Optional[str] = None,
+                    include_archived: bool = False,
+                    limit: int = 50,
+                    offset: int = 0,
+                    after: Optional[Tuple[float, str]] = None) -> List[Dict[str, Any]]:
+    """BM25 sırasına göre eşleşen not id'leri, vurgulu başlık ve snippet
+
+    after=(rank, id) verilirse sonuçlar bu anahtardan sonra başlar (keyset).
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    sql = [f"""SELECT n.id,
+                      bm25({FTS_TABLE}, {weights}) AS rank,
+                      highlight({FTS_TABLE}, 0, ?, ?) AS title_highlight,
+                      snippet({FTS_TABLE}, 1, ?, ?, '…', {SNIPPET_TOKENS}) AS snippet
+               FROM {FTS_TABLE}
+               JOIN notes n ON n.rowid = {FTS_TABLE}.rowid
+               WHERE {FTS_TABLE} MATCH ? AND n.workspace_id = ?"""]
+    params: List[Any] = [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE,
+                         match, workspace_id]
+
+    if not include_archived:
+        sql.append("AND n.is_archived = 0")
+    if parent_id is not None:
+        sql.append("AND n.parent_id = ?")
+        params.append(parent_id)
+    if created_by:
+        sql.append("AND n.created_by = ?")
+        params.append(created_by)
+    if tags:
+        placeholders = ', '.join('?' for _ in tags)
+        sql.append(f"""AND EXISTS (SELECT 1 FROM note_tags nt JOIN tags t ON t.id = nt.tag_id
+                                   WHERE nt.note_id = n.id AND t.name IN ({placeholders}))""")
+        params.extend(tags)
+
+    if after is not None:
+        sql = [f"SELECT * FROM ({' '.join(sql)}) WHERE rank > ? OR (rank = ? AND id > ?)"]
+        params.extend([after[0], after[0], after[1]])
+
+    sql.append("ORDER BY rank, id LIMIT ? OFFSET ?")
+    params.extend([limit, offset])
+
+    rows = connection.exec_driver_sql('\n'.join(sql), tuple(params)).fetchall()
+    return [
+        {'id': row[0], 'rank': row[1], 'title': row[2], 'snippet': row[3]}
+        for row in rows
+    ]
@@ -0,0 +1,571 @@
+"""
+Note Similarity Index
+=====================
+
+Workspace başına ilgili not araması için vektör indeksi.
+
+- Her not, başlık + etiket + içerik token'larının hash'lenmiş (feature
+  hashing) TF vektörüne dönüştürülür; L2 normalize, float32, DIM boyut
+- Workspace başına vektörler tek bir .npy matrisinde tutulur ve
+  memory-mapped açılır; satır -> not id eşlemesi ids.json'dadır
+- Güncellemeler artımlıdır: notun satırı yerinde yazılır, silinen notların
+  satırları yeniden kullanılır, kapasite dolunca matris iki katına büyür
+- İlgili notlar: tek matris-vektör çarpımı + argpartition ile top-k,
+  LLM çağrısı yok; tüm workspace taranır
+- Kümeleme: aynı matris üzerinde küresel k-means (kosinüs); workspace
+  organizasyonu LLM'e not başına değil küme başına gider
+
+İndeks notlardan türetilmiş veridir: NotesDatabase değişiklik akışına
+(change_feed) abone olur, son uygulanan seq'i state.json'a yazar ve yeniden
+başlatmada kaldığı yerden devam eder. Dizin silinirse ilk sorguda
+veritabanından yeniden oluşturulur.
+
+Prefork worker'lar aynı dizini paylaşır: yazmalar dizindeki index.lock
+üzerinde exclusive, sorgular shared fcntl kilidi altında yapılır. Her
+değişikliği kilidi ilk alan worker uygular (state.json'daki seq'i
+geçmişse), diğerleri atlar. ids.json değişmişse (başka process satır
+ekledi/sildi) indeks kullanılmadan önce diskten yeniden yüklenir; yerinde
+yazılan vektörler paylaşılan memmap üzerinden zaten görünür.
+"""
+
+import json
+import math
+import os
+import shutil
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # Windows: process'ler arası kilit yok, tek process varsayılır
+    FCNTL_AVAILABLE = False
+
+from .keywords import TOKENIZER_VERSION, term_frequencies, tokenize
+from ..logger import logger
+
+DEFAULT_DIM = 512
+INITIAL_CAPACITY = 64
+
+TAG_WEIGHT = 2
+
+MAX_CLUSTERS = 32
+CLUSTER_ITERATIONS = 25
+# Bu boyuttan büyük kümelerde ikili benzerlik (kopya) taraması yapılmaz
+DUPLICATE_SCAN_LIMIT = 2000
+DUPLICATE_THRESHOLD = 0.95
+
+
+def _bucket(token: str, dim: int) -> Tuple[int, float]:
+    """Token -> (sütun, işaret); process'ler arası kararlı hash"""
+    value = zlib.crc32(token.encode('utf-8'))
+    return value % dim, (1.0 if (value >> 31) & 1 else -1.0)
+
+
+def embed_counts(counts: Mapping[str, int], tags: Sequence[str] = (), dim: int = DEFAULT_DIM) -> np.ndarray:
+    """Terim frekanslarından normalize edilmiş hash'lenmiş TF vektörü"""
+    weights = dict(counts)
+    for tag in tags:
+        for token in tokenize(tag):
+            weights[token] = weights.get(token, 0) + TAG_WEIGHT
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for token, count in weights.items():
+        column, sign = _bucket(token, dim)
+        vector[column] += sign * (1.0 + math.log(count))
+
+    norm = float(np.linalg.norm(vector))
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def embed(title: str, content: str, tags: Sequence[str] = (), dim: int = DEFAULT_DIM) -> np.ndarray:
+    """Notun normalize edilmiş hash'lenmiş TF vektörü"""
+    return embed_counts(term_frequencies(title, content), tags, dim)
+
+
+def suggest_cluster_count(count: int, max_clusters: int = MAX_CLUSTERS) -> int:
+    """Not sayısına göre küme sayısı (~sqrt(n/2), en fazla max_clusters)"""
+    if count <= 0:
+        return 0
+    return max(1, min(max_clusters, count, int(round(math.sqrt(count / 2)))))
+
+
+def cluster_vectors(vectors: np.ndarray, k: int, iterations: int = CLUSTER_ITERATIONS,
+                    seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalize satırlar üzerinde küresel k-means; (etiketler, merkezler)
+
+    k-means++ başlangıcı sabit seed ile yapılır, aynı girdi aynı kümeleri verir.
+    """
+    count = vectors.shape[0]
+    k = max(1, min(k, count))
+    rng = np.random.RandomState(seed)
+
+    centroids = np.empty((k, vectors.shape[1]), dtype=np.float32)
+    centroids[0] = vectors[rng.randint(count)]
+    distance = 1.0 - vectors @ centroids[0]
+    for index in range(1, k):
+        weights = np.clip(distance, 0, None)
+        total = float(weights.sum())
+        row = rng.choice(count, p=weights / total) if total > 0 else rng.randint(count)
+        centroids[index] = vectors[row]
+        distance = np.minimum(distance, 1.0 - vectors @ centroids[index])
+
+    labels = np.full(count, -1)
+    for _ in range(iterations):
+        similarities = vectors @ centroids.T
+        new_labels = np.argmax(similarities, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for index in range(k):
+            members = labels == index
+            if not members.any():
+                # Boş küme: merkezine en uzak nottan yeniden başlar
+                row = int(np.argmin(similarities[np.arange(count), labels]))
+                centroids[index] = vectors[row]
+                continue
+            centroid = vectors[members].sum(axis=0)
+            norm = float(np.linalg.norm(centroid))
+            centroids[index] = centroid / norm if norm > 0 else centroid
+    return labels, centroids
+
+
+class WorkspaceVectorIndex:
+    """Tek bir workspace'in memory-mapped vektör matrisi"""
+
+    def __init__(self, directory: str, dim: int = DEFAULT_DIM):
+        self.directory = directory
+        self.dim = dim
+        self.vectors_path = os.path.join(directory, 'vectors.npy')
+        self.ids_path = os.path.join(directory, 'ids.json')
+
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._loaded = None
+        self._load()
+
+    def _signature(self):
+        """ids.json kimliği; her yazma os.replace ile yeni dosya oluşturur"""
+        try:
+            stat = os.stat(self.ids_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        self._loaded = self._signature()
+        if not (os.path.exists(self.vectors_path) and os.path.exists(self.ids_path)):
+            return
+        vectors = np.load(self.vectors_path, mmap_mode='r+')
+        with open(self.ids_path, 'r', encoding='utf-8') as f:
+            ids = json.load(f)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim or len(ids) > vectors.shape[0]:
+            logger.warning(f"Vector index at {self.directory} is incompatible, rebuilding")
+            return
+        self._vectors = vectors
+        self._ids = ids
+        self._rows = {note_id: row for row, note_id in enumerate(ids) if note_id is not None}
+        self._free = [row for row, note_id in enumerate(ids) if note_id is None]
+
+    def refresh(self):
+        """Başka process ids.json'u değiştirdiyse indeksi diskten yeniden aç"""
+        if self._signature() == self._loaded:
+            return
+        self._vectors = None
+        self._ids, self._rows, self._free = [], {}, []
+        self._load()
+
+    @property
+    def exists(self) -> bool:
+        return self._vectors is not None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, note_id: str) -> bool:
+        return note_id in self._rows
+
+    def _ensure_capacity(self, rows: int):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, capacity * 2)
+        while new_capacity < rows:
+            new_capacity *= 2
+
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.vectors_path + '.tmp'
+        grown = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32,
+                                          shape=(new_capacity, self.dim))
+        if capacity:
+            grown[:capacity] = self._vectors
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(temp_path, self.vectors_path)
+        self._vectors = np.load(self.vectors_path, mmap_mode='r+')
+
+    def _save_ids(self):
+        temp_path = self.ids_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._ids, f)
+        os.replace(temp_path, self.ids_path)
+        self._loaded = self._signature()
+
+    def upsert(self, note_id: str, vector: np.ndarray):
+        row = self._rows.get(note_id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+                self._ids[row] = note_id
+            else:
+                row = len(self._ids)
+                self._ensure_capacity(row + 1)
+                self._ids.append(note_id)
+            self._rows[note_id] = row
+            self._vectors[row] = vector
+            self._save_ids()
+        else:
+            self._vectors[row] = vector
+
+    def remove(self, note_id: str) -> bool:
+        row = self._rows.pop(note_id, None)
+        if row is None:
+            return False
+        self._vectors[row] = 0.0
+        self._ids[row] = None
+        self._free.append(row)
+        self._save_ids()
+        return True
+
+    def replace_all(self, items: Iterable[Tuple[str, np.ndarray]]):
+        """İndeksi verilen notlarla baştan yaz"""
+        items = list(items)
+        self._vectors = None
+        for path in (self.vectors_path, self.ids_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._ids, self._rows, self._free = [], {}, []
+
+        self._ensure_capacity(max(len(items), 1))
+        for row, (note_id, vector) in enumerate(items):
+            self._vectors[row] = vector
+            self._ids.append(note_id)
+            self._rows[note_id] = row
+        self._save_ids()
+        self.flush()
+
+    def vector(self, note_id: str) -> Optional[np.ndarray]:
+        row = self._rows.get(note_id)
+        return None if row is None else np.array(self._vectors[row])
+
+    def snapshot(self) -> Tuple[List[str], np.ndarray]:
+        """Dolu satırların not id'leri ve vektörleri (kopya)"""
+        if self._vectors is None or not self._rows:
+            return [], np.zeros((0, self.dim), dtype=np.float32)
+        rows = sorted(self._rows.values())
+        return [self._ids[row] for row in rows], np.array(self._vectors[rows])
+
+    def query(self, vector: np.ndarray, k: int = 5, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """Kosinüs benzerliğine göre top-k (not_id, skor)"""
+        if self._vectors is None or not self._rows or not np.any(vector):
+            return []
+        used = len(self._ids)
+        scores = np.asarray(self._vectors[:used] @ vector.astype(np.float32))
+
+        for note_id in exclude:
+            row = self._rows.get(note_id)
+            if row is not None:
+                scores[row] = -np.inf
+        for row in self._free:
+            scores[row] = -np.inf
+
+        k = min(k, used)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[row], float(scores[row])) for row in top if scores[row] > 0]
+
+    def flush(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+
+
+NoteLoader = Callable[..., List[Dict[str, Any]]]
+
+
+class SimilarityIndex:
+    """Workspace vektör indeksleri + değişiklik akışından artımlı güncelleme
+
+    loader(workspace_id=None, note_ids=None) -> [{id, workspace_id, title,
+    content, tags, term_freq}] arşivlenmemiş notları döndürmelidir; term_freq
+    (kayıtta hesaplanmış frekanslar) varsa metin yeniden token'lara ayrılmaz.
+    """
+
+    def __init__(self, base_dir: str, loader: NoteLoader, dim: int = DEFAULT_DIM):
+        self.base_dir = base_dir
+        self.loader = loader
+        self.dim = dim
+        self.state_path = os.path.join(base_dir, 'state.json')
+        self.lock_path = os.path.join(base_dir, 'index.lock')
+
+        self._indexes: Dict[str, WorkspaceVectorIndex] = {}
+        self._lock = threading.RLock()
+        self._attach_lock = threading.Lock()
+        self._subscription = None
+        self._feed = None
+        self._last_seq = 0
+        self.stats = {'queries': 0, 'upserts': 0, 'removals': 0, 'rebuilds': 0}
+
+    def _index(self, workspace_id: str) -> WorkspaceVectorIndex:
+        index = self._indexes.get(workspace_id)
+        if index is None:
+            index = WorkspaceVectorIndex(os.path.join(self.base_dir, workspace_id), self.dim)
+            self._indexes[workspace_id] = index
+        return index
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        """Process'ler arası kilit; her seferinde yeni dosya tanıtıcısı (fork güvenli)
+
+        Aynı process'te iç içe alınmamalıdır: flock ikinci tanıtıcıda kendini bekler.
+        """
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+        os.makedirs(self.base_dir, exist_ok=True)
+        with open(self.lock_path, 'a') as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _reading(self, workspace_id: str):
+        """Sorgu için diskle eşitlenmiş indeks (shared kilit); yoksa önce oluşturulur"""
+        index = self._index(workspace_id)
+        with self._file_lock(exclusive=False):
+            index.refresh()
+            if index.exists:
+                yield index
+                return
+        with self._file_lock():
+            index.refresh()
+            if not index.exists:
+                self._rebuild(workspace_id)
+            yield index
+
+    # Değişiklik akışı
+
+    def attach(self, change_feed):
+        """Akışa abone ol; kaydedilmiş seq'ten sonraki değişiklikleri uygula"""
+        # Dağıtım apply_change içinde self._lock alır; burada tutulmamalı
+        with self._attach_lock:
+            if self._subscription is not None:
+                return
+            since = self._load_state()
+            if since is not None:
+                oldest = change_feed.read(0, limit=1)
+                if oldest and oldest[0]['seq'] > since + 1:
+                    # Günlük budanmış, aradaki değişiklikler bilinmiyor
+                    since = None
+            if since is None:
+                # Kaldığı yer bilinmiyor: indeksler ilk sorguda baştan oluşturulur
+                self._reset()
+                self._last_seq = change_feed.latest_seq()
+            self._feed = change_feed
+            self._subscription = change_feed.subscribe(self.apply_change, since=since)
+
+    def catch_up(self) -> int:
+        """Akış thread'ini beklemeden bekleyen kayıtları uygula (sorgu öncesi)
+
+        Diğer abonelere dokunmaz; thread aynı kayıtları sonra getirdiğinde
+        state.json'daki seq sayesinde atlanır. Okunan kayıt sayısını döndürür.
+        """
+        feed = self._feed
+        if feed is None:
+            return 0
+        count = 0
+        while True:
+            items = feed.read(self._last_seq, limit=feed.batch_size)
+            for item in items:
+                self.apply_change(item)
+            count += len(items)
+            if len(items) < feed.batch_size:
+                return count
+
+    def _reset(self):
+        """Diskteki indeksleri sil; ilk sorguda yeniden oluşturulur"""
+        with self._lock, self._file_lock():
+            self._indexes.clear()
+            if os.path.isdir(self.base_dir):
+                for name in os.listdir(self.base_dir):
+                    path = os.path.join(self.base_dir, name)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                        logger.warning(f"Vector index discarded: {path}")
+
+    def _read_state(self) -> Optional[int]:
+        """Diske yazılmış son uygulanan seq (herhangi bir process'in)
+
+        Farklı tokenizer sürümüyle oluşturulmuş indeks bilinmiyor sayılır.
+        """
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('tokenizer') != TOKENIZER_VERSION:
+                return None
+            return int(state.get('last_seq', 0))
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _load_state(self) -> Optional[int]:
+        with self._file_lock(exclusive=False):
+            seq = self._read_state()
+        if seq is not None:
+            self._last_seq = seq
+        return seq
+
+    def _save_state(self):
+        """Dosya kilidi altında çağrılır; diğer process'in ilerlemesi geri alınmaz"""
+        self._last_seq = max(self._last_seq, self._read_state() or 0)
+        os.makedirs(self.base_dir, exist_ok=True)
+        temp_path = self.state_path + f'.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'last_seq': self._last_seq, 'dim': self.dim, 'tokenizer': TOKENIZER_VERSION}, f)
+        os.replace(temp_path, self.state_path)
+
+    def apply_change(self, item: Dict[str, Any]):
+        """Tek bir değişiklik kaydını uygula (tekrar uygulanması güvenlidir)"""
+        with self._lock, self._file_lock():
+            # Başka worker bu kaydı zaten uyguladı
+            applied = self._read_state() or 0
+            if item['seq'] <= applied:
+                self._last_seq = max(self._last_seq, applied)
+                return
+            workspace_id, note_id, op = item['workspace_id'], item['note_id'], item['op']
+            index = self._index(workspace_id)
+            index.refresh()
+            # Henüz oluşturulmamış indeks ilk sorguda baştan kurulur
+            if index.exists and op != 'move':
+                if op in ('delete', 'archive'):
+                    if index.remove(note_id):
+                        self.stats['removals'] += 1
+                else:
+                    rows = self.loader(note_ids=[note_id])
+                    if rows:
+                        self._upsert(index, rows[0])
+                    elif index.remove(note_id):
+                        self.stats['removals'] += 1
+                index.flush()
+            self._last_seq = max(self._last_seq, item['seq'])
+            self._save_state()
+
+    def _embed_row(self, row: Dict[str, Any]) -> np.ndarray:
+        tags = row.get('tags') or ()
+        if row.get('term_freq') is not None:
+            return embed_counts(row['term_freq'], tags, self.dim)
+        return embed(row['title'], row['content'], tags, self.dim)
+
+    def _upsert(self, index: WorkspaceVectorIndex, row: Dict[str, Any]):
+        index.upsert(row['id'], self._embed_row(row))
+        self.stats['upserts'] += 1
+
+    # Sorgular
+
+    def rebuild(self, workspace_id: str) -> int:
+        """Workspace indeksini veritabanından baştan oluştur"""
+        with self._lock, self._file_lock():
+            return self._rebuild(workspace_id)
+
+    def _rebuild(self, workspace_id: str) -> int:
+        rows = self.loader(workspace_id=workspace_id)
+        index = self._index(workspace_id)
+        index.replace_all(
+            (row['id'], self._embed_row(row))
+            for row in rows
+        )
+        self.stats['rebuilds'] += 1
+        self._save_state()
+        logger.info(f"Vector index rebuilt for workspace {workspace_id}: {len(rows)} notes")
+        return len(rows)
+
+    def related(self, workspace_id: str, note_id: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Notla en benzer k not (kendisi hariç)"""
+        with self._lock, self._reading(workspace_id) as index:
+            vector = index.vector(note_id)
+            if vector is None:
+                rows = self.loader(note_ids=[note_id])
+                if not rows:
+                    return []
+                vector = self._embed_row(rows[0])
+            self.stats['queries'] += 1
+            return index.query(vector, k, exclude=[note_id])
+
+    def similar_to_text(self, workspace_id: str, text: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Serbest metne en benzer k not"""
+        with self._lock, self._reading(workspace_id) as index:
+            self.stats['queries'] += 1
+            return index.query(embed('', text, (), self.dim), k)
+
+    def clusters(self, workspace_id: str, k: Optional[int] = None,
+                 max_clusters: int = MAX_CLUSTERS) -> List[Dict[str, Any]]:
+        """Workspace notlarını benzerliğe göre kümele (LLM çağrısı yok)
+
+        Her küme: note_ids (merkeze yakınlık sırasıyla), scores (merkez
+        benzerliği) ve duplicates (neredeyse aynı not çiftleri). Kümeler
+        büyükten küçüğe sıralıdır; arşivlenmemiş her not tam bir kümededir.
+        """
+        with self._lock, self._reading(workspace_id) as index:
+            ids, vectors = index.snapshot()
+            self.stats['queries'] += 1
+        if not ids:
+            return []
+
+        labels, centroids = cluster_vectors(vectors, k or suggest_cluster_count(len(ids), max_clusters))
+        clusters = []
+        for label in range(centroids.shape[0]):
+            rows = np.flatnonzero(labels == label)
+            if not len(rows):
+                continue
+            scores = vectors[rows] @ centroids[label]
+            order = np.argsort(-scores)
+            rows, scores = rows[order], scores[order]
+
+            duplicates = []
+            if 1 < len(rows) <= DUPLICATE_SCAN_LIMIT:
+                pairwise = np.triu(vectors[rows] @ vectors[rows].T, k=1)
+                for first, second in zip(*np.nonzero(pairwise >= DUPLICATE_THRESHOLD)):
+                    duplicates.append([ids[rows[first]], ids[rows[second]]])
+
+            clusters.append({
+                'note_ids': [ids[row] for row in rows],
+                'scores': [round(float(score), 4) for score in scores],
+                'duplicates': duplicates
+            })
+        clusters.sort(key=lambda cluster: len(cluster['note_ids']), reverse=True)
+        return clusters
+
+    def close(self):
+        with self._lock, self._file_lock():
+            for index in self._indexes.values():
+                index.flush()
+            if self._subscription is not None:
+                self._save_state()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                'last_seq': self._last_seq,
+                'workspaces': {ws: len(index) for ws, index in self._indexes.items() if index.exists}
+            }
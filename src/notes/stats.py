@@ -0,0 +1,130 @@
+"""
+Notes Workspace Statistics
+==========================
+
+Workspace istatistikleri ve etiket sayaçları için hazır (materialized) değerler.
+
+- workspace_stats: workspace başına toplam / arşivli not ve etiket sayısı
+- tags.note_count: etiketin bağlı olduğu not sayısı
+- Sayaçlar tetikleyicilerle (trigger) yazmayla aynı transaction'da güncellenir;
+  ORM, toplu (executemany) ve ham SQL yazmaları aynı şekilde yansır
+- İstatistik ve popüler etiket sorguları COUNT / GROUP BY yerine tek satır
+  ya da indeks üzerinden ilk N kayıt okur
+
+Tetikleyiciler devre dışıyken yapılan yazmalar veya elle düzeltmeler sonrası
+repair_stats() sayaçları kaynak tablolardan yeniden hesaplar ve sadece
+sapan satırları düzeltir.
+"""
+
+from typing import Dict, Optional
+
+from ..logger import logger
+
+_ARCHIVED = "coalesce({row}.is_archived, 0)"
+
+_UPSERT_NOTE = """INSERT INTO workspace_stats (workspace_id, total_notes, archived_notes, total_tags)
+        VALUES (new.workspace_id, 1, {archived}, 0)
+        ON CONFLICT(workspace_id) DO UPDATE SET
+            total_notes = total_notes + 1,
+            archived_notes = archived_notes + excluded.archived_notes;""".format(
+    archived=_ARCHIVED.format(row='new'))
+
+_REMOVE_NOTE = """UPDATE workspace_stats SET
+            total_notes = total_notes - 1,
+            archived_notes = archived_notes - {archived}
+        WHERE workspace_id = old.workspace_id;""".format(archived=_ARCHIVED.format(row='old'))
+
+TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS workspace_stats_note_insert AFTER INSERT ON notes BEGIN
+        {_UPSERT_NOTE}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS workspace_stats_note_delete AFTER DELETE ON notes BEGIN
+        {_REMOVE_NOTE}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS workspace_stats_note_update AFTER UPDATE OF is_archived, workspace_id ON notes
+    WHEN {_ARCHIVED.format(row='old')} IS NOT {_ARCHIVED.format(row='new')}
+      OR old.workspace_id IS NOT new.workspace_id BEGIN
+        {_REMOVE_NOTE}
+        {_UPSERT_NOTE}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS workspace_stats_tag_insert AFTER INSERT ON tags BEGIN
+        INSERT INTO workspace_stats (workspace_id, total_notes, archived_notes, total_tags)
+        VALUES (new.workspace_id, 0, 0, 1)
+        ON CONFLICT(workspace_id) DO UPDATE SET total_tags = total_tags + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS workspace_stats_tag_delete AFTER DELETE ON tags BEGIN
+        UPDATE workspace_stats SET total_tags = total_tags - 1 WHERE workspace_id = old.workspace_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tags_note_count_insert AFTER INSERT ON note_tags BEGIN
+        UPDATE tags SET note_count = note_count + 1 WHERE id = new.tag_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tags_note_count_delete AFTER DELETE ON note_tags BEGIN
+        UPDATE tags SET note_count = note_count - 1 WHERE id = old.tag_id;
+    END""",
+]
+
+_TAG_COUNT = "(SELECT count(*) FROM note_tags WHERE note_tags.tag_id = tags.id)"
+
+
+def add_note_count_column(connection):
+    """tags.note_count sütununu ekle (create_all ile oluşmuş tablolarda zaten vardır)"""
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(tags)")}
+    if 'note_count' not in columns:
+        connection.exec_driver_sql("ALTER TABLE tags ADD COLUMN note_count INTEGER NOT NULL DEFAULT 0")
+
+
+def create_triggers(connection):
+    for statement in TRIGGERS:
+        connection.exec_driver_sql(statement)
+
+
+def repair_connection(connection, workspace_id: Optional[str] = None) -> Dict[str, int]:
+    """Sayaçları kaynak tablolardan hesapla, sapan satırları düzelt"""
+    where, params = ("", ()) if workspace_id is None else (" AND tags.workspace_id = ?", (workspace_id,))
+    fixed_tags = connection.exec_driver_sql(
+        f"UPDATE tags SET note_count = {_TAG_COUNT} WHERE note_count IS NOT {_TAG_COUNT}{where}", params
+    ).rowcount or 0
+
+    workspace_filter = "" if workspace_id is None else " WHERE workspace_id = ?"
+    expected: Dict[str, list] = {}
+    for ws, total, archived in connection.exec_driver_sql(
+        f"SELECT workspace_id, count(*), coalesce(sum(coalesce(is_archived, 0)), 0) FROM notes"
+        f"{workspace_filter} GROUP BY workspace_id", params
+    ):
+        expected[ws] = [total, archived, 0]
+    for ws, total in connection.exec_driver_sql(
+        f"SELECT workspace_id, count(*) FROM tags{workspace_filter} GROUP BY workspace_id", params
+    ):
+        expected.setdefault(ws, [0, 0, 0])[2] = total
+
+    current = {
+        row[0]: list(row[1:]) for row in connection.exec_driver_sql(
+            f"SELECT workspace_id, total_notes, archived_notes, total_tags FROM workspace_stats"
+            f"{workspace_filter}", params
+        )
+    }
+
+    fixed_workspaces = 0
+    for ws in set(expected) | set(current):
+        values = expected.get(ws, [0, 0, 0])
+        if current.get(ws) == values:
+            continue
+        connection.exec_driver_sql(
+            "INSERT INTO workspace_stats (workspace_id, total_notes, archived_notes, total_tags) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT(workspace_id) DO UPDATE SET "
+            "total_notes = excluded.total_notes, archived_notes = excluded.archived_notes, "
+            "total_tags = excluded.total_tags",
+            (ws, *values)
+        )
+        fixed_workspaces += 1
+
+    return {'workspaces': fixed_workspaces, 'tags': fixed_tags}
+
+
+def repair_stats(engine, workspace_id: Optional[str] = None) -> Dict[str, int]:
+    """Tutarlılık onarımı; düzeltilen workspace ve etiket sayısını döndür"""
+    with engine.begin() as connection:
+        fixed = repair_connection(connection, workspace_id)
+    if fixed['workspaces'] or fixed['tags']:
+        logger.warning(f"Notes stats drift repaired: {fixed}")
+    return fixed
@@ -0,0 +1,216 @@
+"""
+Note Version History
+====================
+
+Not içerik geçmişi: ters delta (reverse diff) + periyodik tam kopya.
+
+- Güncel içerik her zaman notes tablosundadır
+- Bir not güncellenince eski sürüm, yeni içerikten eskisine giden küçük
+  bir ters delta olarak saklanır; her SNAPSHOT_INTERVAL kayıtta bir tam
+  kopya (snapshot) yazılır, böylece yeniden oluşturma zinciri kısa kalır
+- Sürüm N: N'den büyük/eşit ilk snapshot'tan (yoksa güncel içerikten)
+  başlanır ve geriye doğru deltalar uygulanır
+- Kayıtlar sıkıştırılır: zstandard kuruluysa zstd, değilse zlib
+- Saklama politikası: not başına son KEEP_VERSIONS kayıt ve/veya yaş sınırı;
+  eski kayıtları silmek yeni sürümlerin oluşturulmasını etkilemez
+
+Sadece başlığı veya içeriği değişen güncellemeler kayıt üretir; kaydı
+olmayan ara sürümler bir sonraki kayıtlı sürümle aynı içeriğe sahiptir.
+"""
+
+import json
+import re
+import zlib
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, func, select
+
+from .models import NoteVersion
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Kaç kayıtta bir tam kopya saklanır (en uzun delta zinciri)
+SNAPSHOT_INTERVAL = 20
+# Not başına saklanan en fazla geçmiş kaydı
+KEEP_VERSIONS = 200
+
+KIND_DELTA = 'delta'
+KIND_SNAPSHOT = 'snapshot'
+
+# Satır sonlarından ve HTML etiketlerinden sonra böl: tek satırlık HTML'de de küçük delta
+_TOKEN_SPLIT = re.compile(r'(?<=\n)|(?<=>)')
+
+_CODEC_ZLIB = b'z'
+_CODEC_ZSTD = b's'
+
+
+def compress(data: bytes) -> bytes:
+    if ZSTD_AVAILABLE:
+        return _CODEC_ZSTD + zstandard.ZstdCompressor(level=6).compress(data)
+    return _CODEC_ZLIB + zlib.compress(data, 6)
+
+
+def decompress(payload: bytes) -> bytes:
+    codec, body = payload[:1], payload[1:]
+    if codec == _CODEC_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard kurulu değil, sürüm açılamıyor")
+        return zstandard.ZstdDecompressor().decompress(body)
+    return zlib.decompress(body)
+
+
+def _tokens(text: str) -> List[str]:
+    return [token for token in _TOKEN_SPLIT.split(text or '') if token]
+
+
+def make_delta(base: str, target: str) -> bytes:
+    """base metninden target metnini üreten sıkıştırılmış delta
+
+    Delta işlemleri: [i, j] -> base token'ları i..j kopyala, "metin" -> ekle.
+    """
+    base_tokens, target_tokens = _tokens(base), _tokens(target)
+    ops: List[Any] = []
+    matcher = SequenceMatcher(None, base_tokens, target_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif tag in ('replace', 'insert'):
+            ops.append(''.join(target_tokens[j1:j2]))
+    return compress(json.dumps(ops, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def apply_delta(base: str, delta: bytes) -> str:
+    base_tokens = _tokens(base)
+    parts = []
+    for op in json.loads(decompress(delta).decode('utf-8')):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_tokens[op[0]:op[1]])
+    return ''.join(parts)
+
+
+def record_version(session, note_id: str, version: int, title: str, content: str,
+                   new_content: str, edited_by: Optional[str], edited_at: Optional[datetime],
+                   change_summary: Optional[str] = None,
+                   keep_versions: int = KEEP_VERSIONS) -> NoteVersion:
+    """Güncellemeden önceki sürümü (version) geçmişe yaz
+
+    content: sürümün içeriği, new_content: güncelleme sonrası içerik.
+    """
+    recent_kinds = [row[0] for row in session.execute(
+        select(NoteVersion.kind)
+        .where(NoteVersion.note_id == note_id)
+        .order_by(NoteVersion.version.desc())
+        .limit(SNAPSHOT_INTERVAL - 1)
+    )]
+    needs_snapshot = len(recent_kinds) >= SNAPSHOT_INTERVAL - 1 and KIND_SNAPSHOT not in recent_kinds
+
+    if needs_snapshot:
+        kind, payload = KIND_SNAPSHOT, compress((content or '').encode('utf-8'))
+    else:
+        kind, payload = KIND_DELTA, make_delta(new_content or '', content or '')
+
+    entry = NoteVersion(
+        note_id=note_id,
+        version=version,
+        kind=kind,
+        title=title,
+        payload=payload,
+        content_size=len(content or ''),
+        edited_by=edited_by,
+        edited_at=edited_at or datetime.now(),
+        change_summary=change_summary
+    )
+    session.merge(entry)
+
+    if keep_versions:
+        prune_versions(session, note_id, keep_versions=keep_versions)
+    return entry
+
+
+def reconstruct(session, note_id: str, version: int, current_version: int,
+                current_title: str, current_content: str) -> Optional[Dict[str, Any]]:
+    """Sürüm N'in başlık ve içeriğini yeniden oluştur (bulunamazsa None)"""
+    if version == current_version:
+        return {'version': version, 'title': current_title, 'content': current_content}
+    if version < 1 or version > current_version:
+        return None
+
+    oldest = session.execute(
+        select(func.min(NoteVersion.version)).where(NoteVersion.note_id == note_id)
+    ).scalar()
+    if oldest is None or version < oldest:
+        # Saklama politikasıyla silinmiş
+        return None
+
+    # N'den sonraki ilk snapshot'a kadar olan kayıtlar (artan sırada)
+    rows = []
+    for row in session.execute(
+        select(NoteVersion)
+        .where(NoteVersion.note_id == note_id, NoteVersion.version >= version)
+        .order_by(NoteVersion.version)
+    ).scalars():
+        rows.append(row)
+        if row.kind == KIND_SNAPSHOT:
+            break
+
+    if rows and rows[-1].kind == KIND_SNAPSHOT:
+        content = decompress(rows[-1].payload).decode('utf-8')
+        deltas = rows[:-1]
+    else:
+        content = current_content or ''
+        deltas = rows
+
+    for row in reversed(deltas):
+        content = apply_delta(content, row.payload)
+
+    title = rows[0].title if rows else current_title
+    return {
+        'version': version,
+        'title': title,
+        'content': content,
+        'edited_by': rows[0].edited_by if rows else None,
+        'edited_at': rows[0].edited_at.isoformat() if rows and rows[0].edited_at else None
+    }
+
+
+def prune_versions(session, note_id: Optional[str] = None,
+                   keep_versions: Optional[int] = KEEP_VERSIONS,
+                   max_age_days: Optional[int] = None) -> int:
+    """Saklama politikası: en yeni keep_versions kaydı ve/veya max_age_days gününü tut"""
+    removed = 0
+
+    if max_age_days is not None:
+        statement = delete(NoteVersion).where(
+            NoteVersion.edited_at < datetime.now() - timedelta(days=max_age_days)
+        )
+        if note_id is not None:
+            statement = statement.where(NoteVersion.note_id == note_id)
+        removed += session.execute(statement).rowcount or 0
+
+    if keep_versions:
+        note_ids = [note_id] if note_id is not None else [
+            row[0] for row in session.execute(select(NoteVersion.note_id).distinct())
+        ]
+        for current_id in note_ids:
+            cutoff = session.execute(
+                select(NoteVersion.version)
+                .where(NoteVersion.note_id == current_id)
+                .order_by(NoteVersion.version.desc())
+                .offset(keep_versions)
+                .limit(1)
+            ).scalar()
+            if cutoff is not None:
+                removed += session.execute(
+                    delete(NoteVersion).where(NoteVersion.note_id == current_id,
+                                              NoteVersion.version <= cutoff)
+                ).rowcount or 0
+
+    return removed
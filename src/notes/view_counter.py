@@ -0,0 +1,134 @@
+"""
+Note View Counter
+=================
+
+Not görüntülenme sayaçları için bellek içi toplayıcı.
+
+Okumalar veritabanına yazmaz: her görüntülenme bellekte not başına
+biriktirilir ve arka plan thread'i tarafından belirli aralıklarla (ya da
+yeterli olay birikince) tek bir toplu UPDATE ile yazılır. Böylece not
+okumaları SQLite yazma kilidi için yarışmaz.
+
+Process kapanırken bekleyen sayaçlar yazılır. Thread ilk kayıtta başlatılır
+ve prefork worker'larda her process'te yeniden oluşturulur.
+"""
+
+import atexit
+import os
+import threading
+from typing import Dict
+
+from sqlalchemy import text
+
+from ..logger import logger
+
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_FLUSH_THRESHOLD = 100
+
+
+class ViewCounter:
+    """Tamponlu görüntülenme sayacı"""
+
+    def __init__(self, engine,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 flush_threshold: int = DEFAULT_FLUSH_THRESHOLD):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+
+        self._pending: Dict[str, int] = {}
+        self._pending_events = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stopped = False
+
+        self.stats = {'recorded': 0, 'flushes': 0, 'rows_updated': 0, 'errors': 0}
+        atexit.register(self.stop)
+
+    def record(self, note_id: str, count: int = 1):
+        """Görüntülenmeyi tampona ekle"""
+        self._ensure_thread()
+        with self._lock:
+            self._pending[note_id] = self._pending.get(note_id, 0) + count
+            self._pending_events += count
+            self.stats['recorded'] += count
+            full = self._pending_events >= self.flush_threshold
+        if full:
+            self._wake.set()
+
+    def pending(self, note_id: str) -> int:
+        """Henüz yazılmamış görüntülenme sayısı"""
+        with self._lock:
+            return self._pending.get(note_id, 0)
+
+    def flush(self) -> int:
+        """Bekleyen sayaçları tek transaction'da yaz; güncellenen not sayısını döndür"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._pending_events = 0
+            if not batch:
+                return 0
+
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(
+                        text("UPDATE notes SET view_count = coalesce(view_count, 0) + :count WHERE id = :note_id"),
+                        [{'note_id': note_id, 'count': count} for note_id, count in batch.items()]
+                    )
+            except Exception as e:
+                # Sayaçlar kaybolmasın; bir sonraki flush'ta tekrar denenir
+                with self._lock:
+                    for note_id, count in batch.items():
+                        self._pending[note_id] = self._pending.get(note_id, 0) + count
+                        self._pending_events += count
+                    self.stats['errors'] += 1
+                logger.error(f"View counter flush failed: {e}")
+                return 0
+
+            with self._lock:
+                self.stats['flushes'] += 1
+                self.stats['rows_updated'] += len(batch)
+            return len(batch)
+
+    def _ensure_thread(self):
+        if self._stopped:
+            return
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        if self._pid not in (None, pid):
+            # Fork sonrası: ebeveynin kilitleri ve tamponu bu process'e ait değil
+            self._lock = threading.Lock()
+            self._flush_lock = threading.Lock()
+            self._wake = threading.Event()
+            self._pending = {}
+            self._pending_events = 0
+            self._thread = None
+            self._pid = pid
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="notes-view-counter", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self):
+        """Thread'i durdur ve bekleyenleri yaz"""
+        self._stopped = True
+        self._wake.set()
+        if self._pid in (None, os.getpid()):
+            self.flush()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, 'pending_notes': len(self._pending), 'pending_events': self._pending_events}
@@ -2,18 +2,21 @@
 Project Memory System - Konuşma Hafızası ve Görev Yönetimi
 """
 import json
-import sqlite3
 import os
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 import uuid
 
+from .server_runtime.sqlite_pool import get_connection_factory
+
 class ProjectMemory:
     """Proje hafızası ve görev yönetimi sistemi"""
     
     def __init__(self, db_path: str = "data/project_memory.db"):
         self.db_path = db_path
         self.ensure_directory()
+        # Paylaşılan bağlantı havuzu (WAL, okuyucu havuzu + tek yazar)
+        self.db = get_connection_factory(db_path)
         self.init_database()
     
     def ensure_directory(self):
@@ -22,7 +25,7 @@ class ProjectMemory:
     
     def init_database(self):
         """Veritabanı tablolarını oluştur"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.writer() as conn:
             cursor = conn.cursor()
             
             # Konuşmalar tablosu
@@ -87,14 +90,12 @@ class ProjectMemory:
                     metadata TEXT -- JSON format
                 )
             ''')
-            
-            conn.commit()
     
     def save_conversation(self, conversation_data: Dict[str, Any]) -> str:
         """Konuşmayı kaydet"""
         conversation_id = str(uuid.uuid4())
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.writer() as conn:
             cursor = conn.cursor()
             
             # Konuşma kaydı
@@ -129,14 +130,12 @@ class ProjectMemory:
                     message.get('message_type', 'response'),
                     json.dumps(message.get('metadata', {}))
                 ))
-            
-            conn.commit()
         
         return conversation_id
     
     def get_conversation_history(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Konuşma geçmişini getir"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.reader() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, title, initial_prompt, status, created_at, completed_at, 
@@ -164,7 +163,7 @@ class ProjectMemory:
     
     def get_conversation_details(self, conversation_id: str) -> Optional[Dict[str, Any]]:
         """Konuşma detaylarını getir"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.reader() as conn:
             cursor = conn.cursor()
             
             # Konuşma bilgisi
@@ -216,7 +215,7 @@ class ProjectMemory:
         """Mesajdan görev oluştur"""
         task_id = str(uuid.uuid4())
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.writer() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO tasks 
@@ -232,13 +231,12 @@ class ProjectMemory:
                 task_data.get('due_date'),
                 json.dumps(task_data.get('metadata', {}))
             ))
-            conn.commit()
         
         return task_id
     
     def get_active_tasks(self) -> List[Dict[str, Any]]:
         """Aktif görevleri getir"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.reader() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT t.id, t.title, t.description, t.priority, t.status, t.assigned_to,
@@ -276,7 +274,7 @@ class ProjectMemory:
     
     def update_task_status(self, task_id: str, status: str) -> bool:
         """Görev durumunu güncelle"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.writer() as conn:
             cursor = conn.cursor()
             
             completed_at = datetime.now() if status == 'completed' else None
@@ -286,7 +284,6 @@ class ProjectMemory:
                 WHERE id = ?
             ''', (status, completed_at, task_id))
             
-            conn.commit()
             return cursor.rowcount > 0
     
     def get_conversation_summary_for_context(self, conversation_id: str) -> str:
@@ -316,7 +313,7 @@ class ProjectMemory:
     
     def search_conversations(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Konuşmalarda arama yap"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.reader() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT DISTINCT c.id, c.title, c.initial_prompt, c.created_at
@@ -0,0 +1,42 @@
+"""
+🚀 Server Runtime - Seçilebilir Sunucu Modları
+=============================================
+
+Web UI'nın çalışma modunu yapılandırmaya göre belirler:
+- threading (geliştirme) veya gevent/eventlet (production) backend
+- Gerçek WebSocket transport
+- Çoklu worker process
+- Process'ler arası Socket.IO emit için message queue (Redis veya yerel SQLite)
+- Konuşma, müdahale ve room durumu için paylaşılan state backend'i
+- SQLite veritabanları için ortak bağlantı profili (WAL, okuyucu havuzu, tek yazar)
+"""
+
+from .config import ServerRuntimeConfig
+from .message_queue import SQLiteQueueManager, build_socketio_options
+from .server import serve, apply_monkey_patch
+from .shared_state import (
+    SharedStateBackend,
+    InMemoryStateBackend,
+    SQLiteStateBackend,
+    RedisStateBackend,
+    create_state_backend,
+    routing_hint
+)
+from .sqlite_pool import SQLiteProfile, SQLiteConnectionFactory, get_connection_factory
+
+__all__ = [
+    'ServerRuntimeConfig',
+    'SQLiteQueueManager',
+    'build_socketio_options',
+    'serve',
+    'apply_monkey_patch',
+    'SharedStateBackend',
+    'InMemoryStateBackend',
+    'SQLiteStateBackend',
+    'RedisStateBackend',
+    'create_state_backend',
+    'routing_hint',
+    'SQLiteProfile',
+    'SQLiteConnectionFactory',
+    'get_connection_factory'
+]
@@ -0,0 +1,126 @@
+"""
+Server Runtime Configuration
+============================
+
+Web sunucusunun çalışma modunu ortam değişkenlerinden okur.
+
+Ortam değişkenleri:
+- SERVER_MODE: development | production
+- SERVER_ASYNC_MODE: threading | gevent | eventlet
+- SERVER_WORKERS: worker process sayısı (production)
+- SOCKETIO_MESSAGE_QUEUE: redis://..., sqlite:///data/socketio_queue.db
+- SOCKETIO_TRANSPORTS: polling,websocket
+- SHARED_STATE_URL: memory://, sqlite:///data/shared_state.db, redis://...
+- CONVERSATION_STORE_URL: konuşma checkpoint'leri (varsayılan: paylaşılan state veya sqlite)
+- CONVERSATION_PIPELINE: true | false (PM/LD turlarını üst üste bindir)
+"""
+
+import os
+import importlib.util
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from ..logger import logger
+
+SUPPORTED_ASYNC_MODES = ('threading', 'gevent', 'eventlet')
+DEFAULT_QUEUE_URL = 'sqlite:///data/socketio_queue.db'
+DEFAULT_SHARED_STATE_URL = 'sqlite:///data/shared_state.db'
+DEFAULT_CONVERSATION_STORE_URL = 'sqlite:///data/conversations.db'
+
+
+def _split_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+@dataclass
+class ServerRuntimeConfig:
+    """Web sunucusu çalışma modu yapılandırması"""
+
+    mode: str = "development"
+    async_mode: str = "threading"
+    workers: int = 1
+    message_queue: Optional[str] = None
+    cors_allowed_origins: str = "*"
+    ping_interval: int = 25
+    ping_timeout: int = 20
+    transports: List[str] = field(default_factory=lambda: ['polling', 'websocket'])
+    shared_state_url: str = "memory://"
+    conversation_store_url: str = DEFAULT_CONVERSATION_STORE_URL
+    conversation_pipeline: bool = True
+
+    @classmethod
+    def from_env(cls) -> "ServerRuntimeConfig":
+        """Ortam değişkenlerinden yapılandırma oluştur"""
+        mode = os.getenv('SERVER_MODE', 'development').lower()
+        production = mode == 'production'
+
+        workers = max(1, int(os.getenv('SERVER_WORKERS', '1')))
+        async_mode = os.getenv('SERVER_ASYNC_MODE', 'gevent' if production else 'threading').lower()
+
+        # Birden fazla worker varsa emit'lerin diğer process'lere ulaşması için queue şart
+        message_queue = os.getenv('SOCKETIO_MESSAGE_QUEUE') or (DEFAULT_QUEUE_URL if workers > 1 else None)
+
+        # Çoklu worker'da long-polling sticky session ister; varsayılan olarak sadece WebSocket
+        default_transports = 'websocket' if workers > 1 else 'polling,websocket'
+        transports = _split_list(os.getenv('SOCKETIO_TRANSPORTS', default_transports))
+
+        # Konuşma/room durumu worker'lar arasında paylaşılmalı
+        shared_state_url = os.getenv('SHARED_STATE_URL') or (DEFAULT_SHARED_STATE_URL if workers > 1 else 'memory://')
+
+        # Konuşma checkpoint'leri restart'tan sonra da yaşamalı; bellek içi state yeterli değil
+        conversation_store_url = os.getenv('CONVERSATION_STORE_URL') or (
+            shared_state_url if shared_state_url != 'memory://' else DEFAULT_CONVERSATION_STORE_URL
+        )
+
+        config = cls(
+            mode=mode,
+            async_mode=async_mode,
+            workers=workers,
+            message_queue=message_queue,
+            cors_allowed_origins=os.getenv('SOCKETIO_CORS_ORIGINS', '*'),
+            ping_interval=int(os.getenv('SOCKETIO_PING_INTERVAL', '25')),
+            ping_timeout=int(os.getenv('SOCKETIO_PING_TIMEOUT', '20')),
+            transports=transports,
+            shared_state_url=shared_state_url,
+            conversation_store_url=conversation_store_url,
+            conversation_pipeline=os.getenv('CONVERSATION_PIPELINE', 'true').lower() in ('1', 'true', 'yes')
+        )
+        config.validate()
+        return config
+
+    @property
+    def is_production(self) -> bool:
+        return self.mode == 'production'
+
+    def validate(self):
+        """Yapılandırmayı doğrula"""
+        if self.async_mode not in SUPPORTED_ASYNC_MODES:
+            raise ValueError(f"Desteklenmeyen async mode: {self.async_mode}")
+        if not self.transports or any(t not in ('polling', 'websocket') for t in self.transports):
+            raise ValueError(f"Geçersiz Socket.IO transport listesi: {self.transports}")
+
+    def resolve_async_mode(self) -> str:
+        """Seçilen backend yüklü değilse threading moduna düş"""
+        if self.async_mode == 'threading':
+            return 'threading'
+
+        if importlib.util.find_spec(self.async_mode) is None:
+            logger.warning(f"{self.async_mode} yüklü değil, threading moduna geçiliyor")
+            return 'threading'
+
+        return self.async_mode
+
+    def client_options(self) -> Dict[str, Any]:
+        """Tarayıcıdaki Socket.IO istemcisi için bağlantı seçenekleri"""
+        return {'transports': list(self.transports)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'async_mode': self.resolve_async_mode(),
+            'workers': self.workers,
+            'message_queue': self.message_queue.split('://')[0] if self.message_queue else None,
+            'transports': list(self.transports),
+            'shared_state': self.shared_state_url.split('://')[0],
+            'conversation_store': self.conversation_store_url.split('://')[0]
+        }
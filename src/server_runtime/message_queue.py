@@ -0,0 +1,138 @@
+"""
+Socket.IO Message Queue
+=======================
+
+Birden fazla worker process arasında Socket.IO emit'lerini dağıtır.
+Redis/RabbitMQ/Kafka URL'leri doğrudan Flask-SocketIO'ya bırakılır;
+``sqlite://`` URL'i ise harici servis gerektirmeyen yerel bir kuyruk kullanır.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import closing
+from typing import Any, Dict
+
+import socketio
+
+from .config import ServerRuntimeConfig
+
+
+class SQLiteQueueManager(socketio.PubSubManager):
+    """Redis gerektirmeyen, SQLite tabanlı yerel pub/sub kuyruğu
+
+    Aynı makinedeki worker process'ler için Redis'in yerine geçer.
+    Her worker yayınlanan mesajları kısa aralıklarla okur.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, url: str = 'sqlite:///data/socketio_queue.db',
+                 channel: str = 'flask-socketio', write_only: bool = False,
+                 logger=None, json=None, poll_interval: float = 0.05,
+                 retention_seconds: int = 60):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.db_path = url[len('sqlite:///'):] if url.startswith('sqlite:///') else url
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Şema geçici bağlantıyla oluşturulur: manager prefork öncesi ebeveynde
+        # kurulur ve açık kalan bağlantı fork ile worker'lara geçerdi
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS socketio_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_socketio_messages_channel ON socketio_messages (channel, id)')
+        _managers.add(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Thread başına tek bağlantı (process başına yeniden açılır)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _reset_after_fork(self):
+        """Çocuk process: ebeveynden kalan bağlantıları kapatmadan bırak"""
+        self._local = threading.local()
+
+    def _publish(self, data):
+        self._connection().execute(
+            'INSERT INTO socketio_messages (channel, payload, created_at) VALUES (?, ?, ?)',
+            (self.channel, self.json.dumps(data), time.time())
+        )
+
+    def _listen(self):
+        conn = self._connection()
+        last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM socketio_messages').fetchone()[0]
+        last_prune = time.time()
+
+        while True:
+            rows = conn.execute(
+                'SELECT id, payload FROM socketio_messages WHERE channel = ? AND id > ? ORDER BY id',
+                (self.channel, last_id)
+            ).fetchall()
+
+            for message_id, payload in rows:
+                last_id = message_id
+                yield payload
+
+            # Eski mesajları temizle (tüm worker'lar okumuş olur)
+            now = time.time()
+            if now - last_prune > self.retention_seconds:
+                conn.execute('DELETE FROM socketio_messages WHERE created_at < ?',
+                             (now - self.retention_seconds,))
+                last_prune = now
+
+            if not rows:
+                self.server.sleep(self.poll_interval)
+
+
+# Fork sonrası bağlantıları sıfırlanacak manager'lar
+_managers = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for manager in list(_managers):
+        manager._reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def build_socketio_options(config: ServerRuntimeConfig) -> Dict[str, Any]:
+    """SocketIO(...) için anahtar kelime argümanlarını oluştur"""
+    options = {
+        'async_mode': config.resolve_async_mode(),
+        'cors_allowed_origins': config.cors_allowed_origins,
+        'ping_interval': config.ping_interval,
+        'ping_timeout': config.ping_timeout,
+        'transports': list(config.transports)
+    }
+
+    if config.message_queue:
+        if config.message_queue.startswith('sqlite://'):
+            options['client_manager'] = SQLiteQueueManager(config.message_queue)
+        else:
+            options['message_queue'] = config.message_queue
+
+    return options
@@ -0,0 +1,111 @@
+"""
+Server Runners
+==============
+
+Seçilen async moda göre web sunucusunu çalıştırır:
+- threading: Werkzeug geliştirme sunucusu (mevcut davranış)
+- gevent / eventlet: gerçek WebSocket transport'lu production sunucusu
+- workers > 1: ortak dinleme soketini paylaşan prefork worker process'ler
+"""
+
+import os
+import signal
+import socket
+from typing import List
+
+from .config import ServerRuntimeConfig
+from ..logger import logger
+from ..monkey_patch import patch_async_mode
+
+
+def apply_monkey_patch(config: ServerRuntimeConfig) -> str:
+    """gevent/eventlet için standart kütüphaneyi yamala
+
+    Bu paket import edildiğinde yama için geç kalınmış olur; giriş noktaları
+    src.monkey_patch.patch_from_env'i en başta çağırmalıdır.
+    """
+    return patch_async_mode(config.resolve_async_mode())
+
+
+def _create_listener(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Worker'lar arasında paylaşılacak dinleme soketi"""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(backlog)
+    return listener
+
+
+def _serve_listener(mode: str, listener: socket.socket, app):
+    """Verilen soket üzerinde async WSGI sunucusunu çalıştır"""
+    if mode == 'gevent':
+        from gevent import pywsgi
+        try:
+            from geventwebsocket.handler import WebSocketHandler
+            handler_class = WebSocketHandler
+        except ImportError:
+            # gevent-websocket yoksa engineio simple-websocket'e düşer
+            handler_class = pywsgi.WSGIHandler
+
+        pywsgi.WSGIServer(listener, app, handler_class=handler_class, log=None).serve_forever()
+
+    elif mode == 'eventlet':
+        # monkey_patch sonrası soket zaten green socket'tir
+        import eventlet.wsgi
+        eventlet.wsgi.server(listener, app, log_output=False)
+
+    else:
+        raise ValueError(f"Listener tabanlı sunucu bu modu desteklemiyor: {mode}")
+
+
+def _run_prefork(mode: str, listener: socket.socket, app, workers: int):
+    """Ortak soketi paylaşan worker process'leri başlat ve izle"""
+    children: List[int] = []
+
+    for index in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                logger.info(f"👷 Worker {index + 1}/{workers} başlatıldı (pid={os.getpid()})")
+                _serve_listener(mode, listener, app)
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def _shutdown(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    for child in children:
+        try:
+            os.waitpid(child, 0)
+        except ChildProcessError:
+            pass
+
+
+def serve(socketio, app, host: str, port: int, config: ServerRuntimeConfig):
+    """Sunucuyu yapılandırmaya göre çalıştır (bloklar)"""
+    mode = config.resolve_async_mode()
+
+    if mode == 'threading':
+        if config.workers > 1:
+            logger.warning("threading modunda çoklu worker desteklenmiyor, tek process ile çalışılıyor")
+        socketio.run(app, host=host, port=port, debug=False, allow_unsafe_werkzeug=True)
+        return
+
+    listener = _create_listener(host, port)
+
+    if config.workers > 1 and hasattr(os, 'fork'):
+        logger.info(f"🚀 {mode} sunucusu {config.workers} worker ile başlatılıyor: {host}:{port}")
+        _run_prefork(mode, listener, app, config.workers)
+    else:
+        if config.workers > 1:
+            logger.warning("Bu platformda fork desteklenmiyor, tek worker ile çalışılıyor")
+        logger.info(f"🚀 {mode} sunucusu başlatılıyor: {host}:{port}")
+        _serve_listener(mode, listener, app)
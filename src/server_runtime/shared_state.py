@@ -0,0 +1,439 @@
+"""
+Shared State Backends
+=====================
+
+Worker process'ler arasında paylaşılan durum:
+- Aktif konuşmalar ve durumları
+- Yönetici müdahale kuyrukları
+- Doküman room üyelikleri
+- Canlı doküman içerikleri
+
+Tüm yüksek seviye işlemler tek bir atomik ``update`` primitifi üzerine kuruludur;
+backend'ler sadece get/set/delete/keys/update sağlar.
+
+Ortam değişkenleri:
+- SHARED_STATE_URL: memory:// (varsayılan), sqlite:///data/shared_state.db, redis://host:6379/0
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+import zlib
+from contextlib import closing
+from datetime import datetime
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Namespace'ler
+CONVERSATIONS = 'conversations'
+INTERVENTIONS = 'interventions'
+ROOMS = 'rooms'
+DOCUMENTS = 'documents'
+
+# Room başına tutulan son operasyon sayısı (conflict tespiti için)
+ROOM_OPERATION_HISTORY = 20
+
+# Doküman başına paylaşılan state'e yazılan son değişiklik sayısı; her düzenleme
+# tüm belgeyi yeniden yazdığından geçmişin tamamı burada tutulmaz
+DOCUMENT_CHANGE_HISTORY = 50
+
+# (yeni_değer, sonuç) döndüren atomik güncelleme fonksiyonu; yeni_değer None ise anahtar silinir
+Mutator = Callable[[Optional[Any]], Tuple[Optional[Any], Any]]
+
+
+def routing_hint(key: str, workers: int) -> int:
+    """Anahtar için kararlı worker indeksi (sticky routing ipucu)
+
+    Load balancer aynı session/doküman isteklerini aynı worker'a
+    yönlendirmek için bu değeri kullanabilir.
+    """
+    if workers <= 1:
+        return 0
+    return zlib.crc32(key.encode('utf-8')) % workers
+
+
+class SharedStateBackend(ABC):
+    """Paylaşılan durum backend'i için temel sınıf"""
+
+    # Process'ler arası paylaşılıyor mu (in-memory backend için False)
+    shared = True
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Değeri getir"""
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any):
+        """Değeri yaz"""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        """Değeri sil"""
+
+    @abstractmethod
+    def keys(self, namespace: str) -> List[str]:
+        """Namespace'deki anahtarları listele"""
+
+    @abstractmethod
+    def update(self, namespace: str, key: str, mutator: Mutator) -> Any:
+        """Atomik read-modify-write işlemi"""
+
+    def values(self, namespace: str) -> Dict[str, Any]:
+        result = {}
+        for key in self.keys(namespace):
+            value = self.get(namespace, key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    # Conversation Operations
+    def create_conversation(self, session_id: str, conversation: Dict[str, Any]):
+        self.set(CONVERSATIONS, session_id, conversation)
+
+    def get_conversation(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.get(CONVERSATIONS, session_id)
+
+    def has_conversation(self, session_id: str) -> bool:
+        return self.get(CONVERSATIONS, session_id) is not None
+
+    def update_conversation(self, session_id: str, **fields) -> Optional[Dict[str, Any]]:
+        """Konuşma alanlarını atomik olarak güncelle"""
+        def mutate(conversation):
+            if conversation is None:
+                return None, None
+            conversation.update(fields)
+            return conversation, conversation
+        return self.update(CONVERSATIONS, session_id, mutate)
+
+    def append_conversation_history(self, session_id: str, entry: str) -> bool:
+        def mutate(conversation):
+            if conversation is None:
+                return None, False
+            conversation['context']['conversation_history'].append(entry)
+            return conversation, True
+        return self.update(CONVERSATIONS, session_id, mutate)
+
+    def transition_conversation(self, session_id: str, expected_status: str,
+                                new_status: str, **fields) -> Optional[Dict[str, Any]]:
+        """Durum beklenen değerdeyse atomik olarak değiştir (compare-and-set)"""
+        def mutate(conversation):
+            if conversation is None or conversation.get('status') != expected_status:
+                return conversation, None
+            conversation['status'] = new_status
+            conversation.update(fields)
+            return conversation, conversation
+        return self.update(CONVERSATIONS, session_id, mutate)
+
+    def pop_conversation(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.update(CONVERSATIONS, session_id, lambda conversation: (None, conversation))
+
+    # Intervention Operations
+    def push_intervention(self, session_id: str, intervention: Dict[str, Any]) -> int:
+        """Müdahaleyi kuyruğa ekle, kuyruk uzunluğunu döndür"""
+        def mutate(queue):
+            queue = queue or []
+            queue.append(intervention)
+            return queue, len(queue)
+        return self.update(INTERVENTIONS, session_id, mutate)
+
+    def take_latest_intervention(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """En son uygulanmamış müdahaleyi al; bekleyenlerin hepsini uygulandı işaretle
+
+        Aynı turda gelen eski müdahaleler son müdahaleyle geçersiz olur;
+        açık kalsalardı has_pending_intervention hep True dönerdi.
+        """
+        def mutate(queue):
+            if not queue:
+                return queue, None
+            pending = [i for i in queue if not i['applied']]
+            if not pending:
+                return queue, None
+            for intervention in pending:
+                intervention['applied'] = True
+            return queue, pending[-1]
+        return self.update(INTERVENTIONS, session_id, mutate)
+
+    def has_pending_intervention(self, session_id: str) -> bool:
+        queue = self.get(INTERVENTIONS, session_id) or []
+        return any(not i['applied'] for i in queue)
+
+    def count_interventions(self, session_id: str) -> int:
+        return len(self.get(INTERVENTIONS, session_id) or [])
+
+    # Room Membership Operations
+    def join_room(self, document_id: str, session_id: str, user_name: str,
+                  colors: List[str]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Kullanıcıyı room'a ekle ve boştaki ilk rengi ata"""
+        def mutate(room):
+            room = room or {'user_sessions': {}, 'users': [], 'operations': []}
+            used_colors = [user['color'] for user in room['users']]
+            available_colors = [c for c in colors if c not in used_colors]
+
+            user_info = {
+                'session_id': session_id,
+                'name': user_name,
+                'color': available_colors[0] if available_colors else colors[0],
+                'cursor_position': {'x': 0, 'y': 0},
+                'joined_at': datetime.now().isoformat()
+            }
+            room['user_sessions'][session_id] = user_info
+            room['users'].append(user_info)
+            return room, (user_info, list(room['users']))
+        return self.update(ROOMS, document_id, mutate)
+
+    def leave_room(self, document_id: str, session_id: str) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Kullanıcıyı room'dan çıkar; room boşalırsa sil"""
+        def mutate(room):
+            if not room or session_id not in room['user_sessions']:
+                return room, None
+            user_info = room['user_sessions'].pop(session_id)
+            room['users'] = [u for u in room['users'] if u['session_id'] != session_id]
+            remaining = list(room['users'])
+            return (room if remaining else None), (user_info, remaining)
+        return self.update(ROOMS, document_id, mutate)
+
+    def get_room(self, document_id: str) -> Optional[Dict[str, Any]]:
+        return self.get(ROOMS, document_id)
+
+    def get_room_user(self, document_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+        room = self.get(ROOMS, document_id)
+        return room['user_sessions'].get(session_id) if room else None
+
+    def update_room_user(self, document_id: str, session_id: str, **fields) -> Optional[Dict[str, Any]]:
+        def mutate(room):
+            if not room or session_id not in room['user_sessions']:
+                return room, None
+            user_info = room['user_sessions'][session_id]
+            user_info.update(fields)
+            for user in room['users']:
+                if user['session_id'] == session_id:
+                    user.update(fields)
+            return room, user_info
+        return self.update(ROOMS, document_id, mutate)
+
+    def append_room_operation(self, document_id: str, operation: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Operasyonu room geçmişine ekle, son operasyonları döndür"""
+        def mutate(room):
+            if not room:
+                return room, None
+            operations = room.setdefault('operations', [])
+            operations.append(operation)
+            room['operations'] = operations[-ROOM_OPERATION_HISTORY:]
+            return room, list(room['operations'])
+        return self.update(ROOMS, document_id, mutate)
+
+    def rooms_for_session(self, session_id: str) -> List[str]:
+        return [
+            document_id for document_id, room in self.values(ROOMS).items()
+            if session_id in room.get('user_sessions', {})
+        ]
+
+
+class InMemoryStateBackend(SharedStateBackend):
+    """Tek process için varsayılan backend
+
+    Değerler kopyalanarak saklanır; böylece diğer backend'lerle aynı
+    (değer semantiği) davranış elde edilir.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def get(self, namespace, key):
+        with self._lock:
+            return copy.deepcopy(self._data.get(namespace, {}).get(key))
+
+    def set(self, namespace, key, value):
+        with self._lock:
+            self._data.setdefault(namespace, {})[key] = copy.deepcopy(value)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            return self._data.get(namespace, {}).pop(key, None) is not None
+
+    def keys(self, namespace):
+        with self._lock:
+            return list(self._data.get(namespace, {}).keys())
+
+    def update(self, namespace, key, mutator):
+        with self._lock:
+            bucket = self._data.setdefault(namespace, {})
+            new_value, result = mutator(copy.deepcopy(bucket.get(key)))
+            if new_value is None:
+                bucket.pop(key, None)
+            else:
+                bucket[key] = copy.deepcopy(new_value)
+            return result
+
+
+class SQLiteStateBackend(SharedStateBackend):
+    """Aynı makinedeki worker process'ler için SQLite backend"""
+
+    def __init__(self, db_path: str = "data/shared_state.db"):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Şema geçici bağlantıyla oluşturulur: backend prefork öncesi ebeveynde
+        # kurulur ve açık kalan bağlantı fork ile worker'lara geçerdi
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS shared_state (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            ''')
+        _sqlite_backends.add(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Thread başına tek bağlantı (process başına yeniden açılır)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _reset_after_fork(self):
+        """Çocuk process: ebeveynden kalan bağlantıları kapatmadan bırak"""
+        self._local = threading.local()
+
+    def get(self, namespace, key):
+        row = self._connection().execute(
+            'SELECT value FROM shared_state WHERE namespace = ? AND key = ?', (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace, key, value):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO shared_state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)',
+            (namespace, key, json.dumps(value, ensure_ascii=False), time.time())
+        )
+
+    def delete(self, namespace, key):
+        cursor = self._connection().execute(
+            'DELETE FROM shared_state WHERE namespace = ? AND key = ?', (namespace, key)
+        )
+        return cursor.rowcount > 0
+
+    def keys(self, namespace):
+        rows = self._connection().execute(
+            'SELECT key FROM shared_state WHERE namespace = ?', (namespace,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def update(self, namespace, key, mutator):
+        conn = self._connection()
+        # IMMEDIATE: yazma kilidini baştan al, diğer process'ler bekler
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM shared_state WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+            new_value, result = mutator(json.loads(row[0]) if row else None)
+
+            if new_value is None:
+                conn.execute('DELETE FROM shared_state WHERE namespace = ? AND key = ?', (namespace, key))
+            else:
+                conn.execute(
+                    'INSERT OR REPLACE INTO shared_state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)',
+                    (namespace, key, json.dumps(new_value, ensure_ascii=False), time.time())
+                )
+            conn.execute('COMMIT')
+            return result
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+
+# Fork sonrası bağlantıları sıfırlanacak backend'ler
+_sqlite_backends = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for backend in list(_sqlite_backends):
+        backend._reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class RedisStateBackend(SharedStateBackend):
+    """Birden fazla makine için Redis protokolü backend'i (Redis, KeyDB, Valkey...)"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "ai_chat_manager"):
+        if not REDIS_AVAILABLE:
+            raise ImportError("Redis backend için 'redis' paketi gerekli: pip install redis")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    def _key(self, namespace: str) -> str:
+        return f"{self.prefix}:{namespace}"
+
+    def get(self, namespace, key):
+        value = self.client.hget(self._key(namespace), key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, namespace, key, value):
+        self.client.hset(self._key(namespace), key, json.dumps(value, ensure_ascii=False))
+
+    def delete(self, namespace, key):
+        return self.client.hdel(self._key(namespace), key) > 0
+
+    def keys(self, namespace):
+        return list(self.client.hkeys(self._key(namespace)))
+
+    def update(self, namespace, key, mutator):
+        hash_key = self._key(namespace)
+        outcome = {}
+
+        def transaction(pipe):
+            # WATCH altında oku; başka bir yazıcı araya girerse redis-py yeniden dener
+            value = pipe.hget(hash_key, key)
+            new_value, outcome['result'] = mutator(json.loads(value) if value is not None else None)
+            pipe.multi()
+            if new_value is None:
+                pipe.hdel(hash_key, key)
+            else:
+                pipe.hset(hash_key, key, json.dumps(new_value, ensure_ascii=False))
+
+        self.client.transaction(transaction, hash_key)
+        return outcome.get('result')
+
+
+def create_state_backend(url: Optional[str] = None) -> SharedStateBackend:
+    """URL'e göre backend oluştur (varsayılan: SHARED_STATE_URL veya memory://)"""
+    url = url or os.getenv('SHARED_STATE_URL', 'memory://')
+
+    if url.startswith('memory://'):
+        return InMemoryStateBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteStateBackend(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStateBackend(url)
+
+    raise ValueError(f"Desteklenmeyen shared state URL'i: {url}")
@@ -0,0 +1,293 @@
+"""
+SQLite Connection Factory
+=========================
+
+SQLite veritabanları için ortak bağlantı profili ve havuzu.
+
+- WAL: okuyucular yazarı, yazar okuyucuları bloklamaz
+- synchronous=NORMAL: WAL ile güvenli, her commit'te fsync yok
+- mmap_size / cache_size: sıcak sayfalar bellekte
+- busy_timeout: kilit çakışmasında hata yerine bekle
+- Okuyucular için boyutlu bir havuz (query_only), yazmalar için tek bir
+  ayrılmış yazar bağlantısı: aynı process'teki yazmalar sıraya girer,
+  SQLITE_BUSY döngüsüne düşmez
+
+Aynı dosya için tek bir factory paylaşılır (get_connection_factory).
+Ham sqlite3 kullanan kod reader()/writer() context manager'larını,
+SQLAlchemy kullanan kod create_engines() ile okuma/yazma engine'lerini kullanır.
+Prefork worker'larda fork öncesi açılmış bağlantılar çocukta kullanılmaz;
+her worker kendi bağlantılarını yeniden açar.
+
+Ortam değişkenleri:
+- SQLITE_MMAP_SIZE: bayt (varsayılan 256 MB)
+- SQLITE_CACHE_SIZE_KB: bağlantı başına sayfa önbelleği (varsayılan 64 MB)
+- SQLITE_BUSY_TIMEOUT_MS: kilit bekleme süresi (varsayılan 5000)
+- SQLITE_READER_POOL_SIZE: okuyucu bağlantı sayısı (varsayılan 4)
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from ..logger import logger
+
+
+@dataclass
+class SQLiteProfile:
+    """SQLite bağlantı ayarları"""
+
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size_kb: int = 64 * 1024
+    busy_timeout_ms: int = 5000
+    reader_pool_size: int = 4
+    checkout_timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "SQLiteProfile":
+        """Ortam değişkenlerinden profil oluştur"""
+        defaults = cls()
+        return cls(
+            mmap_size=int(os.getenv('SQLITE_MMAP_SIZE', defaults.mmap_size)),
+            cache_size_kb=int(os.getenv('SQLITE_CACHE_SIZE_KB', defaults.cache_size_kb)),
+            busy_timeout_ms=int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', defaults.busy_timeout_ms)),
+            reader_pool_size=max(1, int(os.getenv('SQLITE_READER_POOL_SIZE', defaults.reader_pool_size)))
+        )
+
+
+def apply_pragmas(conn: sqlite3.Connection, profile: SQLiteProfile, readonly: bool = False):
+    """Bağlantıya profil pragmalarını uygula"""
+    conn.execute(f"PRAGMA busy_timeout = {int(profile.busy_timeout_ms)}")
+    if not readonly:
+        # journal_mode veritabanı dosyasında kalıcıdır; yazar bağlantısında ayarlamak yeterli
+        conn.execute(f"PRAGMA journal_mode = {profile.journal_mode}")
+    conn.execute(f"PRAGMA synchronous = {profile.synchronous}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile.mmap_size)}")
+    conn.execute(f"PRAGMA cache_size = -{int(profile.cache_size_kb)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+
+
+class SQLiteConnectionFactory:
+    """Tek bir SQLite dosyası için okuyucu havuzu + ayrılmış yazar"""
+
+    def __init__(self, db_path: str, profile: Optional[SQLiteProfile] = None):
+        self.db_path = db_path
+        self.profile = profile or SQLiteProfile.from_env()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_count = 0
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._engines: Optional[Tuple[Any, Any]] = None
+
+        self.stats = {
+            'connections_opened': 0,
+            'reads': 0,
+            'writes': 0,
+            'reader_waits': 0,
+            'writer_waits': 0,
+            'wait_seconds': 0.0,
+            'rollbacks': 0
+        }
+
+        # WAL dosyada kalıcıdır; okuyucular açılmadan önce bir kez geçilir
+        self.connect(readonly=False).close()
+
+    def connect(self, readonly: bool = False, autocommit: bool = True) -> sqlite3.Connection:
+        """Profil uygulanmış yeni bir bağlantı aç"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.profile.busy_timeout_ms / 1000,
+            isolation_level=None if autocommit else '',
+            check_same_thread=False
+        )
+        apply_pragmas(conn, self.profile, readonly=readonly)
+        self._count('connections_opened')
+        return conn
+
+    def _count(self, key: str, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    # Ham sqlite3 erişimi
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Havuzdan salt okunur bağlantı al"""
+        conn = self._checkout_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def _checkout_reader(self) -> sqlite3.Connection:
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                can_open = self._reader_count < self.profile.reader_pool_size
+                if can_open:
+                    self._reader_count += 1
+            if can_open:
+                conn = self.connect(readonly=True)
+            else:
+                started = time.perf_counter()
+                try:
+                    conn = self._readers.get(timeout=self.profile.checkout_timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"SQLite reader pool exhausted: {self.db_path}")
+                self._count('reader_waits')
+                self._count('wait_seconds', time.perf_counter() - started)
+
+        self._count('reads')
+        return conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Ayrılmış yazar bağlantısında bir yazma transaction'ı
+
+        Blok hatasız biterse commit, hata olursa rollback yapılır.
+        """
+        if not self._writer_lock.acquire(blocking=False):
+            started = time.perf_counter()
+            self._writer_lock.acquire()
+            self._count('writer_waits')
+            self._count('wait_seconds', time.perf_counter() - started)
+
+        try:
+            if self._writer is None:
+                self._writer = self.connect(readonly=False)
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._count('rollbacks')
+                raise
+            if conn.in_transaction:
+                conn.commit()
+            self._count('writes')
+        finally:
+            self._writer_lock.release()
+
+    # SQLAlchemy erişimi
+
+    def create_engines(self) -> Tuple[Any, Any]:
+        """(yazma, okuma) SQLAlchemy engine çifti
+
+        Yazma engine'i tek bağlantılıdır; okuma engine'i reader_pool_size
+        boyutunda query_only bağlantılar kullanır.
+        """
+        with self._lock:
+            if self._engines is not None:
+                return self._engines
+
+        from sqlalchemy import create_engine, event
+        from sqlalchemy.pool import QueuePool
+
+        def engine_for(readonly: bool, size: int):
+            engine = create_engine(
+                'sqlite://',
+                creator=lambda: self.connect(readonly=readonly, autocommit=False),
+                poolclass=QueuePool,
+                pool_size=size,
+                max_overflow=0,
+                pool_timeout=self.profile.checkout_timeout
+            )
+            counter = 'reads' if readonly else 'writes'
+            event.listen(engine, 'checkout', lambda *args: self._count(counter))
+            return engine
+
+        engines = (engine_for(False, 1), engine_for(True, self.profile.reader_pool_size))
+        with self._lock:
+            if self._engines is None:
+                self._engines = engines
+            return self._engines
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['idle_readers'] = self._readers.qsize()
+            stats['reader_pool_size'] = self.profile.reader_pool_size
+        if self._engines is not None:
+            stats['engine_pool'] = {
+                'writer_checked_out': self._engines[0].pool.checkedout(),
+                'readers_checked_out': self._engines[1].pool.checkedout()
+            }
+        return stats
+
+    def _reset_after_fork(self):
+        """Çocuk process: ebeveynden kalan bağlantıları kapatmadan bırak"""
+        self._lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._writer = None
+        if self._engines is not None:
+            for engine in self._engines:
+                engine.dispose(close=False)
+
+    def close(self):
+        """Tüm bağlantıları kapat"""
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._reader_count = 0
+            if self._engines is not None:
+                for engine in self._engines:
+                    engine.dispose()
+                self._engines = None
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+_factories: Dict[str, SQLiteConnectionFactory] = {}
+_factories_lock = threading.Lock()
+
+
+def _after_fork_in_child():
+    global _factories_lock
+    _factories_lock = threading.Lock()
+    for factory in _factories.values():
+        factory._reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_connection_factory(db_path: str, profile: Optional[SQLiteProfile] = None) -> SQLiteConnectionFactory:
+    """Dosya başına paylaşılan factory (aynı process'te tek yazar)"""
+    key = os.path.abspath(db_path)
+    with _factories_lock:
+        factory = _factories.get(key)
+        if factory is None:
+            factory = SQLiteConnectionFactory(db_path, profile)
+            _factories[key] = factory
+            logger.info(f"SQLite connection factory created: {db_path}")
+        return factory
@@ -2,11 +2,12 @@
 Web UI Universal - Analytics Dashboard ile geliştirilmiş versiyon
 """
 from flask import Flask, render_template, request, jsonify, send_from_directory
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import json
 import time
 import asyncio
 from datetime import datetime
+from dataclasses import replace
 import threading
 import os
 import sys
@@ -26,6 +27,15 @@ from .live_document_canvas import (
     AIDocumentIntegration
 )
 
+# Server Runtime - Seçilebilir sunucu modu (threading / gevent / eventlet)
+from .server_runtime import ServerRuntimeConfig, build_socketio_options, serve, create_state_backend, routing_hint
+
+# Conversation Engine - Checkpoint'li, yeniden başlatılabilir PM ↔ LD konuşmaları
+from .conversation_engine import ConversationEngine
+
+# Context Manager - Konuşma ve belge context'i için sabit token bütçesi
+from .context_manager import ContextManager
+
 # TODO: Implement these modules in future versions
 # from project_memory import ProjectMemory
 # from plugin_manager import plugin_manager
@@ -33,13 +43,19 @@ from .live_document_canvas import (
 class WebUIUniversal:
     """Universal AI Adapter ile uyumlu Web UI"""
     
-    def __init__(self, host, port, message_broker, memory_bank, ai_adapter):
+    def __init__(self, host, port, message_broker, memory_bank, ai_adapter, server_config=None):
         self.app = Flask(__name__, 
                         template_folder='../templates',
                         static_folder='../static')
         self.app.config['SECRET_KEY'] = 'ai-chrome-chat-manager-universal-secret'
-        # Python 3.13 uyumluluğu için threading mode kullan
-        self.socketio = SocketIO(self.app, cors_allowed_origins="*", async_mode='threading')
+        
+        # Sunucu modu yapılandırmadan gelir (varsayılan: threading, Python 3.13 uyumlu)
+        self.server_config = server_config or ServerRuntimeConfig.from_env()
+        self.socketio = SocketIO(self.app, **build_socketio_options(self.server_config))
+        
+        @self.app.context_processor
+        def inject_socketio_options():
+            return {'socketio_client_options': self.server_config.client_options()}
         
         # Merkezi hata yönetimi sistemini entegre et
         central_error_handler.init_app(self.app)
@@ -51,9 +67,29 @@ class WebUIUniversal:
         self.memory_bank = memory_bank
         self.ai_adapter = ai_adapter
         
-        # Müdahale sistemi için durum
-        self.active_conversations = {}
-        self.intervention_queue = {}
+        # Konuşma, müdahale ve room durumu (worker'lar arasında paylaşılabilir)
+        self.state_backend = create_state_backend(self.server_config.shared_state_url)
+        
+        # Konuşma checkpoint'leri (kalıcı store; paylaşılan state kalıcıysa aynısı kullanılır)
+        if self.server_config.conversation_store_url == self.server_config.shared_state_url:
+            self.conversation_store = self.state_backend
+        else:
+            self.conversation_store = create_state_backend(self.server_config.conversation_store_url)
+        
+        # Session ve belge özetleri (engine ve canvas ortak önbelleği kullanır)
+        self.context_manager = ContextManager()
+        
+        self.conversation_engine = ConversationEngine(
+            ai_adapter=self.ai_adapter,
+            store=self.conversation_store,
+            emit=self.socketio.emit,
+            check_interventions=self._check_interventions,
+            on_message=self.broadcast_analytics_update,
+            on_paused=self._save_conversation_to_memory,
+            has_pending_intervention=self.state_backend.has_pending_intervention,
+            pipelined=self.server_config.conversation_pipeline,
+            context_manager=self.context_manager
+        )
         
         # Proje hafızası (TODO: Implement ProjectMemory)
         # self.project_memory = ProjectMemory()
@@ -79,12 +115,15 @@ class WebUIUniversal:
         
         # Live Document Canvas - Real-time Collaborative Document Editing
         try:
-            self.document_state_manager = DocumentStateManager()
+            self.document_state_manager = DocumentStateManager(
+                state_backend=self.state_backend if self.state_backend.shared else None
+            )
             self.real_time_sync_engine = RealTimeSyncEngine(self.socketio, self.document_state_manager)
             self.canvas_interface = CanvasInterface()
             self.ai_document_integration = AIDocumentIntegration(
                 self.document_state_manager, 
-                self.real_time_sync_engine
+                self.real_time_sync_engine,
+                context_manager=self.context_manager
             )
             print("🎨 Live Document Canvas başlatıldı!")
         except Exception as e:
@@ -96,10 +135,15 @@ class WebUIUniversal:
             self.ai_document_integration = None
         
         # Notes System - AI-Powered Note Taking
+        self.notes_db = None
         try:
-            from .notes.api import notes_blueprint, init_ai_integration
+            from .notes.api import notes_blueprint, init_ai_integration, init_realtime, get_notes_db
             self.app.register_blueprint(notes_blueprint)
             
+            # Not değişikliklerini ve export ilerlemesini workspace odalarına yayınla (notes:<workspace_id>)
+            self.notes_db = get_notes_db()
+            init_realtime(self.socketio)
+            
             # AI entegrasyonunu başlat
             if self.ai_adapter:
                 # General role oluştur (eğer adapter varsa)
@@ -108,7 +152,7 @@ class WebUIUniversal:
                     self.ai_adapter.assign_role("general", first_adapter_id)
                     print(f"🤖 General role atandı: {first_adapter_id}")
                 
-                init_ai_integration(self.ai_adapter)
+                init_ai_integration(self.ai_adapter, self.socketio)
                 print("📝 AI Note Taking System başlatıldı! (AI entegrasyonu aktif)")
             else:
                 print("📝 AI Note Taking System başlatıldı! (AI entegrasyonu pasif)")
@@ -122,6 +166,24 @@ class WebUIUniversal:
     def setup_routes(self):
         """Web rotalarını ayarla"""
         
+        @self.app.before_request
+        def start_conversation_engine():
+            """Prefork worker'larda engine'i ilk istekte başlat (checkpoint'leri devralır)"""
+            self.conversation_engine.ensure_started()
+        
+        @self.app.after_request
+        def add_routing_hint(response):
+            """Load balancer için sticky routing ipucu ekle (session, yoksa doküman)"""
+            view_args = request.view_args or {}
+            key = None
+            for name in ('session_id', 'document_id'):
+                key = view_args.get(name) or request.args.get(name)
+                if key:
+                    break
+            if key:
+                response.headers['X-Routing-Hint'] = str(routing_hint(key, self.server_config.workers))
+            return response
+        
         @self.app.route('/')
         def index():
             return render_template('index_universal.html')
@@ -141,6 +203,8 @@ class WebUIUniversal:
                 'status': 'running',
                 'ai_adapter_ready': self.ai_adapter is not None,
                 'memory_bank_ready': self.memory_bank is not None,
+                'server': self.server_config.to_dict(),
+                'conversation_engine': self.conversation_engine.get_stats(),
                 'timestamp': datetime.now().isoformat()
             })
         
@@ -403,26 +467,12 @@ class WebUIUniversal:
             if not initial_prompt:
                 return jsonify({'error': 'İlk prompt gerekli'}), 400
             
-            # Konuşmayı background'da başlat
-            def run_conversation():
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(
-                        self._run_ai_conversation(initial_prompt, max_turns)
-                    )
-                except Exception as e:
-                    self.socketio.emit('conversation_error', {
-                        'error': str(e),
-                        'timestamp': datetime.now().isoformat()
-                    })
-            
-            conversation_thread = threading.Thread(target=run_conversation)
-            conversation_thread.daemon = True
-            conversation_thread.start()
+            # Konuşmayı conversation engine'in event loop'unda başlat
+            session_id = self.conversation_engine.start_conversation(initial_prompt, max_turns)
             
             return jsonify({
                 'status': 'started',
+                'session_id': session_id,
                 'prompt': initial_prompt,
                 'max_turns': max_turns
             })
@@ -438,17 +488,17 @@ class WebUIUniversal:
             if not intervention_message:
                 return jsonify({'error': 'Müdahale mesajı gerekli'}), 400
             
-            # Müdahaleyi sıraya ekle
-            if session_id not in self.intervention_queue:
-                self.intervention_queue[session_id] = []
-            
             intervention_data = {
                 'message': intervention_message,
                 'timestamp': datetime.now().isoformat(),
                 'applied': False
             }
             
-            self.intervention_queue[session_id].append(intervention_data)
+            # Müdahaleyi sıraya ekle
+            queue_position = self.state_backend.push_intervention(session_id, intervention_data)
+            
+            # Önceden istenmiş (müdahalesiz) PM turu artık geçersiz
+            self.conversation_engine.discard_speculation(session_id)
             
             # WebSocket üzerinden bilgilendirme
             self.socketio.emit('intervention_received', {
@@ -461,7 +511,7 @@ class WebUIUniversal:
                 'status': 'received',
                 'message': intervention_message,
                 'session_id': session_id,
-                'queue_position': len(self.intervention_queue[session_id])
+                'queue_position': queue_position
             })
         
         @self.app.route('/api/ai/conversation/continue', methods=['POST'])
@@ -475,38 +525,20 @@ class WebUIUniversal:
                 if not session_id:
                     return jsonify({'error': 'Session ID gerekli'}), 400
                 
-                if session_id not in self.active_conversations:
+                # Durum atomik olarak paused → active yapılır ve engine'de devam eder
+                try:
+                    conversation = self.conversation_engine.continue_conversation(session_id, additional_turns)
+                except KeyError:
                     return jsonify({'error': 'Devam ettirilebilir konuşma bulunamadı'}), 404
-                
-                conversation = self.active_conversations[session_id]
-                if conversation['status'] != 'paused':
-                    return jsonify({'error': 'Konuşma pause durumunda değil'}), 400
-                
-                # Continue işlemini background'da çalıştır
-                def run_continue():
-                    try:
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        loop.run_until_complete(
-                            self._continue_conversation(session_id, additional_turns)
-                        )
-                    except Exception as e:
-                        self.socketio.emit('conversation_error', {
-                            'error': str(e),
-                            'session_id': session_id,
-                            'timestamp': datetime.now().isoformat()
-                        })
-                
-                continue_thread = threading.Thread(target=run_continue)
-                continue_thread.daemon = True
-                continue_thread.start()
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
                 
                 return jsonify({
                     'status': 'continuing',
                     'session_id': session_id,
                     'additional_turns': additional_turns,
                     'current_completed': conversation['completed_turns'],
-                    'new_max_turns': conversation['max_turns'] + additional_turns
+                    'new_max_turns': conversation['max_turns']
                 })
                 
             except Exception as e:
@@ -516,7 +548,7 @@ class WebUIUniversal:
         def end_conversation_permanently(session_id):
             """Konuşmayı kalıcı olarak sonlandır"""
             try:
-                if session_id not in self.active_conversations:
+                if not self.conversation_store.has_conversation(session_id):
                     return jsonify({'error': 'Konuşma bulunamadı'}), 404
                 
                 self._end_conversation_permanently(session_id)
@@ -534,11 +566,10 @@ class WebUIUniversal:
         def get_conversation_status(session_id):
             """Konuşma durumunu getir"""
             try:
-                if session_id not in self.active_conversations:
+                conversation = self.conversation_store.get_conversation(session_id)
+                if not conversation:
                     return jsonify({'error': 'Konuşma bulunamadı'}), 404
                 
-                conversation = self.active_conversations[session_id]
-                
                 return jsonify({
                     'session_id': session_id,
                     'status': conversation['status'],
@@ -546,6 +577,8 @@ class WebUIUniversal:
                     'max_turns': conversation['max_turns'],
                     'current_turn': conversation['current_turn'],
                     'can_continue': conversation['status'] == 'paused',
+                    'phase': conversation.get('phase'),
+                    'last_error': conversation.get('last_error'),
                     'context_summary': {
                         'project_goal': conversation['context']['project_goal'][:100] + '...',
                         'total_messages': len(conversation['context']['conversation_history'])
@@ -569,8 +602,9 @@ class WebUIUniversal:
                     return jsonify({'error': 'Session ID gerekli'}), 400
                 
                 # Session'dan conversation data'sını çıkar
+                conversation = self.conversation_store.get_conversation(session_id)
                 conversation_data = self.document_synthesizer.get_conversation_data_from_session(
-                    session_id, self.active_conversations
+                    session_id, {session_id: conversation} if conversation else {}
                 )
                 
                 if not conversation_data:
@@ -1715,8 +1749,8 @@ class WebUIUniversal:
     def setup_socketio_events(self):
         """SocketIO event'lerini ayarla"""
         
-        # Document rooms için user tracking
-        self.document_rooms = {}  # {document_id: {user_sessions: {...}, users: [...]}}
+        # Document room üyelikleri state backend'inde tutulur
+        # {document_id: {user_sessions: {...}, users: [...], operations: [...]}}
         self.user_colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', '#DDA0DD', '#98D8C8', '#F7DC6F']
         
         @self.socketio.on('connect')
@@ -1730,7 +1764,7 @@ class WebUIUniversal:
         def handle_disconnect():
             print('🌐 Web client bağlantısı kesildi')
             # User'ı tüm document room'larından çıkar
-            for document_id in list(self.document_rooms.keys()):
+            for document_id in self.state_backend.rooms_for_session(request.sid):
                 self._remove_user_from_room(request.sid, document_id)
         
         @self.socketio.on('request_analytics')
@@ -1753,42 +1787,21 @@ class WebUIUniversal:
                 # Room'a katıl
                 join_room(document_id)
                 
-                # Document room'u yoksa oluştur
-                if document_id not in self.document_rooms:
-                    self.document_rooms[document_id] = {
-                        'user_sessions': {},
-                        'users': []
-                    }
-                
-                room = self.document_rooms[document_id]
-                
-                # Kullanıcıya renk ata
-                used_colors = [user['color'] for user in room['users']]
-                available_colors = [c for c in self.user_colors if c not in used_colors]
-                user_color = available_colors[0] if available_colors else self.user_colors[0]
-                
-                # Kullanıcı bilgilerini kaydet
-                user_info = {
-                    'session_id': request.sid,
-                    'name': user_name,
-                    'color': user_color,
-                    'cursor_position': {'x': 0, 'y': 0},
-                    'joined_at': datetime.now().isoformat()
-                }
-                
-                room['user_sessions'][request.sid] = user_info
-                room['users'].append(user_info)
+                # Kullanıcıyı kaydet ve renk ata (atomik)
+                user_info, users_in_room = self.state_backend.join_room(
+                    document_id, request.sid, user_name, self.user_colors
+                )
                 
                 # Kullanıcıya kendi bilgilerini gönder
                 emit('user_joined', {
                     'user': user_info,
-                    'users_in_room': room['users']
+                    'users_in_room': users_in_room
                 })
                 
                 # Room'daki diğer kullanıcılara yeni katılımı bildir
                 emit('user_joined_room', {
                     'user': user_info,
-                    'users_in_room': room['users']
+                    'users_in_room': users_in_room
                 }, room=document_id, include_self=False)
                 
                 print(f"👥 User {user_name} joined document {document_id}")
@@ -1803,12 +1816,35 @@ class WebUIUniversal:
             try:
                 document_id = data.get('document_id')
                 
-                if document_id and document_id in self.document_rooms:
+                if document_id:
                     self._remove_user_from_room(request.sid, document_id)
                     
             except Exception as e:
                 print(f"❌ Leave document error: {e}")
         
+        @self.socketio.on('subscribe_notes')
+        def handle_subscribe_notes(data):
+            """Workspace not değişikliklerine abone ol (since: son görülen seq)"""
+            workspace_id = (data or {}).get('workspace_id')
+            if not workspace_id or not self.notes_db:
+                emit('error', {'message': 'Workspace ID gerekli'})
+                return
+            
+            join_room(f"notes:{workspace_id}")
+            
+            # Bağlantı koptuysa kaçırılan değişiklikleri gönder
+            since = data.get('since')
+            if since is not None:
+                backlog = self.notes_db.get_changes(int(since), workspace_id)
+                emit('note_changes_backlog', backlog)
+        
+        @self.socketio.on('unsubscribe_notes')
+        def handle_unsubscribe_notes(data):
+            """Workspace not değişikliklerinden çık"""
+            workspace_id = (data or {}).get('workspace_id')
+            if workspace_id:
+                leave_room(f"notes:{workspace_id}")
+        
         @self.socketio.on('cursor_moved')
         def handle_cursor_moved(data):
             """Kullanıcı cursor pozisyonu güncellendi"""
@@ -1816,16 +1852,15 @@ class WebUIUniversal:
                 document_id = data.get('document_id')
                 cursor_pos = data.get('position', {})
                 
-                if not document_id or document_id not in self.document_rooms:
+                if not document_id:
                     return
                 
-                room = self.document_rooms[document_id]
-                
                 # Kullanıcının cursor pozisyonunu güncelle
-                if request.sid in room['user_sessions']:
-                    user_info = room['user_sessions'][request.sid]
-                    user_info['cursor_position'] = cursor_pos
-                    
+                user_info = self.state_backend.update_room_user(
+                    document_id, request.sid, cursor_position=cursor_pos
+                )
+                
+                if user_info:
                     # Diğer kullanıcılara cursor pozisyonunu broadcast et
                     emit('cursor_updated', {
                         'user_id': request.sid,
@@ -1844,14 +1879,12 @@ class WebUIUniversal:
                 document_id = data.get('document_id')
                 selection = data.get('selection', {})
                 
-                if not document_id or document_id not in self.document_rooms:
+                if not document_id:
                     return
                 
-                room = self.document_rooms[document_id]
+                user_info = self.state_backend.get_room_user(document_id, request.sid)
                 
-                if request.sid in room['user_sessions']:
-                    user_info = room['user_sessions'][request.sid]
-                    
+                if user_info:
                     # Diğer kullanıcılara selection'ı broadcast et
                     emit('selection_updated', {
                         'user_id': request.sid,
@@ -1877,17 +1910,8 @@ class WebUIUniversal:
                     emit('error', {'message': 'Document ID and operation required'})
                     return
                 
-                if document_id not in self.document_rooms:
-                    emit('error', {'message': 'Document room not found'})
-                    return
-                
                 print(f"📝 Document operation received: {operation['type']} from {user_name}")
                 
-                # Store operation for conflict detection
-                room = self.document_rooms[document_id]
-                if 'operations' not in room:
-                    room['operations'] = []
-                
                 # Add timestamp and user info to operation
                 operation_with_metadata = {
                     **operation,
@@ -1897,10 +1921,14 @@ class WebUIUniversal:
                     'session_id': request.sid
                 }
                 
-                room['operations'].append(operation_with_metadata)
+                # Store operation for conflict detection
+                operations = self.state_backend.append_room_operation(document_id, operation_with_metadata)
+                if operations is None:
+                    emit('error', {'message': 'Document room not found'})
+                    return
                 
                 # Detect conflicts with recent operations
-                conflict = self._detect_operation_conflict(room['operations'], operation_with_metadata)
+                conflict = self._detect_operation_conflict(operations, operation_with_metadata)
                 
                 if conflict:
                     print(f"🔥 Conflict detected: {conflict['type']}")
@@ -1931,88 +1959,75 @@ class WebUIUniversal:
                 print(f"❌ Document operation error: {e}")
                 emit('error', {'message': f'Operation failed: {str(e)}'})
 
-        def _detect_operation_conflict(self, operations, new_operation):
-            """Detect conflicts between operations"""
-            if len(operations) < 2:
-                return None
-            
-            # Check last few operations for conflicts
-            recent_ops = operations[-5:]  # Check last 5 operations
-            
-            for op in recent_ops[:-1]:  # Exclude the new operation itself
-                if self._operations_conflict(op, new_operation):
-                    return {
-                        'type': 'concurrent_edit',
-                        'description': f"Concurrent {op['type']} and {new_operation['type']} operations",
-                        'operations': [op, new_operation],
-                        'users': [op['user_name'], new_operation['user_name']],
-                        'timestamp': datetime.now().isoformat()
-                    }
-            
+    def _detect_operation_conflict(self, operations, new_operation):
+        """Detect conflicts between operations"""
+        if len(operations) < 2:
             return None
         
-        def _operations_conflict(self, op1, op2):
-            """Check if two operations conflict"""
-            # Same position operations within 1 second
-            time_diff = abs(
-                datetime.fromisoformat(op1.get('server_timestamp', '1970-01-01')).timestamp() - 
-                datetime.fromisoformat(op2.get('server_timestamp', '1970-01-01')).timestamp()
-            )
-            
-            if time_diff > 1.0:  # Operations more than 1 second apart are less likely to conflict
-                return False
+        # Check last few operations for conflicts
+        recent_ops = operations[-5:]  # Check last 5 operations
+        
+        for op in recent_ops[:-1]:  # Exclude the new operation itself
+            if self._operations_conflict(op, new_operation):
+                return {
+                    'type': 'concurrent_edit',
+                    'description': f"Concurrent {op['type']} and {new_operation['type']} operations",
+                    'operations': [op, new_operation],
+                    'users': [op['user_name'], new_operation['user_name']],
+                    'timestamp': datetime.now().isoformat()
+                }
+        
+        return None
+    
+    def _operations_conflict(self, op1, op2):
+        """Check if two operations conflict"""
+        # Same position operations within 1 second
+        time_diff = abs(
+            datetime.fromisoformat(op1.get('server_timestamp', '1970-01-01')).timestamp() - 
+            datetime.fromisoformat(op2.get('server_timestamp', '1970-01-01')).timestamp()
+        )
+        
+        if time_diff > 1.0:  # Operations more than 1 second apart are less likely to conflict
+            return False
+        
+        # Check position conflicts
+        pos1 = op1.get('position', -1)
+        pos2 = op2.get('position', -1)
+        
+        # Same position operations
+        if pos1 == pos2 and pos1 != -1:
+            return True
+        
+        # Overlapping delete operations
+        if (op1.get('type') == 'delete' and op2.get('type') == 'delete'):
+            len1 = op1.get('length', 0)
+            len2 = op2.get('length', 0)
             
-            # Check position conflicts
-            pos1 = op1.get('position', -1)
-            pos2 = op2.get('position', -1)
+            # Check if ranges overlap
+            end1 = pos1 + len1
+            end2 = pos2 + len2
             
-            # Same position operations
-            if pos1 == pos2 and pos1 != -1:
+            if not (end1 <= pos2 or end2 <= pos1):  # Ranges overlap
                 return True
-            
-            # Overlapping delete operations
-            if (op1.get('type') == 'delete' and op2.get('type') == 'delete'):
-                len1 = op1.get('length', 0)
-                len2 = op2.get('length', 0)
-                
-                # Check if ranges overlap
-                end1 = pos1 + len1
-                end2 = pos2 + len2
-                
-                if not (end1 <= pos2 or end2 <= pos1):  # Ranges overlap
-                    return True
-            
-            return False
         
-        def _remove_user_from_room(self, session_id, document_id):
-            """Kullanıcıyı room'dan çıkar"""
-            if document_id not in self.document_rooms:
-                return
-                
-            room = self.document_rooms[document_id]
-            
-            # Kullanıcıyı bul ve çıkar
-            if session_id in room['user_sessions']:
-                user_info = room['user_sessions'][session_id]
-                
-                # Session'dan çıkar
-                del room['user_sessions'][session_id]
-                
-                # Users listesinden çıkar
-                room['users'] = [u for u in room['users'] if u['session_id'] != session_id]
-                
-                # Diğer kullanıcılara ayrılmayı bildir
-                emit('user_left_room', {
-                    'user_id': session_id,
-                    'user_name': user_info['name'],
-                    'users_in_room': room['users']
-                }, room=document_id)
-                
-                print(f"👋 User {user_info['name']} left document {document_id}")
-                
-                # Room boşsa temizle
-                if not room['users']:
-                    del self.document_rooms[document_id]
+        return False
+    
+    def _remove_user_from_room(self, session_id, document_id):
+        """Kullanıcıyı room'dan çıkar (room boşalırsa backend temizler)"""
+        removed = self.state_backend.leave_room(document_id, session_id)
+        if not removed:
+            return
+        
+        user_info, users_in_room = removed
+        
+        # Diğer kullanıcılara ayrılmayı bildir
+        emit('user_left_room', {
+            'user_id': session_id,
+            'user_name': user_info['name'],
+            'users_in_room': users_in_room
+        }, room=document_id)
+        
+        print(f"👋 User {user_info['name']} left document {document_id}")
     
     def setup_message_subscriptions(self):
         """Message broker aboneliklerini kur"""
@@ -2099,241 +2114,10 @@ class WebUIUniversal:
         
         return analytics_data
     
-    async def _run_ai_conversation(self, initial_prompt: str, max_turns: int):
-        """İki AI arasında konuşma köprüsü çalıştır"""
-        try:
-            # Conversation context - daha zengin başlangıç
-            conversation_context = {
-                'project_goal': initial_prompt,
-                'conversation_history': [],
-                'decisions_made': [],
-                'next_actions': []
-            }
-            session_id = str(int(time.time()))
-            
-            # Aktif konuşmayı kaydet
-            self.active_conversations[session_id] = {
-                'status': 'active',
-                'current_turn': 0,
-                'max_turns': max_turns,
-                'context': conversation_context,  # Context'i sakla
-                'completed_turns': 0
-            }
-            
-            self.socketio.emit('conversation_started', {
-                'prompt': initial_prompt,
-                'max_turns': max_turns,
-                'session_id': session_id,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            await self._execute_conversation_turns(session_id, max_turns)
-            
-        except Exception as e:
-            # Hata durumunda temizlik
-            if session_id in self.active_conversations:
-                del self.active_conversations[session_id]
-                
-            self.socketio.emit('conversation_error', {
-                'error': str(e),
-                'session_id': session_id,
-                'timestamp': datetime.now().isoformat()
-            })
-    
-    async def _execute_conversation_turns(self, session_id: str, turns_to_execute: int):
-        """Belirtilen sayıda conversation turn'ü execute et"""
-        if session_id not in self.active_conversations:
-            return
-        
-        conversation = self.active_conversations[session_id]
-        conversation_context = conversation['context']
-        starting_turn = conversation['completed_turns']
-        
-        for turn in range(starting_turn, starting_turn + turns_to_execute):
-            # Müdahale kontrolü
-            intervention_context = self._check_interventions(session_id)
-            
-            # Turn counter güncelle
-            conversation['current_turn'] = turn + 1
-            
-            # PM'den yanıt al
-            self.socketio.emit('conversation_turn', {
-                'turn': turn + 1,
-                'phase': 'pm_thinking',
-                'session_id': session_id,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Zengin PM prompt'u hazırla
-            if turn == 0:
-                pm_prompt = f"""Sen deneyimli bir proje yöneticisisin. Aşağıdaki proje hakkında analiz yap:
-
-🎯 PROJE: {conversation_context['project_goal']}
-
-Tur {turn + 1}'de şunları yap:
-• Proje hedeflerini netleştir
-• Ana gereksinimleri belirle  
-• İlk adımları öneri
-• Lead Developer'a hangi sorular sorulmalı?
-
-Kısa ve odaklı bir analiz sun."""
-            else:
-                recent_history = ' -> '.join(conversation_context['conversation_history'][-3:])
-                pm_prompt = f"""Proje Yöneticisi Perspektifi - Tur {turn + 1}:
-
-🎯 PROJE: {conversation_context['project_goal'][:200]}...
-📋 SON GELİŞMELER: {recent_history}
-
-Lead Developer'ın son yorumuna dayanarak:
-• Teknik yaklaşımı değerlendir
-• Proje planı açısından feedback ver
-• Sonraki adımları belirle
-• Karar alınması gereken konuları öne çıkar
-
-Yapıcı ve yönlendirici bir yanıt ver."""
-            
-            if intervention_context:
-                pm_prompt += f"\n\n🔔 YÖNETİCİ NOTU: {intervention_context}"
-            
-            pm_response = await self.ai_adapter.send_message(
-                "project_manager", 
-                pm_prompt,
-                f"Proje Değerlendirmesi - Tur {turn + 1}"
-            )
-            
-            if pm_response:
-                # Context'e ekle
-                conversation_context['conversation_history'].append(f"PM: {pm_response.content[:100]}...")
-                
-                self.socketio.emit('conversation_message', {
-                    'speaker': 'project_manager',
-                    'speaker_name': '👔 Proje Yöneticisi',
-                    'message': pm_response.content,
-                    'turn': turn + 1,
-                    'model': pm_response.model,
-                    'usage': pm_response.usage,
-                    'timestamp': datetime.now().isoformat()
-                })
-                
-                # Analytics güncellemesi
-                self.broadcast_analytics_update()
-            
-            await asyncio.sleep(1)
-            
-            # LD'den yanıt al
-            self.socketio.emit('conversation_turn', {
-                'turn': turn + 1,
-                'phase': 'ld_thinking',
-                'session_id': session_id,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Zengin LD prompt'u hazırla
-            if turn == 0:
-                ld_prompt = f"""Sen deneyimli bir Lead Developer'sın. Proje Yöneticisi'nin analizini değerlendir:
-
-🎯 PROJE: {conversation_context['project_goal']}
-
-👔 PROJE YÖNETİCİSİ DİYOR: {pm_response.content[:400] if pm_response else "Henüz yanıt yok"}
-
-Teknik perspektiften:
-• Hangi teknolojiler uygun olur?
-• Mimari nasıl olmalı?
-• Gelişirme sürecindeki zorluklar neler?
-• PM'e hangi teknik sorular sormalı?
-
-Teknik ve uygulanabilir öneriler sun."""
-            else:
-                ld_prompt = f"""Lead Developer Perspektifi - Tur {turn + 1}:
-
-🎯 PROJE: {conversation_context['project_goal'][:200]}...
-📋 GÖRÜŞMELER: {' -> '.join(conversation_context['conversation_history'][-4:])}
-
-👔 PM'İN SON YORUMU: {pm_response.content[:400] if pm_response else "Yanıt yok"}
-
-Teknik açıdan:
-• PM'in önerilerine teknik feedback ver
-• Implementation zorlukları belirt
-• Alternatif çözümler öner
-• Bir sonraki teknik adımları tanımla
-
-Gerçekçi ve detaylı bir teknik analiz yap."""
-            
-            if intervention_context:
-                ld_prompt += f"\n\n🔔 YÖNETİCİ NOTU: {intervention_context}"
-            
-            ld_response = await self.ai_adapter.send_message(
-                "lead_developer",
-                ld_prompt,
-                f"Teknik Analiz - Tur {turn + 1}"
-            )
-            
-            if ld_response:
-                # Context'e ekle
-                conversation_context['conversation_history'].append(f"LD: {ld_response.content[:100]}...")
-                
-                self.socketio.emit('conversation_message', {
-                    'speaker': 'lead_developer',
-                    'speaker_name': '👨‍💻 Lead Developer',
-                    'message': ld_response.content,
-                    'turn': turn + 1,
-                    'model': ld_response.model,
-                    'usage': ld_response.usage,
-                    'timestamp': datetime.now().isoformat()
-                })
-                
-                # Analytics güncellemesi
-                self.broadcast_analytics_update()
-            
-            await asyncio.sleep(2)
-        
-        # Tamamlanan turn sayısını güncelle
-        conversation['completed_turns'] = starting_turn + turns_to_execute
-        conversation['status'] = 'paused'  # Pause durumuna geç
-        
-        # Konuşma durakladı (tamamen bitmedi)
-        self.socketio.emit('conversation_paused', {
-            'total_turns': conversation['completed_turns'],
-            'max_turns': conversation['max_turns'],
-            'session_id': session_id,
-            'can_continue': True,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        # Memory'ye kaydet
-        await self._save_conversation_to_memory(session_id, conversation_context['project_goal'], conversation['completed_turns'])
-    
-    async def _continue_conversation(self, session_id: str, additional_turns: int):
-        """Mevcut konuşmayı devam ettir"""
-        if session_id not in self.active_conversations:
-            raise ValueError("Devam ettirilebilir konuşma bulunamadı")
-        
-        conversation = self.active_conversations[session_id]
-        if conversation['status'] != 'paused':
-            raise ValueError("Konuşma aktif durumda değil")
-        
-        # Durumu aktif yap
-        conversation['status'] = 'active'
-        conversation['max_turns'] += additional_turns
-        
-        # Devam bildirimi gönder
-        self.socketio.emit('conversation_continued', {
-            'session_id': session_id,
-            'additional_turns': additional_turns,
-            'total_max_turns': conversation['max_turns'],
-            'current_completed': conversation['completed_turns'],
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        # Ek turn'leri execute et
-        await self._execute_conversation_turns(session_id, additional_turns)
-    
     def _end_conversation_permanently(self, session_id: str):
         """Konuşmayı kalıcı olarak sonlandır"""
-        if session_id in self.active_conversations:
-            conversation = self.active_conversations[session_id]
-            del self.active_conversations[session_id]
-            
+        conversation = self.conversation_engine.end_conversation(session_id)
+        if conversation:
             self.socketio.emit('conversation_completed', {
                 'total_turns': conversation['completed_turns'],
                 'session_id': session_id,
@@ -2342,19 +2126,11 @@ Gerçekçi ve detaylı bir teknik analiz yap."""
     
     def _check_interventions(self, session_id: str) -> str:
         """Bekleyen müdahaleleri kontrol et ve uygula"""
-        if session_id not in self.intervention_queue:
-            return ""
-        
-        interventions = self.intervention_queue[session_id]
-        pending_interventions = [i for i in interventions if not i['applied']]
-        
-        if not pending_interventions:
+        # En son müdahaleyi al ve işaretle (atomik)
+        latest_intervention = self.state_backend.take_latest_intervention(session_id)
+        if not latest_intervention:
             return ""
         
-        # En son müdahaleyi al ve işaretle
-        latest_intervention = pending_interventions[-1]
-        latest_intervention['applied'] = True
-        
         # WebSocket bildirim gönder
         self.socketio.emit('intervention_applied', {
             'session_id': session_id,
@@ -2427,7 +2203,7 @@ Gerçekçi ve detaylı bir teknik analiz yap."""
             #     'initial_prompt': initial_prompt,
             #     'status': 'completed',
             #     'total_turns': max_turns,
-            #     'total_interventions': len(self.intervention_queue.get(session_id, [])),
+            #     'total_interventions': self.state_backend.count_interventions(session_id),
             #     'messages': [],  # Gerçek implementasyonda session'dan toplanacak
             #     'metadata': {
             #         'session_id': session_id,
@@ -2563,10 +2339,28 @@ Gerçekçi ve detaylı bir teknik analiz yap."""
                 'provider': provider
             }
     
+    def serve_forever(self):
+        """Web sunucusunu ön planda çalıştır (production modu, çoklu worker)"""
+        print(f"🌐 Universal Web arayüzü başlatılıyor: http://{self.host}:{self.port} "
+              f"({self.server_config.resolve_async_mode()}, {self.server_config.workers} worker)")
+        if self.server_config.workers == 1:
+            # Yarım kalan konuşmaları hemen devral; prefork'ta her worker ilk istekte başlatır
+            self.conversation_engine.ensure_started()
+        serve(self.socketio, self.app, self.host, self.port, self.server_config)
+    
     def start_background(self):
         """Web sunucusunu background'da başlat"""
+        config = self.server_config
+        if config.workers > 1:
+            # Thread içinden fork güvenli değil; çoklu worker sadece serve_forever ile
+            print("⚠️ Çoklu worker yalnızca --serve modunda destekleniyor, tek worker ile devam ediliyor")
+            config = replace(config, workers=1)
+        
+        # Yarım kalan konuşmaları checkpoint'ten devam ettir
+        self.conversation_engine.ensure_started()
+        
         def run_server():
-            self.socketio.run(self.app, host=self.host, port=self.port, debug=False, allow_unsafe_werkzeug=True)
+            serve(self.socketio, self.app, self.host, self.port, config)
         
         server_thread = threading.Thread(target=run_server)
         server_thread.daemon = True
@@ -41,7 +41,7 @@ class CanvasController {
      */
     setupWebSocket() {
         if (typeof io !== 'undefined') {
-            this.socket = io();
+            this.socket = io(window.SOCKETIO_CLIENT_OPTIONS || {});
             
             this.socket.on('connect', () => {
                 console.log('🔌 Canvas WebSocket connected');
@@ -40,7 +40,7 @@ class AIOrchestrator {
      */
     setupSocketConnection() {
         if (typeof io !== 'undefined') {
-            this.socket = io();
+            this.socket = io(window.SOCKETIO_CLIENT_OPTIONS || {});
             
             this.socket.on('connect', () => {
                 this.isConnected = true;
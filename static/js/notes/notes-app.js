@@ -5,6 +5,9 @@
  * Not alma uygulaması için JavaScript modülü
  */
 
+// Bu boyutun üzerindeki dosyalar parçalı yüklenir
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+
 class NotesApp {
     constructor() {
         this.currentWorkspace = null;
@@ -13,9 +16,13 @@ class NotesApp {
         this.autoSaveTimeout = null;
         this.apiBaseUrl = '/api/notes';
         this.exportFormats = [];
+        this.archiveFormats = ['zip'];
         this.attachedFiles = [];
         this.uploadQueue = [];
         this.isUploading = false;
+        this.socket = null;
+        this.enrichmentWaiters = {};
+        this.activeExportId = null;
         
         this.init();
     }
@@ -33,6 +40,9 @@ class NotesApp {
         await this.loadWorkspaces();
         await this.loadNotes();
         
+        // Arka plan AI sonuçları için Socket.IO
+        this.connectRealtime();
+        
         // Export formatlarını yükle
         await this.loadExportFormats();
         
@@ -66,6 +76,76 @@ class NotesApp {
         this.setupAutoSave();
     }
     
+    // Gerçek zamanlı bildirimler
+    connectRealtime() {
+        if (typeof io === 'undefined' || !this.currentWorkspace) return;
+        
+        this.socket = io(window.SOCKETIO_CLIENT_OPTIONS || {});
+        this.socket.on('connect', () => {
+            this.socket.emit('subscribe_notes', { workspace_id: this.currentWorkspace });
+        });
+        this.socket.on('note_enrichment', (event) => this.handleEnrichment(event));
+        this.socket.on('notes_export_progress', (event) => this.handleExportProgress(event));
+    }
+    
+    handleExportProgress(event) {
+        if (event.export_id !== this.activeExportId) return;
+        
+        if (event.phase === 'done') {
+            this.showStatus(`✅ Workspace export edildi! (${event.notes_done} not, ${event.files_done} ek)`, 'success');
+            this.activeExportId = null;
+        } else if (event.phase === 'error') {
+            this.showStatus(`❌ Export başarısız: ${event.error}`, 'error');
+            this.activeExportId = null;
+        } else {
+            const total = event.notes_total ? ` / ${event.notes_total}` : '';
+            const size = (event.bytes_written / (1024 * 1024)).toFixed(1);
+            this.showStatus(`📦 Export: ${event.notes_done}${total} not, ${event.files_done} ek (${size} MB)`, 'info');
+        }
+    }
+    
+    handleEnrichment(event) {
+        Object.keys(event.enrichment || {}).forEach((task) => {
+            const waiters = this.enrichmentWaiters[`${event.note_id}:${task}`] || [];
+            waiters.slice().forEach((done) => done());
+        });
+    }
+    
+    waitForEnrichment(noteId, task) {
+        // Socket.IO yoksa kısa aralıklarla yeniden sorulur
+        const timeout = this.socket && this.socket.connected ? 30000 : 3000;
+        const key = `${noteId}:${task}`;
+        const waiters = this.enrichmentWaiters[key] = this.enrichmentWaiters[key] || [];
+        
+        return new Promise((resolve) => {
+            const done = () => {
+                clearTimeout(timer);
+                const index = waiters.indexOf(done);
+                if (index >= 0) waiters.splice(index, 1);
+                resolve();
+            };
+            const timer = setTimeout(done, timeout);
+            waiters.push(done);
+        });
+    }
+    
+    async requestEnrichment(task, path, body = {}) {
+        // AI sonuçları arka planda üretilir: 202 dönerse hazır olunca tekrar istenir
+        const noteId = this.currentNote.id;
+        for (let attempt = 0; attempt < 20; attempt++) {
+            const response = await fetch(`${this.apiBaseUrl}/${noteId}/ai/${path}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(body)
+            });
+            if (response.status !== 202) {
+                return response.json();
+            }
+            await this.waitForEnrichment(noteId, task);
+        }
+        return { success: false, error: 'AI sonucu zaman aşımına uğradı' };
+    }
+    
     // Workspace İşlemleri
     async loadWorkspaces() {
         try {
@@ -184,7 +264,8 @@ class NotesApp {
     }
     
     createNoteHTML(note) {
-        const truncatedContent = this.stripHTML(note.content).substring(0, 100);
+        // Liste API'si içerik yerine kısa önizleme (preview) döner
+        const truncatedContent = this.stripHTML(note.preview || note.content || '').substring(0, 100);
         const formattedDate = this.formatDate(note.updated_at);
         const isActive = this.currentNote && this.currentNote.id === note.id ? 'active' : '';
         
@@ -716,6 +797,7 @@ class NotesApp {
             
             if (data.success) {
                 this.exportFormats = data.formats;
+                this.archiveFormats = data.archive_formats || ['zip'];
                 console.log('✅ Export formatları yüklendi:', this.exportFormats);
             }
         } catch (error) {
@@ -843,6 +925,11 @@ class NotesApp {
         
         const progressItem = this.addProgressItem(file.name, progressContainer);
         
+        // Büyük dosyalar parça parça ve kaldığı yerden devam ederek yüklenir
+        if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+            return this.uploadChunked(file, progressItem);
+        }
+        
         try {
             const xhr = new XMLHttpRequest();
             
@@ -893,6 +980,64 @@ class NotesApp {
         }
     }
     
+    async uploadChunked(file, progressItem) {
+        try {
+            const startResponse = await fetch(`${this.apiBaseUrl}/${this.currentNote.id}/uploads`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ filename: file.name, size: file.size })
+            });
+            const upload = await startResponse.json();
+            if (!upload.success) {
+                throw new Error(upload.error);
+            }
+            
+            let offset = 0;
+            let retries = 0;
+            let data = null;
+            while (!data || !data.complete) {
+                const end = Math.min(offset + upload.chunk_size * 4, file.size);
+                try {
+                    const response = await fetch(`${this.apiBaseUrl}/uploads/${upload.upload_id}`, {
+                        method: 'PUT',
+                        headers: { 'Content-Range': `bytes ${offset}-${Math.max(end - 1, offset)}/${file.size}` },
+                        body: file.slice(offset, end)
+                    });
+                    data = await response.json();
+                    if (response.status === 409) {
+                        // Sunucudaki offset'ten devam et
+                        offset = data.offset;
+                        data = null;
+                        continue;
+                    }
+                    if (!data.success) {
+                        throw new Error(data.error);
+                    }
+                    offset = data.offset;
+                    retries = 0;
+                } catch (error) {
+                    // Sadece bağlantı hataları yeniden denenir
+                    if (error.name !== 'TypeError' || ++retries > 5) throw error;
+                    // Bağlantı koptu: sunucudaki durumu sorup kaldığı yerden devam et
+                    await new Promise((resolve) => setTimeout(resolve, 1000 * retries));
+                    const status = await (await fetch(`${this.apiBaseUrl}/uploads/${upload.upload_id}`)).json();
+                    if (!status.success) throw error;
+                    offset = status.offset;
+                    data = null;
+                }
+                this.updateProgressItem(progressItem, (offset / Math.max(file.size, 1)) * 100, 'Yükleniyor...');
+            }
+            
+            this.updateProgressItem(progressItem, 100, 'Tamamlandı');
+            this.showStatus(`${file.name} yüklendi`, 'success');
+            return data;
+        } catch (error) {
+            console.error('Chunked upload error:', error);
+            this.updateProgressItem(progressItem, 0, `Hata: ${error.message}`);
+            this.showStatus(`${file.name} yüklenemedi: ${error.message}`, 'error');
+        }
+    }
+    
     createUploadProgress() {
         const existing = document.getElementById('fileUploadProgress');
         if (existing) existing.remove();
@@ -1168,14 +1313,10 @@ async function aiAnalyzeNote() {
         // AI progress göster
         notesApp.showAIProgress('analyze', 10);
         
-        const response = await fetch(`${notesApp.apiBaseUrl}/${notesApp.currentNote.id}/ai/analyze`, {
-            method: 'POST'
-        });
-        
         // Progress güncelle
         notesApp.showAIProgress('analyze', 50);
         
-        const data = await response.json();
+        const data = await notesApp.requestEnrichment('analysis', 'analyze');
         
         // Progress tamamla
         notesApp.showAIProgress('analyze', 100);
@@ -1207,14 +1348,9 @@ async function aiSummarize() {
     try {
         notesApp.showAIProgress('summarize', 15);
         
-        const response = await fetch(`${notesApp.apiBaseUrl}/${notesApp.currentNote.id}/ai/summarize`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ length: 'medium' })
-        });
+        const data = await notesApp.requestEnrichment('summary', 'summarize', { length: 'medium' });
         
         notesApp.showAIProgress('summarize', 70);
-        const data = await response.json();
         notesApp.showAIProgress('summarize', 100);
         
         if (data.success) {
@@ -1290,11 +1426,7 @@ async function aiSuggestTags() {
     notesApp.showStatus('AI etiket öneriyor...', 'info');
     
     try {
-        const response = await fetch(`${notesApp.apiBaseUrl}/${notesApp.currentNote.id}/ai/suggest-tags`, {
-            method: 'POST'
-        });
-        
-        const data = await response.json();
+        const data = await notesApp.requestEnrichment('tags', 'suggest-tags');
         
         if (data.success) {
             notesApp.showStatus(`✅ ${data.suggested_tags.length} etiket önerisi hazır!`, 'success');
@@ -1474,7 +1606,7 @@ function showRelatedNotesModal(relatedNotes) {
                         <div class="related-note" onclick="openRelatedNote('${item.note.id}')">
                             <div class="note-title">${item.note.title}</div>
                             <div class="similarity-score">Benzerlik: %${Math.round(item.similarity_score * 100)}</div>
-                            <div class="common-keywords">Ortak kelimeler: ${item.common_keywords.join(', ')}</div>
+                            <div class="common-keywords">Ortak kelimeler: ${(item.common_keywords || []).join(', ')}</div>
                         </div>
                     `).join('')}
                 </div>
@@ -1663,43 +1795,24 @@ async function exportCurrentNote(format = 'markdown') {
     }
 }
 
-async function exportWorkspace(format = 'markdown', type = 'multiple') {
+function exportWorkspace(format = 'markdown', archive = 'zip') {
     if (!notesApp.currentWorkspace) {
         notesApp.showStatus('Workspace bulunamadı', 'warning');
         return;
     }
     
-    const exportText = type === 'summary' ? 'özet' : 'tüm notlar';
-    notesApp.showStatus(`Workspace ${exportText} export ediliyor...`, 'info');
+    // Arşiv sunucuda üretildikçe akar; tarayıcı doğrudan diske indirir, ilerleme Socket.IO ile gelir
+    const exportId = `${Date.now().toString(36)}${Math.random().toString(36).slice(2, 8)}`;
+    notesApp.activeExportId = exportId;
+    notesApp.showStatus('Workspace export ediliyor...', 'info');
     
-    try {
-        const response = await fetch(`${notesApp.apiBaseUrl}/workspace/${notesApp.currentWorkspace}/export`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ format, type })
-        });
-        
-        const data = await response.json();
-        
-        if (data.success) {
-            notesApp.showStatus(`✅ Workspace export edildi! (${data.notes_count} not)`, 'success');
-            
-            if (data.download_url) {
-                // Tek dosya
-                window.open(data.download_url, '_blank');
-            } else if (data.download_urls) {
-                // Birden fazla dosya - ilkini aç
-                data.download_urls.forEach((url, index) => {
-                    setTimeout(() => window.open(url, '_blank'), index * 500);
-                });
-            }
-        } else {
-            notesApp.showStatus(`❌ Export başarısız: ${data.error}`, 'error');
-        }
-    } catch (error) {
-        console.error('Workspace export hatası:', error);
-        notesApp.showStatus('❌ Workspace export hatası', 'error');
-    }
+    const params = new URLSearchParams({ format, archive, export_id: exportId });
+    const link = document.createElement('a');
+    link.href = `${notesApp.apiBaseUrl}/workspaces/${notesApp.currentWorkspace}/export?${params}`;
+    link.download = '';
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
 }
 
 async function showExportModal() {
@@ -1717,6 +1830,10 @@ async function showExportModal() {
         `<option value="${format.name}">${format.description}</option>`
     ).join('');
     
+    const archiveOptions = notesApp.archiveFormats.map(archive =>
+        `<option value="${archive}">${archive}</option>`
+    ).join('');
+    
     const modalHTML = `
         <div class="modal-header">
             <h3>📄 Export Note</h3>
@@ -1753,10 +1870,9 @@ async function showExportModal() {
                 </div>
                 
                 <div class="form-group">
-                    <label for="exportType">Tip:</label>
-                    <select id="exportType" class="form-control">
-                        <option value="multiple">Tüm Notlar (Ayrı dosyalar)</option>
-                        <option value="summary">Workspace Özeti</option>
+                    <label for="workspaceArchiveFormat">Arşiv:</label>
+                    <select id="workspaceArchiveFormat" class="form-control">
+                        ${archiveOptions}
                     </select>
                 </div>
                 
@@ -1778,8 +1894,8 @@ function exportSelectedNote() {
 
 function exportSelectedWorkspace() {
     const format = document.getElementById('workspaceExportFormat').value;
-    const type = document.getElementById('exportType').value;
-    exportWorkspace(format, type);
+    const archive = document.getElementById('workspaceArchiveFormat').value;
+    exportWorkspace(format, archive);
     closeModal();
 }
 
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Context Manager testleri
+Rolling summary bütçesi ve belge özet önbelleği
+"""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Proje kökünü path'e ekle
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.context_manager import ContextManager, ContextBudget, estimate_tokens
+from src.conversation_engine import build_pm_prompt, build_ld_prompt
+
+
+def _turn_text(turn, role):
+    return " ".join(
+        f"{role} tur {turn} için mimari karar {i}: mikroservis, veritabanı ve test stratejisi önemli."
+        for i in range(12)
+    )
+
+
+def test_session_summary_stays_within_budget():
+    """Konuşma uzadıkça özet büyümemeli, eski turlar korunmalı"""
+    manager = ContextManager(ContextBudget(session_summary_tokens=120, turn_digest_tokens=40))
+    context = {'project_goal': 'Proje', 'conversation_history': []}
+
+    sizes = []
+    for turn in range(20):
+        context = manager.advance_session(context, turn)
+        context = manager.record_turn(context, turn, _turn_text(turn, "PM"), _turn_text(turn, "LD"))
+        sizes.append(estimate_tokens(context.get('summary', '')))
+
+    assert max(sizes) <= 120
+    assert context['summary'].startswith("• Tur 1-")
+    assert len(context['pending_turns']) <= 2
+
+
+def test_document_summary_cached_per_version():
+    """Büyük belge bütçeye sığacak şekilde özetlenmeli ve sürüm başına önbelleklenmeli"""
+    manager = ContextManager(ContextBudget(document_tokens=200))
+    body = "\n\n".join(f"## Bölüm {i}\n" + _turn_text(i, "Belge") for i in range(6))
+    document = SimpleNamespace(document_id="doc", version=1, content=body)
+
+    summary = manager.document_context(document)
+    assert estimate_tokens(summary) <= 200
+    assert "## Bölüm 0" in summary
+
+    manager.document_context(document)
+    assert manager.stats['document_hits'] == 1
+
+    # Yeni sürümde sadece değişen bölüm yeniden özetlenir
+    document.version = 2
+    document.content = body.replace("Belge tur 5", "Belge tur beş", 1)
+    manager.document_context(document)
+    assert manager.stats['section_hits'] >= 5
+
+    small = SimpleNamespace(document_id="small", version=1, content="Kısa belge")
+    assert manager.document_context(small) == "Kısa belge"
+
+
+def test_prompt_goal_uses_manager_budget():
+    """Prompt'taki proje hedefi verilen ContextManager'ın bütçesine kırpılmalı"""
+    context = {'project_goal': _turn_text(0, "Hedef"), 'conversation_history': []}
+    manager = ContextManager(ContextBudget(goal_tokens=20))
+
+    narrow = build_pm_prompt(context, 0, context_manager=manager)
+    wide = build_pm_prompt(context, 0)
+    assert manager.bounded_goal(context['project_goal']) in narrow
+    assert len(narrow) < len(wide)
+    assert manager.bounded_goal(context['project_goal']) in build_ld_prompt(
+        context, 0, "PM", context_manager=manager
+    )
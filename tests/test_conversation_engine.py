@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Conversation Engine testleri
+Checkpoint, çökme sonrası devam, eşzamanlı konuşmalar ve pipeline
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Proje kökünü path'e ekle
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.conversation_engine import ConversationEngine, ConversationSession, PHASE_LD
+from src.server_runtime import SQLiteStateBackend, InMemoryStateBackend
+
+
+class FakeAdapter:
+    """Her çağrıyı kaydeden sahte AI adapter"""
+
+    def __init__(self, chunks=1, delay=0.0):
+        self.calls = []
+        self.prompts = []
+        self.chunks = chunks
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send_message(self, role_id, message, context=None, on_chunk=None):
+        self.calls.append(role_id)
+        self.prompts.append(message)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Yanıt prompt'a bağlı; aynı prompt aynı yanıtı üretir
+            content = f"{role_id}:{len(message)}:" + "x" * 600
+            size = len(content) // self.chunks + 1
+            for start in range(0, len(content), size):
+                await asyncio.sleep(self.delay)
+                if on_chunk:
+                    on_chunk(content[start:start + size])
+            return SimpleNamespace(content=content, model="fake", usage={})
+        finally:
+            self.in_flight -= 1
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_concurrent_sessions_checkpoint_and_pause():
+    """Birden fazla konuşma tek event loop'ta çalışıp pause'da checkpoint'lenmeli"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStateBackend(f"{tmp}/conversations.db")
+        events = []
+        engine = ConversationEngine(FakeAdapter(), store, emit=lambda event, data: events.append(event))
+
+        session_ids = [engine.start_conversation(f"Proje {i}", 2) for i in range(5)]
+
+        assert _wait_for(lambda: all(
+            store.get_conversation(sid)['status'] == 'paused' for sid in session_ids
+        ))
+        for sid in session_ids:
+            conversation = store.get_conversation(sid)
+            assert conversation['completed_turns'] == 2
+            assert len(conversation['context']['conversation_history']) == 4
+
+        engine.continue_conversation(session_ids[0], 1)
+        assert _wait_for(lambda: store.get_conversation(session_ids[0])['completed_turns'] == 3
+                         and store.get_conversation(session_ids[0])['status'] == 'paused')
+        assert events.count('conversation_paused') == 6
+        engine.stop()
+
+
+def test_resume_from_checkpoint_after_crash():
+    """Sahibi ölmüş konuşma PM yanıtını tekrar üretmeden LD fazından devam etmeli"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStateBackend(f"{tmp}/conversations.db")
+
+        # Çöken bir worker'ın PM fazından sonra bıraktığı checkpoint
+        session = ConversationSession.new('crashed', "Proje", 1)
+        session.phase = PHASE_LD
+        session.current_turn = 1
+        session.turn_state = {'intervention': '', 'pm_content': 'PM analizi'}
+        session.owner = 'eski-host:1:abc'
+        session.heartbeat = time.time() - 3600
+        store.create_conversation('crashed', session.to_dict())
+
+        adapter = FakeAdapter()
+        engine = ConversationEngine(adapter, store, emit=lambda event, data: None)
+        engine.ensure_started()
+
+        assert _wait_for(lambda: store.get_conversation('crashed')['status'] == 'paused')
+        assert adapter.calls == ['lead_developer']
+        assert store.get_conversation('crashed')['completed_turns'] == 1
+        engine.stop()
+
+
+def _run_to_pause(pipelined, interventions=None):
+    store = InMemoryStateBackend()
+    adapter = FakeAdapter(chunks=10, delay=0.005)
+    # Tur başına alınacak müdahaleler; spekülasyon başladıktan sonra gelmiş gibi davranır
+    pending = list(interventions or [])
+    engine = ConversationEngine(
+        adapter, store, emit=lambda event, data: None,
+        check_interventions=lambda sid: pending.pop(0) if pending else "",
+        has_pending_intervention=lambda sid: False,
+        pipelined=pipelined
+    )
+    session_id = engine.start_conversation("Proje", 5)
+    assert _wait_for(lambda: store.get_conversation(session_id)['status'] == 'paused')
+    engine.stop()
+    return adapter, engine, store.get_conversation(session_id)
+
+
+def test_pipelined_turns_keep_dialogue_identical():
+    """Pipeline modu çağrıları üst üste bindirmeli ama aynı diyaloğu üretmeli"""
+    sequential, _, expected = _run_to_pause(pipelined=False)
+    pipelined, engine, actual = _run_to_pause(pipelined=True)
+
+    assert sorted(pipelined.prompts) == sorted(sequential.prompts)
+    assert actual['context']['conversation_history'] == expected['context']['conversation_history']
+    assert sequential.max_in_flight == 1
+    assert pipelined.max_in_flight == 2
+    assert engine.speculation_stats['used'] == engine.speculation_stats['started'] == 9
+
+    # Eski turlar rolling summary ile prompt'a girer
+    assert any("ÖNCEKİ TURLARIN ÖZETİ" in prompt for prompt in pipelined.prompts)
+
+
+def test_pipelined_prefetch_discarded_on_intervention():
+    """Spekülatif PM turu müdahale geldiğinde kullanılmamalı"""
+    adapter, engine, conversation = _run_to_pause(pipelined=True, interventions=["", "Bütçeye dikkat"])
+
+    assert any("Bütçeye dikkat" in prompt for prompt in adapter.prompts)
+    assert engine.speculation_stats['discarded'] == 1
+    assert conversation['completed_turns'] == 5
+
+
+def test_failed_speculation_falls_back_to_fresh_call():
+    """Hata ile bitmiş spekülatif çağrı devralınmamalı; tur taze çağrıyla tamamlanmalı"""
+
+    class FlakyAdapter(FakeAdapter):
+        async def send_message(self, role_id, message, context=None, on_chunk=None):
+            if len(self.calls) == 1:
+                # İlk spekülatif çağrı (1. turun LD yanıtı) hemen hata verir
+                self.calls.append(role_id)
+                raise RuntimeError("geçici hata")
+            return await super().send_message(role_id, message, context, on_chunk)
+
+    store = InMemoryStateBackend()
+    adapter = FlakyAdapter(chunks=10, delay=0.005)
+    errors = []
+    engine = ConversationEngine(
+        adapter, store, emit=lambda event, data: errors.append(data) if event == 'conversation_error' else None,
+        has_pending_intervention=lambda sid: False, pipelined=True
+    )
+    session_id = engine.start_conversation("Proje", 2)
+    assert _wait_for(lambda: store.get_conversation(session_id)['status'] == 'paused')
+    engine.stop()
+
+    assert errors == [] and store.get_conversation(session_id)['completed_turns'] == 2
+    assert adapter.calls.count('lead_developer') == 3
+    assert engine.speculation_stats['discarded'] >= 1
@@ -0,0 +1,866 @@
+#!/usr/bin/env python3
+"""
+Notes veritabanı testleri
+Tam metin arama (FTS5)
+"""
+import os
+import re
+import sys
+from pathlib import Path
+
+# Proje kökünü path'e ekle
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.notes.database import NotesDatabase
+
+
+def _database(tmp_path):
+    db = NotesDatabase(str(tmp_path / "notes.db"))
+    workspace = db.create_workspace("Test", "user")
+    return db, workspace.id
+
+
+def test_full_text_search_ranks_and_stays_in_sync(tmp_path):
+    """Arama BM25 sıralı, prefix ve Türkçe duyarlı olmalı; güncellemeler indekse yansımalı"""
+    db, workspace_id = _database(tmp_path)
+    assert db.fts_enabled
+
+    in_body = db.create_note("Toplantı", workspace_id, "user", content="Yeni proje için ışık tasarımı konuşuldu")
+    in_title = db.create_note("Proje planı", workspace_id, "user", content="Takvim", tags=["Öncelikli"])
+    db.create_note("Alakasız", workspace_id, "user", content="Başka bir konu")
+
+    results = db.search_notes(workspace_id, "proj")
+    assert [note.id for note in results] == [in_title.id, in_body.id]
+    assert results[0].to_dict()['search']['title'] == "<mark>Proje</mark> planı"
+    assert "<mark>ışık</mark>" in db.search_notes(workspace_id, "IŞIK")[0].search_match['snippet']
+    assert [note.id for note in db.search_notes(workspace_id, "isik tasarim")] == [in_body.id]
+
+    # Etiketler de aranır
+    assert [note.id for note in db.search_notes(workspace_id, "oncelik")] == [in_title.id]
+
+    db.update_note(in_body.id, "user", content="İçerik değişti", tags=["arşiv"])
+    assert db.search_notes(workspace_id, "ışık") == []
+    assert [note.id for note in db.search_notes(workspace_id, "arsiv")] == [in_body.id]
+
+    db.delete_note(in_title.id)
+    assert db.search_notes(workspace_id, "plan") == []
+    assert db.search_notes(workspace_id, '"*') == []
+
+
+def test_note_tree_loads_with_constant_queries(tmp_path):
+    """Not ağacı düğüm sayısından bağımsız sabit sayıda sorguyla yüklenmeli"""
+    from sqlalchemy import event
+
+    db, workspace_id = _database(tmp_path)
+    root = db.create_note("B kök", workspace_id, "user", tags=["kök"])
+    db.create_note("A kök", workspace_id, "user")
+    parent = root
+    for depth in range(5):
+        parent = db.create_note(f"Seviye {depth}", workspace_id, "user", parent_id=parent.id, tags=[f"s{depth}"])
+    db.create_note("Arşiv", workspace_id, "user", parent_id=root.id)
+    archived = db.search_notes(workspace_id, "Arşiv")[0]
+    db.archive_note(archived.id)
+
+    statements = []
+    event.listen(db.read_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    tree = db.get_note_tree(workspace_id)
+
+    assert len(statements) <= 3
+    assert [node['title'] for node in tree] == ["A kök", "B kök"]
+    node, depth = tree[1], 0
+    assert node['tags'] == ["kök"]
+    while node['children']:
+        assert len(node['children']) == 1
+        node = node['children'][0]
+        assert node['tags'] == [f"s{depth}"]
+        depth += 1
+    assert depth == 5
+
+    subtree = db.get_note_tree(workspace_id, root.id)
+    assert [node['title'] for node in subtree] == ["Seviye 0"]
+
+
+def test_migrations_and_query_plans_use_indexes(tmp_path):
+    """Göçler bir kez uygulanmalı; sık sorgular tabloyu taramadan indeks kullanmalı"""
+    from sqlalchemy import event
+    from src.notes.migrations import apply_migrations, MIGRATIONS
+
+    db, workspace_id = _database(tmp_path)
+    assert apply_migrations(db.engine) == []
+    with db.engine.connect() as connection:
+        versions = [row[0] for row in connection.exec_driver_sql("SELECT version FROM schema_migrations")]
+    assert versions == [migration.version for migration in MIGRATIONS]
+
+    note = db.create_note("Not", workspace_id, "user", tags=["etiket"])
+    db.create_note("Alt", workspace_id, "user", parent_id=note.id)
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    event.listen(db.read_engine, "before_cursor_execute", capture)
+    db.get_recent_notes(workspace_id)
+    db.get_pinned_notes(workspace_id)
+    db.search_notes(workspace_id, tags=["etiket"])
+    db.get_note_tree(workspace_id)
+    db.list_tags(workspace_id)
+    page = db.list_note_summaries(workspace_id, limit=1)
+    db.list_note_summaries(workspace_id, cursor=page['next_cursor'], limit=1)
+    event.remove(db.read_engine, "before_cursor_execute", capture)
+
+    assert statements
+    with db.engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = " | ".join(
+                row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            )
+            assert not re.search(r"\bSCAN (notes|tags|note_tags)(_\d+)?\b", plan), (statement, plan)
+            if "ORDER BY notes.updated_at DESC, notes.id DESC" in statement:
+                assert "TEMP B-TREE" not in plan, plan
+
+
+def test_view_counter_buffers_and_flushes_in_batches(tmp_path):
+    """Not okumaları yazma yapmamalı; görüntülenmeler toplu yazılmalı"""
+    from sqlalchemy import event
+
+    db, workspace_id = _database(tmp_path)
+    db.view_counter.flush_interval = 3600
+    db.view_counter.flush_threshold = 1000
+    note = db.create_note("Not", workspace_id, "user")
+
+    writes = []
+
+    def capture(conn, cursor, statement, *args):
+        writes.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    for _ in range(5):
+        fetched = db.get_note(note.id)
+    assert writes == []
+    assert fetched.view_count == 5
+
+    assert db.view_counter.flush() == 1
+    assert len(writes) == 1
+    event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert db.get_note(note.id, increment_view=False).view_count == 5
+    db.view_counter.stop()
+
+
+def test_list_summaries_keyset_pagination_and_projection(tmp_path):
+    """Listeler gövdesiz projeksiyon dönmeli ve imleçle eksiksiz sayfalanmalı"""
+    from datetime import datetime
+    from sqlalchemy import update
+    from src.notes.models import Note
+    from src.notes.projections import parse_fields
+
+    db, workspace_id = _database(tmp_path)
+    created = [db.create_note(f"Not {i}", workspace_id, "user", content="gövde " * 500, tags=["ortak"])
+               for i in range(7)]
+    # Aynı updated_at değerleri id ile ayrışmalı
+    with db.engine.begin() as connection:
+        connection.execute(update(Note).values(updated_at=datetime(2025, 1, 1)))
+
+    seen, cursor = [], None
+    for _ in range(10):
+        page = db.list_note_summaries(workspace_id, cursor=cursor, limit=3)
+        seen.extend(page['notes'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert sorted(note['id'] for note in seen) == sorted(note.id for note in created)
+    assert len({note['id'] for note in seen}) == 7
+    assert set(seen[0]) == {'id', 'title', 'preview', 'tags', 'updated_at'}
+    assert len(seen[0]['preview']) == 200 and seen[0]['tags'] == ["ortak"]
+
+    fields = parse_fields("title,content")
+    assert fields == ('id', 'title', 'content')
+    page = db.list_note_summaries(workspace_id, fields=fields, limit=1)
+    assert set(page['notes'][0]) == {'id', 'title', 'content'}
+
+    first = db.list_note_summaries(workspace_id, query="not", limit=4)
+    second = db.list_note_summaries(workspace_id, query="not", cursor=first['next_cursor'], limit=4)
+    assert len(first['notes']) == 4 and len(second['notes']) == 3 and second['next_cursor'] is None
+    assert not {n['id'] for n in first['notes']} & {n['id'] for n in second['notes']}
+    assert 'snippet' in first['notes'][0]['search']
+
+    for bad in ("bozuk", None):
+        try:
+            if bad:
+                db.list_note_summaries(workspace_id, cursor=bad)
+            else:
+                parse_fields("id,gizli")
+            assert False
+        except ValueError:
+            pass
+
+
+def test_bulk_operations_single_transaction(tmp_path):
+    """Toplu işlemler etiketleri tekilleştirmeli, indeksi güncel tutmalı ve döngüyü reddetmeli"""
+    from sqlalchemy import event
+
+    db, workspace_id = _database(tmp_path)
+    commits = []
+    event.listen(db.engine, "commit", lambda conn: commits.append(1))
+
+    ids = db.bulk_create_notes(workspace_id, "user", [
+        {'title': f"Toplu {i}", 'content': "içerik", 'tags': ["ortak", f"t{i % 2}", "ortak"]}
+        for i in range(50)
+    ])
+    assert len(ids) == 50 and len(commits) == 1
+    assert {tag.name for tag in db.list_tags(workspace_id)} == {"ortak", "t0", "t1"}
+    assert db.get_note(ids[3], increment_view=False).to_dict()['tags'].count("ortak") == 1
+    assert len(db.search_notes(workspace_id, "toplu", tags=["t1"], limit=100)) == 25
+
+    assert db.bulk_tag_notes({ids[0]: ["yeni"], ids[1]: ["yeni", "ortak"]}, "agent",
+                             ai_metadata={ids[0]: {'category': 'x'}}) == 2
+    first = db.get_note(ids[0], increment_view=False)
+    assert sorted(first.to_dict()['tags']) == ["ortak", "t0", "yeni"]
+    assert first.ai_metadata == {'category': 'x'} and first.version == 2
+    db.bulk_tag_notes({ids[0]: ["yalnız"]}, "agent", replace=True)
+    assert db.get_note(ids[0], increment_view=False).to_dict()['tags'] == ["yalnız"]
+
+    assert db.bulk_archive_notes(ids[:10]) == 10
+    assert db.get_workspace_stats(workspace_id)['archived_notes'] == 10
+
+    assert db.bulk_move_notes(ids[20:25], ids[19], "user") == 5
+    try:
+        db.bulk_move_notes([ids[19]], ids[22], "user")
+        assert False, "döngü oluşmamalı"
+    except ValueError:
+        pass
+    tree_root = [node for node in db.get_note_tree(workspace_id) if node['id'] == ids[19]][0]
+    assert len(tree_root['children']) == 5
+
+
+def test_version_history_reconstructs_and_prunes(tmp_path):
+    """Her sürüm ters delta/snapshot zincirinden birebir geri gelmeli; saklama politikası eski kayıtları silmeli"""
+    from src.notes import versioning
+
+    db, workspace_id = _database(tmp_path)
+    lines = [f"<p>Satır {i}</p>\n" for i in range(40)]
+    note = db.create_note("Sürüm 0", workspace_id, "user", content="".join(lines))
+
+    expected = {note.version: ("Sürüm 0", "".join(lines))}
+    for step in range(1, 45):
+        lines[step % 40] = f"<p>Değişti {step}</p>\n"
+        note = db.update_note(note.id, f"user{step}", title=f"Sürüm {step}", content="".join(lines))
+        expected[note.version] = (f"Sürüm {step}", "".join(lines))
+        if step == 30:
+            # Sadece sabitleme: kayıt üretmez, sürüm yine artar
+            note = db.update_note(note.id, "user", is_pinned=True)
+            expected[note.version] = expected[note.version - 1]
+
+    history = db.get_note_versions(note.id, limit=100)
+    assert len(history) == 44
+    assert any(entry['kind'] == versioning.KIND_SNAPSHOT for entry in history)
+    assert history[0]['version'] == note.version - 1 and history[0]['edited_by'] == "user43"
+
+    for version, (title, content) in expected.items():
+        result = db.get_note_version(note.id, version)
+        assert (result['title'], result['content']) == (title, content), version
+    assert db.get_note_version(note.id, note.version + 1) is None
+
+    assert db.prune_note_versions(note.id, keep_versions=5) == 39
+    assert db.get_note_version(note.id, 1) is None
+    assert db.get_note_version(note.id, note.version - 1)['content'] == expected[note.version - 1][1]
+
+
+def test_change_feed_is_ordered_and_transactional(tmp_path):
+    """Değişiklikler commit sırasıyla, seq ile iletilmeli; geri alınan işlemler günlüğe düşmemeli"""
+    db, workspace_id = _database(tmp_path)
+    received, failing = [], []
+    db.change_feed.subscribe(lambda item: received.append(item), workspace_id=workspace_id)
+    db.change_feed.subscribe(lambda item: failing.append(1 / 0))
+
+    parent = db.create_note("Üst", workspace_id, "user", tags=["a"])
+    child_ids = db.bulk_create_notes(workspace_id, "user", [{'title': "Alt 1"}, {'title': "Alt 2"}])
+    db.update_note(parent.id, "editor", content="yeni")
+    db.bulk_move_notes(child_ids, parent.id, "user")
+    try:
+        db.bulk_move_notes([parent.id], child_ids[0], "user")
+    except ValueError:
+        pass
+    db.bulk_archive_notes(child_ids[:1])
+    db.delete_note(child_ids[1])
+    db.change_feed.dispatch()
+
+    ops = [(item['op'], item['note_id']) for item in received]
+    assert ops == [
+        ('create', parent.id), ('create', child_ids[0]), ('create', child_ids[1]),
+        ('update', parent.id), ('move', child_ids[0]), ('move', child_ids[1]),
+        ('archive', child_ids[0]), ('delete', child_ids[1])
+    ]
+    seqs = [item['seq'] for item in received]
+    assert seqs == sorted(seqs) and len(set(seqs)) == len(seqs)
+    assert received[3]['data'] == {'fields': ['content'], 'pid': os.getpid()} and received[3]['actor'] == "editor"
+    assert received[0]['data']['tags'] == ["a"] and received[3]['version'] == 2
+    assert db.change_feed.get_stats()['errors'] == len(received)
+    assert all(item['data']['pid'] == os.getpid() for item in received)
+
+    # Kaldığı yerden devam: since ile geçmiş, ardından canlı olaylar
+    replayed = []
+    db.change_feed.subscribe(lambda item: replayed.append(item['seq']), since=seqs[4])
+    db.create_note("Son", workspace_id, "user")
+    db.change_feed.dispatch()
+    assert replayed[:-1] == seqs[5:] and replayed[-1] > seqs[-1]
+
+    page = db.get_changes(after_seq=seqs[1], workspace_id=workspace_id, limit=2)
+    assert [item['seq'] for item in page['changes']] == seqs[2:4] and page['last_seq'] == seqs[3]
+    assert db.change_feed.prune(before_seq=seqs[4]) == 4
+    assert db.get_changes(workspace_id=workspace_id)['changes'][0]['seq'] == seqs[4]
+    db.change_feed.retention_days = 0
+    assert db.change_feed.prune_expired() == 0  # açılışta budandı, aralık dolmadı
+    assert db.change_feed.prune_expired(force=True) > 0 and db.get_changes()['changes'] == []
+
+    # Socket.IO köprüsü sadece bu process'in kayıtlarını yayınlar
+    from src.notes.change_feed import bridge_socketio, change, record_changes
+    emitted = []
+    bridge_socketio(db.change_feed, type('Socket', (), {'emit': lambda self, *args, **kw: emitted.append(kw['room'])})())
+    db.delete_note(parent.id)
+    foreign = change('delete', child_ids[0], workspace_id)
+    foreign['data']['pid'] = os.getpid() + 1
+    with db.get_session() as session:
+        record_changes(session, [foreign])
+        session.commit()
+    db.change_feed.dispatch()
+    assert emitted == [f"notes:{workspace_id}"]
+
+
+def test_materialized_stats_follow_writes_and_repair(tmp_path):
+    """İstatistikler ve etiket sayaçları her yazmada güncel kalmalı, sapma onarılmalı"""
+    from sqlalchemy import event
+
+    db, workspace_id = _database(tmp_path)
+    first = db.create_note("Bir", workspace_id, "user", tags=["a", "b"])
+    ids = db.bulk_create_notes(workspace_id, "user", [{'title': f"T{i}", 'tags': ["a"]} for i in range(3)])
+    db.update_note(first.id, "user", tags=["b", "c"])
+    db.bulk_archive_notes(ids[:2])
+    db.bulk_archive_notes(ids[:1])
+    db.archive_note(ids[0])
+    db.delete_note(ids[2])
+
+    statements = []
+    event.listen(db.read_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert db.get_workspace_stats(workspace_id) == {
+        'total_notes': 3, 'active_notes': 1, 'archived_notes': 2, 'total_tags': 3
+    }
+    assert len(statements) == 1
+    popular = db.get_popular_tags(workspace_id)
+    assert [(tag['name'], tag['note_count']) for tag in popular[:1]] == [("a", 2)]
+    assert sorted((tag['name'], tag['note_count']) for tag in popular) == [("a", 2), ("b", 1), ("c", 1)]
+
+    assert db.repair_stats() == {'workspaces': 0, 'tags': 0}
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE tags SET note_count = 99 WHERE name = 'c'")
+        connection.exec_driver_sql("UPDATE workspace_stats SET total_notes = 0")
+    assert db.repair_stats(workspace_id) == {'workspaces': 1, 'tags': 1}
+    assert db.get_workspace_stats(workspace_id)['total_notes'] == 3
+    assert {tag['name']: tag['note_count'] for tag in db.get_popular_tags(workspace_id)}["c"] == 1
+
+
+def test_related_notes_vector_index_is_incremental(tmp_path):
+    """İlgili notlar tüm workspace'ten bulunmalı; kayıt, arşiv ve yeniden başlatma indekse yansımalı"""
+    db, workspace_id = _database(tmp_path)
+    db.bulk_create_notes(workspace_id, "user", [
+        {'title': f"Dolgu {i}", 'content': f"alışveriş listesi ekmek süt yumurta {i}"} for i in range(150)
+    ])
+    main = db.create_note("Python veritabanı", workspace_id, "user",
+                          content="SQLAlchemy ile sqlite sorgu optimizasyonu ve indeks")
+    close = db.create_note("SQLite indeksleri", workspace_id, "user",
+                           content="sqlite indeks ve sorgu planı, SQLAlchemy optimizasyonu")
+
+    related = db.find_related_notes(main.id, limit=3)
+    assert related[0]['note']['id'] == close.id
+    assert {"sqlite", "sorgu"} <= set(related[0]['common_keywords'])
+
+    # Kayıt sonrası yeni not hemen bulunur (diğer aboneler istek thread'inde çalışmaz), arşivlenen not düşer
+    import threading
+    dispatch, request_dispatches = db.change_feed.dispatch, []
+    db.change_feed.dispatch = lambda: request_dispatches.append(threading.current_thread()) or dispatch()
+    late = db.create_note("Sorgu planı", workspace_id, "user", content="sqlite sorgu optimizasyonu indeks sqlalchemy")
+    assert late.id in [item['note']['id'] for item in db.find_related_notes(main.id)]
+    assert threading.main_thread() not in request_dispatches
+    db.change_feed.dispatch = dispatch
+    db.archive_note(close.id)
+    assert close.id not in [item['note']['id'] for item in db.find_related_notes(main.id)]
+
+    # Yeniden başlatma: indeks diskten açılır, aradaki değişiklikler günlükten uygulanır
+    db.similarity.close()
+    db.update_note(late.id, "user", title="Bahçe", content="bahçe çiçek sulama")
+    restarted = NotesDatabase(str(tmp_path / "notes.db"))
+    restarted.similarity.attach(restarted.change_feed)
+    assert restarted.similarity.get_stats()['rebuilds'] == 0
+    assert late.id not in [item['note']['id'] for item in restarted.find_related_notes(main.id)]
+    assert restarted.similarity.get_stats()['rebuilds'] == 0
+
+
+def test_similarity_index_is_shared_between_processes(tmp_path):
+    """Aynı dizini kullanan worker'lardan değişikliği biri uygulamalı, diğeri diskten yeniden yüklemeli"""
+    from src.notes.similarity import SimilarityIndex
+
+    db, workspace_id = _database(tmp_path)
+    first = db.create_note("Kahve", workspace_id, "user", content="kahve demleme öğütme filtre")
+    db.create_note("Bahçe", workspace_id, "user", content="bahçe çiçek sulama toprak")
+    other = SimilarityIndex(db.similarity.base_dir, db._load_similarity_rows)
+    other.attach(db.change_feed)
+    db.similarity.attach(db.change_feed)
+    assert other.similar_to_text(workspace_id, "kahve demleme")[0][0] == first.id
+    assert db.similarity.similar_to_text(workspace_id, "kahve demleme")[0][0] == first.id
+
+    late = db.create_note("Çay", workspace_id, "user", content="çay demleme demlik bardak")
+    db.change_feed.dispatch()
+    applied = [index.get_stats()['upserts'] for index in (db.similarity, other)]
+    assert sorted(applied) == [0, 1]
+
+    # Satır ekleyen diğer worker'dı: ids.json değiştiği için indeks yeniden açılır
+    assert other.similar_to_text(workspace_id, "çay demlik")[0][0] == late.id
+    assert db.similarity.similar_to_text(workspace_id, "çay demlik")[0][0] == late.id
+    assert db.similarity.get_stats()['rebuilds'] + other.get_stats()['rebuilds'] == 1
+
+
+def test_keywords_computed_at_save_and_invalidated_by_hash(tmp_path, monkeypatch):
+    """Anahtar kelimeler kayıtta hesaplanmalı; ilgili not sorgusu metni yeniden token'lara ayırmamalı"""
+    from src.notes import keywords
+    from src.notes.models import NoteTextFeatures
+
+    # I/İ/ı aramadaki gibi katlanır, rakamlı terimler korunur
+    assert keywords.tokenize("IŞIK İzmir ışık izmir python3 2024 a_b") == [
+        "işik", "izmir", "işik", "izmir", "python3", "2024"
+    ]
+
+    db, workspace_id = _database(tmp_path)
+    main = db.create_note("Kahve demleme", workspace_id, "user", content="<p>Filtre kahve demleme sıcaklığı</p>")
+    other_id = db.bulk_create_notes(workspace_id, "user", [
+        {'title': "Espresso", 'content': "kahve öğütme ve demleme süresi"}
+    ])[0]
+    db.update_note(main.id, "user", content="<p>Filtre kahve demleme sıcaklığı ve öğütme</p>")
+
+    with db.get_read_session() as session:
+        features = session.get(NoteTextFeatures, main.id)
+        assert features.content_hash == keywords.content_hash("Kahve demleme", "<p>Filtre kahve demleme sıcaklığı ve öğütme</p>")
+        assert features.keywords[:2] == ["demleme", "kahve"] and "p" not in features.term_freq
+        assert session.get(NoteTextFeatures, other_id).term_freq["espresso"] == keywords.TITLE_WEIGHT
+
+    calls = []
+    original = keywords.tokenize
+    monkeypatch.setattr(keywords, "tokenize", lambda text: calls.append(text) or original(text))
+    related = db.find_related_notes(main.id)
+    assert related[0]['note']['id'] == other_id and {"kahve", "demleme", "öğütme"} <= set(related[0]['common_keywords'])
+    assert calls == []
+
+    # ORM dışı yazma: hash uyuşmaz, değerler yeniden hesaplanır
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE notes SET content = 'çay' WHERE id = ?", (other_id,))
+    db.find_related_notes(main.id)
+    assert calls
+
+
+def test_enrichment_queue_debounces_dedupes_and_discards_stale(tmp_path):
+    """Kayıtlar tek analiz işinde birleşmeli, aynı içerik yeniden işlenmemeli, eskiyen sonuç yazılmamalı"""
+    import asyncio
+    from src.notes.enrichment import EnrichmentQueue, cached_result
+
+    class FakeAI:
+        def __init__(self):
+            self.calls = []
+            self.on_call = None
+
+        async def analyze_note(self, content):
+            self.calls.append('analysis')
+            await asyncio.sleep(0)
+            return {'success': True, 'analysis': f"analiz: {content}"}
+
+        async def suggest_tags(self, title, content, existing_tags):
+            self.calls.append('tags')
+            return ['kahve', *existing_tags]
+
+        async def summarize_content(self, title, content, length):
+            self.calls.append('summary')
+            if self.on_call:
+                self.on_call()
+            return f"{length}: {content}"
+
+    class FakeSocket:
+        def __init__(self):
+            self.events = []
+
+        def emit(self, event, data, room=None):
+            self.events.append((event, data['note_id'], sorted(data['enrichment']), room))
+
+    db, workspace_id = _database(tmp_path)
+    ai, socket = FakeAI(), FakeSocket()
+    queue = EnrichmentQueue(db, ai, socket, debounce=60, rate_per_minute=0)
+    queue.attach(db.change_feed)
+
+    note = db.create_note("Demleme", workspace_id, "user", content="ilk", tags=["içecek"])
+    db.update_note(note.id, "user", content="ikinci")
+    db.update_note(note.id, "user", is_pinned=True)
+    db.change_feed.dispatch()
+    assert queue.process_pending() == 0  # debounce süresi dolmadı
+
+    # Kayıtlar sadece analiz ister; etiket ve özet açık istekle gelir
+    assert queue.process_pending(force=True) == 1
+    assert ai.calls == ['analysis']
+    assert socket.events == [('note_enrichment', note.id, ['analysis'], f"notes:{workspace_id}")]
+
+    saved = db.get_note(note.id, increment_view=False)
+    assert saved.version == 3 and saved.last_edited_by == "user"
+    assert cached_result(saved.ai_metadata, 'analysis', saved.title, saved.content)['value'] == "analiz: ikinci"
+    assert db.get_changes(workspace_id=workspace_id)['changes'][-1]['actor'] == 'ai'
+
+    # Başka process'in kaydı ve toplu içe aktarma kuyruğa girmez
+    db.change_feed.dispatch()
+    queue._on_change({'op': 'create', 'note_id': note.id, 'data': {'pid': os.getpid() + 1}})
+    db.bulk_create_notes(workspace_id, "user", [{'title': "İçe aktarılan", 'content': "toplu"}])
+    db.change_feed.dispatch()
+    assert queue.get_stats()['pending'] == 0
+
+    # Açık istek eksik görevleri çalıştırır; aynı içerik için tekrar AI çağrısı yapılmaz
+    queue.enqueue(note.id, immediate=True)
+    assert queue.process_pending() == 1 and sorted(ai.calls) == ['analysis', 'summary', 'tags']
+    saved = db.get_note(note.id, increment_view=False)
+    assert cached_result(saved.ai_metadata, 'tags', saved.title, saved.content)['value'] == ['kahve', 'içecek']
+    db.change_feed.dispatch()
+    queue.enqueue(note.id, immediate=True)
+    assert queue.process_pending() == 0 and len(ai.calls) == 3
+
+    # AI çalışırken içerik değişirse sonuç atılır, yeni içerik tekrar kuyruğa girer
+    ai.on_call = lambda: db.update_note(note.id, "user", content="üçüncü")
+    queue.enqueue(note.id, ['summary'], length='short', immediate=True)
+    assert queue.process_pending() == 0 and queue.get_stats()['stale'] == 1
+    ai.on_call = None
+    db.change_feed.dispatch()
+    assert queue.process_pending(force=True) == 1
+    saved = db.get_note(note.id, increment_view=False)
+    assert cached_result(saved.ai_metadata, 'analysis', saved.title, saved.content)['value'] == "analiz: üçüncü"
+    assert cached_result(saved.ai_metadata, 'summary', saved.title, saved.content, 'short') is None
+    queue.stop()
+
+
+def test_file_catalog_imports_legacy_json_once(tmp_path):
+    """Eski file_metadata.json bir kez aktarılmalı; listeleme ve silme katalogdan çalışmalı"""
+    import json
+    from src.notes.file_manager import NotesFileManager
+
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    (upload_dir / "file_metadata.json").write_text(json.dumps({"eski": {
+        "id": "eski", "original_filename": "plan.txt", "stored_filename": "eski.txt",
+        "file_path": "documents\\eski.txt", "file_size": 4, "category": "documents",
+        "hash": "abc", "upload_date": "2025-01-01T00:00:00", "notes": ["n1", "n2"]
+    }}), encoding="utf-8")
+
+    manager = NotesFileManager(str(upload_dir))
+    legacy = manager.get_file_info("eski")
+    assert legacy["file_path"] == "documents/eski.txt" and legacy["notes"] == ["n1", "n2"]
+
+    uploaded = manager.upload_file(b"merhaba", "not.md", "n1")
+    assert [item["id"] for item in manager.get_note_files("n1")] == ["eski", uploaded["file_id"]]
+    assert manager.get_note_files("n2")[0]["original_filename"] == "plan.txt"
+    assert manager.get_storage_stats()["total_files"] == 2
+
+    assert manager.delete_file("eski")["success"]
+    # Yeniden açılışta JSON tekrar okunmaz; silinen kayıt geri gelmez
+    reopened = NotesFileManager(str(upload_dir))
+    assert reopened.get_file_info("eski") is None
+    assert [item["id"] for item in reopened.get_note_files("n1")] == [uploaded["file_id"]]
+
+
+def test_attachments_share_content_addressed_blobs(tmp_path):
+    """Aynı içerik bir kez saklanmalı; blob son referans silinince silinmeli"""
+    import hashlib
+    from src.notes.file_manager import NotesFileManager
+
+    manager = NotesFileManager(str(tmp_path / "uploads"))
+    data = b"ortak ek" * 1000
+    digest = hashlib.sha256(data).hexdigest()
+
+    first = manager.upload_file(data, "rapor.pdf", "n1")
+    second = manager.upload_file(data, "kopya.pdf", "n2")
+    again = manager.upload_file(data, "rapor.pdf", "n1")
+    assert not first["deduplicated"] and second["deduplicated"]
+    assert again["file_id"] == first["file_id"]
+    assert first["file_info"]["hash"] == digest
+    assert manager.get_file_path(second["file_id"]) == manager.blob_path(digest)
+    assert list(manager.temp_dir.iterdir()) == []
+
+    stats = manager.get_storage_stats()
+    assert stats["total_files"] == 2 and stats["blobs"] == 1 and stats["stored_size"] == len(data)
+
+    assert manager.delete_file(first["file_id"], "n1")["success"]
+    assert manager.blob_path(digest).read_bytes() == data
+
+    # Blob, katalog silme işlemi commit edilmeden önce silinir
+    committed = []
+    remove = manager._remove_released_files
+
+    def remove_before_commit(metadata, paths):
+        with manager.catalog.db.reader() as conn:
+            committed.append(conn.execute("SELECT refcount FROM blobs WHERE hash = ?", (digest,)).fetchone())
+        remove(metadata, paths)
+
+    manager._remove_released_files = remove_before_commit
+    assert manager.delete_file(second["file_id"], "n2")["success"]
+    assert committed == [(1,)] and not manager.blob_path(digest).exists()
+    assert manager.get_storage_stats()["blobs"] == 0
+
+
+def test_chunked_upload_resumes_and_download_supports_ranges(tmp_path, monkeypatch):
+    """Parçalı yükleme kaldığı yerden devam etmeli; indirme Range ve ETag desteklemeli"""
+    import hashlib
+    import io
+    from flask import Flask
+    from src.notes import api
+    from src.notes.file_manager import NotesFileManager
+
+    manager = NotesFileManager(str(tmp_path / "uploads"))
+    monkeypatch.setattr(api, "file_manager", manager)
+    app = Flask(__name__)
+    app.register_blueprint(api.notes_blueprint)
+    client = app.test_client()
+
+    data = bytes(range(256)) * 40
+    upload = manager.start_upload("veri.csv", len(data), "n1")
+    url = f"/api/notes/uploads/{upload['upload_id']}"
+
+    first = client.put(url, data=data[:4000], headers={"Content-Range": f"bytes 0-3999/{len(data)}"})
+    assert first.status_code == 200 and first.get_json()["offset"] == 4000
+    conflict = client.put(url, data=data[:10], headers={"Content-Range": f"bytes 0-9/{len(data)}"})
+    assert conflict.status_code == 409 and conflict.get_json()["offset"] == 4000
+
+    # Başka worker / yeniden başlatma: hash durumu diskteki parçadan kurulur
+    manager._upload_hashers.clear()
+    assert client.get(url).get_json()["offset"] == 4000
+    done = client.put(url, data=data[4000:], headers={"Content-Range": f"bytes 4000-{len(data) - 1}/{len(data)}"})
+    info = done.get_json()
+    assert info["complete"] and info["file_info"]["hash"] == hashlib.sha256(data).hexdigest()
+    assert list(manager.temp_dir.iterdir()) == []
+
+    streamed = manager.upload_stream(io.BytesIO(data), "kopya.csv", "n2")
+    assert streamed["deduplicated"]
+    assert not manager.upload_stream(io.BytesIO(b"x" * (26 * 1024 * 1024)), "buyuk.csv")["success"]
+
+    download = f"/api/notes/files/{info['file_id']}"
+    partial = client.get(download, headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206 and partial.data == data[10:20]
+    etag = client.get(download).headers["ETag"]
+    assert etag.strip('"') == info["file_info"]["hash"]
+    assert client.get(download, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_thumbnails_render_in_background_and_are_cached(tmp_path, monkeypatch):
+    """Thumbnail'lar yüklemeyi bloklamadan üretilmeli; boyut/format varyantları önbellekten gelmeli"""
+    import io
+    from flask import Flask
+    from PIL import Image
+    from src.notes import api
+    from src.notes.file_manager import NotesFileManager
+
+    manager = NotesFileManager(str(tmp_path / "uploads"))
+    monkeypatch.setattr(api, "file_manager", manager)
+    app = Flask(__name__)
+    app.register_blueprint(api.notes_blueprint)
+    client = app.test_client()
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (1600, 1200), (200, 40, 40)).save(buffer, "JPEG")
+    try:
+        uploaded = manager.upload_file(buffer.getvalue(), "foto.jpg", "n1")
+        file_id, digest = uploaded["file_id"], uploaded["file_info"]["hash"]
+        assert uploaded["file_info"]["thumbnail_path"] is None
+
+        response = client.get(f"/api/notes/files/{file_id}/thumbnail?size=200",
+                              headers={"Accept": "image/webp,*/*"})
+        assert response.status_code == 200 and response.mimetype == "image/webp"
+        assert "Accept" in response.headers["Vary"]
+        assert max(Image.open(io.BytesIO(response.data)).size) == 300
+
+        for size in (128, 300, 800):
+            for fmt in ("jpeg", "webp"):
+                assert manager.media.path(digest, size, fmt).exists()
+        jpeg = client.get(f"/api/notes/files/{file_id}/thumbnail?size=128&format=jpeg")
+        assert jpeg.mimetype == "image/jpeg" and Image.open(io.BytesIO(jpeg.data)).size == (128, 96)
+        assert client.get(f"/api/notes/files/{file_id}/thumbnail?size=128&format=jpeg",
+                          headers={"If-None-Match": jpeg.headers["ETag"]}).status_code == 304
+        assert manager.media.get_stats()["submitted"] == 1
+
+        assert manager.delete_file(file_id, "n1")["success"]
+        assert not manager.media.path(digest).exists()
+    finally:
+        manager.media.shutdown()
+
+
+def test_workspace_export_streams_archive_with_progress(tmp_path, monkeypatch):
+    """Workspace arşivi parça parça akmalı; notlar, ağaç ve ekler bir kez yer almalı"""
+    import io
+    import json
+    import zipfile
+    from flask import Flask
+    from src.notes import api, export_manager
+    from src.notes.file_manager import NotesFileManager
+
+    db, workspace_id = _database(tmp_path)
+    manager = NotesFileManager(str(tmp_path / "uploads"))
+    events = []
+
+    class Realtime:
+        def emit(self, event, data, room=None):
+            events.append((event, data, room))
+
+    monkeypatch.setattr(api, "notes_db", db)
+    monkeypatch.setattr(api, "file_manager", manager)
+    monkeypatch.setattr(api, "socketio", Realtime())
+    monkeypatch.setattr(export_manager, "EXPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(export_manager, "PROGRESS_INTERVAL", 0)
+    app = Flask(__name__)
+    app.register_blueprint(api.notes_blueprint)
+    client = app.test_client()
+
+    parent = db.create_note("Proje", workspace_id, "u1", content="kök", tags=["iş"])
+    child = db.create_note("Görev", workspace_id, "u1", content="alt", parent_id=parent.id)
+    db.create_note("Arşiv", workspace_id, "u1", content="eski")
+    data = b"ek" * 200000
+    shared = manager.upload_file(data, "rapor.pdf", parent.id)
+    manager.catalog.link(shared["file_id"], child.id)
+
+    response = client.get(f"/api/notes/workspaces/{workspace_id}/export?format=txt&export_id=exp1")
+    assert response.status_code == 200 and response.is_streamed
+    assert response.mimetype == "application/zip" and response.headers["X-Export-Id"] == "exp1"
+    chunks = list(response.response)
+    assert len(chunks) > 3 and all(chunks)
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+    names = archive.namelist()
+    attachments = [name for name in names if "/attachments/" in name]
+    assert len(attachments) == 1 and archive.read(attachments[0]) == data
+    assert sum(name.endswith(".txt") for name in names) == 3
+    tree = [json.loads(line) for name in names if "/tree/part-" in name
+            for line in archive.read(name).decode("utf-8").splitlines()]
+    assert len(tree) == 3
+    by_id = {entry["id"]: entry for entry in tree}
+    assert by_id[child.id]["parent_id"] == parent.id and by_id[parent.id]["tags"] == ["iş"]
+    assert by_id[child.id]["attachments"] == by_id[parent.id]["attachments"]
+
+    progress = [data for event, data, room in events if event == "notes_export_progress"]
+    assert all(data["export_id"] == "exp1" for data in progress)
+    assert progress[-1]["phase"] == "done" and progress[-1]["notes_done"] == 3
+    assert progress[-1]["files_done"] == 1 and progress[-1]["notes_total"] == 3
+
+    # Blob'u silinmiş ek export'u kesmez; ağaçta eksik olarak listelenir
+    lost = manager.upload_file(b"kayip", "kayip.txt", child.id)
+    manager.get_file_path(lost["file_id"]).unlink()
+    chunks = list(client.get(f"/api/notes/workspaces/{workspace_id}/export?format=txt").response)
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+    assert not any("kayip" in name for name in archive.namelist())
+    tree = {entry["id"]: entry for name in archive.namelist() if "/tree/part-" in name
+            for entry in map(json.loads, archive.read(name).decode("utf-8").splitlines())}
+    assert len(tree[child.id]["missing_attachments"]) == 1
+    assert tree[child.id]["attachments"] == tree[parent.id]["attachments"]
+
+    assert client.get(f"/api/notes/workspaces/{workspace_id}/export?archive=rar").status_code == 400
+    manager.media.shutdown()
+
+
+def test_export_cache_reuses_unchanged_versions_and_evicts_lru(tmp_path, monkeypatch):
+    """Değişmeyen not yeniden render edilmemeli; önbellek boyutu sınırlı kalmalı"""
+    import os
+    from src.notes.export_manager import NotesExportManager
+
+    db, workspace_id = _database(tmp_path)
+    manager = NotesExportManager(str(tmp_path / "exports"), cache_max_bytes=6000)
+    manager.cache.attach(db.change_feed)
+    renders = []
+    original = manager.render_note
+    monkeypatch.setattr(manager, "render_note", lambda note, fmt: renders.append(note["id"]) or original(note, fmt))
+
+    note = db.create_note("Rapor", workspace_id, "u1", content="x" * 1000)
+    first = manager.export_single_note(db.get_note(note.id, increment_view=False).to_dict(), "markdown")
+    again = manager.export_single_note(db.get_note(note.id, increment_view=False).to_dict(), "markdown")
+    assert first == again and renders == [note.id]
+
+    db.update_note(note.id, "u1", content="y" * 1000)
+    updated = manager.export_single_note(db.get_note(note.id, increment_view=False).to_dict(), "markdown")
+    assert updated != first and not os.path.exists(first) and len(renders) == 2
+
+    # Sürüm artırmayan değişiklik (arşiv) değişiklik akışıyla önbelleği temizler
+    db.archive_note(note.id)
+    db.change_feed.dispatch()
+    assert not os.path.exists(updated)
+
+    paths = []
+    for index in range(8):
+        other = db.create_note(f"Not {index}", workspace_id, "u1", content="z" * 1000)
+        paths.append(manager.export_single_note(other.to_dict(), "txt"))
+        os.utime(paths[-1], (index, index))
+    manager.export_single_note(other.to_dict(), "txt")
+    stats = manager.cache.get_stats()
+    assert stats["size"] <= 6000 and stats["evictions"] > 0
+    assert not os.path.exists(paths[0]) and os.path.exists(paths[-1])
+    assert not list((tmp_path / "exports").glob("*.txt"))
+
+
+def test_organizer_map_reduce_covers_every_note_with_bounded_concurrency(tmp_path):
+    """Organizasyon küme başına bir istek + tek birleştirme yapmalı ve tüm notları kapsamalı"""
+    import asyncio
+    import json
+    from types import SimpleNamespace
+    from src.ai_note_agents.note_organizer import NoteOrganizerAgent
+
+    db, workspace_id = _database(tmp_path)
+    topics = {
+        "python": "python kod fonksiyon modül test hata ayıklama",
+        "yemek": "tarif un şeker fırın pasta hamur",
+        "seyahat": "uçak otel bilet rota vize bavul",
+    }
+    for topic, words in topics.items():
+        for index in range(5):
+            db.create_note(f"{topic} {index}", workspace_id, "u1", content=f"{words} {words} not{index}")
+
+    calls, active, peak = [], [0], [0]
+
+    class Adapter:
+        async def send_message(self, role_id, message):
+            calls.append(message)
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+            if "ana kategorilerde birleştir" in message:
+                return SimpleNamespace(content=json.dumps({
+                    "main_categories": [{"name": "Hepsi", "clusters": [0, 1]}],
+                    "organization_suggestions": ["öneri"]
+                }))
+            return SimpleNamespace(content='{"name": "grup", "description": "d", "suggested_tags": ["t"]}')
+
+    agent = NoteOrganizerAgent(Adapter(), db, concurrency=2)
+    result = asyncio.run(agent.organize_workspace(workspace_id, max_clusters=3))
+    assert result["success"] and result["total_notes"] == 15
+    clusters = result["organization"]["clusters"]
+    assert result["cluster_count"] == len(clusters) == 3
+    assert len(calls) == len(clusters) + 1 and peak[0] <= 2
+
+    titles = {note.id: note.title.split()[0] for note in db.search_notes(workspace_id, limit=100)}
+    for cluster in clusters:
+        assert len({titles[note_id] for note_id in cluster["note_ids"]}) == 1
+
+    categories = result["organization"]["main_categories"]
+    covered = [note_id for category in categories for note_id in category["note_ids"]]
+    assert sorted(covered) == sorted(titles) and len(categories) == 2
+    assert categories[0]["name"] == "Hepsi" and categories[0]["note_count"] == 10
+
+    calls.clear()
+    tagged = asyncio.run(agent.auto_tag_notes(workspace_id, apply_tags=True, limit=4))
+    assert tagged["processed_notes"] == 4 and len(calls) == 4 and peak[0] <= 2
+
+    # Özellik satırı olmayan notların anahtar kelimeleri metinden hesaplanır
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(
+            "DELETE FROM note_text_features WHERE note_id IN (SELECT id FROM notes WHERE title LIKE 'yemek%')"
+        )
+    baking = [cluster for cluster in db.cluster_notes(workspace_id, max_clusters=3) if "tarif" in cluster["keywords"]]
+    assert len(baking) == 1 and {titles[note_id] for note_id in baking[0]["note_ids"]} == {"yemek"}
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Server Runtime testleri
+Sunucu modu yapılandırması, yerel SQLite message queue, paylaşılan state
+ve SQLite bağlantı havuzu
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+# Proje kökünü path'e ekle
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server_runtime import (
+    ServerRuntimeConfig, SQLiteQueueManager, build_socketio_options,
+    InMemoryStateBackend, SQLiteStateBackend, routing_hint,
+    SQLiteProfile, SQLiteConnectionFactory
+)
+from src.server_runtime.shared_state import DOCUMENTS, DOCUMENT_CHANGE_HISTORY
+from src.live_document_canvas.document_state_manager import DocumentStateManager, DocumentChange
+
+
+def test_config_from_env_defaults(monkeypatch):
+    """Varsayılan yapılandırma mevcut threading davranışını korumalı"""
+    for key in ('SERVER_MODE', 'SERVER_ASYNC_MODE', 'SERVER_WORKERS',
+                'SOCKETIO_MESSAGE_QUEUE', 'SOCKETIO_TRANSPORTS'):
+        monkeypatch.delenv(key, raising=False)
+
+    config = ServerRuntimeConfig.from_env()
+
+    assert config.async_mode == 'threading'
+    assert config.workers == 1
+    assert config.message_queue is None
+    assert config.transports == ['polling', 'websocket']
+
+
+def test_config_multi_worker(monkeypatch):
+    """Çoklu worker'da queue ve websocket-only transport otomatik seçilmeli"""
+    monkeypatch.setenv('SERVER_MODE', 'production')
+    monkeypatch.setenv('SERVER_WORKERS', '4')
+    monkeypatch.delenv('SOCKETIO_MESSAGE_QUEUE', raising=False)
+    monkeypatch.delenv('SOCKETIO_TRANSPORTS', raising=False)
+
+    config = ServerRuntimeConfig.from_env()
+
+    assert config.is_production
+    assert config.message_queue.startswith('sqlite://')
+    assert config.transports == ['websocket']
+    assert config.to_dict()['message_queue'] == 'sqlite'
+
+
+def test_monkey_patch_module_imports_nothing_else():
+    """Yama modülü başka proje modülü veya socket yüklememeli"""
+    import os
+    import subprocess
+
+    code = (
+        "import sys; from src.monkey_patch import patch_from_env; mode = patch_from_env(); "
+        "print(mode, sorted(m for m in sys.modules if m.startswith('src.') or m in ('socket', 'ssl')))"
+    )
+    env = {**os.environ, 'SERVER_MODE': 'production', 'SERVER_ASYNC_MODE': 'threading'}
+    result = subprocess.run([sys.executable, "-c", code], cwd=str(Path(__file__).parent.parent),
+                            env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["threading", "['src.monkey_patch']"]
+
+
+def test_sqlite_queue_cross_manager():
+    """Bir manager'ın yayınladığı mesaj diğerine ulaşmalı"""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/queue.db"
+        publisher = SQLiteQueueManager(url)
+        subscriber = SQLiteQueueManager(url)
+
+        # İlk boş okumada "uyku" sırasında mesaj yayınla
+        class FakeServer:
+            @staticmethod
+            def sleep(seconds):
+                publisher._publish({'method': 'emit', 'event': 'ping', 'data': 1})
+
+        subscriber.server = FakeServer()
+        message = next(subscriber._listen())
+
+        assert subscriber.json.loads(message)['event'] == 'ping'
+
+
+def test_build_socketio_options():
+    """sqlite URL'i için client_manager, diğerleri için message_queue"""
+    with tempfile.TemporaryDirectory() as tmp:
+        config = ServerRuntimeConfig(message_queue=f"sqlite:///{tmp}/queue.db")
+        options = build_socketio_options(config)
+        assert isinstance(options['client_manager'], SQLiteQueueManager)
+
+    config = ServerRuntimeConfig(message_queue='redis://localhost:6379/0')
+    options = build_socketio_options(config)
+    assert options['message_queue'] == 'redis://localhost:6379/0'
+    assert options['async_mode'] == 'threading'
+
+
+def _exercise_state_backend(backend):
+    """Konuşma, müdahale ve room işlemleri backend'den bağımsız çalışmalı"""
+    backend.create_conversation('s1', {
+        'status': 'paused', 'max_turns': 3, 'completed_turns': 3,
+        'context': {'conversation_history': []}
+    })
+    backend.append_conversation_history('s1', 'PM: merhaba')
+
+    # Compare-and-set: ikinci geçiş başarısız olmalı
+    assert backend.transition_conversation('s1', 'paused', 'active')['status'] == 'active'
+    assert backend.transition_conversation('s1', 'paused', 'active') is None
+    assert backend.get_conversation('s1')['context']['conversation_history'] == ['PM: merhaba']
+
+    backend.push_intervention('s1', {'message': 'ilk', 'applied': False})
+    backend.push_intervention('s1', {'message': 'son', 'applied': False})
+    assert backend.take_latest_intervention('s1')['message'] == 'son'
+    assert not backend.has_pending_intervention('s1')
+    assert backend.take_latest_intervention('s1') is None
+    assert backend.count_interventions('s1') == 2
+
+    colors = ['#red', '#blue']
+    first, _ = backend.join_room('doc', 'a', 'Ali', colors)
+    second, users = backend.join_room('doc', 'b', 'Ayşe', colors)
+    assert first['color'] != second['color']
+    assert len(users) == 2
+    assert backend.rooms_for_session('b') == ['doc']
+
+    backend.leave_room('doc', 'a')
+    assert backend.leave_room('doc', 'b')[1] == []
+    assert backend.get_room('doc') is None
+    assert backend.pop_conversation('s1') is not None
+    assert not backend.has_conversation('s1')
+
+
+def test_in_memory_state_backend():
+    """Varsayılan tek process backend'i"""
+    _exercise_state_backend(InMemoryStateBackend())
+
+
+def test_sqlite_state_backend_shared_between_instances():
+    """Aynı veritabanını kullanan iki backend (iki worker) aynı durumu görmeli"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = f"{tmp}/state.db"
+        _exercise_state_backend(SQLiteStateBackend(db_path))
+
+        worker_a = SQLiteStateBackend(db_path)
+        worker_b = SQLiteStateBackend(db_path)
+
+        manager_a = DocumentStateManager(state_backend=worker_a)
+        manager_b = DocumentStateManager(state_backend=worker_b)
+        document_id = manager_a.create_document("Plan", "Merhaba")
+
+        assert manager_b.add_user_to_document(document_id, "web_user")
+        assert manager_a.get_document(document_id).active_users == ["web_user"]
+        assert manager_b.get_statistics()['active_documents'] == 1
+
+        for index in range(DOCUMENT_CHANGE_HISTORY + 5):
+            change = DocumentChange(
+                change_id=manager_a.generate_change_id(), document_id=document_id,
+                user_id="web_user", change_type="insert", position=0,
+                old_content="", new_content="x", timestamp=str(index)
+            )
+            assert manager_a.apply_change(document_id, change)
+        stored = worker_b.get(DOCUMENTS, document_id)
+        assert len(stored['changes_history']) == DOCUMENT_CHANGE_HISTORY
+        assert stored['content'] == "x" * (DOCUMENT_CHANGE_HISTORY + 5) + "Merhaba"
+
+    assert routing_hint('s1', 4) == routing_hint('s1', 4)
+    assert routing_hint('s1', 1) == 0
+
+
+def test_sqlite_connection_factory_profile_and_pool(tmp_path):
+    """WAL profili uygulanmalı; okuyucular sınırlı ve salt okunur, yazmalar tek yazarda olmalı"""
+    import sqlite3
+    import threading
+    from src.project_memory import ProjectMemory
+
+    factory = SQLiteConnectionFactory(str(tmp_path / "pool.db"), SQLiteProfile(reader_pool_size=2))
+    with factory.writer() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        conn.execute("CREATE TABLE items (value INTEGER)")
+
+    def work(value):
+        with factory.writer() as conn:
+            conn.execute("INSERT INTO items VALUES (?)", (value,))
+        with factory.reader() as conn:
+            conn.execute("SELECT COUNT(*) FROM items").fetchone()
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        with factory.writer() as conn:
+            conn.execute("INSERT INTO items VALUES (-1)")
+            raise RuntimeError("iptal")
+    except RuntimeError:
+        pass
+
+    with factory.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 20
+        try:
+            conn.execute("INSERT INTO items VALUES (0)")
+            assert False, "okuyucu yazamamalı"
+        except sqlite3.OperationalError:
+            pass
+
+    stats = factory.get_stats()
+    assert stats['writes'] == 21 and stats['rollbacks'] == 1
+    assert stats['reads'] == 21
+    # 1 WAL kurulum + 1 yazar + en fazla 2 okuyucu
+    assert stats['connections_opened'] <= 4
+    factory.close()
+
+    memory = ProjectMemory(str(tmp_path / "memory.db"))
+    conversation_id = memory.save_conversation({'title': 'Test', 'messages': [
+        {'speaker': 'project_manager', 'content': 'Merhaba'}
+    ]})
+    assert memory.get_conversation_details(conversation_id)['messages'][0]['content'] == 'Merhaba'